@@ -1,127 +1,120 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from typing import Optional
-from app.simulators.scenario_runner import get_all_alerts, get_all_incidents, get_alert
+from app.api.deps import lab_environment, store_version
+from app.services.record_store import VersionExpired
+from app.simulators import tables
+from app.simulators.entity_index import entity_key
+from app.simulators.lab_sessions import LabEnvironment
+from app.simulators.scenario_runner import (
+    alert_changes, get_alert, incident_changes, page_alerts, page_incidents, update_alert_status
+)
 
 router = APIRouter()
 
-DEVICE_INVENTORY = [
-    {
-        "id": "dev-001",
-        "name": "DESKTOP-FIN-001",
-        "os": "Windows 11 Pro",
-        "osVersion": "22H2",
-        "riskLevel": "High",
-        "exposureLevel": "High",
-        "status": "Active",
-        "lastSeen": "2026-02-25T14:22:00Z",
-        "ipAddress": "10.1.1.45",
-        "domain": "CONTOSO",
-        "owner": "alice.johnson@contoso.com",
-        "tags": ["Finance", "High Value"],
-    },
-    {
-        "id": "dev-002",
-        "name": "SRV-DC-01",
-        "os": "Windows Server 2022",
-        "osVersion": "21H2",
-        "riskLevel": "Critical",
-        "exposureLevel": "High",
-        "status": "Active",
-        "lastSeen": "2026-02-25T14:25:00Z",
-        "ipAddress": "10.1.0.1",
-        "domain": "CONTOSO",
-        "owner": "IT Admin",
-        "tags": ["Domain Controller", "Critical Asset"],
-    },
-    {
-        "id": "dev-003",
-        "name": "DESKTOP-IT-042",
-        "os": "Windows 10 Pro",
-        "osVersion": "21H2",
-        "riskLevel": "Medium",
-        "exposureLevel": "Medium",
-        "status": "Active",
-        "lastSeen": "2026-02-25T13:10:00Z",
-        "ipAddress": "10.1.2.88",
-        "domain": "CONTOSO",
-        "owner": "bob.smith@contoso.com",
-        "tags": ["IT"],
-    },
-    {
-        "id": "dev-004",
-        "name": "LAPTOP-EXEC-001",
-        "os": "Windows 11 Pro",
-        "osVersion": "22H2",
-        "riskLevel": "Low",
-        "exposureLevel": "Low",
-        "status": "Active",
-        "lastSeen": "2026-02-25T12:00:00Z",
-        "ipAddress": "10.1.3.12",
-        "domain": "CONTOSO",
-        "owner": "carol.white@contoso.com",
-        "tags": ["Executive", "High Value"],
-    },
-    {
-        "id": "dev-005",
-        "name": "SRV-FILE-02",
-        "os": "Windows Server 2019",
-        "osVersion": "1809",
-        "riskLevel": "Medium",
-        "exposureLevel": "Medium",
-        "status": "Active",
-        "lastSeen": "2026-02-25T11:45:00Z",
-        "ipAddress": "10.1.0.15",
-        "domain": "CONTOSO",
-        "owner": "IT Admin",
-        "tags": ["File Server"],
-    },
-]
-
 
 @router.get("/alerts")
 async def list_alerts(
+    request: Request,
+    response: Response,
     severity: Optional[str] = None,
     status: Optional[str] = None,
-    limit: int = 50
+    scenario_id: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    since: Optional[int] = None,
+    env: LabEnvironment = Depends(lab_environment),
 ):
-    alerts = get_all_alerts()
-    if severity:
-        alerts = [a for a in alerts if a["severity"].lower() == severity.lower()]
-    if status:
-        alerts = [a for a in alerts if a["status"].lower() == status.lower()]
-    return {"alerts": alerts[:limit], "total": len(alerts)}
+    """
+    A page of alerts, or with since=<version> only the alerts created,
+    updated or deleted after that version. Each response carries the store
+    version as its ETag; If-None-Match with the current one gets a 304.
+    """
+    version = store_version(request, response, env.alerts)
+    if since is not None:
+        try:
+            alerts, removed, version, more = alert_changes(env, since, severity, status, scenario_id, max(limit, 1))
+        except VersionExpired as e:
+            raise HTTPException(status_code=410, detail=str(e))
+        return {"alerts": alerts, "removed": removed, "version": version, "more": more}
+    try:
+        alerts, next_cursor, total = page_alerts(env, severity, status, scenario_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"alerts": alerts, "total": total, "nextCursor": next_cursor, "version": version}
 
 
 @router.get("/alerts/{alert_id}")
-async def get_alert_endpoint(alert_id: str):
-    alert = get_alert(alert_id)
+async def get_alert_endpoint(alert_id: str, env: LabEnvironment = Depends(lab_environment)):
+    alert = get_alert(env, alert_id)
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
     return alert
 
 
+@router.patch("/alerts/{alert_id}")
+async def update_alert(alert_id: str, body: dict, env: LabEnvironment = Depends(lab_environment)):
+    status = body.get("status")
+    valid_statuses = ["New", "InProgress", "Resolved"]
+    if status not in valid_statuses:
+        raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
+    try:
+        return update_alert_status(env, alert_id, status)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
 @router.get("/incidents")
-async def list_incidents(limit: int = 50):
-    incidents = get_all_incidents()
-    return {"incidents": incidents[:limit], "total": len(incidents)}
+async def list_incidents(
+    request: Request,
+    response: Response,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    since: Optional[int] = None,
+    env: LabEnvironment = Depends(lab_environment),
+):
+    version = store_version(request, response, env.incidents)
+    if since is not None:
+        try:
+            incidents, removed, version, more = incident_changes(env, since, limit=max(limit, 1))
+        except VersionExpired as e:
+            raise HTTPException(status_code=410, detail=str(e))
+        return {"incidents": incidents, "removed": removed, "version": version, "more": more}
+    try:
+        incidents, next_cursor, total = page_incidents(env, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"incidents": incidents, "total": total, "nextCursor": next_cursor, "version": version}
 
 
 @router.get("/devices")
-async def list_devices(limit: int = 50):
-    alerts = get_all_alerts()
-    alert_devices: dict = {}
-    for alert in alerts:
-        entity = alert.get("entity", "")
-        if "@" not in entity and entity:
-            alert_devices[entity] = alert_devices.get(entity, 0) + 1
+async def list_devices(
+    risk_level: Optional[str] = None,
+    tag: Optional[str] = None,
+    owner: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    env: LabEnvironment = Depends(lab_environment),
+):
+    """
+    A page of the device inventory, most recently seen first, with each
+    device's alert counts in the caller's lab environment. activeAlerts
+    counts the device's alerts that are not resolved or closed.
+    """
+    try:
+        devices, next_cursor, total = tables.devices.page(
+            {"riskLevel": risk_level, "tags": tag, "owner": owner}, limit, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     enriched = []
-    for device in DEVICE_INVENTORY:
+    for device in devices:
         d = dict(device)
-        d["activeAlerts"] = alert_devices.get(device["name"], 0)
+        d["alertCounts"] = env.alert_counts.counts(entity_key(device["name"]))
+        d["activeAlerts"] = d["alertCounts"]["active"]
         enriched.append(d)
 
-    return {"devices": enriched[:limit], "total": len(enriched)}
+    return {"devices": enriched, "total": total, "nextCursor": next_cursor}
 
 
 @router.post("/hunting/query")
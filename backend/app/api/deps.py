@@ -0,0 +1,27 @@
+from typing import Optional
+
+from fastapi import Header, HTTPException, Request, Response
+
+from app.services.record_store import RecordStore
+from app.simulators.lab_sessions import LabEnvironment
+from app.simulators.tables import sessions
+
+
+async def lab_environment(x_lab_session: Optional[str] = Header(None, max_length=64)) -> LabEnvironment:
+    """The caller's lab environment, chosen by the X-Lab-Session header (shared default without it)."""
+    return await sessions.acquire(x_lab_session)
+
+
+def store_version(request: Request, response: Response, store: RecordStore) -> int:
+    """
+    The store's current version, also sent as the response ETag. Answers 304
+    Not Modified straight away when If-None-Match already names it, before
+    anything is paged or serialized.
+    """
+    version = store.version
+    etag = f'"{version}"'
+    tags = {t.strip().removeprefix("W/") for t in request.headers.get("if-none-match", "").split(",")}
+    if etag in tags or "*" in tags:
+        raise HTTPException(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return version
@@ -1,12 +1,14 @@
-from fastapi import APIRouter, HTTPException
-from typing import Optional
-from app.simulators.scenario_runner import start_scenario, SCENARIOS, clear_all
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from app.api.deps import lab_environment
+from app.core.config import settings
+from app.simulators.lab_sessions import DEFAULT_SESSION, LabEnvironment
+from app.simulators.scenario_runner import all_scenarios, clear_all
+from app.simulators.tables import scheduler, sessions
 
 router = APIRouter()
 
-# In-memory score tracking
-_scores: dict = {}
-
 LAB_QUESTIONS = {
     "bec-invoice-fraud-001": [
         {
@@ -211,7 +213,7 @@ LAB_QUESTIONS = {
 @router.get("/scenarios")
 async def list_scenarios(difficulty: Optional[str] = None):
     result = []
-    for scenario_id, scenario in SCENARIOS.items():
+    for scenario_id, scenario in all_scenarios().items():
         if difficulty and scenario["difficulty"].lower() != difficulty.lower():
             continue
         result.append({
@@ -225,19 +227,110 @@ async def list_scenarios(difficulty: Optional[str] = None):
 
 
 @router.post("/scenarios/{scenario_id}/start")
-async def start_scenario_endpoint(scenario_id: str):
+async def start_scenario_endpoint(
+    scenario_id: str,
+    compression: Optional[float] = Query(None, ge=0),
+    env: LabEnvironment = Depends(lab_environment),
+):
+    """
+    Start replaying a scenario's timeline. The incident is created straight
+    away (or, with alert correlation enabled, built from the alerts as they
+    arrive); alerts and log rows arrive as their stage delays elapse, sped
+    up by the compression factor (0 injects everything at once).
+    """
     try:
-        incident = start_scenario(scenario_id)
-        return {
-            "status": "started",
-            "scenario_id": scenario_id,
-            "incident_id": incident["id"],
-            "alerts_created": incident["alertCount"],
-            "question_count": len(LAB_QUESTIONS.get(scenario_id, [])),
-            "message": f"Scenario started! {incident['alertCount']} alerts and 1 incident created.",
-        }
+        run = scheduler.schedule(env, scenario_id, compression)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    status = run.status()
+    alerts_total = sum(1 for _, kind, _ in run.events if kind == "alert")
+    incidents = "1 incident" if env.correlator is None else "correlated incidents"
+    return {
+        "status": "started",
+        "scenario_id": scenario_id,
+        "run_id": run.id,
+        "incident_id": run.incident_id,
+        "alerts_created": status["alerts_created"],
+        "alerts_scheduled": alerts_total,
+        "duration_seconds": status["duration_seconds"],
+        "question_count": len(LAB_QUESTIONS.get(scenario_id, [])),
+        "message": (
+            f"Scenario started! {incidents} created; {alerts_total} alerts arrive over the next {status['duration_seconds']:.0f}s."
+            if status["state"] == "running"
+            else f"Scenario started! {status['alerts_created']} alerts and {incidents} created."
+        ),
+    }
+
+
+class BulkStartRequest(BaseModel):
+    scenario_ids: List[str] = Field(min_length=1)
+    instances: int = Field(1, ge=1)
+    # One environment per listed session (e.g. a class); empty uses the caller's
+    sessions: List[str] = []
+    compression: Optional[float] = Field(None, ge=0)
+
+
+@router.post("/scenarios/bulk-start")
+async def bulk_start_scenarios(body: BulkStartRequest, env: LabEnvironment = Depends(lab_environment)):
+    """
+    Start `instances` runs of every listed scenario in each listed session
+    (or in the caller's environment) in one request.
+    """
+    if any(len(session_id) > 64 for session_id in body.sessions):
+        raise HTTPException(status_code=422, detail="Session ids are limited to 64 characters")
+    distinct = {session_id for session_id in body.sessions if session_id and session_id != DEFAULT_SESSION}
+    if len(distinct) > sessions.max_sessions:
+        # More would evict the first environments before their runs start.
+        raise HTTPException(
+            status_code=400,
+            detail=f"{len(distinct)} sessions requested; at most {sessions.max_sessions} are kept",
+        )
+    environments = [await sessions.acquire(session_id) for session_id in body.sessions] or [env]
+    total = len(environments) * len(body.scenario_ids) * body.instances
+    if total > settings.LAB_BULK_MAX_RUNS:
+        raise HTTPException(
+            status_code=400, detail=f"{total} runs requested; the limit is {settings.LAB_BULK_MAX_RUNS}"
+        )
+    launches = [
+        (target, scenario_id)
+        for target in environments
+        for scenario_id in body.scenario_ids
+        for _ in range(body.instances)
+    ]
+    try:
+        runs = scheduler.schedule_many(launches, body.compression)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {
+        "status": "started",
+        "runs_started": len(runs),
+        "runs": [
+            {"run_id": run.id, "session": run.env.session_id, "scenario_id": run.scenario_id, "incident_id": run.incident_id}
+            for run in runs
+        ],
+    }
+
+
+@router.get("/runs")
+async def list_runs(env: LabEnvironment = Depends(lab_environment)):
+    runs = [run.status() for run in scheduler.runs(env)]
+    return {"runs": runs, "total": len(runs), "active": sum(1 for r in runs if r["state"] == "running")}
+
+
+@router.get("/runs/{run_id}")
+async def get_run(run_id: str, env: LabEnvironment = Depends(lab_environment)):
+    run = scheduler.get(run_id)
+    if not run or run.env is not env:
+        raise HTTPException(status_code=404, detail=f"Run '{run_id}' not found")
+    return run.status()
+
+
+@router.post("/runs/{run_id}/cancel")
+async def cancel_run(run_id: str, env: LabEnvironment = Depends(lab_environment)):
+    run = scheduler.get(run_id)
+    if not run or run.env is not env or not scheduler.cancel(run_id):
+        raise HTTPException(status_code=404, detail=f"No running scenario run '{run_id}'")
+    return run.status()
 
 
 @router.get("/scenarios/{scenario_id}/questions")
@@ -261,7 +354,7 @@ async def get_questions(scenario_id: str):
 
 
 @router.post("/scenarios/{scenario_id}/answer")
-async def submit_answer(scenario_id: str, body: dict):
+async def submit_answer(scenario_id: str, body: dict, env: LabEnvironment = Depends(lab_environment)):
     question_id = body.get("question_id")
     answer = body.get("answer", "").strip().lower()
 
@@ -273,6 +366,8 @@ async def submit_answer(scenario_id: str, body: dict):
 
     accepted = question.get("accepted_answers", [question["answer"]])
     correct = answer in [a.lower() for a in accepted]
+    if correct:
+        env.add_score(scenario_id, question_id, question["points"])
 
     return {
         "correct": correct,
@@ -297,11 +392,34 @@ async def submit_lab_answer(lab_id: str, body: dict):
 
 
 @router.get("/progress")
-async def get_progress():
-    return {"total_points": 0, "labs_completed": 0, "scenarios_run": 0, "skill_tracks": []}
+async def get_progress(env: LabEnvironment = Depends(lab_environment)):
+    return {
+        "total_points": sum(sum(points.values()) for points in env.scores.values()),
+        "labs_completed": sum(
+            1 for scenario_id, points in env.scores.items()
+            if len(points) == len(LAB_QUESTIONS.get(scenario_id, [])) > 0
+        ),
+        "scenarios_run": len(scheduler.runs(env)),
+        "skill_tracks": [],
+    }
 
 
 @router.post("/reset")
-async def reset_environment():
-    clear_all()
-    return {"status": "reset", "message": "Environment reset. All incidents and alerts cleared."}
\ No newline at end of file
+async def reset_environment(env: LabEnvironment = Depends(lab_environment)):
+    scheduler.cancel_all(env)
+    clear_all(env)
+    return {"status": "reset", "message": "Environment reset. All incidents and alerts cleared."}
+
+
+@router.get("/session")
+async def session_status(env: LabEnvironment = Depends(lab_environment)):
+    return env.status()
+
+
+@router.delete("/session")
+async def end_session(env: LabEnvironment = Depends(lab_environment)):
+    """Drop a lab session and everything in it (the default environment is only reset)."""
+    scheduler.cancel_all(env)
+    if not sessions.drop(env.session_id):
+        clear_all(env)
+    return {"status": "ended", "session": env.session_id}
\ No newline at end of file
@@ -0,0 +1,67 @@
+import asyncio
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect, status
+
+from app.services.live_updates import LiveFilter, Subscription
+from app.simulators import tables
+
+router = APIRouter()
+
+
+@router.websocket("/ws")
+async def live_updates(
+    websocket: WebSocket,
+    session: Optional[str] = Query(None, max_length=64),
+    kinds: Optional[str] = None,
+    severity: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    scenario_id: Optional[str] = Query(None, alias="scenarioId"),
+):
+    """
+    Stream incident and alert changes for a lab session (the session query
+    parameter, or the X-Lab-Session header; shared default without either).
+    Filters are comma-separated query parameters and can be replaced later
+    by sending {"kinds": [...], "severity": [...], "status": [...],
+    "scenarioId": ...}. Frames are {"type": "changes", "events": [...]},
+    {"type": "resync"} when the client fell behind and should re-read the
+    REST endpoints, and {"type": "closed"} when the session went away.
+    """
+    try:
+        live_filter = LiveFilter.parse(
+            {"kinds": kinds, "severity": severity, "status": status_filter, "scenarioId": scenario_id}
+        )
+    except ValueError as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(e))
+        return
+    env = await tables.sessions.acquire(session or websocket.headers.get("x-lab-session"))
+    try:
+        subscription = tables.live_hub.subscribe(env, live_filter)
+    except OverflowError as e:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER, reason=str(e))
+        return
+
+    await websocket.accept()
+    sender = asyncio.create_task(_send_frames(websocket, subscription))
+    try:
+        while True:
+            message = await websocket.receive_text()
+            try:
+                subscription.filter = LiveFilter.parse(json.loads(message))
+            except (ValueError, AttributeError) as e:
+                await websocket.send_text(json.dumps({"type": "error", "detail": str(e)}))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        tables.live_hub.unsubscribe(subscription)
+        sender.cancel()
+
+
+async def _send_frames(websocket: WebSocket, subscription: Subscription):
+    while True:
+        frame = await subscription.next_frame()
+        if frame is None:
+            await websocket.close()
+            return
+        await websocket.send_text(frame)
@@ -1,20 +1,63 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from typing import Optional
-from app.simulators.kql_engine import KQLExecutor, TableRegistry
-from app.simulators.log_data import load_all_tables
+from app.core.config import settings
+from app.simulators.entity_index import expand_entity_graph
+from app.simulators.kql_engine import KQLExecutor
+from app.simulators.kql_querylog import QueryLog
+from app.simulators.lab_sessions import LabEnvironment
+from app.api.deps import lab_environment, store_version
+from app.services.record_store import VersionExpired
+from app.simulators import tables
+from app.simulators.tables import registry as _registry
 from app.simulators.scenario_runner import (
-    get_all_incidents, get_incident,
+    get_incident, incident_changes, page_incidents,
     update_incident_status
 )
 
 router = APIRouter()
 
-# Load synthetic data and register tables once at startup
-_registry = TableRegistry()
-for name, df in load_all_tables().items():
-    _registry.register(name, df)
+# Parallel and sharded executors pull in multiprocessing machinery, so they
+# are only imported when configured.
+if settings.KQL_SHARD_ADDRESSES:
+    from app.simulators.kql_shards import ShardedKQLExecutor, generated_sources, parquet_sources, parse_address
+    from app.simulators.log_data import DEFAULT_TABLE_ROWS
 
-_executor = KQLExecutor(_registry)
+    _sources = generated_sources(DEFAULT_TABLE_ROWS, tables.data_seed, tables.data_anchor)
+    if settings.KQL_SHARD_PARQUET_DIR:
+        _sources.update(parquet_sources(settings.KQL_SHARD_PARQUET_DIR))
+    _executor = ShardedKQLExecutor(
+        _registry,
+        addresses=[parse_address(a) for a in settings.KQL_SHARD_ADDRESSES],
+        authkey=settings.KQL_SHARD_AUTHKEY.encode(),
+        sources=_sources,
+        timeout=settings.KQL_SHARD_TIMEOUT_SECONDS,
+    )
+elif settings.KQL_PARALLEL_WORKERS > 1:
+    from app.simulators.kql_parallel import ParallelKQLExecutor
+
+    _executor = ParallelKQLExecutor(
+        _registry,
+        workers=settings.KQL_PARALLEL_WORKERS,
+        partition_rows=settings.KQL_PARTITION_ROWS,
+        min_rows=settings.KQL_PARALLEL_MIN_ROWS,
+    )
+else:
+    _executor = KQLExecutor(_registry)
+
+_query_log = QueryLog(
+    slow_threshold_ms=settings.KQL_SLOW_QUERY_MS,
+    capacity=settings.KQL_SLOW_QUERY_LOG_SIZE,
+    sink_path=settings.KQL_SLOW_QUERY_LOG_PATH,
+)
+
+
+def _execute(query: str, env: LabEnvironment):
+    # Sessions without injected rows read the shared tables, so they keep the
+    # configured (parallel or sharded) executor.
+    shared = env.registry is _registry or env.registry.empty
+    result = (_executor if shared else env.executor).execute(query)
+    _query_log.record(query, result)
+    return result
 
 KQL_CHALLENGES = [
     {
@@ -106,40 +149,78 @@ KQL_CHALLENGES = [
 
 @router.get("/incidents")
 async def list_incidents(
+    request: Request,
+    response: Response,
     severity: Optional[str] = None,
     status: Optional[str] = None,
-    limit: int = 50
+    scenario_id: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    since: Optional[int] = None,
+    env: LabEnvironment = Depends(lab_environment),
 ):
-    incidents = get_all_incidents()
-    if severity:
-        incidents = [i for i in incidents if i["severity"].lower() == severity.lower()]
-    if status:
-        incidents = [i for i in incidents if i["status"].lower() == status.lower()]
-    return {"incidents": incidents[:limit], "total": len(incidents)}
+    """
+    A page of incidents, or with since=<version> only the incidents created,
+    updated or deleted after that version. Each response carries the store
+    version as its ETag; If-None-Match with the current one gets a 304.
+    """
+    version = store_version(request, response, env.incidents)
+    if since is not None:
+        try:
+            incidents, removed, version, more = incident_changes(env, since, severity, status, scenario_id, max(limit, 1))
+        except VersionExpired as e:
+            raise HTTPException(status_code=410, detail=str(e))
+        return {"incidents": incidents, "removed": removed, "version": version, "more": more}
+    try:
+        incidents, next_cursor, total = page_incidents(env, severity, status, scenario_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"incidents": incidents, "total": total, "nextCursor": next_cursor, "version": version}
 
 
 @router.get("/incidents/{incident_id}")
-async def get_incident_endpoint(incident_id: str):
-    incident = get_incident(incident_id)
+async def get_incident_endpoint(incident_id: str, env: LabEnvironment = Depends(lab_environment)):
+    incident = get_incident(env, incident_id)
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
     return incident
 
 
 @router.patch("/incidents/{incident_id}")
-async def update_incident(incident_id: str, body: dict):
+async def update_incident(incident_id: str, body: dict, env: LabEnvironment = Depends(lab_environment)):
     status = body.get("status")
     assigned_to = body.get("assignedTo")
     valid_statuses = ["New", "Active", "InProgress", "Resolved", "Closed"]
     if status and status not in valid_statuses:
         raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
     try:
-        incident = update_incident_status(incident_id, status or "New", assigned_to)
+        incident = update_incident_status(env, incident_id, status or "New", assigned_to)
         return incident
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 
+@router.get("/entities/{entity}/graph")
+async def entity_graph(
+    entity: str,
+    depth: int = 1,
+    fan_out: int = 10,
+    max_nodes: int = 200,
+    env: LabEnvironment = Depends(lab_environment),
+):
+    """
+    Investigation graph around a user, device or IP: related alerts and
+    incidents, rows mentioning it per table, and co-occurring entities up to
+    depth hops away (at most 3), with at most fan_out neighbours per entity.
+    """
+    return expand_entity_graph(
+        env, entity,
+        depth=max(0, min(depth, 3)),
+        fan_out=max(1, min(fan_out, 100)),
+        max_nodes=max(1, min(max_nodes, 1000)),
+    )
+
+
 @router.get("/kql-challenges")
 async def list_kql_challenges():
     """Return all KQL challenges without solutions."""
@@ -160,7 +241,7 @@ async def list_kql_challenges():
 
 
 @router.post("/kql-challenges/{challenge_id}/validate")
-async def validate_kql_challenge(challenge_id: str, body: dict):
+async def validate_kql_challenge(challenge_id: str, body: dict, env: LabEnvironment = Depends(lab_environment)):
     """Validate a KQL query against a challenge."""
     query = body.get("query", "").strip()
     if not query:
@@ -171,7 +252,7 @@ async def validate_kql_challenge(challenge_id: str, body: dict):
         raise HTTPException(status_code=404, detail="Challenge not found")
 
     # Run the query
-    result = _executor.execute(query)
+    result = _execute(query, env)
 
     if result.error:
         return {
@@ -222,16 +303,83 @@ async def validate_kql_challenge(challenge_id: str, body: dict):
     }
 
 
+@router.get("/schema")
+async def get_schema():
+    """
+    Tables, their columns and KQL types, and which columns support value
+    completion. Tables not loaded yet are listed from their declared schema
+    (row_count null) rather than loaded here.
+    """
+    tables = []
+    for name in _registry.list_tables():
+        loaded = _registry.is_loaded(name)
+        completable = set(_registry.completions.columns(name))
+        tables.append({
+            "name": name,
+            "loaded": loaded,
+            "row_count": _registry.stats(name).row_count if loaded else None,
+            "columns": [
+                {"name": column, "type": kql_type, "completable": column in completable}
+                for column, kql_type in _registry.schema(name) or []
+            ],
+        })
+    return {"tables": tables}
+
+
+@router.get("/schema/complete")
+async def complete_value(table: str, column: str, prefix: str = "", limit: int = 10):
+    """Most frequent values of a column starting with prefix."""
+    if _registry.get(table) is None:
+        raise HTTPException(status_code=404, detail=f"Table '{table}' not found")
+    limit = max(1, min(limit, 100))
+    matches = _registry.completions.complete(table, column, prefix, limit)
+    if matches is None:
+        raise HTTPException(status_code=400, detail=f"Column '{column}' of '{table}' has no value completion")
+    return {
+        "table": table,
+        "column": column,
+        "prefix": prefix,
+        "values": [{"value": value, "count": count} for value, count in matches],
+    }
+
+
 @router.post("/query/kql")
-async def run_kql_query(body: dict):
+async def run_kql_query(body: dict, env: LabEnvironment = Depends(lab_environment)):
     query = body.get("query", "")
     if not query:
         raise HTTPException(status_code=400, detail="Query is required")
-    result = _executor.execute(query)
+    result = _execute(query, env)
     return {
         "columns": result.columns,
         "rows": result.rows,
         "row_count": result.row_count,
         "execution_time_ms": result.execution_time_ms,
         "error": result.error,
-    }
\ No newline at end of file
+        "profile": result.profile,
+    }
+
+
+@router.get("/telemetry")
+async def telemetry_status():
+    """Live telemetry emitter status: target vs achieved EPS, lag and dropped events."""
+    if tables.emitter is None:
+        return {"enabled": False, "running": False}
+    return {"enabled": True, **tables.emitter.status()}
+
+
+@router.get("/query/slow")
+async def list_slow_queries(limit: int = 50):
+    """Most recent queries slower than the slow-query threshold, with stage profiles."""
+    return {
+        "threshold_ms": _query_log.slow_threshold_ms,
+        "queries": _query_log.slow_queries(limit),
+    }
+
+
+@router.get("/query/fingerprints")
+async def top_query_fingerprints(by: str = "total", limit: int = 10):
+    """Query fingerprints ranked by total time, call count or p95 latency."""
+    try:
+        return {"by": by, "fingerprints": _query_log.top(by, limit)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
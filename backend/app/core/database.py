@@ -1,7 +1,112 @@
+"""
+Database
+--------
+The optional relational store behind lab state persistence. DATABASE_URL
+may point at PostgreSQL or, for local use, a SQLite file; either way the
+async driver (asyncpg or aiosqlite) is chosen from the URL and one pooled
+engine is shared by the process. Nothing connects unless
+PERSISTENCE_ENABLED is set.
+
+Records are kept as JSON documents keyed on (session, id): the in-memory
+stores own the indexes, so the database only has to hold and return them.
+"""
+
+import logging
+import os
+from typing import AsyncIterator, Optional
+
+from sqlalchemy import JSON, Column, Integer, MetaData, String, Table, event
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+metadata = MetaData()
+
+incidents_table = Table(
+    "incidents", metadata,
+    Column("session", String(64), primary_key=True),
+    Column("id", String(64), primary_key=True),
+    Column("data", JSON, nullable=False),
+)
+
+alerts_table = Table(
+    "alerts", metadata,
+    Column("session", String(64), primary_key=True),
+    Column("id", String(64), primary_key=True),
+    Column("data", JSON, nullable=False),
+)
+
+scores_table = Table(
+    "scores", metadata,
+    Column("session", String(64), primary_key=True),
+    Column("scenario_id", String(128), primary_key=True),
+    Column("question_id", String(128), primary_key=True),
+    Column("points", Integer, nullable=False),
+)
+
+_ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+engine: Optional[AsyncEngine] = None
+
+
+def async_database_url(url: str) -> str:
+    """The URL with its async driver filled in (postgresql:// -> postgresql+asyncpg://)."""
+    scheme, sep, rest = url.partition("://")
+    if "+" in scheme or not sep:
+        return url
+    return f"{_ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+
+def create_engine(url: Optional[str] = None) -> AsyncEngine:
+    url = async_database_url(url or settings.DATABASE_URL)
+    if url.startswith("sqlite"):
+        new_engine = create_async_engine(url)
+
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def _sqlite_pragmas(dbapi_connection, _):
+            # WAL lets reads proceed during the write-behind flushes.
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.close()
+
+        return new_engine
+    return create_async_engine(
+        url, pool_size=settings.DATABASE_POOL_SIZE, max_overflow=settings.DATABASE_POOL_SIZE, pool_pre_ping=True
+    )
+
+
 async def init_db():
-    """Initialize database — placeholder until PostgreSQL is configured."""
-    print("✅ Database ready (running without PostgreSQL for now)")
+    """Create the engine and tables when persistence is enabled."""
+    global engine
+    if not settings.PERSISTENCE_ENABLED:
+        logger.info("Persistence disabled; lab state is kept in memory only")
+        return
+    engine = create_engine()
+    if engine.dialect.name == "sqlite" and engine.url.database not in (None, "", ":memory:"):
+        os.makedirs(os.path.dirname(os.path.abspath(engine.url.database)), exist_ok=True)
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+    logger.info("Database ready at %s", engine.url.render_as_string(hide_password=True))
+
+
+async def close_db():
+    global engine
+    if engine is not None:
+        await engine.dispose()
+        engine = None
+
 
-async def get_db():
-    """Placeholder database session dependency."""
-    yield None
\ No newline at end of file
+async def get_db() -> AsyncIterator[Optional[AsyncConnection]]:
+    """Database connection dependency; None when persistence is disabled."""
+    if engine is None:
+        yield None
+        return
+    async with engine.connect() as conn:
+        yield conn
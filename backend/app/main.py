@@ -2,23 +2,45 @@
 Microsoft SIEM & XDR Simulator — Backend API
 """
 
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
-from app.core.database import init_db
+from app.core import database
+from app.core.metrics import MetricsMiddleware, metrics
+from app.simulators import tables
 from app.api.sentinel import router as sentinel_router
 from app.api.defender import router as defender_router
 from app.api.labs import router as labs_router
+from app.api.live import router as live_router
 from app.api.auth import router as auth_router
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events."""
-    await init_db()
+    await database.init_db()
+    if tables.journal is not None:
+        await tables.journal.restore(database.engine, tables.sessions)
+        tables.journal.start(database.engine, tables.sessions)
+    tables.live_hub.start()
+    warm_up = asyncio.create_task(tables.warm_up()) if settings.KQL_WARMUP_ON_STARTUP else None
+    if tables.emitter is not None:
+        tables.emitter.start()
     yield
+    await tables.scheduler.stop()
+    await tables.live_hub.stop()
+    if tables.emitter is not None:
+        tables.emitter.stop()
+    if tables.journal is not None:
+        await tables.journal.stop()
+    await database.close_db()
+    if warm_up is not None and not warm_up.done():
+        warm_up.cancel()
 
 
 app = FastAPI(
@@ -36,12 +58,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 app.include_router(auth_router, prefix="/api/v1/auth", tags=["Authentication"])
 app.include_router(sentinel_router, prefix="/api/v1/sentinel", tags=["Microsoft Sentinel"])
 app.include_router(defender_router, prefix="/api/v1/defender", tags=["Microsoft Defender XDR"])
 app.include_router(labs_router, prefix="/api/v1/labs", tags=["Labs & Scenarios"])
+app.include_router(live_router, prefix="/api/v1/live", tags=["Live Updates"])
 
 
 @app.get("/health", tags=["Health"])
 async def health_check():
-    return {"status": "ok", "service": "msiem-xdr-simulator"}
\ No newline at end of file
+    return {"status": "ok", "service": "msiem-xdr-simulator"}
+
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse, include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus text-format metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
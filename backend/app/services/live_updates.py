@@ -0,0 +1,274 @@
+"""
+Live Updates
+------------
+Pushes incident and alert changes to WebSocket clients, so the frontend no
+longer has to poll and re-page the stores to notice new alerts.
+
+The hub listens to the incident and alert stores of every lab environment
+that has at least one subscriber. Changes are coalesced per record (the
+latest version of a record changed several times in one interval is sent
+once) and fanned out every flush_seconds. Each change is serialized once
+per interval; subscribers with the same filter share one frame, so the
+cost of a burst grows with the number of distinct filters rather than the
+number of connected clients.
+
+Each subscriber has a bounded frame queue drained by its own sender task.
+A client that falls behind far enough to fill it has its backlog replaced
+with a single "resync" frame, telling it to re-read the REST endpoints,
+so a slow consumer never holds memory or delays anyone else.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from functools import partial
+from typing import Deque, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+FRAMES_SENT = metrics.counter("live_frames_sent_total", "Frames queued for WebSocket subscribers.")
+RESYNCS_SENT = metrics.counter(
+    "live_resyncs_total", "Subscribers whose backlog overflowed and were told to resynchronise."
+)
+
+KINDS = ("incident", "alert")
+STORE_KINDS = {"incidents": "incident", "alerts": "alert"}
+EVENT_TYPES = {"insert": "created", "update": "updated", "delete": "deleted", "clear": "cleared"}
+
+RESYNC_FRAME = json.dumps({"type": "resync"})
+CLOSED_FRAME = json.dumps({"type": "closed"})
+
+
+@dataclass(frozen=True)
+class LiveFilter:
+    """Which changes a subscriber wants; empty sets match everything."""
+
+    kinds: FrozenSet[str] = frozenset(KINDS)
+    severities: FrozenSet[str] = frozenset()
+    statuses: FrozenSet[str] = frozenset()
+    scenario_id: Optional[str] = None
+
+    @classmethod
+    def parse(cls, spec: dict) -> "LiveFilter":
+        """Build a filter from a subscribe message or query parameters; raises ValueError."""
+        kinds = _lower_set(spec.get("kinds")) or frozenset(KINDS)
+        if not kinds <= set(KINDS):
+            raise ValueError(f"Unknown kinds: {', '.join(sorted(kinds - set(KINDS)))}")
+        return cls(
+            kinds=kinds,
+            severities=_lower_set(spec.get("severity")),
+            statuses=_lower_set(spec.get("status")),
+            scenario_id=spec.get("scenarioId") or None,
+        )
+
+    def matches(self, kind: str, record: Optional[dict]) -> bool:
+        if kind not in self.kinds:
+            return False
+        if record is None:  # a cleared store concerns every filter
+            return True
+        return (
+            (not self.severities or str(record.get("severity", "")).lower() in self.severities)
+            and (not self.statuses or str(record.get("status", "")).lower() in self.statuses)
+            and (self.scenario_id is None or record.get("scenarioId") == self.scenario_id)
+        )
+
+
+class Subscription:
+    """One connected client: its filter and a bounded queue of frames to send."""
+
+    def __init__(self, env, live_filter: LiveFilter, max_frames: int):
+        self.env = env
+        self.filter = live_filter
+        self.max_frames = max_frames
+        self.closed = False
+        self._frames: Deque[str] = deque()
+        self._ready = asyncio.Event()
+
+    @property
+    def backlog(self) -> int:
+        return len(self._frames)
+
+    def push(self, frame: str):
+        if self.closed:
+            return
+        if len(self._frames) >= self.max_frames:
+            self._frames.clear()
+            frame = RESYNC_FRAME
+            RESYNCS_SENT.inc()
+        self._frames.append(frame)
+        self._ready.set()
+
+    def close(self):
+        """Send a final "closed" frame after whatever is queued, then stop."""
+        if not self.closed:
+            self._frames.append(CLOSED_FRAME)
+            self._ready.set()
+            self.closed = True
+
+    async def next_frame(self) -> Optional[str]:
+        """The next frame to send, waiting for one; None once closed and drained."""
+        while not self._frames:
+            if self.closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        return self._frames.popleft()
+
+
+class _Watch:
+    """The store listeners and subscribers of one lab environment."""
+
+    def __init__(self, env):
+        self.env = env
+        self.listeners = []
+        self.subscribers: Dict[int, Subscription] = {}
+
+
+class LiveUpdateHub:
+    """Coalesces store changes per environment and fans them out to subscribers."""
+
+    def __init__(self, flush_seconds: float = 0.1, max_frames: int = 64, max_subscribers: int = 10_000):
+        self.flush_seconds = flush_seconds
+        self.max_frames = max_frames
+        self.max_subscribers = max_subscribers
+        self._watches: Dict[int, _Watch] = {}  # id(env) -> watch
+        # id(env) -> (kind, record id) -> (event type, record copy); clears use record id None
+        self._pending: Dict[int, Dict[Tuple[str, Optional[str]], Tuple[str, Optional[dict]]]] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return sum(len(w.subscribers) for w in self._watches.values())
+
+    # ─── Subscriptions ───────────────────────────────────────────────────────
+
+    def subscribe(self, env, live_filter: LiveFilter) -> Subscription:
+        """Register a subscriber to an environment's changes; raises OverflowError when full."""
+        if len(self) >= self.max_subscribers:
+            raise OverflowError(f"At most {self.max_subscribers} live subscribers are allowed")
+        watch = self._watches.get(id(env))
+        if watch is None:
+            watch = self._watches[id(env)] = _Watch(env)
+            for store_name, kind in STORE_KINDS.items():
+                listener = partial(self._record, id(env), kind)
+                getattr(env, store_name).listeners.append(listener)
+                watch.listeners.append((store_name, listener))
+        subscription = Subscription(env, live_filter, self.max_frames)
+        watch.subscribers[id(subscription)] = subscription
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscription.closed = True
+        watch = self._watches.get(id(subscription.env))
+        if watch is None:
+            return
+        watch.subscribers.pop(id(subscription), None)
+        if not watch.subscribers:
+            self._unwatch(watch)
+
+    def _unwatch(self, watch: _Watch):
+        for store_name, listener in watch.listeners:
+            listeners = getattr(watch.env, store_name).listeners
+            if listener in listeners:
+                listeners.remove(listener)
+        self._watches.pop(id(watch.env), None)
+        with self._lock:
+            self._pending.pop(id(watch.env), None)
+
+    # ─── Change capture ──────────────────────────────────────────────────────
+
+    def _record(self, env_key: int, kind: str, op: str, records: Sequence[dict]):
+        """RecordStore listener; may be called from any thread, under the store's lock."""
+        event = EVENT_TYPES[op]
+        with self._lock:
+            pending = self._pending.setdefault(env_key, {})
+            if op == "clear":
+                for key in [k for k in pending if k[0] == kind]:
+                    del pending[key]
+                pending[(kind, None)] = (event, None)
+                return
+            for record in records:
+                key = (kind, record["id"])
+                previous = pending.get(key)
+                if previous is not None and previous[0] == "created" and event == "updated":
+                    event_type = "created"  # still new to subscribers
+                else:
+                    event_type = event
+                pending[key] = (event_type, dict(record))
+
+    # ─── Fan-out ─────────────────────────────────────────────────────────────
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="live-update-hub")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for watch in list(self._watches.values()):
+            for subscription in watch.subscribers.values():
+                subscription.close()
+            self._unwatch(watch)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Live update fan-out failed")
+
+    def flush(self):
+        """Send every change recorded since the last flush to its subscribers."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for env_key, changes in pending.items():
+            watch = self._watches.get(env_key)
+            if watch is not None and changes:
+                self._fan_out(watch, changes)
+        for watch in [w for w in self._watches.values() if w.env.closed]:
+            # The session was dropped or evicted; its subscribers have nothing left to follow.
+            for subscription in watch.subscribers.values():
+                subscription.close()
+            self._unwatch(watch)
+
+    def _fan_out(self, watch: _Watch, changes: Dict[Tuple[str, Optional[str]], Tuple[str, Optional[dict]]]):
+        events: List[Tuple[str, Optional[dict], str]] = []
+        for (kind, _), (event_type, record) in changes.items():
+            payload = {"kind": kind, "event": event_type}
+            if event_type == "deleted":
+                payload["record"] = {"id": record["id"]}
+            elif record is not None:
+                payload["record"] = record
+            events.append((kind, None if event_type == "cleared" else record, json.dumps(payload)))
+
+        frames: Dict[LiveFilter, Optional[str]] = {}
+        for subscription in list(watch.subscribers.values()):
+            live_filter = subscription.filter
+            if live_filter not in frames:
+                matched = [text for kind, record, text in events if live_filter.matches(kind, record)]
+                frames[live_filter] = (
+                    '{"type":"changes","events":[' + ",".join(matched) + "]}" if matched else None
+                )
+            frame = frames[live_filter]
+            if frame is not None:
+                subscription.push(frame)
+                FRAMES_SENT.inc()
+
+
+def _lower_set(values) -> FrozenSet[str]:
+    if not values:
+        return frozenset()
+    if isinstance(values, str):
+        values = values.split(",")
+    return frozenset(str(v).strip().lower() for v in values if str(v).strip())
@@ -0,0 +1,356 @@
+"""
+Lab State Persistence
+---------------------
+Write-behind persistence of every lab session's incidents, alerts and
+scores, so a restart no longer loses them.
+
+Store changes are recorded in memory as they happen (the latest version of
+each changed record, keyed on table, session and id) and a background task
+writes them in batched transactions every flush_seconds, so requests never
+wait on the database and a record changed many times between flushes is
+written once. The pending set is bounded: when it overflows, or a write
+fails, the changes of sessions still in memory are dropped and the next
+flush rewrites those sessions in full from memory instead, which stays
+correct because memory is their source of truth.
+
+Sessions evicted from memory keep their saved state: their pending changes
+survive a resync (or are snapshotted at eviction while one is due), and
+SessionManager.acquire() loads them back on next use. Saved state is only
+deleted by forget(), when a session is explicitly ended.
+
+At startup the state is read back with one query per table and restored
+into as many sessions as the session manager holds; the rest are loaded
+lazily.
+"""
+
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import Table, delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from app.core.database import alerts_table, incidents_table, scores_table
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PERSISTED_WRITES = metrics.counter(
+    "persistence_writes_total", "Rows written or deleted by the write-behind flusher.", ["table"]
+)
+PERSISTENCE_RESYNCS = metrics.counter(
+    "persistence_resyncs_total", "Full rewrites after the pending set overflowed or a flush failed."
+)
+
+RECORD_TABLES: Dict[str, Table] = {"incidents": incidents_table, "alerts": alerts_table}
+
+# Seconds to wait before retrying after a failed flush
+RETRY_SECONDS = 5.0
+
+# A session's saved state: (incidents, alerts, (scenario id, question id, points) scores)
+SessionState = Tuple[List[dict], List[dict], List[Tuple[str, str, int]]]
+
+
+class WriteBehindJournal:
+    """Coalesces lab state changes in memory and flushes them in batches."""
+
+    def __init__(self, max_pending: int = 50_000, batch_size: int = 500, flush_seconds: float = 0.5):
+        self.sessions = None  # the SessionManager, set by start()
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        # (table, session, id) -> latest record, or None once deleted
+        self._records: Dict[Tuple[str, str, str], Optional[dict]] = {}
+        # (session, scenario id, question id) -> points
+        self._scores: Dict[Tuple[str, str, str], int] = {}
+        # (table, session) pairs whose stored rows are deleted before the writes above
+        self._cleared: Set[Tuple[str, str]] = set()
+        self._resync = False
+        self._saved: Set[str] = set()  # sessions with state in the database (or on its way there)
+        self._evicted: Set[str] = set()  # saved sessions no longer in memory
+        self._parked: Dict[str, SessionState] = {}  # evicted sessions snapshotted for a pending resync
+        self._lock = threading.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._engine: Optional[AsyncEngine] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._records) + len(self._scores) + len(self._cleared)
+
+    def has_saved(self, session: str) -> bool:
+        return session in self._saved
+
+    # ─── Recording ───────────────────────────────────────────────────────────
+
+    def record(self, table: str, session: str, op: str, records: Sequence[dict]):
+        """RecordStore listener: note an insert, update, delete or clear of a session's records."""
+        with self._lock:
+            self._saved.add(session)
+            if op == "clear":
+                self._records = {k: v for k, v in self._records.items() if k[:2] != (table, session)}
+                self._cleared.add((table, session))
+                return
+            if self._resync and session not in self._evicted:
+                return
+            for record in records:
+                self._records[(table, session, record["id"])] = None if op == "delete" else record
+            self._check_overflow()
+
+    def score(self, session: str, scenario_id: str, question_id: str, points: int):
+        with self._lock:
+            self._saved.add(session)
+            if self._resync and session not in self._evicted:
+                return
+            self._scores[(session, scenario_id, question_id)] = points
+            self._check_overflow()
+
+    def clear_scores(self, session: str):
+        with self._lock:
+            self._scores = {k: v for k, v in self._scores.items() if k[0] != session}
+            self._cleared.add(("scores", session))
+
+    def forget(self, session: str):
+        """Delete everything stored for a session that has been ended."""
+        for table in RECORD_TABLES:
+            self.record(table, session, "clear", ())
+        self.clear_scores(session)
+        with self._lock:
+            self._saved.discard(session)
+            self._evicted.discard(session)
+            self._parked.pop(session, None)
+
+    def park(self, env):
+        """
+        Note that a session was evicted from memory. Its pending changes are
+        kept through a resync; if one is already due, its state is
+        snapshotted now, since the rewrite can no longer read it from memory.
+        """
+        session = env.session_id
+        with self._lock:
+            if session not in self._saved:
+                return
+            self._evicted.add(session)
+            resync = self._resync
+        if resync:
+            state = _env_state(env)
+            with self._lock:
+                self._parked[session] = state
+
+    def _check_overflow(self):
+        if not self._resync and self.pending > self.max_pending:
+            logger.warning("Write-behind queue passed %d entries; resynchronising the full state", self.max_pending)
+            self._start_resync()
+
+    def _start_resync(self):
+        # Sessions in memory are rewritten from it; evicted ones keep their pending changes.
+        self._records = {k: v for k, v in self._records.items() if k[1] in self._evicted}
+        self._scores = {k: v for k, v in self._scores.items() if k[0] in self._evicted}
+        self._resync = True
+        PERSISTENCE_RESYNCS.inc()
+
+    # ─── Flushing ────────────────────────────────────────────────────────────
+
+    def start(self, engine: AsyncEngine, sessions):
+        self._engine = engine
+        self.sessions = sessions
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="persistence-flusher")
+
+    async def stop(self):
+        """Stop the flusher after writing whatever is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._engine is not None:
+            await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Write-behind flush failed; retrying with a full resync")
+                with self._lock:
+                    self._start_resync()
+                await asyncio.sleep(RETRY_SECONDS)
+
+    async def flush(self):
+        """Write everything recorded since the last flush in one transaction."""
+        async with self._flush_lock:
+            with self._lock:
+                records, scores, cleared, resync, parked = (
+                    self._records, self._scores, self._cleared, self._resync, self._parked
+                )
+                self._records, self._scores, self._cleared, self._resync, self._parked = {}, {}, set(), False, {}
+            try:
+                await self._write(records, scores, cleared, resync, parked)
+            except Exception:
+                self._requeue(records, scores, cleared, resync, parked)
+                raise
+
+    async def _write(self, records, scores, cleared, resync, parked):
+        snapshot = self._snapshot(parked) if resync else {}
+        if not (records or scores or cleared or snapshot):
+            return
+
+        upserts: Dict[str, List[dict]] = defaultdict(list)
+        deletes: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+        for (table, session, record_id), record in records.items():
+            if record is None:
+                deletes[(table, session)].append(record_id)
+            else:
+                upserts[table].append({"session": session, "id": record_id, "data": record})
+        score_rows = [
+            {"session": s, "scenario_id": scenario_id, "question_id": q, "points": points}
+            for (s, scenario_id, q), points in scores.items()
+        ]
+
+        async with self._engine.begin() as conn:
+            for table, session in cleared:
+                target = RECORD_TABLES.get(table, scores_table)
+                await conn.execute(delete(target).where(target.c.session == session))
+            if snapshot:
+                await self._write_snapshot(conn, snapshot)
+            for (table, session), ids in deletes.items():
+                target = RECORD_TABLES[table]
+                for batch in _batches(ids, self.batch_size):
+                    await conn.execute(delete(target).where(target.c.session == session, target.c.id.in_(batch)))
+                PERSISTED_WRITES.inc(len(ids), table=table)
+            for table, rows in upserts.items():
+                await self._upsert(conn, RECORD_TABLES[table], rows, ("session", "id"), "data")
+            if score_rows:
+                await self._upsert(conn, scores_table, score_rows, ("session", "scenario_id", "question_id"), "points")
+
+    def _requeue(self, records, scores, cleared, resync, parked):
+        """Put a failed flush's changes back under anything recorded since."""
+        with self._lock:
+            for key, record in records.items():
+                if key[:2] not in self._cleared:
+                    self._records.setdefault(key, record)
+            for key, points in scores.items():
+                if ("scores", key[0]) not in self._cleared:
+                    self._scores.setdefault(key, points)
+            self._cleared |= cleared
+            for session, state in parked.items():
+                self._parked.setdefault(session, state)
+            self._resync = self._resync or resync
+
+    async def _upsert(self, conn: AsyncConnection, table: Table, rows: List[dict], keys: Tuple[str, ...], value: str):
+        dialect = conn.dialect.name
+        for batch in _batches(rows, self.batch_size):
+            if dialect in ("sqlite", "postgresql"):
+                if dialect == "sqlite":
+                    from sqlalchemy.dialects.sqlite import insert as dialect_insert
+                else:
+                    from sqlalchemy.dialects.postgresql import insert as dialect_insert
+                stmt = dialect_insert(table)
+                stmt = stmt.on_conflict_do_update(index_elements=list(keys), set_={value: stmt.excluded[value]})
+                await conn.execute(stmt, batch)
+            else:
+                for row in batch:
+                    await conn.execute(delete(table).where(*(table.c[k] == row[k] for k in keys)))
+                await conn.execute(insert(table), batch)
+        PERSISTED_WRITES.inc(len(rows), table=table.name)
+
+    def _snapshot(self, parked: Dict[str, SessionState]) -> Dict[str, SessionState]:
+        """The full state of every session in memory, plus evicted sessions parked for the resync."""
+        snapshot = dict(parked)
+        for env in self.sessions.environments():
+            snapshot[env.session_id] = _env_state(env)
+        return snapshot
+
+    async def _write_snapshot(self, conn: AsyncConnection, snapshot: Dict[str, SessionState]):
+        """Replace the stored state of the snapshotted sessions; other sessions are left alone."""
+        rows: Dict[str, List[dict]] = defaultdict(list)
+        for session, (incidents, alerts, scores) in snapshot.items():
+            rows["incidents"].extend({"session": session, "id": r["id"], "data": r} for r in incidents)
+            rows["alerts"].extend({"session": session, "id": r["id"], "data": r} for r in alerts)
+            rows["scores"].extend(
+                {"session": session, "scenario_id": scenario_id, "question_id": q, "points": points}
+                for scenario_id, q, points in scores
+            )
+        for table in (*RECORD_TABLES.values(), scores_table):
+            for sessions in _batches(list(snapshot), self.batch_size):
+                await conn.execute(delete(table).where(table.c.session.in_(sessions)))
+            for batch in _batches(rows[table.name], self.batch_size):
+                await conn.execute(insert(table), batch)
+            PERSISTED_WRITES.inc(len(rows[table.name]), table=table.name)
+        logger.info("Resynchronised persisted lab state (%d sessions)", len(snapshot))
+
+    # ─── Restore ─────────────────────────────────────────────────────────────
+
+    async def restore(self, engine: AsyncEngine, sessions) -> int:
+        """
+        Load the stored state into a SessionManager, up to the number of
+        sessions it holds (the rest load on first use); returns the sessions
+        restored.
+        """
+        async with engine.connect() as conn:
+            incidents = (await conn.execute(select(incidents_table.c.session, incidents_table.c.data))).all()
+            alerts = (await conn.execute(select(alerts_table.c.session, alerts_table.c.data))).all()
+            scores = (await conn.execute(
+                select(scores_table.c.session, scores_table.c.scenario_id, scores_table.c.question_id, scores_table.c.points)
+            )).all()
+
+        by_session: Dict[str, SessionState] = defaultdict(lambda: ([], [], []))
+        for session, data in incidents:
+            by_session[session][0].append(data)
+        for session, data in alerts:
+            by_session[session][1].append(data)
+        for row in scores:
+            by_session[row.session][2].append((row.scenario_id, row.question_id, row.points))
+
+        with self._lock:
+            self._saved.update(by_session)
+        restored = 0
+        for session, state in by_session.items():
+            if restored >= sessions.max_sessions + 1:  # + the default environment
+                with self._lock:
+                    self._evicted.add(session)
+                continue
+            sessions.restore(session, *state)
+            restored += 1
+        logger.info(
+            "Restored %d incidents, %d alerts and %d scores; %d of %d sessions loaded",
+            len(incidents), len(alerts), len(scores), restored, len(by_session),
+        )
+        return restored
+
+    async def load(self, session: str) -> SessionState:
+        """A saved session's state, read back after flushing anything pending."""
+        await self.flush()
+        async with self._engine.connect() as conn:
+            incidents = (await conn.execute(
+                select(incidents_table.c.data).where(incidents_table.c.session == session)
+            )).scalars().all()
+            alerts = (await conn.execute(
+                select(alerts_table.c.data).where(alerts_table.c.session == session)
+            )).scalars().all()
+            scores = (await conn.execute(
+                select(scores_table.c.scenario_id, scores_table.c.question_id, scores_table.c.points)
+                .where(scores_table.c.session == session)
+            )).all()
+        with self._lock:
+            self._evicted.discard(session)
+        return list(incidents), list(alerts), [tuple(row) for row in scores]
+
+
+def _env_state(env) -> SessionState:
+    return (
+        env.incidents.values(),
+        env.alerts.values(),
+        [(scenario_id, q, points) for scenario_id, questions in env.scores.items() for q, points in questions.items()],
+    )
+
+
+def _batches(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
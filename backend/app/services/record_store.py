@@ -0,0 +1,362 @@
+"""
+Indexed Record Store
+--------------------
+An in-memory store of dict records (incidents, alerts) kept in creation
+order, with sorted secondary indexes on selected fields.
+
+Every index is a list of (createdTime, id) keys kept sorted with bisect, so
+a filtered page is one bisect to the cursor position plus a walk over the
+page: O(log n + page size) instead of sorting and filtering everything.
+Filters on several fields walk the smallest matching index and check the
+other fields per record; match counts for every combination of indexed
+fields are kept up to date, so totals never need a scan. Index values are
+compared case-insensitively. A multi-valued field (a list, such as tags) is
+indexed under each of its values, and filtering on it matches records that
+contain the value.
+
+Records handed out are the stored dicts; change indexed fields only through
+update() so the indexes stay in step. Listeners are told about every
+insert, update, delete and clear, e.g. to persist or push changes.
+
+Every write also advances a monotonic version and appends (version, id) to
+a change log, so the records created, updated or deleted after a version
+are found with one bisect. Deletions are remembered as tombstones up to a
+bound; a version older than the oldest change still known (or from before
+a clear, or from another process, since versions start at the creation
+time in microseconds) raises VersionExpired and the caller must re-read
+the full list.
+"""
+
+import base64
+import itertools
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+Key = Tuple[str, str]
+Combo = Tuple[Tuple[str, str], ...]
+# Called with ("insert" | "update" | "delete" | "clear", affected records)
+Listener = Callable[[str, Sequence[dict]], None]
+
+
+class VersionExpired(Exception):
+    """The requested version is too old (or unknown) to compute changes from."""
+
+
+def encode_cursor(key: Key) -> str:
+    return base64.urlsafe_b64encode(f"{key[0]}|{key[1]}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Key:
+    try:
+        created, record_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    return created, record_id
+
+
+def _merge_sorted(target: List[Key], keys: List[Key]):
+    """Merge sorted keys into a sorted list in place."""
+    if not keys:
+        return
+    append_only = not target or keys[0] >= target[-1]
+    target.extend(keys)
+    if not append_only:
+        # Two sorted runs: timsort merges them in linear time.
+        target.sort()
+
+
+def _index_value(value: Any) -> str:
+    return str(value).lower() if value is not None else ""
+
+
+class RecordStore:
+    """Dict records by id, ordered newest first, with sorted field indexes."""
+
+    def __init__(
+        self, indexed_fields: Sequence[str] = (), order_field: str = "createdTime",
+        multi_valued: Sequence[str] = (), max_tombstones: int = 10_000,
+    ):
+        self.order_field = order_field
+        self.indexed_fields = tuple(indexed_fields)
+        self.multi_valued = frozenset(multi_valued)
+        self._records: Dict[str, dict] = {}
+        self._order: List[Key] = []
+        self._indexes: Dict[str, Dict[str, List[Key]]] = {f: {} for f in self.indexed_fields}
+        self._combo_fields = [
+            c for r in range(2, len(self.indexed_fields) + 1) for c in itertools.combinations(self.indexed_fields, r)
+        ]
+        self._counts: Dict[Combo, int] = {}  # matches per multi-field value combination
+        self._lock = threading.RLock()
+        self.listeners: List[Listener] = []
+        self.max_tombstones = max_tombstones
+        self.version = self._floor = int(time.time() * 1_000_000)
+        self._versions: Dict[str, int] = {}  # id -> version of its last change
+        self._log: List[Tuple[int, str]] = []  # (version, id) ascending; superseded entries are skipped
+        self._tombstones: Dict[str, int] = {}  # deleted id -> version, oldest first
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, record_id: str) -> bool:
+        return record_id in self._records
+
+    def _key(self, record: dict) -> Key:
+        return record[self.order_field], record["id"]
+
+    def _field_values(self, field: str, value: Any) -> List[str]:
+        """The index values a field value is filed under."""
+        if field in self.multi_valued:
+            return list(dict.fromkeys(_index_value(v) for v in value or ()))
+        return [_index_value(value)]
+
+    def _matches(self, record: dict, filters: Dict[str, str]) -> bool:
+        return all(v in self._field_values(f, record.get(f)) for f, v in filters.items())
+
+    # ─── Writes ──────────────────────────────────────────────────────────────
+
+    def insert(self, record: dict) -> dict:
+        with self._lock:
+            if record["id"] in self._records:
+                self.delete(record["id"])
+            key = self._key(record)
+            self._records[record["id"]] = record
+            insort(self._order, key)
+            for field in self.indexed_fields:
+                for value in self._field_values(field, record.get(field)):
+                    insort(self._indexes[field].setdefault(value, []), key)
+            self._count(record, 1)
+            self._touch(record["id"])
+            self._notify("insert", (record,))
+        return record
+
+    def insert_many(self, records: Sequence[dict]) -> Sequence[dict]:
+        """Insert a batch under one lock, merging its keys into each index in one pass."""
+        with self._lock:
+            # A batch naming an id twice keeps the last record, as separate inserts would.
+            batch = list({record["id"]: record for record in records}.values())
+            for record in batch:
+                if record["id"] in self._records:
+                    self.delete(record["id"])
+            keyed = sorted(((self._key(r), r) for r in batch), key=lambda kr: kr[0])
+            buckets: Dict[str, Dict[str, List[Key]]] = {f: {} for f in self.indexed_fields}
+            for key, record in keyed:
+                self._records[record["id"]] = record
+                values = {f: self._field_values(f, record.get(f)) for f in self.indexed_fields}
+                for field, field_values in values.items():
+                    for value in field_values:
+                        buckets[field].setdefault(value, []).append(key)
+                self._count(record, 1, values)
+            _merge_sorted(self._order, [key for key, _ in keyed])
+            for field, values in buckets.items():
+                for value, keys in values.items():
+                    _merge_sorted(self._indexes[field].setdefault(value, []), keys)
+            self._touch_many([record["id"] for record in batch])
+            self._notify("insert", batch)
+        return records
+
+    def update(self, record_id: str, **changes) -> dict:
+        """Apply field changes to a record, moving it between index buckets as needed."""
+        with self._lock:
+            record = self._records.get(record_id)
+            if record is None:
+                raise KeyError(record_id)
+            key = self._key(record)
+            # A changed order field moves the record's key in every index.
+            rekey = self.order_field in changes and changes[self.order_field] != record[self.order_field]
+            moved = [
+                f for f in self.indexed_fields
+                if rekey or (f in changes and self._field_values(f, record.get(f)) != self._field_values(f, changes[f]))
+            ]
+            if moved:
+                self._count(record, -1)
+            for field in moved:
+                for value in self._field_values(field, record.get(field)):
+                    self._unindex(field, value, key)
+            if rekey:
+                del self._order[bisect_left(self._order, key)]
+            record.update(changes)
+            new_key = self._key(record)
+            if rekey:
+                insort(self._order, new_key)
+            for field in moved:
+                for value in self._field_values(field, record.get(field)):
+                    insort(self._indexes[field].setdefault(value, []), new_key)
+            if moved:
+                self._count(record, 1)
+            self._touch(record_id)
+            self._notify("update", (record,))
+            return record
+
+    def delete(self, record_id: str) -> Optional[dict]:
+        with self._lock:
+            record = self._records.pop(record_id, None)
+            if record is None:
+                return None
+            key = self._key(record)
+            del self._order[bisect_left(self._order, key)]
+            for field in self.indexed_fields:
+                for value in self._field_values(field, record.get(field)):
+                    self._unindex(field, value, key)
+            self._count(record, -1)
+            self._touch(record_id, deleted=True)
+            self._notify("delete", (record,))
+            return record
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self._order.clear()
+            for index in self._indexes.values():
+                index.clear()
+            self._counts.clear()
+            self.version += 1
+            self._floor = self.version
+            self._versions.clear()
+            self._log.clear()
+            self._tombstones.clear()
+            self._notify("clear", ())
+
+    def _touch(self, record_id: str, deleted: bool = False):
+        self.version += 1
+        self._versions[record_id] = self.version
+        self._log.append((self.version, record_id))
+        if deleted:
+            self._tombstones[record_id] = self.version
+            if len(self._tombstones) > self.max_tombstones:
+                oldest = next(iter(self._tombstones))
+                self._floor = self._tombstones.pop(oldest)
+                del self._versions[oldest]
+        else:
+            self._tombstones.pop(record_id, None)
+        if len(self._log) > 2 * len(self._versions) + 1024:
+            self._log = [(v, i) for v, i in self._log if self._versions.get(i) == v]
+
+    def _touch_many(self, record_ids: List[str]):
+        entries = list(zip(range(self.version + 1, self.version + 1 + len(record_ids)), record_ids))
+        self.version += len(record_ids)
+        self._versions.update((i, v) for v, i in entries)
+        self._log.extend(entries)
+        if self._tombstones:
+            for record_id in record_ids:
+                self._tombstones.pop(record_id, None)
+
+    def _notify(self, op: str, records: Sequence[dict]):
+        for listener in self.listeners:
+            listener(op, records)
+
+    def _count(self, record: dict, delta: int, values: Optional[Dict[str, List[str]]] = None):
+        if self.multi_valued:
+            values = values or {f: self._field_values(f, record.get(f)) for f in self.indexed_fields}
+            combos = [
+                tuple(zip(fields, combo_values))
+                for fields in self._combo_fields
+                for combo_values in itertools.product(*(values[f] for f in fields))
+            ]
+        else:
+            value = {f: v[0] for f, v in values.items()} if values else {
+                f: _index_value(record.get(f)) for f in self.indexed_fields
+            }
+            combos = [tuple((f, value[f]) for f in fields) for fields in self._combo_fields]
+        for combo in combos:
+            count = self._counts.get(combo, 0) + delta
+            if count:
+                self._counts[combo] = count
+            else:
+                del self._counts[combo]
+
+    def _unindex(self, field: str, value: str, key: Key):
+        bucket = self._indexes[field].get(value)
+        if not bucket:
+            return
+        position = bisect_left(bucket, key)
+        if position < len(bucket) and bucket[position] == key:
+            del bucket[position]
+        if not bucket:
+            del self._indexes[field][value]
+
+    # ─── Reads ───────────────────────────────────────────────────────────────
+
+    def get(self, record_id: str) -> Optional[dict]:
+        return self._records.get(record_id)
+
+    def values(self) -> List[dict]:
+        """Every record, newest first."""
+        with self._lock:
+            return [self._records[k[1]] for k in reversed(self._order)]
+
+    def _candidates(self, filters: Dict[str, str]) -> Tuple[List[Key], Dict[str, str]]:
+        """The smallest index list covering the filters, and the filters it leaves to check."""
+        if not filters:
+            return self._order, {}
+        for field in filters:
+            if field not in self._indexes:
+                raise ValueError(f"Field '{field}' is not indexed")
+        buckets = {f: self._indexes[f].get(_index_value(v), []) for f, v in filters.items()}
+        field = min(buckets, key=lambda f: len(buckets[f]))
+        remaining = {f: _index_value(v) for f, v in filters.items() if f != field}
+        return buckets[field], remaining
+
+    def _walk(self, keys: List[Key], remaining: Dict[str, str], cursor: Optional[str]) -> Iterator[dict]:
+        # Keys are ascending; pages run newest first, starting below the cursor.
+        position = bisect_left(keys, decode_cursor(cursor)) if cursor else len(keys)
+        for i in range(position - 1, -1, -1):
+            record = self._records[keys[i][1]]
+            if self._matches(record, remaining):
+                yield record
+
+    def page(
+        self, filters: Optional[Dict[str, Optional[str]]] = None, limit: int = 50, cursor: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str], int]:
+        """
+        One page of records matching every filter, newest first. Returns the
+        records, the cursor for the next page (None on the last page) and the
+        total number of matches.
+        """
+        filters = {f: v for f, v in (filters or {}).items() if v}
+        with self._lock:
+            keys, remaining = self._candidates(filters)
+            items: List[dict] = []
+            next_cursor = None
+            for record in self._walk(keys, remaining, cursor) if limit > 0 else ():
+                if len(items) == limit:
+                    next_cursor = encode_cursor(self._key(items[-1]))
+                    break
+                items.append(record)
+            if remaining:
+                combo = tuple((f, _index_value(filters[f])) for f in self.indexed_fields if f in filters)
+                total = self._counts.get(combo, 0)
+            else:
+                total = len(keys)
+        return items, next_cursor, total
+
+    def changes_since(
+        self, version: int, filters: Optional[Dict[str, Optional[str]]] = None, limit: int = 500
+    ) -> Tuple[List[dict], List[str], int, bool]:
+        """
+        The records created or updated after a version, oldest change first,
+        and the ids to drop: deleted records and changed ones that no longer
+        match the filters. Returns (records, removed ids, version to ask from
+        next, whether more changes remain); raises VersionExpired.
+        """
+        filters = {f: _index_value(v) for f, v in (filters or {}).items() if v}
+        with self._lock:
+            if not self._floor <= version <= self.version:
+                raise VersionExpired(f"Version {version} has expired; re-read the full list")
+            records: List[dict] = []
+            removed: List[str] = []
+            position = bisect_right(self._log, version, key=lambda entry: entry[0])
+            next_version = version
+            for changed, record_id in self._log[position:]:
+                if self._versions.get(record_id) != changed:
+                    continue  # superseded by a later change
+                if len(records) + len(removed) == limit:
+                    return records, removed, next_version, True
+                next_version = changed
+                record = self._records.get(record_id)
+                if record is not None and self._matches(record, filters):
+                    records.append(record)
+                else:
+                    removed.append(record_id)
+            return records, removed, self.version, False
@@ -0,0 +1,252 @@
+"""
+Alert Correlation
+-----------------
+Groups incoming alerts into incidents by shared entity (user, device, IP)
+within a sliding time window, the way Defender XDR builds incidents,
+instead of relying on the incident block hand-written in each scenario.
+
+Entities are the nodes of an incremental union-find: an alert unions all
+of its entities, and each connected component owns one incident whose
+entity and MITRE technique sets grow as alerts arrive. An entity not seen
+for longer than the window starts a fresh node, so a new alert about it
+opens a new incident instead of reviving a stale one. When an alert links
+two components, the larger component's incident absorbs the smaller one,
+which is removed. Expired nodes are compacted away periodically, so memory
+follows the live window rather than the full alert history.
+"""
+
+import threading
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Set
+
+from app.core.metrics import metrics
+from app.services.record_store import RecordStore
+from app.simulators.entity_index import EntityRecordIndex, alert_entities
+
+ALERTS_CORRELATED = metrics.counter(
+    "alerts_correlated_total", "Alerts grouped into incidents by the correlation engine."
+)
+INCIDENTS_MERGED = metrics.counter(
+    "incidents_merged_total", "Correlated incidents absorbed into another when an alert linked them."
+)
+
+SEVERITY_RANK = {"informational": 0, "low": 1, "medium": 2, "high": 3, "critical": 4}
+
+
+@dataclass
+class _Group:
+    incident: dict  # the stored record once stored; only changed through the store
+    title: str  # of the first alert
+    severity: str  # highest of its alerts
+    alert_ids: List[str] = field(default_factory=list)
+    entities: Dict[str, str] = field(default_factory=dict)  # entity key -> display name
+    techniques: Dict[str, None] = field(default_factory=dict)  # insertion-ordered set
+    stored: bool = False
+
+
+class AlertCorrelator:
+    """Incremental entity union-find feeding one environment's incident store."""
+
+    def __init__(
+        self, incidents: RecordStore, window_seconds: float = 3600.0, entities: Optional[EntityRecordIndex] = None
+    ):
+        self.incidents = incidents
+        self.window_seconds = window_seconds
+        self.entities = entities
+        self._node: Dict[str, int] = {}  # entity -> current node
+        self._last_seen: Dict[int, float] = {}  # node -> newest alert time
+        self._parent: Dict[int, int] = {}
+        self._size: Dict[int, int] = {}
+        self._groups: Dict[int, _Group] = {}  # root node -> its incident
+        self._next_node = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._groups)
+
+    def clear(self):
+        """Forget every entity; the incidents already stored are left alone."""
+        with self._lock:
+            self._node.clear()
+            self._last_seen.clear()
+            self._parent.clear()
+            self._size.clear()
+            self._groups.clear()
+
+    def ingest(self, alert: dict) -> Optional[dict]:
+        return self.ingest_many([alert])[0]
+
+    def ingest_many(self, alerts: Sequence[dict]) -> List[Optional[dict]]:
+        """
+        Correlate a batch of stored alerts; returns each alert's incident (None
+        for an alert with no entities). Incident records are written to the
+        store once per batch.
+        """
+        touched: Dict[int, _Group] = {}
+        merged: List[_Group] = []
+        results: List[Optional[_Group]] = []
+        with self._lock:
+            for alert in alerts:
+                entities = alert_entities(alert)
+                if not entities:
+                    results.append(None)
+                    continue
+                at = _timestamp(alert["createdTime"])
+                roots = {self._find(self._node_for(entity, at)) for entity in entities}
+                root = self._union(roots, merged, alert)
+                group = self._groups[root]
+                for entity, name in entities.items():
+                    group.entities.setdefault(entity, name)
+                    self._last_seen[self._node[entity]] = at
+                if alert.get("mitreAttackTechnique"):
+                    group.techniques.setdefault(alert["mitreAttackTechnique"])
+                _add_alert(group, alert)
+                touched[id(group)] = group
+                results.append(group)
+                ALERTS_CORRELATED.inc()
+
+            self._write(touched, merged)
+            if len(self._parent) > 2 * len(self._node) + 1024:
+                self._compact()
+        return [group.incident if group else None for group in results]
+
+    # ─── Union-find ──────────────────────────────────────────────────────────
+
+    def _node_for(self, entity: str, at: float) -> int:
+        node = self._node.get(entity)
+        if node is None or at - self._last_seen[node] > self.window_seconds:
+            node = self._next_node
+            self._next_node += 1
+            self._node[entity] = node
+            self._parent[node] = node
+            self._size[node] = 1
+            self._last_seen[node] = at
+        return node
+
+    def _find(self, node: int) -> int:
+        root = node
+        while self._parent[root] != root:
+            root = self._parent[root]
+        while self._parent[node] != root:
+            self._parent[node], node = root, self._parent[node]
+        return root
+
+    def _union(self, roots: Set[int], merged: List[_Group], alert: dict) -> int:
+        """Join the components into the largest one; returns its root."""
+        ordered = sorted(roots, key=lambda r: self._size[r], reverse=True)
+        root = ordered[0]
+        group = self._groups.get(root)
+        for other in ordered[1:]:
+            self._parent[other] = root
+            self._size[root] += self._size.pop(other)
+            absorbed = self._groups.pop(other, None)
+            if absorbed is None:
+                continue
+            if group is None:
+                group = absorbed
+                continue
+            _absorb(group, absorbed)
+            merged.append(absorbed)
+            INCIDENTS_MERGED.inc()
+        if group is None:
+            group = _Group(incident=_new_incident(alert), title=alert["title"], severity=alert["severity"])
+        self._groups[root] = group
+        return root
+
+    def _compact(self):
+        """Drop nodes no live entity maps to, pointing live nodes straight at their roots."""
+        live = {node: self._find(node) for node in self._node.values()}
+        roots = set(live.values())
+        self._parent = {**{node: root for node, root in live.items()}, **{r: r for r in roots}}
+        self._size = {r: self._size[r] for r in roots}
+        self._last_seen = {n: self._last_seen[n] for n in self._parent if n in self._last_seen}
+        self._groups = {r: g for r, g in self._groups.items() if r in roots}
+
+    # ─── Incident records ────────────────────────────────────────────────────
+
+    def _write(self, touched: Dict[int, _Group], merged: List[_Group]):
+        for group in merged:
+            if group.stored:
+                self.incidents.delete(group.incident["id"])
+                if self.entities is not None:
+                    self.entities.remove("incident", group.incident["id"])
+            touched.pop(id(group), None)
+        new = []
+        for group in touched.values():
+            changes = _summary(group)
+            if group.stored:
+                self.incidents.update(group.incident["id"], **changes)
+            else:
+                group.incident.update(changes)
+                group.stored = True
+                new.append(group.incident)
+            if self.entities is not None:
+                self.entities.set("incident", group.incident["id"], group.entities)
+        if new:
+            self.incidents.insert_many(new)
+
+
+def _timestamp(created: str) -> float:
+    return datetime.fromisoformat(created).timestamp()
+
+
+def _new_incident(alert: dict) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "title": alert["title"],
+        "severity": alert["severity"],
+        "description": "",
+        "status": "New",
+        "assignedTo": None,
+        "entities": [],
+        "mitreAttackTechniques": [],
+        "alertIds": [],
+        "alertCount": 0,
+        "createdTime": alert["createdTime"],
+        "scenarioId": alert.get("scenarioId"),
+        "scenarioName": None,
+        "correlated": True,
+    }
+
+
+def _escalate(group: _Group, severity: str):
+    if SEVERITY_RANK.get(severity.lower(), 0) > SEVERITY_RANK.get(group.severity.lower(), 0):
+        group.severity = severity
+
+
+def _add_alert(group: _Group, alert: dict):
+    group.alert_ids.append(alert["id"])
+    _escalate(group, alert["severity"])
+
+
+def _absorb(group: _Group, other: _Group):
+    for entity, name in other.entities.items():
+        group.entities.setdefault(entity, name)
+    group.techniques.update(other.techniques)
+    group.alert_ids.extend(other.alert_ids)
+    _escalate(group, other.severity)
+
+
+def _summary(group: _Group) -> dict:
+    """Incident fields derived from the group."""
+    entities = list(group.entities.values())
+    count = len(group.alert_ids)
+    if count == 1:
+        title = group.title
+    else:
+        title = f"Multi-stage incident involving {entities[0]}"
+        if len(entities) == 2:
+            title += " and 1 other entity"
+        elif len(entities) > 2:
+            title += f" and {len(entities) - 1} other entities"
+    return {
+        "title": title,
+        "severity": group.severity,
+        "description": f"{count} correlated alerts sharing entities within the correlation window.",
+        "entities": entities,
+        "mitreAttackTechniques": list(group.techniques),
+        "alertIds": list(group.alert_ids),
+        "alertCount": count,
+    }
@@ -0,0 +1,147 @@
+"""
+Device Inventory
+----------------
+The Defender device inventory: the hand-written reference devices that the
+scenarios and synthetic logs mention, optionally padded with generated
+devices for load testing, held in one indexed RecordStore shared by every
+lab session.
+
+Devices are ordered by lastSeen (most recent first) and indexed on
+riskLevel, owner and each of their tags, so a filtered inventory page is
+a bisect and a walk over the page even with 100k devices. Alert counts are
+not stored on the devices; they come from each lab environment's
+EntityAlertCounter when a page is served.
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+import numpy as np
+
+from app.services.record_store import RecordStore
+from app.simulators.log_data import USERS
+
+DEVICE_INDEXES = ("riskLevel", "owner", "tags")
+
+DEVICE_INVENTORY = [
+    {
+        "id": "dev-001",
+        "name": "DESKTOP-FIN-001",
+        "os": "Windows 11 Pro",
+        "osVersion": "22H2",
+        "riskLevel": "High",
+        "exposureLevel": "High",
+        "status": "Active",
+        "lastSeen": "2026-02-25T14:22:00Z",
+        "ipAddress": "10.1.1.45",
+        "domain": "CONTOSO",
+        "owner": "alice.johnson@contoso.com",
+        "tags": ["Finance", "High Value"],
+    },
+    {
+        "id": "dev-002",
+        "name": "SRV-DC-01",
+        "os": "Windows Server 2022",
+        "osVersion": "21H2",
+        "riskLevel": "Critical",
+        "exposureLevel": "High",
+        "status": "Active",
+        "lastSeen": "2026-02-25T14:25:00Z",
+        "ipAddress": "10.1.0.1",
+        "domain": "CONTOSO",
+        "owner": "IT Admin",
+        "tags": ["Domain Controller", "Critical Asset"],
+    },
+    {
+        "id": "dev-003",
+        "name": "DESKTOP-IT-042",
+        "os": "Windows 10 Pro",
+        "osVersion": "21H2",
+        "riskLevel": "Medium",
+        "exposureLevel": "Medium",
+        "status": "Active",
+        "lastSeen": "2026-02-25T13:10:00Z",
+        "ipAddress": "10.1.2.88",
+        "domain": "CONTOSO",
+        "owner": "bob.smith@contoso.com",
+        "tags": ["IT"],
+    },
+    {
+        "id": "dev-004",
+        "name": "LAPTOP-EXEC-001",
+        "os": "Windows 11 Pro",
+        "osVersion": "22H2",
+        "riskLevel": "Low",
+        "exposureLevel": "Low",
+        "status": "Active",
+        "lastSeen": "2026-02-25T12:00:00Z",
+        "ipAddress": "10.1.3.12",
+        "domain": "CONTOSO",
+        "owner": "carol.white@contoso.com",
+        "tags": ["Executive", "High Value"],
+    },
+    {
+        "id": "dev-005",
+        "name": "SRV-FILE-02",
+        "os": "Windows Server 2019",
+        "osVersion": "1809",
+        "riskLevel": "Medium",
+        "exposureLevel": "Medium",
+        "status": "Active",
+        "lastSeen": "2026-02-25T11:45:00Z",
+        "ipAddress": "10.1.0.15",
+        "domain": "CONTOSO",
+        "owner": "IT Admin",
+        "tags": ["File Server"],
+    },
+]
+
+# Pools for generated devices
+_PREFIXES = ["DESKTOP", "LAPTOP", "SRV", "VM"]
+_DEPARTMENTS = ["FIN", "IT", "HR", "ENG", "SALES", "OPS", "EXEC", "LEGAL"]
+_OS = [
+    ("Windows 11 Pro", "22H2"), ("Windows 10 Pro", "21H2"), ("Windows Server 2022", "21H2"),
+    ("Windows Server 2019", "1809"), ("macOS", "14.4"), ("Ubuntu", "22.04"),
+]
+_RISK_LEVELS = ["None", "Low", "Low", "Medium", "Medium", "High", "Critical"]
+_TAGS = ["Finance", "IT", "HR", "Engineering", "Sales", "Executive", "High Value", "Critical Asset", "Remote", "VIP"]
+
+
+def generate_devices(count: int, seed: Optional[int] = None, anchor: Optional[datetime] = None) -> List[dict]:
+    """count synthetic devices, seen within the week before anchor."""
+    rng = np.random.default_rng(seed)
+    anchor = anchor or datetime.now(timezone.utc)
+    prefixes = rng.integers(0, len(_PREFIXES), count)
+    departments = rng.integers(0, len(_DEPARTMENTS), count)
+    systems = rng.integers(0, len(_OS), count)
+    risks = rng.integers(0, len(_RISK_LEVELS), count)
+    owners = rng.integers(0, len(USERS), count)
+    seen = rng.integers(0, 7 * 24 * 3600, count)
+    tag_masks = rng.random((count, len(_TAGS))) < 0.15
+    devices = []
+    for i in range(count):
+        n = len(DEVICE_INVENTORY) + i + 1
+        risk = _RISK_LEVELS[risks[i]]
+        os_name, os_version = _OS[systems[i]]
+        devices.append({
+            "id": f"dev-{n:06d}",
+            "name": f"{_PREFIXES[prefixes[i]]}-{_DEPARTMENTS[departments[i]]}-{n:06d}",
+            "os": os_name,
+            "osVersion": os_version,
+            "riskLevel": risk,
+            "exposureLevel": "High" if risk in ("High", "Critical") else risk if risk != "None" else "Low",
+            "status": "Active",
+            "lastSeen": (anchor - timedelta(seconds=int(seen[i]))).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "ipAddress": f"10.{2 + n // 65536 % 250}.{n // 256 % 256}.{n % 256}",
+            "domain": "CONTOSO",
+            "owner": USERS[owners[i]],
+            "tags": [t for t, on in zip(_TAGS, tag_masks[i]) if on],
+        })
+    return devices
+
+
+def build_device_store(generated: int = 0, seed: Optional[int] = None) -> RecordStore:
+    """The reference devices plus generated ones, indexed for filtered pages."""
+    store = RecordStore(indexed_fields=DEVICE_INDEXES, order_field="lastSeen", multi_valued=("tags",))
+    store.insert_many([dict(d) for d in DEVICE_INVENTORY] + generate_devices(generated, seed))
+    return store
@@ -0,0 +1,485 @@
+"""
+Entity Index
+------------
+Maps normalized entity keys (users, devices, IP addresses) to the log rows,
+alerts and incidents that mention them, so an investigation pivot from an
+entity is a few binary searches instead of a KQL scan of every table.
+
+Log rows are indexed per table in compressed sparse form: a sorted array of
+entity keys, offsets into it, and the row positions holding each key. Each
+registered table or appended batch becomes one such chunk; chunks of
+similar size are merged as they accumulate, so an ingest stream costs a
+handful of chunks per table rather than one per batch. Alerts and incidents
+are indexed per lab environment as they are created or re-correlated, and
+each environment keeps per-entity alert counts by severity and status.
+
+expand_entity_graph() walks the resulting graph breadth-first from one
+entity, bounded in depth, fan-out per node and total nodes.
+"""
+
+import re
+import threading
+from collections import Counter, deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Log table columns holding a user, device or IP address
+ENTITY_COLUMNS = frozenset({
+    "UserPrincipalName", "SubjectUserName", "TargetUserName", "AccountName", "UserId",
+    "SenderFromAddress", "RecipientEmailAddress", "MailboxOwnerUPN", "CompromisedEntity",
+    "Computer", "DeviceName",
+    "IPAddress", "IpAddress", "RemoteIPAddress", "LocalIPAddress", "ClientIPAddress",
+})
+
+# Placeholder values that would otherwise link unrelated rows
+IGNORED_KEYS = frozenset({"", "-", "n/a", "unknown", "system", "local system"})
+
+# Users (UPNs), IPv4 addresses and host names such as DESKTOP-FIN-001 mentioned in free text
+_ENTITY_RE = re.compile(
+    r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"
+    r"|\b(?:\d{1,3}\.){3}\d{1,3}\b"
+    r"|\b[A-Z][A-Z0-9]*(?:-[A-Z0-9]+)*-\d+\b"
+)
+_IP_RE = re.compile(r"^(?:\d{1,3}\.){3}\d{1,3}$")
+_HOST_RE = re.compile(r"^[a-z][a-z0-9]*(?:-[a-z0-9]+)*-\d+$")
+
+# Alert statuses that no longer count as active
+CLOSED_STATUSES = frozenset({"resolved", "closed"})
+
+# Chunks merge once a table has more than this many
+MAX_CHUNKS = 8
+# Newest rows per table read when looking for an entity's neighbours
+NEIGHBOUR_SCAN_ROWS = 5_000
+
+
+def entity_key(value: Any) -> str:
+    """The normalized index key for an entity value (lower case, trimmed)."""
+    if isinstance(value, dict):
+        value = next((value[k] for k in ("upn", "hostname", "ip", "address", "name") if value.get(k)), "")
+    return str(value or "").strip().rstrip(".").lower()
+
+
+def entity_kind(key: str) -> str:
+    if _IP_RE.match(key):
+        return "ip"
+    if "@" in key:
+        return "account"
+    if _HOST_RE.match(key):
+        return "device"
+    return "account"
+
+
+def record_entities(values: Iterable[Any]) -> Dict[str, str]:
+    """Entity keys for a list of entity values, with the first spelling of each as the value."""
+    entities: Dict[str, str] = {}
+    for value in values or ():
+        key = entity_key(value)
+        if key not in IGNORED_KEYS:
+            entities.setdefault(key, value.strip().rstrip(".") if isinstance(value, str) else key)
+    return entities
+
+
+def alert_entities(alert: dict) -> Dict[str, str]:
+    """
+    The entities an alert involves: its entity field and entities list, plus
+    users, IPs and hosts named in its description.
+    """
+    values = [alert.get("entity"), *(alert.get("entities") or [])]
+    values += _ENTITY_RE.findall(alert.get("description") or "")
+    return record_entities(values)
+
+
+# ─── Log Rows ────────────────────────────────────────────────────────────────
+
+class _Chunk:
+    """Row positions grouped by entity key, for one batch of rows."""
+
+    __slots__ = ("keys", "names", "offsets", "positions")
+
+    def __init__(self, keys: np.ndarray, names: np.ndarray, offsets: np.ndarray, positions: np.ndarray):
+        self.keys = keys  # sorted unique keys
+        self.names = names  # first spelling of each key
+        self.offsets = offsets  # positions[offsets[i]:offsets[i + 1]] hold keys[i]
+        self.positions = positions
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    @classmethod
+    def build(cls, codes: np.ndarray, keys: np.ndarray, names: np.ndarray, positions: np.ndarray) -> "_Chunk":
+        """
+        A chunk from per-row codes into keys/names (which may repeat a key),
+        so strings are sorted once per distinct value rather than per row.
+        """
+        key_codes, uniques = pd.factorize(keys, sort=True)
+        row_codes = key_codes[codes]
+        order = np.argsort(row_codes, kind="stable")
+        offsets = np.zeros(len(uniques) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(row_codes, minlength=len(uniques)), out=offsets[1:])
+        first = np.unique(key_codes, return_index=True)[1]
+        return cls(np.asarray(uniques, dtype=object), names[first], offsets, positions[order])
+
+    def lookup(self, key: str) -> Tuple[Optional[np.ndarray], Optional[str]]:
+        i = int(np.searchsorted(self.keys, key))
+        if i == len(self.keys) or self.keys[i] != key:
+            return None, None
+        return self.positions[self.offsets[i]:self.offsets[i + 1]], self.names[i]
+
+
+
+def _merge(chunks: List[_Chunk]) -> _Chunk:
+    codes, base = [], 0
+    for chunk in chunks:
+        codes.append(np.repeat(np.arange(base, base + len(chunk.keys)), np.diff(chunk.offsets)))
+        base += len(chunk.keys)
+    return _Chunk.build(
+        np.concatenate(codes),
+        np.concatenate([c.keys for c in chunks]),
+        np.concatenate([c.names for c in chunks]),
+        np.concatenate([c.positions for c in chunks]),
+    )
+
+
+class EntityRowIndex:
+    """Entity key -> row positions, per log table."""
+
+    def __init__(self, columns: Iterable[str] = ENTITY_COLUMNS):
+        self.columns = frozenset(columns)
+        self._chunks: Dict[str, List[_Chunk]] = {}
+        self._lock = threading.Lock()
+
+    def index_table(self, name: str, df: pd.DataFrame):
+        chunk = self._chunk(df, 0)
+        with self._lock:
+            self._chunks[name] = [chunk] if chunk is not None else []
+
+    def append(self, name: str, df: pd.DataFrame, start: int):
+        """Index rows appended at position start onwards."""
+        chunk = self._chunk(df, start)
+        if chunk is None:
+            return
+        with self._lock:
+            chunks = self._chunks.setdefault(name, [])
+            chunks.append(chunk)
+            # Size-tiered: fold the newest chunk into its predecessor while it is
+            # at least half as large, and always once there are too many.
+            while len(chunks) > 1 and (len(chunks[-1]) * 2 >= len(chunks[-2]) or len(chunks) > MAX_CHUNKS):
+                chunks[-2:] = [_merge(chunks[-2:])]
+
+    def clear(self):
+        with self._lock:
+            self._chunks.clear()
+
+    def rows(self, name: str, key: str) -> np.ndarray:
+        """Sorted positions of the rows of a table that mention an entity."""
+        with self._lock:
+            chunks = list(self._chunks.get(name, ()))
+        found = [positions for positions, _ in (c.lookup(key) for c in chunks) if positions is not None]
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(found)).astype(np.int64)
+
+    def name(self, key: str) -> Optional[str]:
+        """The spelling an entity key was first indexed with."""
+        with self._lock:
+            chunks = [c for table in self._chunks.values() for c in table]
+        for chunk in chunks:
+            _, name = chunk.lookup(key)
+            if name is not None:
+                return name
+        return None
+
+    def sizes(self) -> Dict[str, Tuple[int, int]]:
+        """Distinct keys and indexed positions per table."""
+        with self._lock:
+            return {
+                name: (sum(len(c.keys) for c in chunks), sum(len(c) for c in chunks))
+                for name, chunks in self._chunks.items()
+            }
+
+    def _chunk(self, df: pd.DataFrame, start: int) -> Optional[_Chunk]:
+        codes, keys, names, positions = [], [], [], []
+        base = 0
+        for column in df.columns:
+            if column not in self.columns:
+                continue
+            values = df[column]
+            if values.dtype != object and not isinstance(values.dtype, pd.StringDtype):
+                continue
+            # Normalize each distinct value once, not every row.
+            column_codes, uniques = pd.factorize(values)
+            spelled = pd.Index(uniques).astype(str).str.strip()
+            lowered = spelled.str.lower()
+            kept = ~lowered.isin(IGNORED_KEYS)
+            mask = column_codes >= 0
+            mask[mask] = kept[column_codes[mask]]
+            if not mask.any():
+                continue
+            # Placeholder values are left out of the chunk's keys as well as its rows.
+            renumbered = np.cumsum(kept) - 1
+            codes.append(renumbered[column_codes[mask]] + base)
+            keys.append(lowered[kept].to_numpy(dtype=object))
+            names.append(spelled[kept].to_numpy(dtype=object))
+            positions.append(np.flatnonzero(mask).astype(np.int32) + start)
+            base += int(kept.sum())
+        if not codes:
+            return None
+        return _Chunk.build(*(np.concatenate(parts) for parts in (codes, keys, names, positions)))
+
+
+# ─── Alerts and Incidents ────────────────────────────────────────────────────
+
+class EntityRecordIndex:
+    """Entity key -> ids of the alerts and incidents that involve it."""
+
+    def __init__(self):
+        self._ids: Dict[str, Dict[str, Dict[str, None]]] = {}  # kind -> key -> ordered ids
+        self._keys: Dict[Tuple[str, str], Tuple[str, ...]] = {}  # (kind, id) -> keys
+        self._names: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def set(self, kind: str, record_id: str, entities: Dict[str, str]):
+        """Index a record under exactly these entities (key -> display name)."""
+        with self._lock:
+            self._unlink(kind, record_id)
+            by_key = self._ids.setdefault(kind, {})
+            for key, name in entities.items():
+                by_key.setdefault(key, {})[record_id] = None
+                self._names.setdefault(key, name)
+            self._keys[(kind, record_id)] = tuple(entities)
+
+    def set_many(self, kind: str, records: Iterable[Tuple[str, Dict[str, str]]]):
+        for record_id, entities in records:
+            self.set(kind, record_id, entities)
+
+    def remove(self, kind: str, record_id: str):
+        with self._lock:
+            self._unlink(kind, record_id)
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+            self._keys.clear()
+            self._names.clear()
+
+    def ids(self, kind: str, key: str) -> List[str]:
+        """Ids of the records of a kind involving an entity, oldest first."""
+        with self._lock:
+            return list(self._ids.get(kind, {}).get(key, ()))
+
+    def entities(self, kind: str, record_id: str) -> Tuple[str, ...]:
+        return self._keys.get((kind, record_id), ())
+
+    def name(self, key: str) -> Optional[str]:
+        return self._names.get(key)
+
+    def _unlink(self, kind: str, record_id: str):
+        by_key = self._ids.get(kind, {})
+        for key in self._keys.pop((kind, record_id), ()):
+            ids = by_key.get(key)
+            if ids is not None:
+                ids.pop(record_id, None)
+                if not ids:
+                    del by_key[key]
+
+
+class EntityAlertCounter:
+    """
+    Alert counts per entity by severity and status, kept current as a
+    RecordStore listener on an alert store, so per-device totals never need
+    a scan of the alerts.
+    """
+
+    def __init__(self):
+        self._counts: Dict[str, Counter] = {}  # entity key -> (severity, status) -> alerts
+        self._alerts: Dict[str, Tuple[Tuple[str, ...], str, str]] = {}  # alert id -> (keys, severity, status)
+        self._lock = threading.Lock()
+
+    def record(self, op: str, alerts: Iterable[dict]):
+        """RecordStore listener: count inserted and updated alerts, uncount deleted ones."""
+        with self._lock:
+            if op == "clear":
+                self._counts.clear()
+                self._alerts.clear()
+                return
+            for alert in alerts:
+                previous = self._uncount(alert["id"])
+                if op == "delete":
+                    continue
+                # An update keeps the entities worked out when the alert was created.
+                keys = previous[0] if previous is not None and op == "update" else tuple(alert_entities(alert))
+                pair = (alert.get("severity") or "", alert.get("status") or "")
+                for key in keys:
+                    self._counts.setdefault(key, Counter())[pair] += 1
+                self._alerts[alert["id"]] = (keys, *pair)
+
+    def counts(self, key: str) -> dict:
+        """An entity's alert total, unresolved alerts, and counts by severity and by status."""
+        by_severity: Counter = Counter()
+        by_status: Counter = Counter()
+        with self._lock:
+            for (severity, status), n in self._counts.get(key, {}).items():
+                by_severity[severity] += n
+                by_status[status] += n
+        return {
+            "total": sum(by_status.values()),
+            "active": sum(n for status, n in by_status.items() if status.lower() not in CLOSED_STATUSES),
+            "bySeverity": dict(by_severity),
+            "byStatus": dict(by_status),
+        }
+
+    def _uncount(self, alert_id: str) -> Optional[Tuple[Tuple[str, ...], str, str]]:
+        previous = self._alerts.pop(alert_id, None)
+        if previous is not None:
+            keys, severity, status = previous
+            for key in keys:
+                counts = self._counts[key]
+                counts[(severity, status)] -= 1
+                if not counts[(severity, status)]:
+                    del counts[(severity, status)]
+                    if not counts:
+                        del self._counts[key]
+        return previous
+
+
+# ─── Graph Expansion ─────────────────────────────────────────────────────────
+
+def expand_entity_graph(env, entity: str, depth: int = 1, fan_out: int = 10, max_nodes: int = 200) -> dict:
+    """
+    The entity's neighbourhood in a lab environment, breadth-first: alerts
+    and incidents that involve each entity, the rows mentioning it per
+    table, and the entities seen alongside it (in the same rows, alerts or
+    incidents), up to depth hops away. Each entity contributes at most
+    fan_out alerts, incidents and neighbour entities, and expansion stops
+    at max_nodes nodes.
+    """
+    registry = env.registry
+    root = entity_key(entity)
+    nodes: Dict[str, dict] = {}
+    edges: List[dict] = []
+    linked = set()  # (entity, entity) pairs already joined by an edge
+    frames: Dict[str, pd.DataFrame] = {}  # fetched once: a session's tables are combined per get()
+    truncated = False
+    queue = deque([(root, 0)])
+    nodes[f"entity:{root}"] = None  # reserved; filled when expanded
+
+    def add(node_id: str, node: dict) -> bool:
+        nonlocal truncated
+        if node_id in nodes:
+            return True
+        if len(nodes) >= max_nodes:
+            truncated = True
+            return False
+        nodes[node_id] = node
+        return True
+
+    while queue:
+        key, level = queue.popleft()
+        node_id = f"entity:{key}"
+        neighbours: Counter = Counter()
+        via: Dict[str, set] = {}
+
+        tables = {}
+        for table in registry.list_tables():
+            if not registry.is_loaded(table):
+                continue
+            positions = registry.entity_rows(table, key)
+            if not len(positions):
+                continue
+            df = frames.get(table)
+            if df is None:
+                df = frames[table] = registry.get(table)
+            positions = positions[positions < len(df)]
+            if not len(positions):
+                continue
+            tables[table] = _row_summary(df, positions)
+            for other in _row_neighbours(df, positions[-NEIGHBOUR_SCAN_ROWS:]):
+                neighbours[other] += 1
+                via.setdefault(other, set()).add(table)
+
+        alert_ids = env.entities.ids("alert", key)
+        incident_ids = env.entities.ids("incident", key)
+        nodes[node_id] = {
+            "id": node_id,
+            "type": "entity",
+            "kind": entity_kind(key),
+            "name": env.entities.name(key) or registry.entity_name(key) or key,
+            "depth": level,
+            "tables": tables,
+            "alertCount": len(alert_ids),
+            "incidentCount": len(incident_ids),
+        }
+
+        for kind, ids, store in (("alert", alert_ids, env.alerts), ("incident", incident_ids, env.incidents)):
+            for record_id in ids[::-1][:fan_out]:
+                record = store.get(record_id)
+                if record is None or not add(f"{kind}:{record_id}", _record_node(kind, record)):
+                    continue
+                edges.append({"source": node_id, "target": f"{kind}:{record_id}", "relation": "involved_in"})
+                for other in env.entities.entities(kind, record_id):
+                    neighbours[other] += 1
+                    via.setdefault(other, set()).add(f"{kind}s")
+
+        neighbours.pop(key, None)
+        for other, weight in neighbours.most_common(fan_out):
+            other_id = f"entity:{other}"
+            known = other_id in nodes
+            if not known and level >= depth:
+                continue
+            if not known:
+                if not add(other_id, None):
+                    break
+                queue.append((other, level + 1))
+            if (other, key) not in linked:
+                linked.add((key, other))
+                edges.append({
+                    "source": node_id, "target": other_id, "relation": "related_to",
+                    "weight": weight, "via": sorted(via[other]),
+                })
+
+    return {
+        "root": f"entity:{root}",
+        "depth": depth,
+        "nodes": [n for n in nodes.values() if n is not None],
+        "edges": edges,
+        "truncated": truncated,
+    }
+
+
+def _row_summary(df: pd.DataFrame, positions: np.ndarray) -> dict:
+    summary = {"rows": int(len(positions))}
+    if "TimeGenerated" in df.columns:
+        times = df["TimeGenerated"].take(positions)
+        summary["firstSeen"] = _iso(times.min())
+        summary["lastSeen"] = _iso(times.max())
+    return summary
+
+
+def _row_neighbours(df: pd.DataFrame, positions: np.ndarray) -> Iterable[str]:
+    """Distinct entity keys in the given rows, from the indexed columns."""
+    found = set()
+    for column in df.columns:
+        if column in ENTITY_COLUMNS:
+            values = df[column].take(positions).unique()
+            found.update(entity_key(v) for v in values if isinstance(v, str))
+    return found - IGNORED_KEYS
+
+
+def _record_node(kind: str, record: dict) -> dict:
+    node = {
+        "id": f"{kind}:{record['id']}",
+        "type": kind,
+        "title": record.get("title"),
+        "severity": record.get("severity"),
+        "status": record.get("status"),
+        "createdTime": record.get("createdTime"),
+    }
+    if kind == "alert":
+        node["mitreAttackTechnique"] = record.get("mitreAttackTechnique")
+    return node
+
+
+def _iso(value) -> Optional[str]:
+    return value.isoformat() if hasattr(value, "isoformat") and not pd.isna(value) else None
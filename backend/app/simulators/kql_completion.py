@@ -0,0 +1,184 @@
+"""
+KQL Value Completion
+--------------------
+Per-column dictionaries of the values held in each string column, kept
+sorted by their lower-cased form so a prefix lookup is two binary searches
+instead of a table scan. The query editor uses them to complete user
+principals, device names, IP addresses and similar values as the user types.
+
+Dictionaries are built when a table is registered and folded forward with
+only the new rows when rows are appended. Appends update the sorted arrays
+in place: counts of known values are bumped where they sit, a few new
+values are inserted by binary search, and a large batch of new values is
+sorted on its own and merged in one linear pass. Lookups never rebuild.
+"""
+
+import heapq
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+MAX_VALUES_PER_COLUMN = 10_000
+DEFAULT_COMPLETION_LIMIT = 10
+
+# Sorts after every character, so [prefix, prefix + sentinel) spans every
+# key that starts with prefix.
+_PREFIX_SENTINEL = "\U0010ffff"
+
+# New values per update above which they are merged in one pass rather
+# than inserted one at a time.
+MERGE_THRESHOLD = 64
+
+
+class ValueDictionary:
+    """Frequency-ranked, prefix-searchable distinct values of one column."""
+
+    def __init__(self, max_values: int = MAX_VALUES_PER_COLUMN):
+        self.max_values = max_values
+        self.truncated = False
+        self._counts: Dict[str, int] = {}
+        # Parallel arrays sorted by (lower-cased value, value)
+        self._keys: List[str] = []
+        self._values: List[str] = []
+        self._freq: List[int] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def update(self, series: pd.Series):
+        """Fold the values of series into the dictionary."""
+        counts = series.value_counts(sort=False, dropna=True)
+        if counts.empty:
+            return
+        with self._lock:
+            new: Dict[str, int] = {}
+            for value, count in counts.items():
+                if not isinstance(value, str):
+                    continue
+                if value in self._counts:
+                    self._counts[value] += int(count)
+                    self._freq[self._position(value)] += int(count)
+                else:
+                    new[value] = new.get(value, 0) + int(count)
+            self._counts.update(new)
+            if len(new) > MERGE_THRESHOLD:
+                self._merge(new)
+            else:
+                for value, count in new.items():
+                    i = bisect_left(self._entries(), (value.lower(), value))
+                    self._keys.insert(i, value.lower())
+                    self._values.insert(i, value)
+                    self._freq.insert(i, count)
+            if len(self._counts) > self.max_values:
+                # Keep the most frequent values; rare ones are poor completions.
+                # Among equal counts the newest values go first.
+                excess = len(self._counts) - self.max_values
+                rare = heapq.nsmallest(excess, reversed(self._counts.items()), key=lambda kv: kv[1])
+                for value, _ in rare:
+                    del self._counts[value]
+                if excess > MERGE_THRESHOLD:
+                    kept = [i for i, value in enumerate(self._values) if value in self._counts]
+                    self._keys = [self._keys[i] for i in kept]
+                    self._values = [self._values[i] for i in kept]
+                    self._freq = [self._freq[i] for i in kept]
+                else:
+                    for value, _ in rare:
+                        i = self._position(value)
+                        del self._keys[i], self._values[i], self._freq[i]
+                self.truncated = True
+
+    def _entries(self) -> "_SortKeys":
+        return _SortKeys(self._keys, self._values)
+
+    def _position(self, value: str) -> int:
+        return bisect_left(self._entries(), (value.lower(), value))
+
+    def _merge(self, new: Dict[str, int]):
+        added = sorted((value.lower(), value, count) for value, count in new.items())
+        merged = list(heapq.merge(zip(self._keys, self._values, self._freq), added))
+        self._keys = [e[0] for e in merged]
+        self._values = [e[1] for e in merged]
+        self._freq = [e[2] for e in merged]
+
+    def complete(self, prefix: str, limit: int = DEFAULT_COMPLETION_LIMIT) -> List[Tuple[str, int]]:
+        """The most frequent values starting with prefix (case-insensitive)."""
+        with self._lock:
+            key = prefix.lower()
+            lo = bisect_left(self._keys, key)
+            hi = bisect_left(self._keys, key + _PREFIX_SENTINEL, lo)
+            if hi <= lo or limit <= 0:
+                return []
+            freq = np.array(self._freq[lo:hi], dtype=np.int64)
+            if hi - lo > limit:
+                # Broad prefixes ("a", "10.") select the top values without
+                # sorting the whole range.
+                picked = np.argpartition(-freq, limit - 1)[:limit]
+            else:
+                picked = np.arange(hi - lo)
+            matches = [(self._values[lo + i], int(freq[i])) for i in picked]
+        matches.sort(key=lambda m: (-m[1], m[0].lower()))
+        return matches
+
+
+class _SortKeys:
+    """A (key, value) view of the parallel arrays, for bisect."""
+
+    __slots__ = ("keys", "values")
+
+    def __init__(self, keys: List[str], values: List[str]):
+        self.keys = keys
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __getitem__(self, i: int) -> Tuple[str, str]:
+        return self.keys[i], self.values[i]
+
+
+class CompletionIndex:
+    """Value dictionaries for every string column of every registered table."""
+
+    def __init__(self, max_values: int = MAX_VALUES_PER_COLUMN):
+        self.max_values = max_values
+        self._columns: Dict[str, Dict[str, ValueDictionary]] = {}
+
+    def index_table(self, name: str, df: pd.DataFrame):
+        self._columns[name] = {}
+        self.append(name, df)
+
+    def append(self, name: str, df: pd.DataFrame):
+        columns = self._columns.setdefault(name, {})
+        for column in df.columns:
+            if not _is_text(df[column]):
+                continue
+            dictionary = columns.get(str(column))
+            if dictionary is None:
+                dictionary = columns[str(column)] = ValueDictionary(self.max_values)
+            dictionary.update(df[column])
+
+    def columns(self, name: str) -> List[str]:
+        return list(self._columns.get(name, {}))
+
+    def complete(
+        self, name: str, column: str, prefix: str, limit: int = DEFAULT_COMPLETION_LIMIT
+    ) -> Optional[List[Tuple[str, int]]]:
+        """Completions for a column, or None when the column is not indexed."""
+        dictionary = self._columns.get(name, {}).get(column)
+        if dictionary is None:
+            return None
+        return dictionary.complete(prefix, limit)
+
+
+def _is_text(series: pd.Series) -> bool:
+    if isinstance(series.dtype, pd.StringDtype):
+        return True
+    if series.dtype != object:
+        return False
+    sample = series.dropna().head(100)
+    return not sample.empty and all(isinstance(v, str) for v in sample)
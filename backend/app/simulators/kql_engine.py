@@ -6,22 +6,49 @@ queries against Pandas DataFrames representing Azure Monitor log tables.
 
 Supported operators:
   where, project, extend, summarize, order by, sort by,
-  take, limit, join, union, parse, mv-expand, top
+  take, limit, join, union, parse, mv-expand, top, count,
+  distinct, getschema
 
 Supported functions:
   count(), sum(), avg(), min(), max(), dcount(), make_list()
   ago(), now(), datetime(), bin(), iif(), iff(), case(),
   tostring(), toint(), todouble(), tobool(),
-  contains, startswith, endswith, has, matches regex
+  contains, startswith, endswith, has, matches regex,
+  has_any, contains_any, in~, in, !in, between,
+  ==, !=, <, <=, >, >=, =~, !~, isempty(), isnotempty()
 """
 
+import itertools
 import re
+import threading
+import time
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from dataclasses import dataclass, field
 
+from app.core.metrics import metrics
+from app.simulators.entity_index import EntityRowIndex
+from app.simulators.kql_completion import CompletionIndex
+from app.simulators.kql_stats import TableStats, kql_type, merge_table_stats, table_stats
+
+
+KQL_QUERY_DURATION = metrics.histogram(
+    "kql_query_duration_seconds", "End-to-end KQL query latency.", ["status"]
+)
+KQL_OPERATOR_DURATION = metrics.histogram(
+    "kql_operator_duration_seconds", "Latency of individual KQL pipeline operators.", ["operator"]
+)
+KQL_ROWS_SCANNED = metrics.counter(
+    "kql_rows_scanned_total", "Rows read from source tables by KQL queries.", ["table"]
+)
+KQL_ROWS_RETURNED = metrics.counter(
+    "kql_rows_returned_total", "Rows returned to callers by KQL queries."
+)
+
 
 # ─── Result ──────────────────────────────────────────────────────────────────
 
@@ -32,9 +59,14 @@ class KQLResult:
     row_count: int
     execution_time_ms: float
     error: Optional[str] = None
+    # One entry per executed stage: operator, stage text, ms, rows out
+    profile: List[Dict[str, Any]] = field(default_factory=list)
 
     @classmethod
     def from_dataframe(cls, df: pd.DataFrame, execution_time_ms: float) -> "KQLResult":
+        if df.isna().to_numpy().any():
+            # Nulls (outer joins, columns only some rows carry) serialize as JSON null, not NaN.
+            df = df.astype(object).where(df.notna(), None)
         return cls(
             columns=list(df.columns),
             rows=df.to_dict(orient="records"),
@@ -43,26 +75,190 @@ class KQLResult:
         )
 
     @classmethod
-    def error_result(cls, message: str) -> "KQLResult":
-        return cls(columns=[], rows=[], row_count=0, execution_time_ms=0.0, error=message)
+    def error_result(cls, message: str, execution_time_ms: float = 0.0) -> "KQLResult":
+        return cls(columns=[], rows=[], row_count=0, execution_time_ms=execution_time_ms, error=message)
+
+
+# Stage profile of the query currently executing in this thread/task.
+_current_profile: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("kql_profile", default=None)
+
+
+def _record_stage(operator: str, stage: str, start: float, rows: int):
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.append({
+            "operator": operator,
+            "stage": stage,
+            "ms": round((time.perf_counter() - start) * 1000, 3),
+            "rows": rows,
+        })
 
 
 # ─── Table Registry ──────────────────────────────────────────────────────────
 
+# Shared by every registry, so a replaced table never reuses an epoch.
+_EPOCHS = itertools.count(1)
+
+
+@dataclass(frozen=True)
+class TableSpan:
+    """
+    Which rows a table holds, for executors that mirror tables elsewhere.
+    Rows are numbered in arrival order: the table holds rows
+    [dropped, appended). The epoch changes whenever a table is replaced
+    rather than appended to or trimmed; epoch 0 is a lazy table's loader
+    output.
+    """
+
+    epoch: int
+    dropped: int
+    appended: int
+
+
 class TableRegistry:
-    """Holds all available log tables as Pandas DataFrames."""
+    """
+    Holds all available log tables as Pandas DataFrames.
+
+    Tables registered with register_lazy() are only generated or loaded on
+    first reference (or by warm_up()), so constructing a registry is cheap.
+    """
 
     def __init__(self):
         self._tables: Dict[str, pd.DataFrame] = {}
+        self._stats: Dict[str, TableStats] = {}
+        self._bytes: Dict[str, Tuple[int, int]] = {}
+        self._loaders: Dict[str, Callable[[], pd.DataFrame]] = {}
+        self._declared: Dict[str, Callable[[], List[Tuple[str, str]]]] = {}  # schemas of lazy tables
+        self._names: Dict[str, None] = {}  # registration order
+        self._spans: Dict[str, TableSpan] = {}
+        self._load_lock = threading.RLock()
+        self.completions = CompletionIndex()
+        self.entities = EntityRowIndex()
 
     def register(self, name: str, df: pd.DataFrame):
-        self._tables[name] = df.copy()
+        self._set(name, df.copy())
+        self._loaders.pop(name, None)
+        self._names[name] = None
+        self._spans[name] = TableSpan(next(_EPOCHS), 0, len(df))
+
+    def _set(self, name: str, df: pd.DataFrame):
+        self._tables[name] = df
+        self._stats[name] = table_stats(df)
+        self.completions.index_table(name, df)
+        self.entities.index_table(name, df)
+
+    def register_lazy(
+        self, name: str, loader: Callable[[], pd.DataFrame],
+        schema: Optional[Callable[[], List[Tuple[str, str]]]] = None,
+    ):
+        """
+        Register a table whose rows are produced by loader() on first use.
+        schema(), if given, returns its (column, KQL type) pairs without
+        loading it.
+        """
+        self._loaders[name] = loader
+        if schema is not None:
+            self._declared[name] = schema
+        else:
+            self._declared.pop(name, None)
+        self._tables.pop(name, None)
+        self._stats.pop(name, None)
+        self._spans.pop(name, None)
+        self._names[name] = None
+
+    def _materialize(self, name: str):
+        with self._load_lock:
+            # Another thread may have loaded it while we waited.
+            loader = self._loaders.get(name)
+            if loader is not None:
+                df = loader()
+                self._set(name, df)
+                self._spans[name] = TableSpan(0, 0, len(df))
+                del self._loaders[name]
+
+    def warm_up(self, names: Optional[List[str]] = None):
+        """Materialize lazy tables ahead of their first query."""
+        for name in names or list(self._loaders):
+            if name in self._loaders:
+                self._materialize(name)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._tables
+
+    def append(self, name: str, df: pd.DataFrame):
+        """Add rows to a table, updating its statistics and indexes from the new rows only."""
+        with self._load_lock:
+            current = self.get(name)
+            if current is None:
+                self.register(name, df)
+                return
+            self._tables[name] = pd.concat([current, df], ignore_index=True)
+            self._stats[name] = merge_table_stats(self._stats[name], df)
+            self.completions.append(name, df)
+            self.entities.append(name, df, len(current))
+            span = self._spans[name]
+            self._spans[name] = TableSpan(span.epoch, span.dropped, span.appended + len(df))
+
+    def retain_last(self, name: str, rows: int):
+        """Drop all but the newest rows of a table (statistics are rebuilt)."""
+        with self._load_lock:
+            current = self.get(name)
+            if current is not None and len(current) > rows:
+                self._set(name, current.iloc[-rows:].reset_index(drop=True))
+                span = self._spans[name]
+                self._spans[name] = TableSpan(span.epoch, span.dropped + len(current) - rows, span.appended)
 
     def get(self, name: str) -> Optional[pd.DataFrame]:
+        if name in self._loaders:
+            self._materialize(name)
         return self._tables.get(name)
 
+    def stats(self, name: str) -> Optional[TableStats]:
+        if name in self._loaders:
+            self._materialize(name)
+        return self._stats.get(name)
+
+    def schema(self, name: str) -> Optional[List[Tuple[str, str]]]:
+        """A table's columns and KQL types, without loading a lazy table; None if not known."""
+        stats = self._stats.get(name)
+        if stats is not None:
+            return stats.schema()
+        declared = self._declared.get(name) if name in self._loaders else None
+        return list(declared()) if declared is not None else None
+
+    def span(self, name: str) -> Optional[TableSpan]:
+        """The rows a loaded table holds; None for a lazy table not yet loaded (or an unknown one)."""
+        return self._spans.get(name)
+
+    def snapshot(self, name: str) -> Tuple[Optional[pd.DataFrame], Optional[TableSpan]]:
+        """A table and its span, read together (loading the table if lazy)."""
+        with self._load_lock:
+            df = self.get(name)
+            return df, self._spans.get(name)
+
+    def entity_rows(self, name: str, key: str) -> np.ndarray:
+        """Positions of the rows of a loaded table that mention an entity key."""
+        return self.entities.rows(name, key)
+
+    def entity_name(self, key: str) -> Optional[str]:
+        return self.entities.name(key)
+
     def list_tables(self) -> List[str]:
-        return list(self._tables.keys())
+        return list(self._names)
+
+    def table_sizes(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Row count and approximate in-memory bytes per table. The deep byte
+        count walks every string, so it is cached until the table changes.
+        """
+        sizes = {}
+        for name, df in list(self._tables.items()):
+            cached = self._bytes.get(name)
+            if cached is None or cached[0] != id(df):
+                cached = (id(df), int(df.memory_usage(deep=True).sum()))
+                self._bytes[name] = cached
+            sizes[name] = (len(df), cached[1])
+        return sizes
 
 
 # ─── KQL Functions ───────────────────────────────────────────────────────────
@@ -75,10 +271,12 @@ def _parse_timespan(span: str) -> timedelta:
         "m": timedelta(minutes=1),
         "s": timedelta(seconds=1),
     }
-    match = re.match(r"(\d+(?:\.\d+)?)([dhms])", span.strip())
+    match = re.match(r"(\d+(?:\.\d+)?)(ms|[dhms])", span.strip())
     if not match:
         raise ValueError(f"Cannot parse timespan: {span}")
     value, unit = float(match.group(1)), match.group(2)
+    if unit == "ms":
+        return timedelta(milliseconds=value)
     return patterns[unit] * value
 
 
@@ -106,6 +304,634 @@ def eval_kql_expression(expr: str, row: Optional[pd.Series] = None) -> Any:
     return expr
 
 
+def parse_summarize(expr_str: str) -> Tuple[List[str], Dict[str, Tuple[str, str]]]:
+    """
+    Split a summarize clause into its group-by columns and aggregations.
+    Aggregations map each output alias to a (column, pandas agg) pair.
+    """
+    by_match = re.search(r"\bby\b(.+)$", expr_str, re.IGNORECASE)
+    group_cols = []
+    if by_match:
+        group_cols = [c.strip() for c in by_match.group(1).split(",")]
+        agg_str = expr_str[: by_match.start()].strip()
+    else:
+        agg_str = expr_str.strip()
+
+    agg_exprs = {}
+    for part in agg_str.split(","):
+        part = part.strip()
+        alias_match = re.match(r"(\w+)\s*=\s*(.+)", part)
+        if alias_match:
+            alias, func = alias_match.group(1), alias_match.group(2).strip()
+        else:
+            alias, func = part, part
+
+        if re.match(r"count\(\)", func, re.IGNORECASE):
+            agg_exprs[alias] = ("__count__", "count")
+        elif m := re.match(r"sum\((\w+)\)", func, re.IGNORECASE):
+            agg_exprs[alias] = (m.group(1), "sum")
+        elif m := re.match(r"avg\((\w+)\)", func, re.IGNORECASE):
+            agg_exprs[alias] = (m.group(1), "mean")
+        elif m := re.match(r"min\((\w+)\)", func, re.IGNORECASE):
+            agg_exprs[alias] = (m.group(1), "min")
+        elif m := re.match(r"max\((\w+)\)", func, re.IGNORECASE):
+            agg_exprs[alias] = (m.group(1), "max")
+        elif m := re.match(r"dcount\((\w+)\)", func, re.IGNORECASE):
+            agg_exprs[alias] = (m.group(1), "nunique")
+
+    return group_cols, agg_exprs
+
+
+# ─── String Predicates ───────────────────────────────────────────────────────
+
+PATTERN_CACHE_SIZE = 256
+
+
+@lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def compile_pattern(pattern: str, flags: int = 0) -> "re.Pattern":
+    """Compile a regex once and reuse it across queries."""
+    return re.compile(pattern, flags)
+
+
+def _trie_pattern(terms: Tuple[str, ...]) -> str:
+    """
+    Build a regex alternation shaped like a prefix trie, so a list of
+    terms is matched in a single left-to-right pass over each value
+    instead of one scan per term.
+    """
+    trie: Dict[str, dict] = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            body = f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+@lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def compile_multi_pattern(terms: Tuple[str, ...], whole_term: bool) -> "re.Pattern":
+    """Compile a case-insensitive multi-term matcher for has_any / contains_any."""
+    unique = tuple(sorted({t.lower() for t in terms if t}))
+    if not unique:
+        return re.compile(r"(?!x)x")
+    body = _trie_pattern(unique)
+    if whole_term:
+        body = rf"\b{body}\b"
+    return re.compile(body, re.IGNORECASE)
+
+
+def _match_values(series: pd.Series, predicate) -> pd.Series:
+    """
+    Evaluate a per-value string predicate once per distinct value.
+    Log columns repeat the same users, devices and IPs many times, so this
+    is far cheaper than testing every row.
+    """
+    codes, uniques = pd.factorize(series)
+    hits = np.fromiter((bool(predicate(str(v))) for v in uniques), dtype=bool, count=len(uniques))
+    mask = np.zeros(len(series), dtype=bool)
+    valid = codes >= 0
+    mask[valid] = hits[codes[valid]]
+    return pd.Series(mask, index=series.index)
+
+
+def str_contains(series: pd.Series, term: str, case_sensitive: bool = False) -> pd.Series:
+    if case_sensitive:
+        return _match_values(series, lambda v: term in v)
+    needle = term.lower()
+    return _match_values(series, lambda v: needle in v.lower())
+
+
+def str_has(series: pd.Series, term: str, case_sensitive: bool = False) -> pd.Series:
+    pattern = compile_pattern(rf"\b{re.escape(term)}\b", 0 if case_sensitive else re.IGNORECASE)
+    return _match_values(series, pattern.search)
+
+
+def str_startswith(series: pd.Series, prefix: str, case_sensitive: bool = False) -> pd.Series:
+    if case_sensitive:
+        return _match_values(series, lambda v: v.startswith(prefix))
+    needle = prefix.lower()
+    return _match_values(series, lambda v: v.lower().startswith(needle))
+
+
+def str_endswith(series: pd.Series, suffix: str, case_sensitive: bool = False) -> pd.Series:
+    if case_sensitive:
+        return _match_values(series, lambda v: v.endswith(suffix))
+    needle = suffix.lower()
+    return _match_values(series, lambda v: v.lower().endswith(needle))
+
+
+def str_matches_regex(series: pd.Series, pattern: str) -> pd.Series:
+    return _match_values(series, compile_pattern(pattern).search)
+
+
+def str_has_any(series: pd.Series, terms: List[str]) -> pd.Series:
+    return _match_values(series, compile_multi_pattern(tuple(terms), True).search)
+
+
+def str_contains_any(series: pd.Series, terms: List[str]) -> pd.Series:
+    return _match_values(series, compile_multi_pattern(tuple(terms), False).search)
+
+
+def str_in_ci(series: pd.Series, values: List[Any]) -> pd.Series:
+    lowered = frozenset(str(v).lower() for v in values)
+    return _match_values(series, lambda v: v.lower() in lowered)
+
+
+# ─── Where Predicates ────────────────────────────────────────────────────────
+
+_TOKEN_RE = re.compile(
+    r"""\s*(?:
+        (?P<string>@?"(?:[^"\\]|\\.)*"|@?'(?:[^'\\]|\\.)*')
+      | (?P<timespan>\d+(?:\.\d+)?(?:ms|d|h|m|s)\b)
+      | (?P<number>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+      | (?P<op>==|!=|=~|!~|<=|>=|<|>|\.\.|\(|\)|,)
+      | (?P<word>!?[A-Za-z_]\w*~?)
+    )""",
+    re.VERBOSE,
+)
+
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "\\": "\\", '"': '"', "'": "'"}
+
+# Operators written as words, mapped to their canonical name.
+_WORD_OPERATORS = {
+    "contains", "!contains", "contains_cs", "!contains_cs",
+    "has", "!has", "has_cs", "!has_cs",
+    "startswith", "!startswith", "startswith_cs", "!startswith_cs",
+    "endswith", "!endswith", "endswith_cs", "!endswith_cs",
+    "in", "!in", "in~", "!in~", "has_any", "contains_any",
+    "between", "!between", "matches",
+}
+_SYMBOL_OPERATORS = {"==", "!=", "=~", "!~", "<", "<=", ">", ">="}
+_NULL_FUNCTIONS = {"isempty", "isnotempty", "isnull", "isnotnull"}
+
+# Rough fraction of rows a predicate keeps when no statistics are available,
+# and its relative per-row cost. Used to order the terms of a conjunction.
+DEFAULT_SELECTIVITY = {
+    "==": 0.1, "=~": 0.1, "in": 0.1, "in~": 0.1, "has_any": 0.2, "contains_any": 0.2,
+    "!=": 0.9, "!~": 0.9, "!in": 0.9, "!in~": 0.9,
+    "<": 0.33, "<=": 0.33, ">": 0.33, ">=": 0.33, "between": 0.25, "!between": 0.75,
+    "isempty": 0.1, "isnull": 0.1, "isnotempty": 0.9, "isnotnull": 0.9,
+}
+PREDICATE_COST = {
+    "==": 1, "!=": 1, "<": 1, "<=": 1, ">": 1, ">=": 1, "between": 2, "!between": 2,
+    "in": 2, "!in": 2, "isnull": 1, "isnotnull": 1, "isempty": 2, "isnotempty": 2,
+    "matches": 20, "has_any": 15, "contains_any": 15,
+}
+_STRING_COST, _STRING_SELECTIVITY = 8, 0.5
+
+
+@dataclass
+class Predicate:
+    """One comparison: column/value operands joined by a KQL operator."""
+    op: str
+    left: tuple
+    right: Optional[tuple] = None
+
+    @property
+    def columns(self) -> List[str]:
+        operands = [self.left]
+        if self.right is not None:
+            operands.extend(self.right[1] if self.right[0] == "list" else
+                            self.right[1:] if self.right[0] == "range" else [self.right])
+        return [o[1] for o in operands if o[0] == "col"]
+
+
+@dataclass
+class BoolExpr:
+    """and / or / not over predicates."""
+    kind: str
+    children: List[Any] = field(default_factory=list)
+
+
+def _unquote(token: str) -> str:
+    if token.startswith("@"):
+        return token[2:-1]
+    return re.sub(r"\\(.)", lambda m: _ESCAPES.get(m.group(1), "\\" + m.group(1)), token[1:-1])
+
+
+def _tokenize(condition: str) -> List[Tuple[str, str]]:
+    # datetime() arguments are free text in KQL, so quote them up front.
+    condition = re.sub(r"datetime\(\s*([^)'\"]+?)\s*\)", r'datetime("\1")', condition)
+    tokens, pos = [], 0
+    condition = condition.rstrip()
+    while pos < len(condition):
+        match = _TOKEN_RE.match(condition, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"Unexpected input at '{condition[pos:].strip()[:20]}'")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        pos = match.end()
+    return tokens
+
+
+class _WhereParser:
+    """Recursive-descent parser for the boolean expression of a where clause."""
+
+    def __init__(self, condition: str):
+        self.tokens = _tokenize(condition)
+        self.pos = 0
+
+    def parse(self):
+        node = self._or()
+        if self.pos != len(self.tokens):
+            raise ValueError(f"Unexpected token '{self.tokens[self.pos][1]}'")
+        return node
+
+    def _peek(self) -> Tuple[Optional[str], Optional[str]]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _next(self) -> Tuple[str, str]:
+        if self.pos >= len(self.tokens):
+            raise ValueError("Unexpected end of where clause")
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def _expect(self, value: str):
+        kind, text = self._next()
+        if text.lower() != value:
+            raise ValueError(f"Expected '{value}' but found '{text}'")
+
+    def _keyword(self, word: str) -> bool:
+        kind, text = self._peek()
+        if kind == "word" and text.lower() == word:
+            self.pos += 1
+            return True
+        return False
+
+    def _or(self):
+        children = [self._and()]
+        while self._keyword("or"):
+            children.append(self._and())
+        return children[0] if len(children) == 1 else BoolExpr("or", children)
+
+    def _and(self):
+        children = [self._unary()]
+        while self._keyword("and"):
+            children.append(self._unary())
+        return children[0] if len(children) == 1 else BoolExpr("and", children)
+
+    def _unary(self):
+        if self._keyword("not"):
+            return BoolExpr("not", [self._unary()])
+        kind, text = self._peek()
+        if text == "(":
+            self._next()
+            node = self._or()
+            self._expect(")")
+            return node
+        if kind == "word" and text.lower() in _NULL_FUNCTIONS:
+            self._next()
+            self._expect("(")
+            operand = self._operand()
+            self._expect(")")
+            return Predicate(text.lower(), operand)
+        return self._comparison()
+
+    def _comparison(self) -> Predicate:
+        left = self._operand()
+        kind, text = self._next()
+        op = text.lower()
+        if kind == "op" and op in _SYMBOL_OPERATORS:
+            return Predicate(op, left, self._operand())
+        if kind != "word" or op not in _WORD_OPERATORS:
+            raise ValueError(f"Unsupported operator '{text}'")
+        if op == "matches":
+            self._expect("regex")
+            return Predicate(op, left, self._operand())
+        if op in ("in", "!in", "in~", "!in~", "has_any", "contains_any"):
+            return Predicate(op, left, ("list", self._list()))
+        if op in ("between", "!between"):
+            self._expect("(")
+            low = self._operand()
+            self._expect("..")
+            high = self._operand()
+            self._expect(")")
+            return Predicate(op, left, ("range", low, high))
+        return Predicate(op, left, self._operand())
+
+    def _list(self) -> List[tuple]:
+        self._expect("(")
+        items = []
+        while True:
+            items.append(self._operand())
+            kind, text = self._next()
+            if text == ")":
+                return items
+            if text != ",":
+                raise ValueError(f"Expected ',' or ')' but found '{text}'")
+
+    def _operand(self) -> tuple:
+        kind, text = self._next()
+        if kind == "string":
+            return ("lit", _unquote(text))
+        if kind == "number":
+            return ("lit", float(text) if re.search(r"[.eE]", text) else int(text))
+        if kind == "timespan":
+            return ("lit", pd.Timedelta(_parse_timespan(text)))
+        if kind == "word":
+            lower = text.lower()
+            if lower in ("true", "false"):
+                return ("lit", lower == "true")
+            if self._peek()[1] == "(":
+                return self._call(lower)
+            return ("col", text)
+        raise ValueError(f"Unexpected token '{text}'")
+
+    def _call(self, name: str) -> tuple:
+        self._expect("(")
+        args = []
+        if self._peek()[1] != ")":
+            args.append(self._operand())
+            while self._peek()[1] == ",":
+                self._next()
+                args.append(self._operand())
+        self._expect(")")
+        if name == "ago" and len(args) == 1:
+            return ("call", "ago", args[0][1])
+        if name == "now" and not args:
+            return ("call", "now", None)
+        if name in ("datetime", "todatetime") and len(args) == 1:
+            return ("lit", _to_timestamp(args[0][1]))
+        raise ValueError(f"Unsupported function '{name}()' in where clause")
+
+
+@lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def parse_where(condition: str):
+    """Parse a where condition into a tree of BoolExpr and Predicate nodes."""
+    return _WhereParser(condition).parse()
+
+
+def _to_timestamp(value: Any) -> pd.Timestamp:
+    ts = pd.Timestamp(value)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts
+
+
+def _resolve(operand: tuple, df: pd.DataFrame) -> Any:
+    kind = operand[0]
+    if kind == "col":
+        if operand[1] not in df.columns:
+            raise ValueError(f"Column '{operand[1]}' not found")
+        return df[operand[1]]
+    if kind == "call":
+        now_ts = pd.Timestamp.now(tz="UTC")
+        return now_ts if operand[1] == "now" else now_ts - operand[2]
+    return operand[1]
+
+
+def _coerce(value: Any, series: pd.Series) -> Any:
+    """Convert a literal to the type of the column it is compared with."""
+    if isinstance(value, pd.Series):
+        return value
+    dtype = series.dtype
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        ts = _to_timestamp(value)
+        return ts if getattr(dtype, "tz", None) is not None else ts.tz_localize(None)
+    if pd.api.types.is_bool_dtype(dtype):
+        return value if isinstance(value, bool) else str(value).lower() == "true"
+    if pd.api.types.is_numeric_dtype(dtype):
+        if isinstance(value, str):
+            try:
+                return float(value)
+            except ValueError:
+                raise ValueError(f"Cannot compare numeric column '{series.name}' with '{value}'")
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return value
+
+
+_STRING_PREDICATES = {
+    "contains": str_contains,
+    "has": str_has,
+    "startswith": str_startswith,
+    "endswith": str_endswith,
+}
+
+
+def _string_predicate(op: str, series: pd.Series, value: str) -> np.ndarray:
+    negate = op.startswith("!")
+    base = op.lstrip("!")
+    case_sensitive = base.endswith("_cs")
+    mask = _STRING_PREDICATES[base.replace("_cs", "")](series, value, case_sensitive).to_numpy()
+    return ~mask if negate else mask
+
+
+def _eval_predicate(node: Predicate, df: pd.DataFrame) -> np.ndarray:
+    op = node.op
+    left = _resolve(node.left, df)
+    if not isinstance(left, pd.Series):
+        raise ValueError(f"Left side of '{op}' must be a column")
+
+    if op in _NULL_FUNCTIONS:
+        empty = left.isna() | (left.astype(str) == "") if op.endswith("empty") else left.isna()
+        return (~empty if "not" in op else empty).to_numpy()
+
+    if node.right[0] == "list":
+        values = [_resolve(item, df) for item in node.right[1]]
+        if op in ("has_any", "contains_any"):
+            match_any = str_has_any if op == "has_any" else str_contains_any
+            return match_any(left, [str(v) for v in values]).to_numpy()
+        if op in ("in~", "!in~"):
+            mask = str_in_ci(left, values).to_numpy()
+        else:
+            mask = left.isin({_coerce(v, left) for v in values}).to_numpy()
+        return ~mask if op.startswith("!") else mask
+
+    if node.right[0] == "range":
+        low = _coerce(_resolve(node.right[1], df), left)
+        high = _resolve(node.right[2], df)
+        # "between (start .. 1h)" means an interval relative to the start.
+        high = low + high if isinstance(high, pd.Timedelta) and not isinstance(low, pd.Timedelta) else _coerce(high, left)
+        mask = ((left >= low) & (left <= high)).fillna(False).to_numpy(dtype=bool)
+        return ~mask if op == "!between" else mask
+
+    right = _resolve(node.right, df)
+    if op == "matches":
+        return str_matches_regex(left, str(right)).to_numpy()
+    if op in ("=~", "!~"):
+        mask = str_in_ci(left, [right]).to_numpy()
+        return ~mask if op == "!~" else mask
+    if op not in _SYMBOL_OPERATORS:
+        return _string_predicate(op, left, str(right))
+
+    right = _coerce(right, left)
+    result = {
+        "==": lambda: left == right,
+        "!=": lambda: left != right,
+        "<": lambda: left < right,
+        "<=": lambda: left <= right,
+        ">": lambda: left > right,
+        ">=": lambda: left >= right,
+    }[op]()
+    return result.fillna(op == "!=").to_numpy(dtype=bool)
+
+
+def estimate_selectivity(node, stats: Optional[TableStats] = None) -> float:
+    """
+    Estimated fraction of rows a predicate tree keeps. Column statistics
+    are used when available, otherwise fixed per-operator defaults.
+    """
+    if isinstance(node, BoolExpr):
+        parts = [estimate_selectivity(c, stats) for c in node.children]
+        if node.kind == "not":
+            return 1.0 - parts[0]
+        if node.kind == "and":
+            return float(np.prod(parts))
+        return min(1.0, sum(parts))
+
+    column = stats.columns.get(node.left[1]) if stats is not None and node.left[0] == "col" else None
+    if column is not None:
+        estimate = _column_selectivity(node, column)
+        if estimate is not None:
+            return estimate
+    if node.op == "in" and node.right is not None:
+        return min(1.0, DEFAULT_SELECTIVITY["in"] * len(node.right[1]))
+    return DEFAULT_SELECTIVITY.get(node.op, _STRING_SELECTIVITY)
+
+
+def _column_selectivity(node: Predicate, column) -> Optional[float]:
+    op, right = node.op, node.right
+    if op in ("isnull", "isempty"):
+        return column.null_fraction
+    if op in ("isnotnull", "isnotempty"):
+        return 1.0 - column.null_fraction
+    if right is None:
+        return None
+    if right[0] == "lit" and op in ("==", "!="):
+        equal = column.frequency(right[1])
+        return equal if op == "==" else 1.0 - equal
+    if right[0] == "list" and op in ("in", "!in"):
+        literals = [item[1] for item in right[1] if item[0] == "lit"]
+        equal = min(1.0, sum(column.frequency(v) for v in literals))
+        return equal if op == "in" else 1.0 - equal
+    if right[0] in ("lit", "call") and op in ("<", "<=", ">", ">="):
+        value = _resolve(right, None)
+        if column.dtype == "datetime":
+            value = _to_timestamp(value)
+        return column.range_fraction(op, value)
+    return None
+
+
+def estimate_cost(node) -> float:
+    """Relative per-row cost of evaluating a predicate tree."""
+    if isinstance(node, BoolExpr):
+        return sum(estimate_cost(c) for c in node.children)
+    return PREDICATE_COST.get(node.op, _STRING_COST)
+
+
+def order_conjuncts(children: List[Any], stats: Optional[TableStats] = None) -> List[Any]:
+    """
+    Order the terms of an and so that cheap, selective filters run first.
+    Ranking by cost / (1 - selectivity) minimises the expected work when
+    each term only sees the rows that survived the previous ones.
+    """
+    def rank(node) -> float:
+        return estimate_cost(node) / max(1e-6, 1.0 - estimate_selectivity(node, stats))
+
+    return sorted(children, key=rank)
+
+
+def _node_columns(node) -> List[str]:
+    if isinstance(node, Predicate):
+        return node.columns
+    return list(dict.fromkeys(c for child in node.children for c in _node_columns(child)))
+
+
+def eval_where(node, df: pd.DataFrame, stats: Optional[TableStats] = None) -> np.ndarray:
+    """Evaluate a parsed where tree to a boolean mask over df."""
+    if isinstance(node, Predicate):
+        return _eval_predicate(node, df)
+    if node.kind == "not":
+        return ~eval_where(node.children[0], df, stats)
+    if node.kind == "or":
+        mask = np.zeros(len(df), dtype=bool)
+        for child in node.children:
+            mask |= eval_where(child, df, stats)
+        return mask
+
+    # and: evaluate each term only on the rows that are still alive.
+    alive = np.arange(len(df))
+    for child in order_conjuncts(node.children, stats):
+        subset = df if len(alive) == len(df) else df[_node_columns(child)].iloc[alive]
+        alive = alive[eval_where(child, subset, stats)]
+        if not len(alive):
+            break
+    mask = np.zeros(len(df), dtype=bool)
+    mask[alive] = True
+    return mask
+
+
+def operator_name(stage: str) -> str:
+    """Canonical operator name of a pipeline stage, e.g. 'order by'."""
+    words = stage.strip().lower().split()
+    if not words:
+        return ""
+    if words[0] in ("order", "sort") and len(words) > 1 and words[1] == "by":
+        return "order by"
+    return words[0]
+
+
+# ─── Joins & Schema ──────────────────────────────────────────────────────────
+
+JOIN_KINDS = {
+    "inner", "innerunique", "leftouter", "rightouter", "fullouter",
+    "leftsemi", "leftanti", "rightsemi", "rightanti",
+}
+
+_CLR_TYPES = {
+    "string": "System.String",
+    "long": "System.Int64",
+    "real": "System.Double",
+    "datetime": "System.DateTime",
+    "bool": "System.SByte",
+    "timespan": "System.TimeSpan",
+}
+
+
+def _parse_join_keys(on_clause: str) -> Tuple[List[str], List[str]]:
+    left_keys, right_keys = [], []
+    for part in on_clause.split(","):
+        part = part.strip()
+        pair = re.match(r"\$left\.(\w+)\s*==\s*\$right\.(\w+)$", part, re.IGNORECASE)
+        if pair:
+            left_keys.append(pair.group(1))
+            right_keys.append(pair.group(2))
+        elif re.match(r"^\w+$", part):
+            left_keys.append(part)
+            right_keys.append(part)
+        else:
+            raise ValueError(f"Unsupported join condition: '{part}'")
+    return left_keys, right_keys
+
+
+def _key_mask(frame: pd.DataFrame, keys: List[str], other: pd.DataFrame, other_keys: List[str]) -> np.ndarray:
+    """Rows of frame whose join key appears in other (a hash semi-join)."""
+    if len(keys) == 1:
+        return frame[keys[0]].isin(pd.unique(other[other_keys[0]])).to_numpy()
+    wanted = pd.MultiIndex.from_frame(other[other_keys].drop_duplicates())
+    return pd.MultiIndex.from_frame(frame[keys]).isin(wanted)
+
+
+def _schema_frame(columns: List[Tuple[str, str]]) -> pd.DataFrame:
+    return pd.DataFrame({
+        "ColumnName": [name for name, _ in columns],
+        "ColumnOrdinal": list(range(len(columns))),
+        "DataType": [_CLR_TYPES.get(kql, "System.Object") for _, kql in columns],
+        "ColumnType": [kql for _, kql in columns],
+    })
+
+
 # ─── KQL Executor ────────────────────────────────────────────────────────────
 
 class KQLExecutor:
@@ -120,16 +946,24 @@ class KQLExecutor:
         self.registry = registry
 
     def execute(self, query: str) -> KQLResult:
-        import time
         start = time.perf_counter()
+        profile: List[Dict[str, Any]] = []
+        token = _current_profile.set(profile)
 
         try:
             result_df = self._run_pipeline(query.strip())
             elapsed = (time.perf_counter() - start) * 1000
-            return KQLResult.from_dataframe(result_df, elapsed)
+            KQL_QUERY_DURATION.observe(elapsed / 1000, status="ok")
+            KQL_ROWS_RETURNED.inc(len(result_df))
+            result = KQLResult.from_dataframe(result_df, elapsed)
         except Exception as exc:
             elapsed = (time.perf_counter() - start) * 1000
-            return KQLResult.error_result(str(exc))
+            KQL_QUERY_DURATION.observe(elapsed / 1000, status="error")
+            result = KQLResult.error_result(str(exc), elapsed)
+        finally:
+            _current_profile.reset(token)
+        result.profile = profile
+        return result
 
     def _run_pipeline(self, query: str) -> pd.DataFrame:
         # Split on pipe operator (skip pipes inside strings/parentheses)
@@ -139,12 +973,49 @@ class KQLExecutor:
 
         # First stage must be a table name or union
         first = stages[0].strip()
+        stats = self.registry.stats(first)
+        start = time.perf_counter()
+        if stats is not None:
+            answer = self._answer_from_metadata(stats, stages[1:])
+            if answer is not None:
+                _record_stage("metadata", " | ".join(stages), start, len(answer))
+                return answer
+
         df = self._load_source(first)
+        _record_stage("source", first, start, len(df))
+        return self._apply_stages(df, stages[1:], stats)
 
-        # Apply each subsequent stage
-        for stage in stages[1:]:
-            df = self._apply_operator(df, stage.strip())
+    def _answer_from_metadata(self, stats: TableStats, stages: List[str]) -> Optional[pd.DataFrame]:
+        """Answer `T | count`, `T | getschema` and `T | summarize count()` from table statistics."""
+        if len(stages) != 1:
+            return None
+        stage = stages[0].strip()
+        lower = stage.lower()
+        if lower == "count":
+            return pd.DataFrame({"Count": [stats.row_count]})
+        if lower == "getschema":
+            return _schema_frame(stats.schema())
+        if lower.startswith("summarize "):
+            group_cols, agg_exprs = parse_summarize(stage[10:])
+            if agg_exprs and not group_cols and all(col == "__count__" for col, _ in agg_exprs.values()):
+                return pd.DataFrame({alias: [stats.row_count] for alias in agg_exprs})
+        return None
 
+    def _apply_stages(self, df: pd.DataFrame, stages: List[str], stats: Optional[TableStats] = None) -> pd.DataFrame:
+        """
+        Apply each operator stage to the DataFrame in sequence. Source table
+        stats only describe the frame up to its first reshaping stage, so only
+        the leading where stages get them.
+        """
+        for stage in stages:
+            stage = stage.strip()
+            start = time.perf_counter()
+            name = operator_name(stage)
+            if name != "where":
+                stats = None
+            df = self._apply_operator(df, stage, stats)
+            KQL_OPERATOR_DURATION.observe(time.perf_counter() - start, operator=name)
+            _record_stage(name, stage, start, len(df))
         return df
 
     def _load_source(self, source: str) -> pd.DataFrame:
@@ -160,13 +1031,14 @@ class KQLExecutor:
         df = self.registry.get(name)
         if df is None:
             raise ValueError(f"Table '{name}' not found. Available: {self.registry.list_tables()}")
+        KQL_ROWS_SCANNED.inc(len(df), table=name)
         return df.copy()
 
-    def _apply_operator(self, df: pd.DataFrame, stage: str) -> pd.DataFrame:
+    def _apply_operator(self, df: pd.DataFrame, stage: str, stats: Optional[TableStats] = None) -> pd.DataFrame:
         lower = stage.lower()
 
         if lower.startswith("where "):
-            return self._op_where(df, stage[6:])
+            return self._op_where(df, stage[6:], stats)
         elif lower.startswith("project "):
             return self._op_project(df, stage[8:])
         elif lower.startswith("extend "):
@@ -186,38 +1058,20 @@ class KQLExecutor:
         elif lower.startswith("distinct "):
             cols = [c.strip() for c in stage[9:].split(",")]
             return df[cols].drop_duplicates()
+        elif lower == "getschema":
+            return _schema_frame([(str(c), kql_type(df[c].dtype)) for c in df.columns])
+        elif lower.startswith("join ") or lower.startswith("join("):
+            return self._op_join(df, stage[4:])
         else:
             raise ValueError(f"Unsupported KQL operator: '{stage.split()[0]}'")
 
-    def _op_where(self, df: pd.DataFrame, condition: str) -> pd.DataFrame:
-        """Apply a where filter. Translates KQL conditions to pandas."""
-        # Translate KQL operators to pandas-friendly expressions
-        cond = condition.strip()
-
-        # Handle 'ago()' time comparisons
-        cond = re.sub(
-            r"ago\((\w+)\)",
-            lambda m: f'pd.Timestamp.now(tz="UTC") - pd.Timedelta("{_parse_timespan(m.group(1))}")',
-            cond,
-        )
-
-        # KQL string operators → Python
-        cond = re.sub(r"(\w+)\s+contains\s+['\"](.+?)['\"]", r"df['\1'].str.contains('\2', case=False, na=False)", cond)
-        cond = re.sub(r"(\w+)\s+startswith\s+['\"](.+?)['\"]", r"df['\1'].str.startswith('\2', na=False)", cond)
-        cond = re.sub(r"(\w+)\s+has\s+['\"](.+?)['\"]", r"df['\1'].str.contains(r'\\b\2\\b', case=False, na=False)", cond)
-
-        # Replace == with pandas-safe equals
-        cond = re.sub(r"(\w+)\s*==\s*['\"](.+?)['\"]", r"(df['\1'] == '\2')", cond)
-        cond = re.sub(r"(\w+)\s*!=\s*['\"](.+?)['\"]", r"(df['\1'] != '\2')", cond)
-        cond = re.sub(r"\band\b", "&", cond)
-        cond = re.sub(r"\bor\b", "|", cond)
-        cond = re.sub(r"\bnot\b", "~", cond)
-
+    def _op_where(self, df: pd.DataFrame, condition: str, stats: Optional[TableStats] = None) -> pd.DataFrame:
+        """Apply a where filter, evaluating the parsed condition with vectorized masks."""
         try:
-            mask = eval(cond, {"df": df, "pd": pd, "np": np})  # noqa: S307
-            return df[mask].reset_index(drop=True)
+            mask = eval_where(parse_where(condition.strip()), df, stats)
         except Exception as exc:
             raise ValueError(f"Error in where clause '{condition}': {exc}") from exc
+        return df[mask].reset_index(drop=True)
 
     def _op_project(self, df: pd.DataFrame, cols_str: str) -> pd.DataFrame:
         """Select (and optionally rename) columns."""
@@ -248,40 +1102,12 @@ class KQLExecutor:
 
     def _op_summarize(self, df: pd.DataFrame, expr_str: str) -> pd.DataFrame:
         """Aggregation: summarize count() by Column"""
-        by_match = re.search(r"\bby\b(.+)$", expr_str, re.IGNORECASE)
-        group_cols = []
-        if by_match:
-            group_cols = [c.strip() for c in by_match.group(1).split(",")]
-            agg_str = expr_str[: by_match.start()].strip()
-        else:
-            agg_str = expr_str.strip()
-
-        agg_exprs = {}
-        for part in agg_str.split(","):
-            part = part.strip()
-            alias_match = re.match(r"(\w+)\s*=\s*(.+)", part)
-            if alias_match:
-                alias, func = alias_match.group(1), alias_match.group(2).strip()
-            else:
-                alias, func = part, part
-
-            if re.match(r"count\(\)", func, re.IGNORECASE):
-                agg_exprs[alias] = ("__count__", "count")
-            elif m := re.match(r"sum\((\w+)\)", func, re.IGNORECASE):
-                agg_exprs[alias] = (m.group(1), "sum")
-            elif m := re.match(r"avg\((\w+)\)", func, re.IGNORECASE):
-                agg_exprs[alias] = (m.group(1), "mean")
-            elif m := re.match(r"min\((\w+)\)", func, re.IGNORECASE):
-                agg_exprs[alias] = (m.group(1), "min")
-            elif m := re.match(r"max\((\w+)\)", func, re.IGNORECASE):
-                agg_exprs[alias] = (m.group(1), "max")
-            elif m := re.match(r"dcount\((\w+)\)", func, re.IGNORECASE):
-                agg_exprs[alias] = (m.group(1), "nunique")
+        group_cols, agg_exprs = parse_summarize(expr_str)
 
         if group_cols:
             grouped = df.groupby(group_cols)
         else:
-            df["__all__"] = 1
+            df = df.assign(__all__=1)
             grouped = df.groupby("__all__")
 
         result_parts = {}
@@ -296,6 +1122,48 @@ class KQLExecutor:
             result = result.drop(columns=["__all__"], errors="ignore")
         return result
 
+    def _op_join(self, left: pd.DataFrame, expr_str: str) -> pd.DataFrame:
+        """join [kind=...] (subquery) on Key | $left.A == $right.B"""
+        match = re.match(
+            r"\s*(?:kind\s*=\s*(\w+)\s*)?(?:\((.*)\)|(\w+))\s+on\s+(.+)$", expr_str, re.IGNORECASE | re.DOTALL
+        )
+        if not match:
+            raise ValueError(f"Cannot parse join: '{expr_str.strip()}'")
+        kind = (match.group(1) or "innerunique").lower()
+        if kind not in JOIN_KINDS:
+            raise ValueError(f"Unsupported join kind '{kind}'. Supported: {sorted(JOIN_KINDS)}")
+        right = self._run_pipeline((match.group(2) or match.group(3)).strip())
+        left_keys, right_keys = _parse_join_keys(match.group(4))
+        for frame, keys, side in ((left, left_keys, "left"), (right, right_keys, "right")):
+            missing = [k for k in keys if k not in frame.columns]
+            if missing:
+                raise ValueError(f"Join key {missing} not found on the {side} side")
+
+        if kind == "innerunique":
+            left = left.drop_duplicates(subset=left_keys)
+            kind = "inner"
+        if kind in ("leftsemi", "leftanti"):
+            mask = _key_mask(left, left_keys, right, right_keys)
+            return left[mask if kind == "leftsemi" else ~mask].reset_index(drop=True)
+        if kind in ("rightsemi", "rightanti"):
+            mask = _key_mask(right, right_keys, left, left_keys)
+            return right[mask if kind == "rightsemi" else ~mask].reset_index(drop=True)
+
+        if kind == "inner":
+            # Hash the smaller input's keys and drop probe-side rows that
+            # cannot match before the merge materialises anything.
+            if len(left) >= len(right):
+                left = left[_key_mask(left, left_keys, right, right_keys)]
+            else:
+                right = right[_key_mask(right, right_keys, left, left_keys)]
+
+        how = {"inner": "inner", "leftouter": "left", "rightouter": "right", "fullouter": "outer"}[kind]
+        if left_keys == right_keys:
+            result = left.merge(right, on=left_keys, how=how, suffixes=("", "1"))
+        else:
+            result = left.merge(right, left_on=left_keys, right_on=right_keys, how=how, suffixes=("", "1"))
+        return result.reset_index(drop=True)
+
     def _op_orderby(self, df: pd.DataFrame, expr_str: str) -> pd.DataFrame:
         cols, ascending = [], []
         for part in expr_str.split(","):
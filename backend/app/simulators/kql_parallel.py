@@ -0,0 +1,264 @@
+"""
+Parallel KQL Execution
+----------------------
+Runs the partition-friendly prefix of a KQL pipeline across a pool of
+worker processes and merges the partial results on the coordinator.
+
+The pushed-down prefix is any run of leading where / extend / project
+stages, optionally followed by a summarize. Workers evaluate the prefix
+against their own row range and return either the filtered rows or a
+partial aggregate; the coordinator concatenates or re-aggregates them and
+applies the remaining stages serially.
+
+Tables are shared rather than pickled: the pool is forked after the
+tables are handed to it, so each worker reads the parent's DataFrames
+copy-on-write and only (table, start, stop) tuples cross the process
+boundary. This needs the "fork" start method; where it is unavailable
+the executor falls back to serial execution.
+
+The workers are long-lived and keep the snapshot they were forked with.
+Tables that live telemetry keeps appending to and trimming are followed
+through the registry's row spans: the workers scan the part of their
+snapshot that is still in the table, and the coordinator scans the rows
+appended since the fork itself, alongside them. The pool is only forked
+again once a table is replaced, or once more than partition_rows rows
+have arrived since the fork.
+"""
+
+import math
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from app.simulators.kql_engine import KQL_ROWS_SCANNED, KQLExecutor, TableRegistry, TableSpan, parse_summarize
+
+
+PUSHDOWN_OPERATORS = ("where ", "extend ", "project ")
+
+# Partial aggregates are re-aggregated with these functions when merging.
+_MERGE_AGGS = {"count": "sum", "sum": "sum", "min": "min", "max": "max"}
+
+
+# ─── Plan Splitting ──────────────────────────────────────────────────────────
+
+def split_pushdown(stages: List[str]) -> Tuple[List[str], Optional[str], List[str]]:
+    """
+    Split the operator stages of a pipeline into three parts:
+    the row-local prefix that can run on any partition, an optional
+    summarize clause that can be computed partially, and the rest.
+    """
+    pushdown = []
+    for i, stage in enumerate(stages):
+        lower = stage.strip().lower()
+        if lower.startswith(PUSHDOWN_OPERATORS):
+            pushdown.append(stage.strip())
+            continue
+        if lower.startswith("summarize "):
+            return pushdown, stage.strip()[10:], stages[i + 1:]
+        return pushdown, None, stages[i:]
+    return pushdown, None, []
+
+
+# ─── Partial Aggregation ─────────────────────────────────────────────────────
+
+def partial_summarize(df: pd.DataFrame, expr_str: str) -> Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]:
+    """
+    Compute the mergeable partial state of a summarize clause.
+
+    Returns a frame of per-group partial aggregates plus, for each dcount
+    alias, the distinct (group, value) pairs seen in this partition.
+    """
+    group_cols, agg_exprs = parse_summarize(expr_str)
+    keys = group_cols or ["__all__"]
+    if not group_cols:
+        df = df.assign(__all__=1)
+    grouped = df.groupby(keys)
+
+    parts = {"__rows__": grouped.size()}
+    distinct = {}
+    for alias, (col, agg) in agg_exprs.items():
+        if col == "__count__":
+            parts[f"{alias}__count"] = grouped.size()
+        elif agg == "mean":
+            parts[f"{alias}__sum"] = grouped[col].sum()
+            parts[f"{alias}__n"] = grouped[col].count()
+        elif agg == "nunique":
+            distinct[alias] = df[keys + [col]].drop_duplicates()
+        else:
+            parts[f"{alias}__{agg}"] = getattr(grouped[col], agg)()
+
+    return pd.DataFrame(parts).reset_index(), distinct
+
+
+def merge_partials(
+    partials: List[Tuple[pd.DataFrame, Dict[str, pd.DataFrame]]], expr_str: str
+) -> pd.DataFrame:
+    """Combine partial summarize states into the final summarize result."""
+    group_cols, agg_exprs = parse_summarize(expr_str)
+    keys = group_cols or ["__all__"]
+
+    frames = pd.concat([p[0] for p in partials], ignore_index=True)
+    merge_spec = {}
+    for column in frames.columns:
+        if column in keys:
+            continue
+        suffix = column.rsplit("__", 1)[-1]
+        merge_spec[column] = _MERGE_AGGS.get(suffix, "sum")
+    merged = frames.groupby(keys).agg(merge_spec)
+
+    result_parts = {}
+    for alias, (col, agg) in agg_exprs.items():
+        if col == "__count__":
+            result_parts[alias] = merged[f"{alias}__count"]
+        elif agg == "mean":
+            result_parts[alias] = merged[f"{alias}__sum"] / merged[f"{alias}__n"]
+        elif agg == "nunique":
+            distinct = pd.concat([p[1][alias] for p in partials], ignore_index=True)
+            counts = distinct.drop_duplicates().groupby(keys)[col].nunique()
+            result_parts[alias] = counts.reindex(merged.index, fill_value=0)
+        else:
+            result_parts[alias] = merged[f"{alias}__{agg}"]
+
+    result = pd.DataFrame(result_parts, index=merged.index).reset_index()
+    if not group_cols:
+        result = result.drop(columns=["__all__"], errors="ignore")
+    return result
+
+
+# ─── Worker Side ─────────────────────────────────────────────────────────────
+
+_worker_tables: Dict[str, pd.DataFrame] = {}
+
+
+def _init_worker(tables: Dict[str, pd.DataFrame]):
+    # With the fork start method the initargs are inherited, not pickled.
+    global _worker_tables
+    _worker_tables = tables
+
+
+def run_partition(df: pd.DataFrame, stages: List[str], summarize: Optional[str]):
+    """Evaluate a pushed-down plan against one partition of a table."""
+    df = KQLExecutor(TableRegistry())._apply_stages(df, stages)
+    if summarize is not None:
+        return partial_summarize(df, summarize)
+    return df
+
+
+def _run_worker_partition(table: str, start: int, stop: int, stages: List[str], summarize: Optional[str]):
+    return run_partition(_worker_tables[table].iloc[start:stop], stages, summarize)
+
+
+# ─── Parallel Executor ───────────────────────────────────────────────────────
+
+class ParallelKQLExecutor(KQLExecutor):
+    """
+    KQLExecutor that splits large tables into row partitions and runs the
+    pushed-down part of each query in a process pool.
+
+    Tables smaller than min_rows, union sources and pipelines with nothing
+    to push down are executed serially by the base class.
+    """
+
+    def __init__(
+        self,
+        registry: TableRegistry,
+        workers: int,
+        partition_rows: int = 500_000,
+        min_rows: int = 1_000_000,
+    ):
+        super().__init__(registry)
+        self.workers = workers
+        self.partition_rows = partition_rows
+        self.min_rows = min_rows
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_spans: Dict[str, TableSpan] = {}  # the rows each table had when the pool forked
+        self._pool_lock = threading.Lock()
+        self._fork_available = "fork" in multiprocessing.get_all_start_methods()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+            self._pool_spans = {}
+
+    def _run_pipeline(self, query: str) -> pd.DataFrame:
+        stages = self._split_pipeline(query)
+        if not stages:
+            raise ValueError("Empty query")
+
+        source = stages[0].strip()
+        pushdown, summarize, rest = split_pushdown(stages[1:])
+        submitted = None
+        if (
+            self._fork_available
+            and self.workers >= 2
+            and (pushdown or summarize is not None)
+            and source in self.registry.list_tables()
+        ):
+            submitted = self._submit(source, pushdown, summarize)
+        if submitted is None:
+            return super()._run_pipeline(query)
+
+        rows, futures, fresh = submitted
+        KQL_ROWS_SCANNED.inc(rows, table=source)
+        results = [run_partition(fresh, pushdown, summarize)] if len(fresh) or not futures else []
+        results = [f.result() for f in futures] + results
+
+        if summarize is not None:
+            df = merge_partials(results, summarize)
+        else:
+            df = pd.concat(results, ignore_index=True)
+        return self._apply_stages(df, rest)
+
+    def _partition_bounds(self, start: int, stop: int) -> List[Tuple[int, int]]:
+        total = stop - start
+        count = max(self.workers, math.ceil(total / self.partition_rows))
+        size = max(1, math.ceil(total / count))
+        return [(lo, min(lo + size, stop)) for lo in range(start, stop, size)]
+
+    def _submit(
+        self, source: str, pushdown: List[str], summarize: Optional[str]
+    ) -> Optional[Tuple[int, List[Future], pd.DataFrame]]:
+        """
+        Submit the worker partitions of a query on one snapshot of source,
+        forking the pool again if its copy is too stale. Returns the rows
+        scanned, the futures and the rows to scan here (those that arrived
+        after the fork); None when the table is too small to parallelize.
+        """
+        with self._pool_lock:
+            table, span = self.registry.snapshot(source)
+            if table is None or len(table) < self.min_rows:
+                return None
+            forked = self._pool_spans.get(source)
+            if (
+                self._pool is None
+                or forked is None
+                or forked.epoch != span.epoch
+                or span.dropped >= forked.appended
+                or span.appended - forked.appended > self.partition_rows
+            ):
+                # Queries still running on the old pool finish on it.
+                if self._pool is not None:
+                    self._pool.shutdown(wait=False)
+                tables, self._pool_spans = {source: table}, {source: span}
+                for name in self.registry.list_tables():
+                    if name != source and self.registry.is_loaded(name):
+                        tables[name], self._pool_spans[name] = self.registry.snapshot(name)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("fork"),
+                    initializer=_init_worker,
+                    initargs=(tables,),
+                )
+                forked = span
+            # Workers scan what is left of their snapshot; rows that arrived
+            # after the fork are scanned here while they run.
+            start = max(span.dropped, forked.dropped) - forked.dropped
+            futures = [
+                self._pool.submit(_run_worker_partition, source, lo, hi, pushdown, summarize)
+                for lo, hi in self._partition_bounds(start, forked.appended - forked.dropped)
+            ]
+        return len(table), futures, table.iloc[max(0, forked.appended - span.dropped):]
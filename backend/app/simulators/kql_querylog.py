@@ -0,0 +1,178 @@
+"""
+KQL Query Log
+-------------
+Groups executed queries by fingerprint and keeps a bounded log of the
+slow ones.
+
+A fingerprint is the query with every literal (strings, numbers,
+timespans, datetimes, in-lists) replaced by a placeholder and whitespace
+normalised, so `where EventID == 4625` and `where EventID == 4624` land in
+the same bucket. Each fingerprint keeps its call count, total time and a
+window of recent latencies for percentiles; queries over the slow
+threshold are also kept in full, with their per-stage profile, and can be
+appended to a JSONL file for replay against the benchmark suite.
+"""
+
+import hashlib
+import json
+import re
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+
+import numpy as np
+
+from app.simulators.kql_engine import KQLResult
+
+
+LATENCY_WINDOW = 256
+
+_FINGERPRINT_TOKEN_RE = re.compile(
+    r"""\s*(?:
+        (?P<datetime>datetime\s*\([^)]*\))
+      | (?P<string>@?"(?:[^"\\]|\\.)*"|@?'(?:[^'\\]|\\.)*')
+      | (?P<timespan>\d+(?:\.\d+)?(?:ms|d|h|m|s)\b)
+      | (?P<number>\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+      | (?P<word>[A-Za-z_$][\w.$-]*~?)
+      | (?P<op>==|!=|=~|!~|<=|>=|\.\.|\S)
+    )""",
+    re.VERBOSE | re.IGNORECASE,
+)
+
+# A parenthesised run of placeholders, e.g. an in (...) list.
+_PLACEHOLDER_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+def normalize_query(query: str) -> str:
+    """The query text with literals replaced by '?' and whitespace collapsed."""
+    tokens, pos = [], 0
+    while pos < len(query):
+        match = _FINGERPRINT_TOKEN_RE.match(query, pos)
+        if not match or match.end() == pos:
+            break
+        kind = match.lastgroup
+        if kind == "datetime":
+            tokens.append("datetime(?)")
+        elif kind in ("string", "timespan", "number"):
+            tokens.append("?")
+        else:
+            tokens.append(match.group(kind))
+        pos = match.end()
+    text = " ".join(tokens)
+    return _PLACEHOLDER_LIST_RE.sub("(?+)", text)
+
+
+def fingerprint(query: str) -> str:
+    return hashlib.sha1(normalize_query(query).encode()).hexdigest()[:16]
+
+
+class _FingerprintStats:
+    __slots__ = ("normalized", "count", "errors", "total_ms", "max_ms", "latencies", "last_seen")
+
+    def __init__(self, normalized: str):
+        self.normalized = normalized
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.last_seen = ""
+
+    def to_dict(self, fp: str) -> Dict[str, Any]:
+        latencies = list(self.latencies)
+        return {
+            "fingerprint": fp,
+            "query": self.normalized,
+            "count": self.count,
+            "errors": self.errors,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3) if latencies else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "last_seen": self.last_seen,
+        }
+
+
+class QueryLog:
+    """Per-fingerprint aggregates plus a bounded log of slow queries."""
+
+    SORT_KEYS = ("total", "count", "p95")
+
+    def __init__(
+        self,
+        slow_threshold_ms: float = 250.0,
+        capacity: int = 500,
+        max_fingerprints: int = 1000,
+        sink_path: Optional[str] = None,
+    ):
+        self.slow_threshold_ms = slow_threshold_ms
+        self.max_fingerprints = max_fingerprints
+        self.sink_path = sink_path or None
+        self._slow: Deque[Dict[str, Any]] = deque(maxlen=capacity)
+        self._fingerprints: Dict[str, _FingerprintStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, query: str, result: KQLResult):
+        normalized = normalize_query(query)
+        fp = hashlib.sha1(normalized.encode()).hexdigest()[:16]
+        now = datetime.now(timezone.utc).isoformat()
+        elapsed = result.execution_time_ms
+        slow = elapsed >= self.slow_threshold_ms
+
+        with self._lock:
+            stats = self._fingerprints.get(fp)
+            if stats is None:
+                if len(self._fingerprints) >= self.max_fingerprints:
+                    # Forget the cheapest fingerprint to make room.
+                    cheapest = min(self._fingerprints, key=lambda k: self._fingerprints[k].total_ms)
+                    del self._fingerprints[cheapest]
+                stats = self._fingerprints[fp] = _FingerprintStats(normalized)
+            stats.count += 1
+            stats.errors += 1 if result.error else 0
+            stats.total_ms += elapsed
+            stats.max_ms = max(stats.max_ms, elapsed)
+            stats.latencies.append(elapsed)
+            stats.last_seen = now
+
+            if not slow:
+                return
+            entry = {
+                "time": now,
+                "fingerprint": fp,
+                "query": query,
+                "execution_time_ms": round(elapsed, 3),
+                "row_count": result.row_count,
+                "error": result.error,
+                "profile": result.profile,
+            }
+            self._slow.append(entry)
+            if self.sink_path:
+                with open(self.sink_path, "a") as fh:
+                    fh.write(json.dumps(entry, default=str) + "\n")
+
+    def slow_queries(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent slow queries, newest first."""
+        with self._lock:
+            entries = list(self._slow)
+        return entries[::-1][:limit]
+
+    def top(self, by: str = "total", limit: int = 10) -> List[Dict[str, Any]]:
+        if by not in self.SORT_KEYS:
+            raise ValueError(f"Unknown sort key '{by}'. Must be one of: {list(self.SORT_KEYS)}")
+        with self._lock:
+            rows = [stats.to_dict(fp) for fp, stats in self._fingerprints.items()]
+        field = {"total": "total_ms", "count": "count", "p95": "p95_ms"}[by]
+        rows.sort(key=lambda r: r[field], reverse=True)
+        return rows[:limit]
+
+
+def load_jsonl(path: str) -> List[Dict[str, Any]]:
+    """Read slow-query entries back from a JSONL sink file."""
+    entries = []
+    with open(path) as fh:
+        for line in fh:
+            line = line.strip()
+            if line:
+                entries.append(json.loads(line))
+    return entries
@@ -0,0 +1,581 @@
+"""
+Sharded KQL Execution
+---------------------
+Scatter-gather execution of KQL queries across shard worker processes
+that behave like separate nodes and talk to the coordinator over local
+sockets (multiprocessing.connection, authenticated with a shared key).
+Shards unpickle what they receive, so anyone holding the key can run code
+on them: there is no built-in key. Standalone shards and the coordinator
+read it from KQL_SHARD_AUTHKEY; local_shard_cluster() draws a random one.
+
+Shards hold their own partitions of each table. A table with a source
+(see generated_sources() and parquet_sources()) is built on the shards
+themselves: each generates its run of the table's seeded chunks, or reads
+its share of the table's Parquet day files, so the coordinator never
+ships the base rows. Other tables are shipped once as contiguous slices.
+After that the coordinator follows the registry's row span: rows appended
+since are sent to the least-loaded shard, and rows trimmed from the head
+are dropped on the shards holding them, so live telemetry costs one small
+message per batch rather than a re-ship.
+
+For a query the coordinator pushes down the row-local prefix (where /
+extend / project) plus either a partial summarize (a trailing count
+becomes one) or a per-shard top / order by / take / distinct, gathers the
+shard results and finishes the merge itself before running the remaining
+stages locally. Pipelines with nothing to push down run on the local
+executor, which answers count and getschema from table statistics.
+
+Placement (connecting shards, syncing a table's rows) is serialized; the
+scatter-gather itself is not. Each in-flight query borrows its own
+connection to every shard, so concurrent queries run on the shards at the
+same time. A query may see rows appended while it was in flight.
+
+A shard that stops answering is dropped: its partitions are rebuilt on
+the remaining shards and the query is retried. Dropped shards are
+reconnected every RECONNECT_SECONDS. With no shard left, queries fall
+back to the local executor.
+
+Start shards for local testing with local_shard_cluster(), or run them as
+standalone processes:
+
+    KQL_SHARD_AUTHKEY=... python -m app.simulators.kql_shards --shards 4 --port 9400
+"""
+
+import argparse
+import glob
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from app.core.metrics import metrics
+from app.simulators.kql_engine import KQL_ROWS_SCANNED, KQLExecutor, TableRegistry
+from app.simulators.kql_parallel import merge_partials, run_partition, split_pushdown
+from app.simulators.log_data import CHUNK_ROWS, generate_partition
+
+logger = logging.getLogger(__name__)
+
+SHARDS_LOST = metrics.counter("kql_shards_lost_total", "Shard servers dropped after failing to answer.")
+
+# Environment variable holding the key shards and coordinator share
+AUTHKEY_ENV = "KQL_SHARD_AUTHKEY"
+
+# Stages that are correct to apply per shard and again after gathering.
+SHARD_FINISHERS = ("top ", "order by ", "sort by ", "take ", "limit ", "distinct ")
+
+# Seconds between attempts to reconnect dropped shards
+RECONNECT_SECONDS = 5.0
+
+# Queries scattered at once per shard before further ones queue
+QUERY_CONCURRENCY = 8
+
+Address = Tuple[str, int]
+
+
+# ─── Table Sources ───────────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class GeneratedTable:
+    """A synthetic table whose shards generate their own runs of its seeded chunks."""
+
+    rows: int
+    seed: int
+    anchor: datetime
+    chunk_rows: int = CHUNK_ROWS
+
+    def partition(self, name: str, part: int, parts: int) -> pd.DataFrame:
+        return generate_partition(name, self.rows, part, parts, self.seed, self.anchor, self.chunk_rows)
+
+
+@dataclass(frozen=True)
+class ParquetTable:
+    """A table written by log_data.write_table(); each shard reads its share of the day files."""
+
+    directory: str
+
+    def partition(self, name: str, part: int, parts: int) -> pd.DataFrame:
+        import pyarrow.parquet as pq
+
+        paths = sorted(glob.glob(os.path.join(self.directory, "date=*", "*.parquet")))
+        if not paths:
+            raise ValueError(f"No Parquet files for table '{name}' under {self.directory}")
+        mine = paths[len(paths) * part // parts:len(paths) * (part + 1) // parts]
+        if not mine:
+            return pq.read_schema(paths[0]).empty_table().to_pandas()
+        return pd.concat([pd.read_parquet(p) for p in mine], ignore_index=True)
+
+
+TableSource = Union[GeneratedTable, ParquetTable]
+
+
+def generated_sources(
+    table_rows: Dict[str, int], seed: int, anchor: datetime, chunk_rows: int = CHUNK_ROWS
+) -> Dict[str, TableSource]:
+    """Sources matching a registry built by tables.build_registry() with the same seed and anchor."""
+    return {name: GeneratedTable(rows, seed, anchor, chunk_rows) for name, rows in table_rows.items()}
+
+
+def parquet_sources(out_dir: str) -> Dict[str, TableSource]:
+    """One source per table directory that log_data.write_table() created under out_dir."""
+    return {
+        name: ParquetTable(os.path.join(out_dir, name))
+        for name in sorted(os.listdir(out_dir))
+        if glob.glob(os.path.join(out_dir, name, "date=*"))
+    }
+
+
+# ─── Shard Server ────────────────────────────────────────────────────────────
+
+def _handle_connection(conn: Connection, tables: Dict[str, pd.DataFrame], lock: threading.Lock):
+    with conn:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                return
+            command = message[0]
+            try:
+                if command == "load":
+                    _, name, df = message
+                    with lock:
+                        tables[name] = df
+                    conn.send(("ok", len(df)))
+                elif command == "build":
+                    _, name, source, part, parts = message
+                    df = source.partition(name, part, parts)
+                    with lock:
+                        tables[name] = df
+                    conn.send(("ok", len(df)))
+                elif command == "append":
+                    _, name, df = message
+                    with lock:
+                        tables[name] = pd.concat([tables[name], df], ignore_index=True)
+                    conn.send(("ok", len(tables[name])))
+                elif command == "trim":
+                    _, name, rows = message
+                    with lock:
+                        tables[name] = tables[name].iloc[rows:].reset_index(drop=True)
+                    conn.send(("ok", len(tables[name])))
+                elif command == "run":
+                    _, name, stages, summarize = message
+                    df = tables.get(name)
+                    if df is None:
+                        raise ValueError(f"Table '{name}' is not loaded on this shard")
+                    conn.send(("ok", run_partition(df, stages, summarize)))
+                elif command == "tables":
+                    conn.send(("ok", {name: len(df) for name, df in tables.items()}))
+                elif command == "close":
+                    conn.send(("ok", None))
+                    return
+                else:
+                    raise ValueError(f"Unknown shard command: '{command}'")
+            except Exception as exc:
+                conn.send(("error", str(exc)))
+
+
+def serve_shard(address: Address, authkey: bytes, ready: Optional[Connection] = None):
+    """Serve one shard until the process is terminated."""
+    if not authkey:
+        raise ValueError("A KQL shard needs an authentication key")
+    tables: Dict[str, pd.DataFrame] = {}
+    lock = threading.Lock()
+    with Listener(address, authkey=authkey) as listener:
+        if ready is not None:
+            ready.send(listener.address)
+            ready.close()
+        while True:
+            try:
+                conn = listener.accept()
+            except (AuthenticationError, EOFError, OSError) as exc:
+                logger.warning("Refused KQL shard connection: %s", exc)
+                continue
+            threading.Thread(target=_handle_connection, args=(conn, tables, lock), daemon=True).start()
+
+
+@dataclass
+class LocalShardCluster:
+    """Shard processes started by local_shard_cluster()."""
+
+    addresses: List[Address]
+    processes: List[multiprocessing.Process]
+    authkey: bytes
+
+    def kill(self, index: int):
+        """Stop one shard abruptly, as if its node had died."""
+        self.processes[index].kill()
+        self.processes[index].join()
+
+
+@contextmanager
+def local_shard_cluster(shards: int, authkey: Optional[bytes] = None) -> Iterator[LocalShardCluster]:
+    """
+    Start N shard processes on ephemeral localhost ports, sharing authkey or
+    a random key (cluster.authkey). The processes are terminated when the
+    block exits.
+    """
+    cluster = LocalShardCluster([], [], authkey or os.urandom(32))
+    try:
+        for _ in range(shards):
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(
+                target=serve_shard, args=(("127.0.0.1", 0), cluster.authkey, sender), daemon=True
+            )
+            process.start()
+            sender.close()
+            cluster.addresses.append(tuple(receiver.recv()))
+            receiver.close()
+            cluster.processes.append(process)
+        yield cluster
+    finally:
+        for process in cluster.processes:
+            process.terminate()
+        for process in cluster.processes:
+            process.join()
+
+
+# ─── Coordinator ─────────────────────────────────────────────────────────────
+
+class _ShardLost(Exception):
+    """A shard stopped answering; placements were reset and the query should be retried."""
+
+
+@dataclass
+class _Placement:
+    """Where a table's rows live: arrival positions [dropped, appended), as runs per shard."""
+
+    epoch: int
+    dropped: int
+    appended: int
+    runs: List[List[int]] = field(default_factory=list)  # [shard, rows], oldest first
+
+    def held(self, shard: int) -> int:
+        return sum(rows for s, rows in self.runs if s == shard)
+
+
+class ShardedKQLExecutor(KQLExecutor):
+    """
+    KQLExecutor that answers queries by scatter-gather across shard servers.
+    Tables named in sources are built on the shards themselves; other
+    registry tables are shipped on first use. Either way the shards then
+    follow the registry's appends and trims.
+    """
+
+    def __init__(
+        self,
+        registry: TableRegistry,
+        addresses: List[Address],
+        authkey: bytes,
+        sources: Optional[Dict[str, TableSource]] = None,
+        timeout: float = 60.0,
+    ):
+        if addresses and not authkey:
+            raise ValueError(f"Sharded KQL execution needs an authentication key ({AUTHKEY_ENV})")
+        super().__init__(registry)
+        self.addresses = [tuple(a) for a in addresses]
+        self.authkey = authkey
+        self.sources = dict(sources or {})
+        self.timeout = timeout
+        self._connections: Dict[Address, Connection] = {}  # placement traffic, under _lock
+        self._idle: Dict[Address, List[Connection]] = {}  # query connections not in use
+        self._placements: Dict[str, _Placement] = {}
+        self._generation = 0  # bumped whenever placements are rebuilt
+        self._reconnect_at = 0.0
+        self._lock = threading.RLock()
+        self._idle_lock = threading.Lock()
+        self._io = ThreadPoolExecutor(max_workers=max(1, len(self.addresses)) * QUERY_CONCURRENCY)
+
+    def close(self):
+        with self._lock:
+            with self._idle_lock:
+                idle, self._idle = [c for conns in self._idle.values() for c in conns], {}
+            for conn in [*self._connections.values(), *idle]:
+                try:
+                    conn.send(("close",))
+                    conn.recv()
+                except (EOFError, OSError):
+                    pass
+                conn.close()
+            self._connections = {}
+            self._reset()
+
+    def _run_pipeline(self, query: str) -> pd.DataFrame:
+        stages = self._split_pipeline(query)
+        if not stages:
+            raise ValueError("Empty query")
+
+        source = stages[0].strip()
+        local = source in self.registry.list_tables()
+        if not self.addresses or not (local or source in self.sources):
+            return super()._run_pipeline(query)
+        if self.registry.is_loaded(source):
+            answer = self._answer_from_metadata(self.registry.stats(source), stages[1:])
+            if answer is not None:
+                return answer
+
+        pushdown, summarize, rest = split_pushdown(stages[1:])
+        shard_stages = list(pushdown)
+        counting = summarize is None and [s.strip().lower() for s in rest] == ["count"]
+        if counting:
+            summarize, rest = "Count=count()", []
+        elif summarize is None and rest and rest[0].strip().lower().startswith(SHARD_FINISHERS):
+            # Each shard pre-applies the finisher; re-applying it to the
+            # gathered rows below yields the global result.
+            shard_stages.append(rest[0].strip())
+        elif not shard_stages and summarize is None and local:
+            return super()._run_pipeline(query)
+
+        for _ in range(len(self.addresses) + 1):
+            with self._lock:
+                try:
+                    shards = self._live()
+                    if not shards:
+                        break
+                    placement = self._sync(source)
+                except _ShardLost:
+                    continue
+                generation, rows = self._generation, placement.appended - placement.dropped
+            try:
+                results = self._query(shards, ("run", source, shard_stages, summarize))
+            except _ShardLost:
+                continue
+            if generation != self._generation:
+                continue  # partitions were rebuilt while the shards answered
+            KQL_ROWS_SCANNED.inc(rows, table=source)
+            if summarize is not None:
+                df = merge_partials(results, summarize)
+                if counting and df.empty:
+                    df = pd.DataFrame({"Count": [0]})
+            else:
+                df = pd.concat(results, ignore_index=True)
+            return self._apply_stages(df, rest)
+
+        if local:
+            logger.warning("No KQL shard is reachable; running '%s' locally", source)
+            return super()._run_pipeline(query)
+        raise ValueError("No KQL shard server is reachable")
+
+    # ─── Shard connections ───────────────────────────────────────────────────
+
+    def _live(self) -> List[Address]:
+        """Connected shards in address order, reconnecting dropped ones when due."""
+        if len(self._connections) < len(self.addresses) and time.monotonic() >= self._reconnect_at:
+            joined = False
+            for address in self.addresses:
+                if address in self._connections:
+                    continue
+                try:
+                    self._connections[address] = Client(address, authkey=self.authkey)
+                    joined = True
+                except (AuthenticationError, OSError) as exc:
+                    logger.warning("KQL shard %s:%d is unreachable: %s", *address, exc)
+            if joined:
+                self._reset()  # rebalance across the new set of shards
+            self._reconnect_at = time.monotonic() + RECONNECT_SECONDS
+        return [a for a in self.addresses if a in self._connections]
+
+    def _scatter(self, messages: List[Optional[tuple]]) -> list:
+        """
+        Send messages[i] to the i-th live shard (None skips it) over the
+        placement connections and return the answers in the same order.
+        Callers hold _lock.
+        """
+        shards = self._live()
+        futures = {
+            address: self._io.submit(self._call, self._connections[address], message)
+            for address, message in zip(shards, messages) if message is not None
+        }
+        return self._gather(shards, futures)
+
+    def _query(self, shards: List[Address], message: tuple) -> list:
+        """Send one message to every shard, each over a query connection of its own."""
+
+        def call(address: Address):
+            conn = self._checkout(address)
+            try:
+                answer = self._call(conn, message)
+            except BaseException:
+                conn.close()
+                raise
+            with self._idle_lock:
+                self._idle.setdefault(address, []).append(conn)
+            return answer
+
+        return self._gather(shards, {address: self._io.submit(call, address) for address in shards})
+
+    def _checkout(self, address: Address) -> Connection:
+        with self._idle_lock:
+            idle = self._idle.get(address)
+            if idle:
+                return idle.pop()
+        try:
+            return Client(address, authkey=self.authkey)
+        except AuthenticationError as exc:
+            raise ConnectionRefusedError(str(exc))
+
+    def _call(self, conn: Connection, message: tuple):
+        conn.send(message)
+        if not conn.poll(self.timeout):
+            raise TimeoutError(f"no answer within {self.timeout:g}s")
+        return conn.recv()
+
+    def _gather(self, shards: List[Address], futures: dict) -> list:
+        """
+        The answers of the shards asked, in shard order (None for the
+        others). A shard that failed to answer is dropped and _ShardLost
+        raised.
+        """
+        wait(futures.values())
+        lost = {a: f.exception() for a, f in futures.items() if isinstance(f.exception(), (EOFError, OSError))}
+        if lost:
+            with self._lock:
+                for address, exc in lost.items():
+                    conn = self._connections.pop(address, None)
+                    if conn is None:
+                        continue  # already dropped by a concurrent query
+                    logger.warning("Dropping KQL shard %s:%d: %s", *address, exc or "connection closed")
+                    conn.close()
+                    with self._idle_lock:
+                        for idle in self._idle.pop(address, []):
+                            idle.close()
+                    SHARDS_LOST.inc()
+                self._reset()
+                self._reconnect_at = time.monotonic() + RECONNECT_SECONDS
+            raise _ShardLost()
+
+        results = []
+        for address in shards:
+            if address not in futures:
+                results.append(None)
+                continue
+            status, payload = futures[address].result()
+            if status != "ok":
+                raise ValueError(payload)
+            results.append(payload)
+        return results
+
+    def _send(self, shard: int, message: tuple):
+        """Send one message to the shard-th live shard."""
+        messages: List[Optional[tuple]] = [None] * len(self._live())
+        messages[shard] = message
+        return self._scatter(messages)[shard]
+
+    # ─── Placement ───────────────────────────────────────────────────────────
+
+    def _sync(self, name: str) -> _Placement:
+        """Bring the shards' copy of a table up to date with the registry."""
+        span = self.registry.span(name)
+        placement = self._placements.get(name)
+        if placement is None or (span is not None and span.epoch != placement.epoch):
+            self._generation += 1
+            placement = self._placements[name] = self._place(name)
+            span = self.registry.span(name)
+        if span is None:
+            return placement
+
+        if span.appended > placement.appended:
+            df, current = self.registry.snapshot(name)
+            if placement.appended < current.dropped:
+                # Rows the shards never saw have already been trimmed away.
+                self._generation += 1
+                placement = self._placements[name] = self._ship(name)
+            else:
+                self._append(name, placement, df.iloc[placement.appended - current.dropped:])
+                span = current
+        if span.dropped > placement.dropped:
+            self._trim(name, placement, span.dropped - placement.dropped)
+        return placement
+
+    def _reset(self):
+        self._placements = {}
+        self._generation += 1
+
+    def _place(self, name: str) -> _Placement:
+        span = self.registry.span(name)
+        source = self.sources.get(name)
+        if source is None or (span is not None and span.epoch != 0):
+            return self._ship(name)
+        count = len(self._live())
+        sizes = self._scatter([("build", name, source, part, count) for part in range(count)])
+        return _Placement(0, 0, sum(sizes), [[shard, rows] for shard, rows in enumerate(sizes) if rows])
+
+    def _ship(self, name: str) -> _Placement:
+        df, span = self.registry.snapshot(name)
+        if df is None:
+            raise ValueError(f"Table '{name}' not found. Available: {self.registry.list_tables()}")
+        count = len(self._live())
+        size = max(1, math.ceil(len(df) / count))
+        slices = [df.iloc[i * size:(i + 1) * size] for i in range(count)]
+        self._scatter([("load", name, part) for part in slices])
+        runs = [[shard, len(part)] for shard, part in enumerate(slices) if len(part)]
+        return _Placement(span.epoch, span.dropped, span.dropped + len(df), runs)
+
+    def _append(self, name: str, placement: _Placement, df: pd.DataFrame):
+        shard = min(range(len(self._live())), key=placement.held)
+        self._send(shard, ("append", name, df))
+        if placement.runs and placement.runs[-1][0] == shard:
+            placement.runs[-1][1] += len(df)
+        else:
+            placement.runs.append([shard, len(df)])
+        placement.appended += len(df)
+
+    def _trim(self, name: str, placement: _Placement, rows: int):
+        # A shard's rows are in arrival order, so the oldest rows overall are
+        # the first rows of the shards holding the leading runs.
+        drops: Dict[int, int] = {}
+        while rows and placement.runs:
+            shard, held = placement.runs[0]
+            taken = min(held, rows)
+            drops[shard] = drops.get(shard, 0) + taken
+            rows -= taken
+            placement.dropped += taken
+            if taken == held:
+                placement.runs.pop(0)
+            else:
+                placement.runs[0][1] -= taken
+        for shard, count in drops.items():
+            self._send(shard, ("trim", name, count))
+
+
+def parse_address(value: str) -> Address:
+    host, _, port = value.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+# ─── CLI ─────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Run local KQL shard servers.")
+    parser.add_argument("--shards", type=int, default=2, help="number of shard processes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9400, help="port of the first shard")
+    parser.add_argument(
+        "--authkey", default=os.environ.get(AUTHKEY_ENV), help=f"shared key (default: ${AUTHKEY_ENV})"
+    )
+    args = parser.parse_args()
+    if not args.authkey:
+        parser.error(f"set {AUTHKEY_ENV} or pass --authkey; shards never start without a key")
+
+    processes = []
+    for i in range(args.shards):
+        address = (args.host, args.port + i)
+        process = multiprocessing.Process(target=serve_shard, args=(address, args.authkey.encode()))
+        process.start()
+        processes.append(process)
+        print(f"Shard {i} listening on {address[0]}:{address[1]}")
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+KQL Table Statistics
+--------------------
+Per-table and per-column statistics kept alongside each registered table:
+row counts, null counts, min/max, a HyperLogLog sketch of the number of
+distinct values (NDV) and a mergeable top-k summary of frequent values.
+
+Every statistic is mergeable, so appending rows only needs a pass over the
+new rows. The executor uses them to answer metadata queries (count,
+getschema) without touching the data and to estimate predicate
+selectivity when ordering filters and choosing join build sides.
+"""
+
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+HLL_PRECISION = 12
+TOP_K_CAPACITY = 64
+
+_POWERS_OF_TWO = np.array([1 << i for i in range(64)], dtype=np.uint64)
+
+
+# ─── NDV Sketch ──────────────────────────────────────────────────────────────
+
+class HyperLogLog:
+    """HyperLogLog distinct-count sketch over 64-bit value hashes."""
+
+    def __init__(self, precision: int = HLL_PRECISION, registers: Optional[np.ndarray] = None):
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+
+    def add_hashes(self, hashes: np.ndarray):
+        if not len(hashes):
+            return
+        hashes = hashes.astype(np.uint64, copy=False)
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+        remainder = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        # Rank = position of the first set bit in the remaining 64-p bits.
+        bit_length = np.searchsorted(_POWERS_OF_TWO, remainder, side="right")
+        rank = (64 - self.precision - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        return HyperLogLog(self.precision, np.maximum(self.registers, other.registers))
+
+    def estimate(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / float(np.sum(np.power(2.0, -self.registers.astype(np.float64))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+
+def hash_values(values: pd.Series) -> np.ndarray:
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+
+# ─── Column & Table Statistics ───────────────────────────────────────────────
+
+@dataclass
+class ColumnStats:
+    dtype: str
+    count: int = 0
+    null_count: int = 0
+    min: Any = None
+    max: Any = None
+    ndv_sketch: HyperLogLog = field(default_factory=HyperLogLog)
+    top_k: Dict[Any, int] = field(default_factory=dict)
+    top_k_error: int = 0
+
+    @property
+    def ndv(self) -> int:
+        # The sketch is approximate; it can never exceed the non-null count.
+        return max(min(self.ndv_sketch.estimate(), self.count), 1 if self.count else 0)
+
+    @property
+    def null_fraction(self) -> float:
+        total = self.count + self.null_count
+        return self.null_count / total if total else 0.0
+
+    def frequency(self, value: Any) -> float:
+        """Estimated fraction of rows equal to value."""
+        total = self.count + self.null_count
+        if not total:
+            return 0.0
+        if value in self.top_k:
+            return self.top_k[value] / total
+        covered = sum(self.top_k.values())
+        if covered >= self.count:
+            # The top-k holds every distinct value, so this one never occurs.
+            return 0.0
+        # Spread the rows not covered by the top-k evenly over the other values.
+        per_value = (self.count - covered) / max(self.ndv - len(self.top_k), 1)
+        if self.top_k_error:
+            per_value = min(per_value, self.top_k_error)
+        return per_value / total
+
+    def range_fraction(self, op: str, value: Any) -> Optional[float]:
+        """Estimated fraction of rows satisfying `column <op> value`."""
+        try:
+            low, high = _as_number(self.min), _as_number(self.max)
+            point = _as_number(value)
+        except (TypeError, ValueError):
+            return None
+        if low is None or high is None or point is None:
+            return None
+        if high == low:
+            below = 1.0 if point > low else 0.0
+        else:
+            below = min(max((point - low) / (high - low), 0.0), 1.0)
+        fraction = below if op in ("<", "<=") else 1.0 - below
+        return fraction * (1.0 - self.null_fraction)
+
+
+@dataclass
+class TableStats:
+    row_count: int = 0
+    columns: Dict[str, ColumnStats] = field(default_factory=dict)
+
+    def schema(self) -> List[Tuple[str, str]]:
+        return [(name, col.dtype) for name, col in self.columns.items()]
+
+
+def _as_number(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).value
+    if isinstance(value, (bool, np.bool_)):
+        return float(value)
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    raise TypeError(f"Not orderable numerically: {value!r}")
+
+
+def kql_type(dtype) -> str:
+    """Map a pandas dtype to the KQL scalar type name."""
+    if pd.api.types.is_bool_dtype(dtype):
+        return "bool"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "long"
+    if pd.api.types.is_float_dtype(dtype):
+        return "real"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "datetime"
+    if pd.api.types.is_timedelta64_dtype(dtype):
+        return "timespan"
+    return "string"
+
+
+def _merge_top_k(a: Dict[Any, int], b: Dict[Any, int], capacity: int) -> Tuple[Dict[Any, int], int]:
+    merged = dict(a)
+    for value, count in b.items():
+        merged[value] = merged.get(value, 0) + count
+    if len(merged) <= capacity:
+        return merged, 0
+    ranked = sorted(merged.items(), key=lambda kv: kv[1], reverse=True)
+    return dict(ranked[:capacity]), ranked[capacity][1]
+
+
+def column_stats(series: pd.Series, capacity: int = TOP_K_CAPACITY) -> ColumnStats:
+    """Compute statistics for one column in a single factorize pass."""
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    valid = codes >= 0
+    counts = np.bincount(codes[valid], minlength=len(uniques))
+
+    stats = ColumnStats(dtype=kql_type(series.dtype))
+    stats.count = int(valid.sum())
+    stats.null_count = int(len(series) - stats.count)
+    if len(uniques):
+        stats.ndv_sketch.add_hashes(hash_values(pd.Series(uniques)))
+        if stats.dtype != "string":
+            stats.min, stats.max = uniques.min(), uniques.max()
+        order = np.argsort(counts)[::-1]
+        top = order[:capacity]
+        stats.top_k = {_scalar(uniques[i]): int(counts[i]) for i in top}
+        stats.top_k_error = int(counts[order[capacity]]) if len(order) > capacity else 0
+    return stats
+
+
+def _scalar(value: Any) -> Any:
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def merge_column_stats(a: ColumnStats, b: ColumnStats, capacity: int = TOP_K_CAPACITY) -> ColumnStats:
+    top_k, dropped = _merge_top_k(a.top_k, b.top_k, capacity)
+    bounds = [v for v in (a.min, b.min) if v is not None]
+    upper = [v for v in (a.max, b.max) if v is not None]
+    return ColumnStats(
+        dtype=a.dtype,
+        count=a.count + b.count,
+        null_count=a.null_count + b.null_count,
+        min=min(bounds) if bounds else None,
+        max=max(upper) if upper else None,
+        ndv_sketch=a.ndv_sketch.merge(b.ndv_sketch),
+        top_k=top_k,
+        top_k_error=max(a.top_k_error + b.top_k_error, dropped),
+    )
+
+
+def table_stats(df: pd.DataFrame) -> TableStats:
+    return TableStats(
+        row_count=len(df),
+        columns={str(name): column_stats(df[name]) for name in df.columns},
+    )
+
+
+def merge_table_stats(current: TableStats, appended: pd.DataFrame) -> TableStats:
+    """Fold the statistics of newly appended rows into a table's stats."""
+    new = table_stats(appended)
+    columns = dict(current.columns)
+    for name, stats in new.columns.items():
+        if name in columns:
+            columns[name] = merge_column_stats(columns[name], stats)
+        else:
+            # A new column is null for every existing row.
+            columns[name] = ColumnStats(**{**stats.__dict__, "null_count": stats.null_count + current.row_count})
+    # Columns missing from the appended rows became null for those rows.
+    for name in set(columns) - set(new.columns):
+        columns[name] = ColumnStats(
+            **{**columns[name].__dict__, "null_count": columns[name].null_count + len(appended)}
+        )
+    return TableStats(row_count=current.row_count + len(appended), columns=columns)
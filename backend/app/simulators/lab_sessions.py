@@ -0,0 +1,307 @@
+"""
+Lab Sessions
+------------
+Per-trainee lab environments. Each session has its own incidents, alerts,
+scores and scenario log rows, while the synthetic base tables are shared
+read-only by every session.
+
+A session's tables are an OverlayRegistry: reads see the base table plus
+the rows scenarios injected into that session, appends go to the overlay
+only. The overlay holds nothing but injected rows, so an idle session costs
+a few empty dicts and 500 trainees cost little more than one. Requests
+without a session id use the default environment, which writes straight to
+the base tables as before. Sessions idle for longer than idle_seconds, or
+beyond max_sessions, are evicted from memory oldest first.
+
+When a correlation window is set, each environment also gets an
+AlertCorrelator that groups its alerts into incidents by shared entity.
+With a journal (see app.services.persistence), every change to an
+environment's incidents, alerts and scores is recorded for persistence.
+Eviction then only releases memory: acquire() loads an evicted session
+back from the journal, and only drop() deletes what was saved.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.record_store import RecordStore
+from app.simulators.alert_correlation import AlertCorrelator
+from app.simulators.entity_index import (
+    EntityAlertCounter, EntityRecordIndex, EntityRowIndex, alert_entities, record_entities
+)
+from app.simulators.kql_engine import KQLExecutor, TableRegistry
+from app.simulators.kql_stats import TableStats, merge_table_stats
+
+DEFAULT_SESSION = "default"
+
+STORE_INDEXES = ("severity", "status", "scenarioId")
+
+
+# ─── Overlay Tables ──────────────────────────────────────────────────────────
+
+class OverlayRegistry:
+    """A TableRegistry view: shared base tables plus this session's own rows."""
+
+    def __init__(self, base: TableRegistry):
+        self.base = base
+        self._overlay: Dict[str, pd.DataFrame] = {}
+        self._entities = EntityRowIndex()  # positions within the overlay rows
+        # name -> (base stats the merge was computed from, merged stats)
+        self._stats: Dict[str, Tuple[TableStats, TableStats]] = {}
+        # name -> (base frame and overlay frame the concat was built from, concat)
+        self._combined: Dict[str, Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def completions(self):
+        return self.base.completions
+
+    @property
+    def empty(self) -> bool:
+        return not self._overlay
+
+    def append(self, name: str, df: pd.DataFrame):
+        with self._lock:
+            current = self._overlay.get(name)
+            self._overlay[name] = df if current is None else pd.concat([current, df], ignore_index=True)
+            self._stats.pop(name, None)
+            self._combined.pop(name, None)
+            self._entities.append(name, df, 0 if current is None else len(current))
+
+    def clear(self):
+        with self._lock:
+            self._overlay.clear()
+            self._stats.clear()
+            self._combined.clear()
+            self._entities.clear()
+
+    def get(self, name: str) -> Optional[pd.DataFrame]:
+        base = self.base.get(name)
+        overlay = self._overlay.get(name)
+        if overlay is None:
+            return base
+        if base is None:
+            return overlay
+        with self._lock:
+            cached = self._combined.get(name)
+            # Both frames are replaced, never modified, when rows arrive.
+            if cached is None or cached[0] is not base or cached[1] is not overlay:
+                cached = self._combined[name] = (base, overlay, pd.concat([base, overlay], ignore_index=True))
+            return cached[2]
+
+    def stats(self, name: str) -> Optional[TableStats]:
+        base = self.base.stats(name)
+        overlay = self._overlay.get(name)
+        if overlay is None or base is None:
+            return base
+        with self._lock:
+            cached = self._stats.get(name)
+            # The base table's stats object is replaced whenever it grows.
+            if cached is None or cached[0] is not base:
+                cached = self._stats[name] = (base, merge_table_stats(base, overlay))
+            return cached[1]
+
+    def entity_rows(self, name: str, key: str) -> np.ndarray:
+        """Row positions in get(name): base rows first, then this session's own."""
+        base = self.base.entity_rows(name, key)
+        if name not in self._overlay:
+            return base
+        base_df = self.base.get(name)
+        offset = len(base_df) if base_df is not None else 0
+        return np.concatenate([base[base < offset], self._entities.rows(name, key) + offset])
+
+    def entity_name(self, key: str) -> Optional[str]:
+        return self._entities.name(key) or self.base.entity_name(key)
+
+    def is_loaded(self, name: str) -> bool:
+        return self.base.is_loaded(name)
+
+    def list_tables(self) -> List[str]:
+        return self.base.list_tables()
+
+    def overlay_sizes(self) -> Dict[str, Tuple[int, int]]:
+        """Row count and approximate bytes of this session's own rows per table."""
+        return {
+            name: (len(df), int(df.memory_usage(deep=True).sum()))
+            for name, df in list(self._overlay.items())
+        }
+
+
+# ─── Environments ────────────────────────────────────────────────────────────
+
+class LabEnvironment:
+    """Everything one trainee's lab can change."""
+
+    def __init__(self, session_id: str, registry, correlation_window: Optional[float] = None, journal=None):
+        self.session_id = session_id
+        self.registry = registry
+        self.journal = journal
+        self.incidents = RecordStore(indexed_fields=STORE_INDEXES)
+        self.alerts = RecordStore(indexed_fields=STORE_INDEXES)
+        self.alert_counts = EntityAlertCounter()  # entity key -> alerts by severity and status
+        self.alerts.listeners.append(self.alert_counts.record)
+        if journal is not None:
+            self.incidents.listeners.append(partial(journal.record, "incidents", session_id))
+            self.alerts.listeners.append(partial(journal.record, "alerts", session_id))
+        self.entities = EntityRecordIndex()  # entity key -> alert and incident ids
+        # None: scenario runs create their hand-authored incident instead
+        self.correlator = (
+            AlertCorrelator(self.incidents, correlation_window, self.entities) if correlation_window else None
+        )
+        self.scores: Dict[str, Dict[str, int]] = {}  # scenario id -> question id -> points
+        self.created = time.time()
+        self.last_used = time.monotonic()
+        self.closed = False
+        self._executor: Optional[KQLExecutor] = None
+
+    @property
+    def executor(self) -> KQLExecutor:
+        if self._executor is None:
+            self._executor = KQLExecutor(self.registry)
+        return self._executor
+
+    def add_score(self, scenario_id: str, question_id: str, points: int):
+        self.scores.setdefault(scenario_id, {})[question_id] = points
+        if self.journal is not None:
+            self.journal.score(self.session_id, scenario_id, question_id, points)
+
+    def restore(self, incidents: List[dict], alerts: List[dict], scores: List[Tuple[str, str, int]]):
+        """Load persisted state without recording it as new changes."""
+        listeners = self.incidents.listeners, self.alerts.listeners
+        self.incidents.listeners, self.alerts.listeners = [], []
+        try:
+            self.incidents.insert_many(incidents)
+            self.alerts.insert_many(alerts)
+        finally:
+            self.incidents.listeners, self.alerts.listeners = listeners
+        self.entities.set_many("incident", ((i["id"], record_entities(i.get("entities"))) for i in incidents))
+        self.entities.set_many("alert", ((a["id"], alert_entities(a)) for a in alerts))
+        self.alert_counts.record("insert", alerts)
+        for scenario_id, question_id, points in scores:
+            self.scores.setdefault(scenario_id, {})[question_id] = points
+
+    def close(self):
+        """Mark the environment as no longer held by the session manager."""
+        self.closed = True
+
+    def reset(self):
+        """Clear this environment's incidents, alerts, scores and injected rows."""
+        self.incidents.clear()
+        self.alerts.clear()
+        self.scores.clear()
+        if self.journal is not None:
+            self.journal.clear_scores(self.session_id)
+        self.entities.clear()
+        if self.correlator is not None:
+            self.correlator.clear()
+        if isinstance(self.registry, OverlayRegistry):
+            self.registry.clear()
+
+    def status(self) -> dict:
+        overlay = self.registry.overlay_sizes() if isinstance(self.registry, OverlayRegistry) else {}
+        return {
+            "session": self.session_id,
+            "incidents": len(self.incidents),
+            "alerts": len(self.alerts),
+            "points": sum(sum(q.values()) for q in self.scores.values()),
+            "overlay_rows": sum(rows for rows, _ in overlay.values()),
+            "overlay_bytes": sum(size for _, size in overlay.values()),
+            "idle_seconds": round(time.monotonic() - self.last_used, 1),
+        }
+
+
+class SessionManager:
+    """Creates lab environments on first use and drops idle ones."""
+
+    def __init__(
+        self, base: TableRegistry, max_sessions: int = 500, idle_seconds: float = 3600.0,
+        correlation_window: Optional[float] = None, journal=None,
+    ):
+        self.base = base
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.correlation_window = correlation_window
+        self.journal = journal
+        self.default = LabEnvironment(DEFAULT_SESSION, base, correlation_window, journal)
+        self._sessions: "OrderedDict[str, LabEnvironment]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def get(self, session_id: Optional[str]) -> LabEnvironment:
+        """The environment for a session id, created if new; no id means the default one."""
+        if not session_id or session_id == DEFAULT_SESSION:
+            self.default.last_used = time.monotonic()
+            return self.default
+        with self._lock:
+            env = self._sessions.get(session_id)
+            if env is None:
+                env = self._sessions[session_id] = self._new(session_id)
+            else:
+                self._sessions.move_to_end(session_id)
+            env.last_used = time.monotonic()
+            self._evict()
+            return env
+
+    async def acquire(self, session_id: Optional[str]) -> LabEnvironment:
+        """get(), first loading a session the journal saved but memory no longer holds."""
+        if self.journal is not None and session_id and session_id != DEFAULT_SESSION:
+            with self._lock:
+                resident = session_id in self._sessions
+            if not resident and self.journal.has_saved(session_id):
+                return self.restore(session_id, *await self.journal.load(session_id))
+        return self.get(session_id)
+
+    def restore(
+        self, session_id: str, incidents: List[dict], alerts: List[dict], scores: List[Tuple[str, str, int]]
+    ) -> LabEnvironment:
+        """Put a session's saved state back in memory, unless it is already there."""
+        if session_id == DEFAULT_SESSION:
+            self.default.restore(incidents, alerts, scores)
+            return self.default
+        with self._lock:
+            env = self._sessions.get(session_id)
+            if env is None:
+                env = self._sessions[session_id] = self._new(session_id)
+                env.restore(incidents, alerts, scores)
+            else:
+                self._sessions.move_to_end(session_id)
+            env.last_used = time.monotonic()
+            self._evict()
+            return env
+
+    def drop(self, session_id: str) -> bool:
+        """End a session, deleting its saved state too."""
+        with self._lock:
+            env = self._sessions.pop(session_id, None)
+        if env is not None:
+            env.close()
+        if self.journal is not None and session_id != DEFAULT_SESSION:
+            self.journal.forget(session_id)
+        return env is not None
+
+    def environments(self) -> List[LabEnvironment]:
+        with self._lock:
+            return [self.default, *self._sessions.values()]
+
+    def _evict(self):
+        # Least recently used first, so the idle check can stop at the first fresh session.
+        now = time.monotonic()
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if len(self._sessions) <= self.max_sessions and now - oldest.last_used < self.idle_seconds:
+                break
+            del self._sessions[oldest.session_id]
+            oldest.close()
+            if self.journal is not None:
+                self.journal.park(oldest)
+
+    def _new(self, session_id: str) -> LabEnvironment:
+        return LabEnvironment(session_id, OverlayRegistry(self.base), self.correlation_window, self.journal)
@@ -1,31 +1,103 @@
 """
 Synthetic Log Data Generator
 Generates realistic fake security log data for all supported KQL tables.
+
+Every column is drawn as a whole NumPy array from a single Generator call,
+so generating millions of rows takes seconds rather than minutes. Large
+tables are built in fixed-size chunks with independent seeded streams,
+optionally across processes.
 """
 
+import argparse
+import logging
+import os
+import re
+import sys
 import pandas as pd
 import numpy as np
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from datetime import datetime, timedelta, timezone
-import random
-import uuid
+from typing import Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.simulators.kql_stats import kql_type
+
+logger = logging.getLogger(__name__)
 
 # ── Helpers ──────────────────────────────────────────────────────────────────
 
 def now():
     return datetime.now(timezone.utc)
 
-def random_time(hours_ago=24):
-    delta = random.uniform(0, hours_ago * 3600)
-    return now() - timedelta(seconds=delta)
+def _choice(rng: np.random.Generator, options, n: int) -> np.ndarray:
+    """n uniform picks from options (duplicates in options act as weights)."""
+    options = options if isinstance(options, np.ndarray) else _as_array(options)
+    return options[rng.integers(0, len(options), n)]
+
+def _as_array(values: Sequence) -> np.ndarray:
+    array = np.empty(len(values), dtype=object)
+    array[:] = list(values)
+    return array
+
+def random_times(rng: np.random.Generator, n: int, hours_ago: float = 24, anchor: Optional[datetime] = None) -> pd.DatetimeIndex:
+    """n timestamps spread uniformly over the hours_ago hours before anchor."""
+    anchor = anchor or now()
+    end = np.datetime64(anchor.astimezone(timezone.utc).replace(tzinfo=None), "us")
+    offsets = (rng.random(n) * (hours_ago * 3600 * 1_000_000)).astype("timedelta64[us]")
+    return pd.DatetimeIndex(end - offsets).tz_localize("UTC")
+
+# Every internal address (10.1.0-10.1-254) is precomputed; external ones
+# are joined from two precomputed "a.b" halves. Built on first use to keep
+# the module cheap to import.
+@lru_cache(maxsize=None)
+def _internal_ips() -> np.ndarray:
+    return _as_array([f"10.1.{c}.{d}" for c in range(11) for d in range(1, 255)])
+
+@lru_cache(maxsize=None)
+def _ip_halves() -> np.ndarray:
+    return _as_array([f"{a}.{b}" for a in range(1, 255) for b in range(1, 255)])
+
+def random_ips_internal(rng: np.random.Generator, n: int) -> np.ndarray:
+    return _choice(rng, _internal_ips(), n)
+
+def random_ips_external(rng: np.random.Generator, n: int) -> np.ndarray:
+    return _choice(rng, _ip_halves(), n) + "." + _choice(rng, _ip_halves(), n)
+
+def random_ips_mixed(rng: np.random.Generator, n: int, external_share: float) -> np.ndarray:
+    return np.where(rng.random(n) < external_share, random_ips_external(rng, n), random_ips_internal(rng, n))
+
+_HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+
+def _hex_matrix(rng: np.random.Generator, n: int, nbytes: int) -> np.ndarray:
+    """(n, 2 * nbytes) ASCII hex digits of random bytes."""
+    raw = rng.integers(0, 256, (n, nbytes), dtype=np.uint8)
+    digits = np.empty((n, nbytes * 2), dtype=np.uint8)
+    digits[:, 0::2] = _HEX_DIGITS[raw >> 4]
+    digits[:, 1::2] = _HEX_DIGITS[raw & 0x0F]
+    return digits
 
-def random_ip_internal():
-    return f"10.1.{random.randint(0,10)}.{random.randint(1,254)}"
+def _ascii_rows(matrix: np.ndarray) -> np.ndarray:
+    """Turn an (n, width) ASCII byte matrix into an object array of str."""
+    width = matrix.shape[1]
+    return np.ascontiguousarray(matrix).view(f"S{width}").ravel().astype(f"U{width}").astype(object)
 
-def random_ip_external():
-    return f"{random.randint(1,254)}.{random.randint(1,254)}.{random.randint(1,254)}.{random.randint(1,254)}"
+def random_guids(rng: np.random.Generator, n: int, prefix: str = "") -> np.ndarray:
+    """Random version-4 GUID strings, optionally prefixed."""
+    digits = _hex_matrix(rng, n, 16)
+    digits[:, 12] = ord("4")
+    digits[:, 16] = _HEX_DIGITS[8 + (digits[:, 16] % 4)]
+    head = np.frombuffer(prefix.encode(), dtype=np.uint8)
+    out = np.empty((n, len(head) + 36), dtype=np.uint8)
+    out[:, : len(head)] = head
+    body = out[:, len(head):]
+    body[:, [8, 13, 18, 23]] = ord("-")
+    body[:, [i for i in range(36) if i not in (8, 13, 18, 23)]] = digits
+    return _ascii_rows(out)
 
-def random_guid():
-    return str(uuid.uuid4())
+def random_hex(rng: np.random.Generator, n: int, nbytes: int) -> np.ndarray:
+    return _ascii_rows(_hex_matrix(rng, n, nbytes))
 
 # ── Sample Data ───────────────────────────────────────────────────────────────
 
@@ -37,6 +109,8 @@ USERS = [
     "eve.davis@contoso.com",
 ]
 
+ACCOUNT_NAMES = [u.split("@")[0] for u in USERS]
+
 DEVICES = [
     "DESKTOP-FIN-001",
     "DESKTOP-IT-042",
@@ -64,102 +138,92 @@ PROCESSES = [
     "mshta.exe",
 ]
 
+COMMAND_ARGS = ["", "-enc abc123", "/c whoami", "--hidden"]
+
+# ProcessCommandLine for every (process, argument) pair, indexed
+# process * len(COMMAND_ARGS) + argument.
+_COMMAND_LINES = _as_array([f"{p} {a}" for p in PROCESSES for a in COMMAND_ARGS])
+
 # ── Table Generators ──────────────────────────────────────────────────────────
 
-def generate_signin_logs(n=100):
-    rows = []
-    for _ in range(n):
-        success = random.random() > 0.2
-        rows.append({
-            "TimeGenerated": random_time(48),
-            "UserPrincipalName": random.choice(USERS),
-            "AppDisplayName": random.choice(["Microsoft Office", "Azure Portal", "Teams", "SharePoint"]),
-            "IPAddress": random_ip_external() if random.random() > 0.7 else random_ip_internal(),
-            "Location": random.choice(LOCATIONS),
-            "Status": "Success" if success else "Failure",
-            "RiskLevelDuringSignIn": random.choice(["none", "none", "none", "low", "medium", "high"]),
-            "ConditionalAccessStatus": random.choice(["success", "notApplied", "failure"]),
-            "DeviceDetail": random.choice(["Windows 11", "Windows 10", "macOS", "iOS"]),
-            "CorrelationId": random_guid(),
-        })
-    return pd.DataFrame(rows)
-
-
-def generate_security_event(n=150):
-    event_ids = [4624, 4625, 4648, 4656, 4720, 4732, 4768, 4769]
-    rows = []
-    for _ in range(n):
-        rows.append({
-            "TimeGenerated": random_time(48),
-            "EventID": random.choice(event_ids),
-            "Computer": random.choice(DEVICES),
-            "SubjectUserName": random.choice([u.split("@")[0] for u in USERS]),
-            "TargetUserName": random.choice([u.split("@")[0] for u in USERS]),
-            "IpAddress": random_ip_internal(),
-            "LogonType": random.choice([2, 3, 10]),
-            "AuthenticationPackageName": random.choice(["NTLM", "Kerberos", "Negotiate"]),
-            "Activity": random.choice([
-                "An account was successfully logged on",
-                "An account failed to log on",
-                "A logon was attempted using explicit credentials",
-                "A handle to an object was requested",
-            ]),
-        })
-    return pd.DataFrame(rows)
-
-
-def generate_device_process_events(n=200):
-    rows = []
-    for _ in range(n):
-        proc = random.choice(PROCESSES)
-        rows.append({
-            "TimeGenerated": random_time(48),
-            "DeviceName": random.choice(DEVICES),
-            "AccountName": random.choice([u.split("@")[0] for u in USERS]),
-            "FileName": proc,
-            "ProcessCommandLine": f"{proc} {random.choice(['', '-enc abc123', '/c whoami', '--hidden'])}",
-            "InitiatingProcessFileName": random.choice(PROCESSES),
-            "SHA256": uuid.uuid4().hex * 2,
-            "ProcessId": random.randint(1000, 9999),
-        })
-    return pd.DataFrame(rows)
-
-
-def generate_device_network_events(n=150):
-    rows = []
-    for _ in range(n):
-        rows.append({
-            "TimeGenerated": random_time(48),
-            "DeviceName": random.choice(DEVICES),
-            "AccountName": random.choice([u.split("@")[0] for u in USERS]),
-            "RemoteIPAddress": random_ip_external() if random.random() > 0.5 else random_ip_internal(),
-            "RemotePort": random.choice([80, 443, 445, 3389, 8080, 22, 53]),
-            "LocalIPAddress": random_ip_internal(),
-            "LocalPort": random.randint(49152, 65535),
-            "Protocol": random.choice(["Tcp", "Udp"]),
-            "ActionType": random.choice(["ConnectionSuccess", "ConnectionFailed", "ConnectionFound"]),
-        })
-    return pd.DataFrame(rows)
-
-
-def generate_device_logon_events(n=100):
-    rows = []
-    for _ in range(n):
-        rows.append({
-            "TimeGenerated": random_time(48),
-            "DeviceName": random.choice(DEVICES),
-            "AccountName": random.choice([u.split("@")[0] for u in USERS]),
-            "AccountDomain": "CONTOSO",
-            "LogonType": random.choice(["Interactive", "Network", "RemoteInteractive"]),
-            "ActionType": random.choice(["LogonSuccess", "LogonFailed"]),
-            "RemoteIPAddress": random_ip_internal(),
-            "IsLocalAdmin": random.choice([True, False]),
-        })
-    return pd.DataFrame(rows)
-
-
-def generate_email_events(n=80):
-    rows = []
+def _signin_logs_chunk(rng: np.random.Generator, n: int, anchor: datetime):
+    return pd.DataFrame({
+        "TimeGenerated": random_times(rng, n, 48, anchor),
+        "UserPrincipalName": _choice(rng, USERS, n),
+        "AppDisplayName": _choice(rng, ["Microsoft Office", "Azure Portal", "Teams", "SharePoint"], n),
+        "IPAddress": random_ips_mixed(rng, n, external_share=0.3),
+        "Location": _choice(rng, LOCATIONS, n),
+        "Status": np.where(rng.random(n) < 0.8, "Success", "Failure").astype(object),
+        "RiskLevelDuringSignIn": _choice(rng, ["none", "none", "none", "low", "medium", "high"], n),
+        "ConditionalAccessStatus": _choice(rng, ["success", "notApplied", "failure"], n),
+        "DeviceDetail": _choice(rng, ["Windows 11", "Windows 10", "macOS", "iOS"], n),
+        "CorrelationId": random_guids(rng, n),
+    })
+
+
+def _security_event_chunk(rng: np.random.Generator, n: int, anchor: datetime):
+    event_ids = np.array([4624, 4625, 4648, 4656, 4720, 4732, 4768, 4769], dtype=np.int64)
+    return pd.DataFrame({
+        "TimeGenerated": random_times(rng, n, 48, anchor),
+        "EventID": _choice(rng, event_ids, n),
+        "Computer": _choice(rng, DEVICES, n),
+        "SubjectUserName": _choice(rng, ACCOUNT_NAMES, n),
+        "TargetUserName": _choice(rng, ACCOUNT_NAMES, n),
+        "IpAddress": random_ips_internal(rng, n),
+        "LogonType": _choice(rng, np.array([2, 3, 10], dtype=np.int64), n),
+        "AuthenticationPackageName": _choice(rng, ["NTLM", "Kerberos", "Negotiate"], n),
+        "Activity": _choice(rng, [
+            "An account was successfully logged on",
+            "An account failed to log on",
+            "A logon was attempted using explicit credentials",
+            "A handle to an object was requested",
+        ], n),
+    })
+
+
+def _device_process_events_chunk(rng: np.random.Generator, n: int, anchor: datetime):
+    proc = rng.integers(0, len(PROCESSES), n)
+    args = rng.integers(0, len(COMMAND_ARGS), n)
+    return pd.DataFrame({
+        "TimeGenerated": random_times(rng, n, 48, anchor),
+        "DeviceName": _choice(rng, DEVICES, n),
+        "AccountName": _choice(rng, ACCOUNT_NAMES, n),
+        "FileName": _as_array(PROCESSES)[proc],
+        "ProcessCommandLine": _COMMAND_LINES[proc * len(COMMAND_ARGS) + args],
+        "InitiatingProcessFileName": _choice(rng, PROCESSES, n),
+        "SHA256": random_hex(rng, n, 32),
+        "ProcessId": rng.integers(1000, 10000, n),
+    })
+
+
+def _device_network_events_chunk(rng: np.random.Generator, n: int, anchor: datetime):
+    return pd.DataFrame({
+        "TimeGenerated": random_times(rng, n, 48, anchor),
+        "DeviceName": _choice(rng, DEVICES, n),
+        "AccountName": _choice(rng, ACCOUNT_NAMES, n),
+        "RemoteIPAddress": random_ips_mixed(rng, n, external_share=0.5),
+        "RemotePort": _choice(rng, np.array([80, 443, 445, 3389, 8080, 22, 53], dtype=np.int64), n),
+        "LocalIPAddress": random_ips_internal(rng, n),
+        "LocalPort": rng.integers(49152, 65536, n),
+        "Protocol": _choice(rng, ["Tcp", "Udp"], n),
+        "ActionType": _choice(rng, ["ConnectionSuccess", "ConnectionFailed", "ConnectionFound"], n),
+    })
+
+
+def _device_logon_events_chunk(rng: np.random.Generator, n: int, anchor: datetime):
+    return pd.DataFrame({
+        "TimeGenerated": random_times(rng, n, 48, anchor),
+        "DeviceName": _choice(rng, DEVICES, n),
+        "AccountName": _choice(rng, ACCOUNT_NAMES, n),
+        "AccountDomain": np.full(n, "CONTOSO", dtype=object),
+        "LogonType": _choice(rng, ["Interactive", "Network", "RemoteInteractive"], n),
+        "ActionType": _choice(rng, ["LogonSuccess", "LogonFailed"], n),
+        "RemoteIPAddress": random_ips_internal(rng, n),
+        "IsLocalAdmin": rng.random(n) < 0.5,
+    })
+
+
+def _email_events_chunk(rng: np.random.Generator, n: int, anchor: datetime):
     subjects = [
         "Q4 Invoice - Action Required",
         "Meeting tomorrow",
@@ -168,40 +232,35 @@ def generate_email_events(n=80):
         "Your account security",
         "Weekly report",
     ]
-    for _ in range(n):
-        rows.append({
-            "TimeGenerated": random_time(48),
-            "SenderFromAddress": random.choice(USERS + ["attacker@evil.com", "noreply@phish.net"]),
-            "RecipientEmailAddress": random.choice(USERS),
-            "Subject": random.choice(subjects),
-            "DeliveryAction": random.choice(["Delivered", "Blocked", "Quarantined"]),
-            "ThreatTypes": random.choice(["", "", "", '["Phish"]', '["Malware"]']),
-            "AttachmentCount": random.randint(0, 3),
-            "UrlCount": random.randint(0, 5),
-        })
-    return pd.DataFrame(rows)
-
-
-def generate_office_activity(n=100):
+    return pd.DataFrame({
+        "TimeGenerated": random_times(rng, n, 48, anchor),
+        "SenderFromAddress": _choice(rng, USERS + ["attacker@evil.com", "noreply@phish.net"], n),
+        "RecipientEmailAddress": _choice(rng, USERS, n),
+        "Subject": _choice(rng, subjects, n),
+        "DeliveryAction": _choice(rng, ["Delivered", "Blocked", "Quarantined"], n),
+        "ThreatTypes": _choice(rng, ["", "", "", '["Phish"]', '["Malware"]'], n),
+        "AttachmentCount": rng.integers(0, 4, n),
+        "UrlCount": rng.integers(0, 6, n),
+    })
+
+
+def _office_activity_chunk(rng: np.random.Generator, n: int, anchor: datetime):
     operations = [
         "FileDownloaded", "FileUploaded", "FilePreviewed",
         "MailItemsAccessed", "New-InboxRule", "SearchQueryInitiatedExchange",
         "UserLoggedIn", "FileDeleted",
     ]
-    rows = []
-    for _ in range(n):
-        rows.append({
-            "TimeGenerated": random_time(48),
-            "UserId": random.choice(USERS),
-            "Operation": random.choice(operations),
-            "ClientIPAddress": random_ip_external() if random.random() > 0.6 else random_ip_internal(),
-            "Workload": random.choice(["SharePoint", "Exchange", "OneDrive", "Teams"]),
-            "ObjectId": f"/sites/contoso/{random_guid()}",
-        })
-    return pd.DataFrame(rows)
-
-
-def generate_security_alert(n=30):
+    return pd.DataFrame({
+        "TimeGenerated": random_times(rng, n, 48, anchor),
+        "UserId": _choice(rng, USERS, n),
+        "Operation": _choice(rng, operations, n),
+        "ClientIPAddress": random_ips_mixed(rng, n, external_share=0.4),
+        "Workload": _choice(rng, ["SharePoint", "Exchange", "OneDrive", "Teams"], n),
+        "ObjectId": random_guids(rng, n, prefix="/sites/contoso/"),
+    })
+
+
+def _security_alert_chunk(rng: np.random.Generator, n: int, anchor: datetime):
     alerts = [
         ("Suspicious PowerShell command line", "High", "Execution"),
         ("Credential dumping via comsvcs.dll", "High", "CredentialAccess"),
@@ -212,41 +271,323 @@ def generate_security_alert(n=30):
         ("Mass file deletion detected", "Medium", "Impact"),
         ("Encoded PowerShell execution", "Medium", "Execution"),
     ]
-    rows = []
-    for _ in range(n):
-        alert = random.choice(alerts)
-        rows.append({
-            "TimeGenerated": random_time(48),
-            "AlertName": alert[0],
-            "AlertSeverity": alert[1],
-            "Category": alert[2],
-            "CompromisedEntity": random.choice(DEVICES + USERS),
-            "ProviderName": random.choice([
-                "Microsoft Defender for Endpoint",
-                "Microsoft Defender for Identity",
-                "Microsoft Defender for Office 365",
-            ]),
-            "Status": random.choice(["New", "InProgress", "Resolved"]),
-            "SystemAlertId": random_guid(),
-        })
-    return pd.DataFrame(rows)
+    alert = rng.integers(0, len(alerts), n)
+    names, severities, categories = (_as_array(column) for column in zip(*alerts))
+    return pd.DataFrame({
+        "TimeGenerated": random_times(rng, n, 48, anchor),
+        "AlertName": names[alert],
+        "AlertSeverity": severities[alert],
+        "Category": categories[alert],
+        "CompromisedEntity": _choice(rng, DEVICES + USERS, n),
+        "ProviderName": _choice(rng, [
+            "Microsoft Defender for Endpoint",
+            "Microsoft Defender for Identity",
+            "Microsoft Defender for Office 365",
+        ], n),
+        "Status": _choice(rng, ["New", "InProgress", "Resolved"], n),
+        "SystemAlertId": random_guids(rng, n),
+    })
+
+
+# ── Chunked Generation ────────────────────────────────────────────────────────
+
+CHUNK_ROWS = 100_000
+
+_CHUNK_BUILDERS = {
+    "SignInLogs": _signin_logs_chunk,
+    "SecurityEvent": _security_event_chunk,
+    "DeviceProcessEvents": _device_process_events_chunk,
+    "DeviceNetworkEvents": _device_network_events_chunk,
+    "DeviceLogonEvents": _device_logon_events_chunk,
+    "EmailEvents": _email_events_chunk,
+    "OfficeActivity": _office_activity_chunk,
+    "SecurityAlert": _security_alert_chunk,
+}
+
+
+def _table_seed(name: str, seed: Optional[int]) -> np.random.SeedSequence:
+    # Keyed on the table name, so a table's rows do not depend on which
+    # other tables are generated alongside it.
+    return np.random.SeedSequence(seed, spawn_key=(zlib.crc32(name.encode()),))
+
+
+def _generate_chunk(name: str, n: int, seed: np.random.SeedSequence, anchor: datetime) -> pd.DataFrame:
+    return _CHUNK_BUILDERS[name](np.random.default_rng(seed), n, anchor)
+
+
+def _chunk_sizes(n: int, chunk_rows: int) -> List[int]:
+    return [min(chunk_rows, n - start) for start in range(0, n, chunk_rows)] or [0]
+
+
+def _generate(name: str, n: int, seed: Optional[int], anchor: datetime,
+              pool: Optional[ProcessPoolExecutor], chunk_rows: int = CHUNK_ROWS) -> pd.DataFrame:
+    sizes = _chunk_sizes(n, chunk_rows)
+    seeds = _table_seed(name, seed).spawn(len(sizes))
+    args = ([name] * len(sizes), sizes, seeds, [anchor] * len(sizes))
+    chunks = list(pool.map(_generate_chunk, *args)) if pool and len(sizes) > 1 else list(map(_generate_chunk, *args))
+    return chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+
+
+@lru_cache(maxsize=None)
+def table_schema(name: str) -> Tuple[Tuple[str, str], ...]:
+    """Column names and KQL types of a synthetic table, from a one-row sample."""
+    sample = _generate_chunk(name, 1, _table_seed(name, 0), datetime.now(timezone.utc))
+    return tuple((str(column), kql_type(sample[column].dtype)) for column in sample.columns)
+
+
+def generate_batch(name: str, n: int, rng: np.random.Generator, start: datetime, end: datetime) -> pd.DataFrame:
+    """n rows of a table with sorted timestamps in [start, end), for live telemetry."""
+    df = _CHUNK_BUILDERS[name](rng, n, end)
+    span_us = max(int((end - start).total_seconds() * 1_000_000), 1)
+    offsets = np.sort(rng.integers(0, span_us, n)).astype("timedelta64[us]")
+    base = np.datetime64(start.astimezone(timezone.utc).replace(tzinfo=None), "us")
+    df["TimeGenerated"] = pd.DatetimeIndex(base + offsets).tz_localize("UTC")
+    return df
+
+
+def generate_table(name: str, n: int, seed: Optional[int] = None, anchor: Optional[datetime] = None,
+                   workers: int = 1, chunk_rows: int = CHUNK_ROWS) -> pd.DataFrame:
+    """
+    Generate n rows of a table in fixed-size chunks, each drawn from its own
+    stream spawned from (seed, table). Chunk boundaries do not depend on
+    workers, so with a seed and an anchor the output is identical for any
+    worker count.
+    """
+    anchor = anchor or now()
+    if workers > 1 and n > chunk_rows:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return _generate(name, n, seed, anchor, pool, chunk_rows)
+    return _generate(name, n, seed, anchor, None, chunk_rows)
+
+
+def generate_partition(name: str, n: int, part: int, parts: int, seed: Optional[int] = None,
+                       anchor: Optional[datetime] = None, chunk_rows: int = CHUNK_ROWS) -> pd.DataFrame:
+    """
+    The part-th of `parts` contiguous runs of generate_table()'s chunks, so
+    shards can each generate their own rows of a table. With a seed and an
+    anchor, concatenating every part in order reproduces generate_table()
+    called with the same chunk_rows.
+    """
+    anchor = anchor or now()
+    sizes = _chunk_sizes(n, chunk_rows)
+    seeds = _table_seed(name, seed).spawn(len(sizes))
+    first, last = len(sizes) * part // parts, len(sizes) * (part + 1) // parts
+    chunks = [_generate_chunk(name, sizes[i], seeds[i], anchor) for i in range(first, last)]
+    if not chunks:
+        # Sliced from a sampled row: an empty chunk would infer object
+        # rather than string columns, which then leak into concatenations.
+        return _generate_chunk(name, 1, seeds[0], anchor).iloc[:0]
+    return chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+
+
+def generate_signin_logs(n=100, seed: Optional[int] = None, anchor: Optional[datetime] = None, workers: int = 1):
+    return generate_table("SignInLogs", n, seed, anchor, workers)
+
+
+def generate_security_event(n=150, seed: Optional[int] = None, anchor: Optional[datetime] = None, workers: int = 1):
+    return generate_table("SecurityEvent", n, seed, anchor, workers)
+
+
+def generate_device_process_events(n=200, seed: Optional[int] = None, anchor: Optional[datetime] = None, workers: int = 1):
+    return generate_table("DeviceProcessEvents", n, seed, anchor, workers)
+
+
+def generate_device_network_events(n=150, seed: Optional[int] = None, anchor: Optional[datetime] = None, workers: int = 1):
+    return generate_table("DeviceNetworkEvents", n, seed, anchor, workers)
+
+
+def generate_device_logon_events(n=100, seed: Optional[int] = None, anchor: Optional[datetime] = None, workers: int = 1):
+    return generate_table("DeviceLogonEvents", n, seed, anchor, workers)
+
+
+def generate_email_events(n=80, seed: Optional[int] = None, anchor: Optional[datetime] = None, workers: int = 1):
+    return generate_table("EmailEvents", n, seed, anchor, workers)
+
+
+def generate_office_activity(n=100, seed: Optional[int] = None, anchor: Optional[datetime] = None, workers: int = 1):
+    return generate_table("OfficeActivity", n, seed, anchor, workers)
+
+
+def generate_security_alert(n=30, seed: Optional[int] = None, anchor: Optional[datetime] = None, workers: int = 1):
+    return generate_table("SecurityAlert", n, seed, anchor, workers)
 
 
 # ── Registry ──────────────────────────────────────────────────────────────────
 
-def load_all_tables() -> dict:
+DEFAULT_TABLE_ROWS = {
+    "SignInLogs": 100,
+    "SecurityEvent": 150,
+    "DeviceProcessEvents": 200,
+    "DeviceNetworkEvents": 150,
+    "DeviceLogonEvents": 100,
+    "EmailEvents": 80,
+    "OfficeActivity": 100,
+    "SecurityAlert": 30,
+}
+
+
+def load_all_tables(seed: Optional[int] = None, anchor: Optional[datetime] = None, workers: int = 1) -> dict:
     """Generate all synthetic log tables and return as a dict of DataFrames."""
-    print("📊 Loading synthetic log data...")
-    tables = {
-        "SignInLogs": generate_signin_logs(100),
-        "SecurityEvent": generate_security_event(150),
-        "DeviceProcessEvents": generate_device_process_events(200),
-        "DeviceNetworkEvents": generate_device_network_events(150),
-        "DeviceLogonEvents": generate_device_logon_events(100),
-        "EmailEvents": generate_email_events(80),
-        "OfficeActivity": generate_office_activity(100),
-        "SecurityAlert": generate_security_alert(30),
-    }
+    logger.info("Generating synthetic log data...")
+    anchor = anchor or now()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        tables = {
+            name: _generate(name, rows, seed, anchor, pool)
+            for name, rows in DEFAULT_TABLE_ROWS.items()
+        }
+    finally:
+        if pool:
+            pool.shutdown()
     total = sum(len(df) for df in tables.values())
-    print(f"✅ Loaded {len(tables)} tables with {total} total rows")
-    return tables
\ No newline at end of file
+    logger.info("Generated %d tables with %d total rows", len(tables), total)
+    return tables
+
+
+# ── Streaming To Disk ─────────────────────────────────────────────────────────
+
+DEFAULT_STREAM_DAYS = 2
+
+
+def _stream_chunk(name: str, n: int, seed: np.random.SeedSequence, origin: datetime,
+                  start_us: int, end_us: int) -> pd.DataFrame:
+    """A chunk whose timestamps are sorted and fall in [origin + start_us, origin + end_us)."""
+    rng = np.random.default_rng(seed)
+    df = _CHUNK_BUILDERS[name](rng, n, origin)
+    offsets = np.sort(rng.integers(start_us, max(end_us, start_us + 1), n)).astype("timedelta64[us]")
+    base = np.datetime64(origin.astimezone(timezone.utc).replace(tzinfo=None), "us")
+    df["TimeGenerated"] = pd.DatetimeIndex(base + offsets).tz_localize("UTC")
+    return df
+
+
+def stream_table(name: str, rows: int, seed: Optional[int] = None, anchor: Optional[datetime] = None,
+                 days: float = DEFAULT_STREAM_DAYS, chunk_rows: int = CHUNK_ROWS,
+                 workers: int = 1) -> Iterator[pd.DataFrame]:
+    """
+    Yield a table as fixed-size, time-ordered chunks covering the `days`
+    before anchor. Chunk i holds the i-th slice of the time window, so the
+    concatenated stream is sorted by TimeGenerated. At most two chunks per
+    worker are held in memory at once.
+    """
+    anchor = anchor or now()
+    window_us = int(days * 86_400 * 1_000_000)
+    origin = anchor - timedelta(microseconds=window_us)
+    bounds = [(start, min(start + chunk_rows, rows)) for start in range(0, rows, chunk_rows)]
+    seeds = _table_seed(name, seed).spawn(len(bounds))
+    jobs = (
+        (name, stop - start, chunk_seed, origin, window_us * start // rows, window_us * stop // rows)
+        for (start, stop), chunk_seed in zip(bounds, seeds)
+    )
+
+    if workers <= 1:
+        for job in jobs:
+            yield _stream_chunk(*job)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending: Deque = deque()
+        for job in jobs:
+            pending.append(pool.submit(_stream_chunk, *job))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _day_slices(times: pd.Series) -> List[tuple]:
+    """(day, start, stop) runs of a time-sorted column."""
+    days = times.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy().astype("datetime64[D]")
+    cuts = [0, *(np.flatnonzero(days[1:] != days[:-1]) + 1), len(days)]
+    return [(str(days[start]), start, stop) for start, stop in zip(cuts[:-1], cuts[1:])]
+
+
+def write_table(name: str, rows: int, out_dir: str, seed: Optional[int] = None,
+                anchor: Optional[datetime] = None, days: float = DEFAULT_STREAM_DAYS,
+                chunk_rows: int = CHUNK_ROWS, workers: int = 1) -> Dict[str, int]:
+    """
+    Stream a table to Parquet under out_dir/<name>/date=YYYY-MM-DD/, one
+    file per day, one row group per chunk. Memory stays bounded by the
+    chunk size whatever the row count.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer, current_day, schema = None, None, None
+    summary = {"rows": 0, "files": 0, "bytes": 0}
+    paths = []
+    try:
+        for chunk in stream_table(name, rows, seed, anchor, days, chunk_rows, workers):
+            for day, start, stop in _day_slices(chunk["TimeGenerated"]):
+                if day != current_day:
+                    if writer is not None:
+                        writer.close()
+                    directory = os.path.join(out_dir, name, f"date={day}")
+                    os.makedirs(directory, exist_ok=True)
+                    paths.append(os.path.join(directory, "part-0.parquet"))
+                    current_day = day
+                    writer = None
+                batch = pa.Table.from_pandas(chunk.iloc[start:stop], schema=schema, preserve_index=False)
+                if writer is None:
+                    schema = schema or batch.schema
+                    writer = pq.ParquetWriter(paths[-1], schema)
+                writer.write_table(batch)
+                summary["rows"] += stop - start
+    finally:
+        if writer is not None:
+            writer.close()
+    summary["files"] = len(paths)
+    summary["bytes"] = sum(os.path.getsize(p) for p in paths)
+    return summary
+
+
+def estimate_row_bytes(name: str, sample_rows: int = 20_000) -> float:
+    """Approximate on-disk Parquet bytes per row of a table."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sample = next(stream_table(name, sample_rows, seed=0, chunk_rows=sample_rows))
+    sink = pa.BufferOutputStream()
+    pq.write_table(pa.Table.from_pandas(sample, preserve_index=False), sink)
+    return sink.getvalue().size / sample_rows
+
+
+_SIZE_UNITS = {"": 1, "B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3, "TB": 1024 ** 4}
+
+
+def parse_size(text: str) -> int:
+    """Parse sizes like '500MB' or '2.5 GB' into bytes."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?B)?\s*", text, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Cannot parse size: {text}")
+    return int(float(match.group(1)) * _SIZE_UNITS[(match.group(2) or "").upper()])
+
+
+# ── Command Line ──────────────────────────────────────────────────────────────
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Stream synthetic log tables to day-partitioned Parquet files.",
+    )
+    parser.add_argument("--tables", nargs="+", default=list(_CHUNK_BUILDERS), choices=list(_CHUNK_BUILDERS))
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--rows", type=int, help="rows per table")
+    target.add_argument("--size", help="approximate on-disk size per table, e.g. 2GB")
+    parser.add_argument("--out", default="./data/synthetic", help="output directory")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--days", type=float, default=DEFAULT_STREAM_DAYS, help="days of history to cover")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--workers", type=int, default=1, help="processes generating chunks")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    anchor = now()
+    for name in args.tables:
+        rows = args.rows if args.rows is not None else int(parse_size(args.size) / estimate_row_bytes(name))
+        logger.info("Writing %s: %d rows", name, rows)
+        summary = write_table(name, rows, args.out, args.seed, anchor, args.days, args.chunk_rows, args.workers)
+        logger.info("  %d rows in %d files, %.1f MB", summary["rows"], summary["files"], summary["bytes"] / 1024 ** 2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
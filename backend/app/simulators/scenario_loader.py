@@ -0,0 +1,340 @@
+"""
+Scenario Loader
+---------------
+Reads scenario YAML files (see SCENARIO_FORMAT.md) from the scenarios
+directory, validates them and compiles them into the runtime shape used by
+the scenario runner.
+
+Compiled scenarios are cached on disk keyed on each file's mtime and
+SHA-256, so a restart only re-parses files that actually changed. Nothing
+is read until a scenario is first requested, and the directory is re-scanned
+(stat calls only) at most every reload_interval seconds, which picks up
+added, edited and deleted files without a restart.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+
+DIFFICULTIES = ("beginner", "intermediate", "advanced", "expert")
+SEVERITIES = ("informational", "low", "medium", "high", "critical")
+EVENT_TYPES = ("log", "alert")
+
+_ID_RE = re.compile(r"^[a-z0-9]+(?:-[a-z0-9]+)*$")
+
+
+class ScenarioValidationError(ValueError):
+    def __init__(self, path: str, errors: List[str]):
+        self.path = path
+        self.errors = errors
+        super().__init__(f"{path}: " + "; ".join(errors))
+
+
+# ─── Validation ──────────────────────────────────────────────────────────────
+
+def validate_scenario(raw: Any) -> List[str]:
+    """Return a list of problems with a parsed scenario document (empty if valid)."""
+    if not isinstance(raw, dict):
+        return ["scenario must be a mapping"]
+    errors = []
+    scenario_id = raw.get("id")
+    if not isinstance(scenario_id, str) or not _ID_RE.match(scenario_id):
+        errors.append("id must be a kebab-case string")
+    if not raw.get("name"):
+        errors.append("name is required")
+    if str(raw.get("difficulty", "")).lower() not in DIFFICULTIES:
+        errors.append(f"difficulty must be one of {list(DIFFICULTIES)}")
+
+    stages = raw.get("stages")
+    if not isinstance(stages, list) or not stages:
+        errors.append("stages must be a non-empty list")
+        stages = []
+    for i, stage in enumerate(stages):
+        where = f"stages[{i}]"
+        if not isinstance(stage, dict):
+            errors.append(f"{where} must be a mapping")
+            continue
+        if not isinstance(stage.get("delay_minutes", 0), (int, float)):
+            errors.append(f"{where}.delay_minutes must be a number")
+        for j, event in enumerate(stage.get("events") or []):
+            errors.extend(_validate_event(event, f"{where}.events[{j}]"))
+
+    incident = raw.get("incident")
+    if not isinstance(incident, dict):
+        errors.append("incident is required")
+    else:
+        if not incident.get("title"):
+            errors.append("incident.title is required")
+        if str(incident.get("severity", "")).lower() not in SEVERITIES:
+            errors.append(f"incident.severity must be one of {list(SEVERITIES)}")
+    return errors
+
+
+def _validate_event(event: Any, where: str) -> List[str]:
+    if not isinstance(event, dict):
+        return [f"{where} must be a mapping"]
+    errors = []
+    kind = event.get("type")
+    if kind not in EVENT_TYPES:
+        errors.append(f"{where}.type must be one of {list(EVENT_TYPES)}")
+    data = event.get("data")
+    if not isinstance(data, dict):
+        errors.append(f"{where}.data must be a mapping")
+        data = {}
+    if kind == "log" and not event.get("table"):
+        errors.append(f"{where}.table is required for log events")
+    if kind == "alert":
+        if not event.get("product"):
+            errors.append(f"{where}.product is required for alert events")
+        if not data.get("title"):
+            errors.append(f"{where}.data.title is required for alert events")
+        if str(data.get("severity", "")).lower() not in SEVERITIES:
+            errors.append(f"{where}.data.severity must be one of {list(SEVERITIES)}")
+    if not isinstance(event.get("delay_seconds", 0), (int, float)):
+        errors.append(f"{where}.delay_seconds must be a number")
+    return errors
+
+
+# ─── Compilation ─────────────────────────────────────────────────────────────
+
+def _entity_of(data: dict, default: str) -> str:
+    if data.get("entity"):
+        return str(data["entity"])
+    for entity in data.get("entities") or []:
+        for key in ("upn", "hostname", "name", "ip", "address"):
+            if isinstance(entity, dict) and entity.get(key):
+                return str(entity[key])
+    return default
+
+
+def compile_scenario(raw: dict) -> dict:
+    """
+    Turn a validated scenario document into the runtime shape used by
+    scenario_runner: alerts and incident in API form, plus every log and
+    alert event with its offset in seconds from scenario start.
+    """
+    environment = raw.get("environment") or {}
+    users = [u.get("upn") for u in environment.get("users") or [] if u.get("upn")]
+    default_entity = users[0] if users else ""
+    techniques = [t.get("id") for t in raw.get("mitre_techniques") or [] if t.get("id")]
+
+    alerts, logs = [], []
+    for stage in raw["stages"]:
+        stage_offset = float(stage.get("delay_minutes", 0)) * 60
+        for event in stage.get("events") or []:
+            offset = stage_offset + float(event.get("delay_seconds", 0))
+            data = event.get("data") or {}
+            if event["type"] == "alert":
+                alerts.append({
+                    "title": data["title"],
+                    "severity": str(data["severity"]).capitalize(),
+                    "product": event["product"],
+                    "category": data.get("category", ""),
+                    "description": data.get("description", ""),
+                    "entity": _entity_of(data, default_entity),
+                    "mitre": data.get("mitre_technique", ""),
+                    "status": "New",
+                    "offset_seconds": offset,
+                    "stage": stage.get("name", ""),
+                })
+            else:
+                logs.append({
+                    "table": event["table"],
+                    "offset_seconds": offset,
+                    "repeat": int(event.get("repeat", 1)),
+                    "repeat_interval_ms": float(event.get("repeat_interval_ms", 0)),
+                    "data": data,
+                    "stage": stage.get("name", ""),
+                })
+
+    incident = raw["incident"]
+    return {
+        "name": raw["name"],
+        "difficulty": str(raw["difficulty"]).capitalize(),
+        "description": " ".join(str(raw.get("description", "")).split()),
+        "alerts": alerts,
+        "logs": logs,
+        "incident": {
+            "title": incident["title"],
+            "severity": str(incident["severity"]).capitalize(),
+            "description": " ".join(str(incident.get("description") or raw.get("description", "")).split()),
+            "entities": incident.get("entities") or users,
+            "mitre_techniques": incident.get("mitre_techniques") or techniques,
+        },
+    }
+
+
+def parse_scenario_file(path: str, content: bytes) -> Tuple[str, dict]:
+    """Parse, validate and compile one scenario file; returns (id, compiled)."""
+    import yaml
+
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    try:
+        raw = yaml.load(content, Loader=loader)
+    except yaml.YAMLError as exc:
+        raise ScenarioValidationError(path, [f"invalid YAML: {exc}"])
+    errors = validate_scenario(raw)
+    if errors:
+        raise ScenarioValidationError(path, errors)
+    return raw["id"], compile_scenario(raw)
+
+
+# ─── Catalog ─────────────────────────────────────────────────────────────────
+
+class ScenarioCatalog:
+    """Compiled scenarios from a directory tree of YAML files, hot-reloaded."""
+
+    def __init__(self, root: str, cache_path: Optional[str] = None, reload_interval: float = 2.0):
+        self.root = root
+        self.cache_path = cache_path or None
+        self.reload_interval = reload_interval
+        self.errors: Dict[str, List[str]] = {}
+        self._entries: Optional[Dict[str, dict]] = None  # path -> cache entry
+        self._scenarios: Dict[str, dict] = {}
+        self._last_scan = 0.0
+        self._lock = threading.RLock()
+
+    def get(self, scenario_id: str) -> Optional[dict]:
+        return self.all().get(scenario_id)
+
+    def all(self) -> Dict[str, dict]:
+        self.refresh()
+        return self._scenarios
+
+    def refresh(self, force: bool = False):
+        """Re-scan the directory if the reload interval has passed."""
+        with self._lock:
+            if not force and self._entries is not None and time.monotonic() - self._last_scan < self.reload_interval:
+                return
+            first = self._entries is None
+            if first:
+                self._entries = self._load_cache()
+            changed = self._scan()
+            self._last_scan = time.monotonic()
+            if changed or first:
+                self._rebuild()
+            if changed:
+                self._save_cache()
+
+    def _files(self) -> List[str]:
+        found = []
+        for directory, _, names in os.walk(self.root):
+            found.extend(os.path.join(directory, n) for n in names if n.endswith((".yaml", ".yml")))
+        return sorted(found)
+
+    def _scan(self) -> bool:
+        entries, changed = {}, False
+        for path in self._files():
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            entry = self._entries.get(path)
+            if entry is not None and entry["mtime_ns"] == mtime:
+                entries[path] = entry
+                continue
+
+            with open(path, "rb") as fh:
+                content = fh.read()
+            digest = hashlib.sha256(content).hexdigest()
+            if entry is not None and entry["sha256"] == digest:
+                # Touched but not edited: keep the compiled form.
+                entries[path] = {**entry, "mtime_ns": mtime}
+                changed = True
+                continue
+
+            changed = True
+            try:
+                scenario_id, compiled = parse_scenario_file(path, content)
+            except ScenarioValidationError as exc:
+                logger.warning("Skipping invalid scenario %s: %s", path, "; ".join(exc.errors))
+                # Keep serving the last good version of the file, if any.
+                kept = {k: entry[k] for k in ("id", "scenario") if entry and k in entry}
+                entries[path] = {**kept, "mtime_ns": mtime, "sha256": digest, "errors": exc.errors}
+                continue
+            logger.info("Loaded scenario %s from %s", scenario_id, path)
+            entries[path] = {"mtime_ns": mtime, "sha256": digest, "id": scenario_id, "scenario": compiled}
+
+        if set(entries) != set(self._entries):
+            changed = True
+        self._entries = entries
+        return changed
+
+    def _rebuild(self):
+        scenarios, errors = {}, {}
+        for path, entry in self._entries.items():
+            if entry.get("errors"):
+                errors[path] = entry["errors"]
+            if "scenario" not in entry:
+                continue
+            if entry["id"] in scenarios:
+                errors[path] = [f"duplicate scenario id '{entry['id']}'"]
+                continue
+            scenarios[entry["id"]] = {**entry["scenario"], "source": path}
+        self._scenarios = scenarios
+        self.errors = errors
+
+    def _load_cache(self) -> Dict[str, dict]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path) as fh:
+                cached = json.load(fh)
+        except (OSError, ValueError):
+            return {}
+        if cached.get("version") != CACHE_VERSION or cached.get("root") != os.path.abspath(self.root):
+            return {}
+        return cached.get("entries", {})
+
+    def _save_cache(self):
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            tmp = f"{self.cache_path}.tmp"
+            with open(tmp, "w") as fh:
+                json.dump(
+                    {"version": CACHE_VERSION, "root": os.path.abspath(self.root), "entries": self._entries},
+                    fh, default=str,
+                )
+            os.replace(tmp, self.cache_path)
+        except OSError as exc:
+            logger.warning("Could not write scenario cache %s: %s", self.cache_path, exc)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Validate scenario YAML files.")
+    parser.add_argument("paths", nargs="+", help="scenario files to check")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for path in args.paths:
+        with open(path, "rb") as fh:
+            content = fh.read()
+        try:
+            scenario_id, compiled = parse_scenario_file(path, content)
+        except ScenarioValidationError as exc:
+            failed += 1
+            print(f"FAIL {path}")
+            for error in exc.errors:
+                print(f"  - {error}")
+            continue
+        print(f"OK   {path} ({scenario_id}: {len(compiled['alerts'])} alerts, {len(compiled['logs'])} log events)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(main())
@@ -2,38 +2,77 @@
 Scenario Runner
 Loads YAML scenario files and injects synthetic alerts and incidents
 into the in-memory data store when a user starts a lab.
+
+Scenarios come from the YAML files under SCENARIOS_PATH; the definitions
+below are built-in fallbacks and are overridden by a YAML file with the
+same id.
 """
 
+import os
 import uuid
 import random
 from datetime import datetime, timezone
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.simulators.entity_index import alert_entities, record_entities
+from app.simulators.lab_sessions import LabEnvironment
+from app.simulators.scenario_loader import ScenarioCatalog
+
+# ── Incident and alert stores ─────────────────────────────────────────────────
+# Each lab environment (see lab_sessions) holds its own incident and alert
+# RecordStores; every function here takes the environment to act on.
+
+def get_all_incidents(env: LabEnvironment) -> List[dict]:
+    return env.incidents.values()
+
+
+def get_all_alerts(env: LabEnvironment) -> List[dict]:
+    return env.alerts.values()
 
-# ── In-memory store for active incidents and alerts ───────────────────────────
 
-_incidents: Dict[str, dict] = {}
-_alerts: Dict[str, dict] = {}
+def page_incidents(
+    env: LabEnvironment, severity: Optional[str] = None, status: Optional[str] = None,
+    scenario_id: Optional[str] = None, limit: int = 50, cursor: Optional[str] = None,
+) -> Tuple[List[dict], Optional[str], int]:
+    """A page of incidents, newest first: (incidents, next cursor, total matches)."""
+    return env.incidents.page({"severity": severity, "status": status, "scenarioId": scenario_id}, limit, cursor)
 
 
-def get_all_incidents() -> List[dict]:
-    return sorted(_incidents.values(), key=lambda x: x["createdTime"], reverse=True)
+def page_alerts(
+    env: LabEnvironment, severity: Optional[str] = None, status: Optional[str] = None,
+    scenario_id: Optional[str] = None, limit: int = 50, cursor: Optional[str] = None,
+) -> Tuple[List[dict], Optional[str], int]:
+    """A page of alerts, newest first: (alerts, next cursor, total matches)."""
+    return env.alerts.page({"severity": severity, "status": status, "scenarioId": scenario_id}, limit, cursor)
 
 
-def get_all_alerts() -> List[dict]:
-    return sorted(_alerts.values(), key=lambda x: x["createdTime"], reverse=True)
+def incident_changes(
+    env: LabEnvironment, since: int, severity: Optional[str] = None, status: Optional[str] = None,
+    scenario_id: Optional[str] = None, limit: int = 500,
+) -> Tuple[List[dict], List[str], int, bool]:
+    """Incidents changed after a store version: (incidents, removed ids, next version, more)."""
+    return env.incidents.changes_since(since, {"severity": severity, "status": status, "scenarioId": scenario_id}, limit)
 
 
-def get_incident(incident_id: str) -> Optional[dict]:
-    return _incidents.get(incident_id)
+def alert_changes(
+    env: LabEnvironment, since: int, severity: Optional[str] = None, status: Optional[str] = None,
+    scenario_id: Optional[str] = None, limit: int = 500,
+) -> Tuple[List[dict], List[str], int, bool]:
+    """Alerts changed after a store version: (alerts, removed ids, next version, more)."""
+    return env.alerts.changes_since(since, {"severity": severity, "status": status, "scenarioId": scenario_id}, limit)
 
 
-def get_alert(alert_id: str) -> Optional[dict]:
-    return _alerts.get(alert_id)
+def get_incident(env: LabEnvironment, incident_id: str) -> Optional[dict]:
+    return env.incidents.get(incident_id)
 
 
-def clear_all():
-    _incidents.clear()
-    _alerts.clear()
+def get_alert(env: LabEnvironment, alert_id: str) -> Optional[dict]:
+    return env.alerts.get(alert_id)
+
+
+def clear_all(env: LabEnvironment):
+    env.reset()
 
 
 # ── Scenario Definitions ──────────────────────────────────────────────────────
@@ -340,42 +379,49 @@ SCENARIOS = {
 }
 
 
+_catalog = ScenarioCatalog(
+    settings.SCENARIOS_PATH,
+    cache_path=settings.SCENARIO_CACHE_PATH,
+    reload_interval=settings.SCENARIO_RELOAD_SECONDS,
+)
+
+
+def all_scenarios() -> Dict[str, dict]:
+    """Built-in scenarios overlaid with those loaded from YAML."""
+    return {**SCENARIOS, **_catalog.all()}
+
+
+def get_scenario(scenario_id: str) -> Optional[dict]:
+    return _catalog.get(scenario_id) or SCENARIOS.get(scenario_id)
+
+
 # ── Runner ────────────────────────────────────────────────────────────────────
 
-def start_scenario(scenario_id: str) -> dict:
-    """
-    Inject alerts and incidents from a scenario into the in-memory store.
-    Returns the created incident.
-    """
-    scenario = SCENARIOS.get(scenario_id)
-    if not scenario:
-        raise ValueError(f"Scenario '{scenario_id}' not found")
+def new_ids(count: int) -> List[str]:
+    """Random (version 4) UUID strings, drawn from a single urandom call."""
+    raw = os.urandom(16 * count)
+    return [str(uuid.UUID(bytes=raw[i * 16:(i + 1) * 16], version=4)) for i in range(count)]
+
+
+def alert_template(scenario_id: str, alert_def: dict) -> dict:
+    """An alert record from a scenario definition, minus its id and createdTime."""
+    return {
+        "title": alert_def["title"],
+        "severity": alert_def["severity"],
+        "product": alert_def["product"],
+        "category": alert_def["category"],
+        "description": alert_def["description"],
+        "entity": alert_def["entity"],
+        "mitreAttackTechnique": alert_def["mitre"],
+        "status": alert_def["status"],
+        "scenarioId": scenario_id,
+    }
 
-    now = datetime.now(timezone.utc)
-    alert_ids = []
-
-    for alert_def in scenario["alerts"]:
-        alert_id = str(uuid.uuid4())
-        alert = {
-            "id": alert_id,
-            "title": alert_def["title"],
-            "severity": alert_def["severity"],
-            "product": alert_def["product"],
-            "category": alert_def["category"],
-            "description": alert_def["description"],
-            "entity": alert_def["entity"],
-            "mitreAttackTechnique": alert_def["mitre"],
-            "status": alert_def["status"],
-            "createdTime": now.isoformat(),
-            "scenarioId": scenario_id,
-        }
-        _alerts[alert_id] = alert
-        alert_ids.append(alert_id)
 
-    incident_id = str(uuid.uuid4())
+def incident_template(scenario_id: str, scenario: dict) -> dict:
+    """An incident record for a scenario, minus its id, alerts and createdTime."""
     inc_def = scenario["incident"]
-    incident = {
-        "id": incident_id,
+    return {
         "title": inc_def["title"],
         "severity": inc_def["severity"],
         "description": inc_def["description"],
@@ -383,30 +429,84 @@ def start_scenario(scenario_id: str) -> dict:
         "assignedTo": None,
         "entities": inc_def["entities"],
         "mitreAttackTechniques": inc_def["mitre_techniques"],
-        "alertIds": alert_ids,
-        "alertCount": len(alert_ids),
-        "createdTime": now.isoformat(),
         "scenarioId": scenario_id,
         "scenarioName": scenario["name"],
     }
-    _incidents[incident_id] = incident
 
+
+def create_alerts(env: LabEnvironment, templates: List[dict], created: Optional[datetime] = None) -> List[dict]:
+    """Store one alert per template in a single batch."""
+    created_time = (created or datetime.now(timezone.utc)).isoformat()
+    alerts = [
+        {"id": alert_id, **template, "createdTime": created_time}
+        for alert_id, template in zip(new_ids(len(templates)), templates)
+    ]
+    env.alerts.insert_many(alerts)
+    env.entities.set_many("alert", ((alert["id"], alert_entities(alert)) for alert in alerts))
+    return alerts
+
+
+def create_incidents(env: LabEnvironment, templates: List[dict], created: Optional[datetime] = None) -> List[dict]:
+    """Store one incident (with no alerts yet) per template in a single batch."""
+    created_time = (created or datetime.now(timezone.utc)).isoformat()
+    incidents = [
+        {"id": incident_id, **template, "alertIds": [], "alertCount": 0, "createdTime": created_time}
+        for incident_id, template in zip(new_ids(len(templates)), templates)
+    ]
+    env.incidents.insert_many(incidents)
+    env.entities.set_many("incident", ((i["id"], record_entities(i["entities"])) for i in incidents))
+    return incidents
+
+
+def create_alert(env: LabEnvironment, scenario_id: str, alert_def: dict, created: Optional[datetime] = None) -> dict:
+    """Store one alert from a scenario definition."""
+    return create_alerts(env, [alert_template(scenario_id, alert_def)], created)[0]
+
+
+def create_incident(
+    env: LabEnvironment, scenario_id: str, scenario: dict, alert_ids: List[str], created: Optional[datetime] = None
+) -> dict:
+    """Store the incident for a scenario run, grouping the given alerts."""
+    template = {**incident_template(scenario_id, scenario), "alertIds": alert_ids, "alertCount": len(alert_ids)}
+    incident = {"id": new_ids(1)[0], **template, "createdTime": (created or datetime.now(timezone.utc)).isoformat()}
+    env.incidents.insert(incident)
+    env.entities.set("incident", incident["id"], record_entities(incident["entities"]))
     return incident
-def update_incident_status(incident_id: str, status: str, assigned_to: str = None) -> dict:
+
+
+def attach_alert(env: LabEnvironment, incident: dict, alert: dict):
+    alert_ids = incident["alertIds"] + [alert["id"]]
+    env.incidents.update(incident["id"], alertIds=alert_ids, alertCount=len(alert_ids))
+
+
+def start_scenario(env: LabEnvironment, scenario_id: str) -> dict:
+    """
+    Inject alerts and incidents from a scenario into an environment at once.
+    Returns the created incident.
+    """
+    scenario = get_scenario(scenario_id)
+    if not scenario:
+        raise ValueError(f"Scenario '{scenario_id}' not found")
+
+    now = datetime.now(timezone.utc)
+    alert_ids = [create_alert(env, scenario_id, alert_def, now)["id"] for alert_def in scenario["alerts"]]
+    return create_incident(env, scenario_id, scenario, alert_ids, now)
+
+
+def update_incident_status(env: LabEnvironment, incident_id: str, status: str, assigned_to: str = None) -> dict:
     """Update the status and assignee of an incident."""
-    incident = _incidents.get(incident_id)
+    incident = env.incidents.get(incident_id)
     if not incident:
         raise ValueError(f"Incident '{incident_id}' not found")
-    incident["status"] = status
+    changes = {"status": status}
     if assigned_to is not None:
-        incident["assignedTo"] = assigned_to
-    return incident
+        changes["assignedTo"] = assigned_to
+    return env.incidents.update(incident_id, **changes)
 
 
-def update_alert_status(alert_id: str, status: str) -> dict:
+def update_alert_status(env: LabEnvironment, alert_id: str, status: str) -> dict:
     """Update the status of an alert."""
-    alert = _alerts.get(alert_id)
+    alert = env.alerts.get(alert_id)
     if not alert:
         raise ValueError(f"Alert '{alert_id}' not found")
-    alert["status"] = status
-    return alert
\ No newline at end of file
+    return env.alerts.update(alert_id, status=status)
\ No newline at end of file
@@ -0,0 +1,306 @@
+"""
+Scenario Timeline Scheduler
+---------------------------
+Replays scenario timelines in (compressed) real time: log events are
+appended to the lab environment's KQL tables and alerts are attached to
+the run's incident when their stage and event delays come due, instead of
+everything being injected at once.
+
+Every pending event of every run sits on a single heap keyed by due time,
+and one driver task sleeps until the earliest entry is due, so thousands of
+concurrent runs cost one task and one heap entry per event. Log rows that
+come due together are batched per environment and table into a single
+append. Runs whose lab session has been dropped stop at their next event.
+
+In an environment with an alert correlator, runs create no incident up
+front: their alerts are handed to the correlator, which groups them into
+incidents by shared entity.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from app.core.metrics import metrics
+from app.simulators.lab_sessions import LabEnvironment
+from app.simulators.scenario_runner import (
+    alert_template, attach_alert, create_alerts, create_incidents, get_scenario, incident_template,
+)
+
+logger = logging.getLogger(__name__)
+
+SCENARIO_EVENTS = metrics.counter(
+    "scenario_events_fired_total", "Scenario timeline events fired by the scheduler.", ["kind"]
+)
+
+MAX_FINISHED_RUNS = 1000
+
+
+# ─── Runs ────────────────────────────────────────────────────────────────────
+
+class ScenarioRun:
+    """One playback of a scenario timeline."""
+
+    __slots__ = (
+        "id", "env", "scenario_id", "incident", "events", "compression",
+        "started", "started_at", "fired", "alerts_created", "cancelled",
+    )
+
+    def __init__(
+        self, env: LabEnvironment, scenario_id: str, incident: Optional[dict],
+        events: List[Tuple[float, str, dict]], compression: float,
+    ):
+        self.id = str(uuid.uuid4())
+        self.env = env
+        self.scenario_id = scenario_id
+        # The run's own incident; with correlation, the one its latest alert joined
+        self.incident = incident
+        # (offset_seconds, "alert" | "log", alert template or log event), sorted by offset;
+        # shared by every run of the same scenario
+        self.events = events
+        self.compression = compression
+        self.started = time.monotonic()
+        self.started_at = datetime.now(timezone.utc)
+        self.fired = 0
+        self.alerts_created = 0
+        self.cancelled = False
+
+    @property
+    def incident_id(self) -> Optional[str]:
+        return self.incident["id"] if self.incident else None
+
+    @property
+    def finished(self) -> bool:
+        return self.cancelled or self.fired == len(self.events)
+
+    def due(self, offset: float) -> float:
+        """Monotonic time at which an event at the given scenario offset fires."""
+        return self.started + (offset / self.compression if self.compression > 0 else 0.0)
+
+    def status(self) -> dict:
+        duration = self.events[-1][0] if self.events else 0.0
+        return {
+            "run_id": self.id,
+            "session": self.env.session_id,
+            "scenario_id": self.scenario_id,
+            "incident_id": self.incident_id,
+            "state": "cancelled" if self.cancelled else "completed" if self.finished else "running",
+            "started_at": self.started_at.isoformat(),
+            "compression": self.compression,
+            "events_fired": self.fired,
+            "events_total": len(self.events),
+            "alerts_created": self.alerts_created,
+            "duration_seconds": round(duration / self.compression if self.compression > 0 else 0.0, 3),
+        }
+
+
+# ─── Scheduler ───────────────────────────────────────────────────────────────
+
+class TimelineScheduler:
+    """Single-task timer heap driving every active scenario run."""
+
+    def __init__(self, compression: float = 60.0):
+        self.compression = compression
+        self._heap: List[Tuple[float, int, str, int]] = []  # (due, seq, run id, event index)
+        self._seq = itertools.count()
+        self._runs: Dict[str, ScenarioRun] = {}
+        self._finished: Deque[str] = deque()  # ids of finished runs, oldest first
+        self._pending: Dict[Tuple[LabEnvironment, str], List[dict]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def schedule(self, env: LabEnvironment, scenario_id: str, compression: Optional[float] = None) -> ScenarioRun:
+        """
+        Start a run: create its incident now (unless the environment correlates
+        alerts) and queue every timeline event.
+        Must be called from the event loop; events already due (offset 0, or
+        every event when compression is 0) fire before this returns.
+        """
+        return self.schedule_many([(env, scenario_id)], compression)[0]
+
+    def schedule_many(
+        self, launches: Sequence[Tuple[LabEnvironment, str]], compression: Optional[float] = None
+    ) -> List[ScenarioRun]:
+        """
+        Start one run per (environment, scenario id) pair. Each scenario's
+        timeline and incident template are built once, incidents are stored
+        in one batch per environment and the heap is extended in one step.
+        """
+        compression = self.compression if compression is None else compression
+        if compression < 0:
+            raise ValueError("compression must be zero or positive")
+        plans: Dict[str, Tuple[dict, List[Tuple[float, str, dict]]]] = {}
+        for _, scenario_id in launches:
+            if scenario_id not in plans:
+                scenario = get_scenario(scenario_id)
+                if not scenario:
+                    raise ValueError(f"Scenario '{scenario_id}' not found")
+                plans[scenario_id] = (incident_template(scenario_id, scenario), _timeline(scenario_id, scenario))
+
+        by_env: Dict[LabEnvironment, List[int]] = {}
+        for position, (env, _) in enumerate(launches):
+            by_env.setdefault(env, []).append(position)
+        runs: List[Optional[ScenarioRun]] = [None] * len(launches)
+        for env, positions in by_env.items():
+            if env.correlator is not None:
+                incidents = [None] * len(positions)
+            else:
+                incidents = create_incidents(env, [plans[launches[p][1]][0] for p in positions])
+            for position, incident in zip(positions, incidents):
+                scenario_id = launches[position][1]
+                runs[position] = ScenarioRun(env, scenario_id, incident, plans[scenario_id][1], compression)
+
+        entries = []
+        for run in runs:
+            self._runs[run.id] = run
+            entries.extend((run.due(offset), next(self._seq), run.id, i) for i, (offset, _, _) in enumerate(run.events))
+            if not run.events:
+                self._finish(run)
+        if len(entries) > len(self._heap) // 4:
+            self._heap.extend(entries)
+            heapq.heapify(self._heap)
+        else:
+            for entry in entries:
+                heapq.heappush(self._heap, entry)
+
+        self._ensure_driver()
+        self._fire_due(time.monotonic())
+        self._wakeup.set()
+        return runs
+
+    def get(self, run_id: str) -> Optional[ScenarioRun]:
+        return self._runs.get(run_id)
+
+    def runs(self, env: Optional[LabEnvironment] = None) -> List[ScenarioRun]:
+        return [run for run in self._runs.values() if env is None or run.env is env]
+
+    def cancel(self, run_id: str) -> bool:
+        """Stop a run; its queued events are skipped as they come off the heap."""
+        run = self._runs.get(run_id)
+        if run is None or run.finished:
+            return False
+        run.cancelled = True
+        self._finish(run)
+        return True
+
+    def cancel_all(self, env: Optional[LabEnvironment] = None):
+        """Stop every run, or every run of one environment."""
+        for run in self.runs(env):
+            if not run.finished:
+                run.cancelled = True
+                self._finish(run)
+        if env is None:
+            self._heap.clear()
+
+    @property
+    def active(self) -> int:
+        return len(self._runs) - len(self._finished)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _ensure_driver(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._drive(), name="scenario-scheduler")
+
+    async def _drive(self):
+        while True:
+            self._wakeup.clear()
+            if self._pending:
+                batches, self._pending = self._pending, {}
+                try:
+                    await asyncio.to_thread(self._append_logs, batches)
+                except Exception:
+                    logger.exception("Failed to append scenario log rows")
+                continue
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            delay = self._heap[0][0] - time.monotonic()
+            if delay > 0:
+                try:
+                    # Woken early when a new run queues an earlier event.
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._fire_due(time.monotonic())
+
+    def _fire_due(self, now: float):
+        fired_at = datetime.now(timezone.utc)
+        due_alerts: Dict[LabEnvironment, List[Tuple[ScenarioRun, dict]]] = {}
+        while self._heap and self._heap[0][0] <= now:
+            _, _, run_id, index = heapq.heappop(self._heap)
+            run = self._runs.get(run_id)
+            if run is None or run.cancelled:
+                continue
+            if run.env.closed:
+                run.cancelled = True
+                self._finish(run)
+                continue
+            _, kind, definition = run.events[index]
+            if kind == "alert":
+                due_alerts.setdefault(run.env, []).append((run, definition))
+            else:
+                rows = _log_rows(definition, fired_at, run.compression)
+                self._pending.setdefault((run.env, definition["table"]), []).extend(rows)
+            run.fired += 1
+            SCENARIO_EVENTS.inc(kind=kind)
+            if run.finished:
+                self._finish(run)
+
+        # Alerts due together are stored in one batch per environment.
+        for env, items in due_alerts.items():
+            alerts = create_alerts(env, [template for _, template in items], fired_at)
+            if env.correlator is not None:
+                for (run, _), incident in zip(items, env.correlator.ingest_many(alerts)):
+                    run.incident = incident or run.incident
+                    run.alerts_created += 1
+                continue
+            for (run, _), alert in zip(items, alerts):
+                attach_alert(env, run.incident, alert)
+                run.alerts_created += 1
+
+    def _append_logs(self, batches: Dict[Tuple[LabEnvironment, str], List[dict]]):
+        for (env, table), rows in batches.items():
+            df = pd.DataFrame(rows)
+            df["TimeGenerated"] = pd.to_datetime(df["TimeGenerated"], utc=True)
+            env.registry.append(table, df)
+
+    def _finish(self, run: ScenarioRun):
+        """Keep a finished run's status around, forgetting the oldest beyond MAX_FINISHED_RUNS."""
+        self._finished.append(run.id)
+        while len(self._finished) > MAX_FINISHED_RUNS:
+            self._runs.pop(self._finished.popleft(), None)
+
+def _timeline(scenario_id: str, scenario: dict) -> List[Tuple[float, str, dict]]:
+    events = [(float(a.get("offset_seconds", 0)), "alert", alert_template(scenario_id, a)) for a in scenario["alerts"]]
+    events += [(float(e["offset_seconds"]), "log", e) for e in scenario.get("logs", [])]
+    events.sort(key=lambda e: e[0])
+    return events
+
+
+def _log_rows(event: dict, fired_at: datetime, compression: float) -> List[dict]:
+    """The rows one log event contributes, spaced by its repeat interval."""
+    spacing = event["repeat_interval_ms"] / compression if compression > 0 else 0.0
+    rows = []
+    for i in range(max(event["repeat"], 1)):
+        row = dict(event["data"])
+        row.setdefault("TimeGenerated", fired_at + timedelta(milliseconds=i * spacing))
+        rows.append(row)
+    return rows
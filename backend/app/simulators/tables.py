@@ -0,0 +1,145 @@
+"""
+KQL Table Registry
+------------------
+The process-wide registry of synthetic log tables served by the API.
+
+Tables are registered lazily: nothing is generated at import time. Each
+table is built on its first query, or ahead of time by the background
+warm-up task the application starts from its lifespan hook. Every table
+shares one time anchor, so tables generated minutes apart still line up.
+When live telemetry is enabled, the emitter appends new events to the same
+registry, as does the scheduler replaying scenario timelines for the
+default lab environment; other lab sessions layer their scenario rows over
+these tables without copying them.
+"""
+
+import asyncio
+import logging
+import secrets
+from datetime import datetime, timezone
+from functools import partial
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.live_updates import LiveUpdateHub
+from app.services.persistence import WriteBehindJournal
+from app.simulators.devices import build_device_store
+from app.simulators.kql_engine import TableRegistry
+from app.simulators.lab_sessions import SessionManager
+from app.simulators.log_data import DEFAULT_TABLE_ROWS, generate_table, table_schema
+from app.simulators.scenario_scheduler import TimelineScheduler
+from app.simulators.telemetry import TelemetryEmitter
+
+logger = logging.getLogger(__name__)
+
+def _generate(name: str, rows: int, seed: Optional[int], anchor: datetime):
+    logger.info("Generating %s (%d rows)", name, rows)
+    return generate_table(name, rows, seed=seed, anchor=anchor)
+
+
+def build_registry(seed: Optional[int] = None, anchor: Optional[datetime] = None) -> TableRegistry:
+    """A registry with every synthetic table registered lazily."""
+    anchor = anchor or datetime.now(timezone.utc)
+    registry = TableRegistry()
+    for name, rows in DEFAULT_TABLE_ROWS.items():
+        registry.register_lazy(name, partial(_generate, name, rows, seed, anchor), partial(table_schema, name))
+    return registry
+
+
+# Fixed for the process even without a configured seed, so shard servers
+# can generate the same tables (see kql_shards.generated_sources).
+data_seed = settings.SYNTHETIC_DATA_SEED
+if data_seed is None:
+    data_seed = secrets.randbits(64)
+data_anchor = datetime.now(timezone.utc)
+registry = build_registry(seed=data_seed, anchor=data_anchor)
+
+metrics.gauge(
+    "kql_table_rows", "Rows held in each KQL table.", ["table"],
+    collect=lambda: {(name,): rows for name, (rows, _) in registry.table_sizes().items()},
+)
+metrics.gauge(
+    "kql_table_bytes", "Approximate in-memory size of each KQL table.", ["table"],
+    collect=lambda: {(name,): size for name, (_, size) in registry.table_sizes().items()},
+)
+metrics.gauge(
+    "entity_index_keys", "Distinct entity keys indexed per KQL table.", ["table"],
+    collect=lambda: {(name,): keys for name, (keys, _) in registry.entities.sizes().items()},
+)
+
+emitter: Optional[TelemetryEmitter] = None
+if settings.TELEMETRY_ENABLED:
+    emitter = TelemetryEmitter(
+        registry,
+        eps=settings.TELEMETRY_EPS,
+        profile=settings.TELEMETRY_PROFILE,
+        tables=settings.TELEMETRY_TABLES or None,
+        batch_seconds=settings.TELEMETRY_BATCH_SECONDS,
+        max_batch_rows=settings.TELEMETRY_MAX_BATCH_ROWS,
+        max_lag_seconds=settings.TELEMETRY_MAX_LAG_SECONDS,
+        max_table_rows=settings.TELEMETRY_MAX_TABLE_ROWS,
+        seed=settings.SYNTHETIC_DATA_SEED,
+    )
+    metrics.gauge(
+        "telemetry_achieved_eps", "Events per second appended by the live emitter.",
+        collect=lambda: {(): emitter.status()["achieved_eps"]},
+    )
+    metrics.gauge(
+        "telemetry_lag_seconds", "How far the live emitter's last batch finished behind schedule.",
+        collect=lambda: {(): emitter.status()["lag_seconds"]},
+    )
+
+journal: Optional[WriteBehindJournal] = None
+if settings.PERSISTENCE_ENABLED:
+    journal = WriteBehindJournal(
+        max_pending=settings.PERSISTENCE_MAX_PENDING,
+        batch_size=settings.PERSISTENCE_BATCH_SIZE,
+        flush_seconds=settings.PERSISTENCE_FLUSH_SECONDS,
+    )
+    metrics.gauge(
+        "persistence_pending_writes", "Lab state changes waiting for the write-behind flusher.",
+        collect=lambda: {(): journal.pending},
+    )
+
+sessions = SessionManager(
+    registry,
+    max_sessions=settings.LAB_MAX_SESSIONS,
+    idle_seconds=settings.LAB_SESSION_IDLE_SECONDS,
+    correlation_window=settings.ALERT_CORRELATION_WINDOW_MINUTES * 60 if settings.ALERT_CORRELATION_ENABLED else None,
+    journal=journal,
+)
+metrics.gauge("lab_sessions_active", "Lab sessions with their own environment.", collect=lambda: {(): len(sessions)})
+metrics.gauge(
+    "incident_store_size", "Incidents held in the in-memory stores.",
+    collect=lambda: {(): sum(len(env.incidents) for env in sessions.environments())},
+)
+metrics.gauge(
+    "alert_store_size", "Alerts held in the in-memory stores.",
+    collect=lambda: {(): sum(len(env.alerts) for env in sessions.environments())},
+)
+
+devices = build_device_store(settings.DEVICE_INVENTORY_GENERATED, seed=settings.SYNTHETIC_DATA_SEED)
+metrics.gauge("device_inventory_size", "Devices in the Defender inventory.", collect=lambda: {(): len(devices)})
+
+live_hub = LiveUpdateHub(
+    flush_seconds=settings.LIVE_FLUSH_SECONDS,
+    max_frames=settings.LIVE_MAX_QUEUED_FRAMES,
+    max_subscribers=settings.LIVE_MAX_SUBSCRIBERS,
+)
+metrics.gauge("live_subscribers", "WebSocket clients subscribed to live updates.", collect=lambda: {(): len(live_hub)})
+
+scheduler = TimelineScheduler(compression=settings.SCENARIO_TIME_COMPRESSION)
+metrics.gauge(
+    "scenario_runs_active", "Scenario runs whose timelines are still playing.",
+    collect=lambda: {(): scheduler.active},
+)
+
+
+async def warm_up():
+    """Materialize every lazy table in a worker thread."""
+    try:
+        await asyncio.to_thread(registry.warm_up)
+        logger.info("Warmed up %d KQL tables", len(registry.list_tables()))
+    except Exception:
+        logger.exception("KQL table warm-up failed; tables will load on first query")
@@ -0,0 +1,211 @@
+"""
+Live Telemetry Emitter
+----------------------
+Keeps generating synthetic events after startup and appends them to the
+KQL table registry in micro-batches, so queries run against data that is
+still being written.
+
+The total events-per-second target is split across tables in proportion to
+their default sizes and shaped by a rate profile (constant, diurnal or
+bursty). Each tick covers the wall-clock time since the previous one, so a
+late tick produces one larger batch rather than a backlog of small ones.
+Batches are capped, and once the emitter falls further behind than
+max_lag_seconds it sheds the overdue events and resynchronises. Dropped
+events are counted, and achieved EPS and lag are reported, so a soak test
+shows when ingestion cannot keep up.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.metrics import metrics
+from app.simulators.kql_engine import TableRegistry
+from app.simulators.log_data import DEFAULT_TABLE_ROWS, generate_batch
+
+logger = logging.getLogger(__name__)
+
+TELEMETRY_EVENTS = metrics.counter(
+    "telemetry_events_total", "Synthetic events appended by the live emitter.", ["table"]
+)
+TELEMETRY_DROPPED = metrics.counter(
+    "telemetry_events_dropped_total", "Synthetic events shed because ingestion fell behind.", ["table"]
+)
+
+EPS_WINDOW_SECONDS = 10.0
+
+
+# ─── Rate Profiles ───────────────────────────────────────────────────────────
+
+def _constant(at: datetime) -> float:
+    return 1.0
+
+
+def _diurnal(at: datetime) -> float:
+    # Peaks mid-afternoon UTC, bottoms out overnight at 30% of the peak.
+    hour = at.hour + at.minute / 60
+    return 0.65 + 0.35 * math.cos(2 * math.pi * (hour - 14) / 24)
+
+
+def _bursty(at: datetime) -> float:
+    # A 5x burst for 10 seconds of every minute over a slightly lower baseline.
+    return 5.0 if at.second < 10 else 0.6
+
+
+RATE_PROFILES: Dict[str, Callable[[datetime], float]] = {
+    "constant": _constant,
+    "diurnal": _diurnal,
+    "bursty": _bursty,
+}
+
+
+# ─── Emitter ─────────────────────────────────────────────────────────────────
+
+class TelemetryEmitter:
+    """Background thread appending live synthetic events to a registry."""
+
+    def __init__(
+        self,
+        registry: TableRegistry,
+        eps: float,
+        profile: str = "constant",
+        tables: Optional[List[str]] = None,
+        batch_seconds: float = 1.0,
+        max_batch_rows: int = 50_000,
+        max_lag_seconds: float = 10.0,
+        max_table_rows: int = 1_000_000,
+        seed: Optional[int] = None,
+    ):
+        if profile not in RATE_PROFILES:
+            raise ValueError(f"Unknown rate profile '{profile}'. Must be one of: {list(RATE_PROFILES)}")
+        self.registry = registry
+        self.eps = eps
+        self.profile = profile
+        self.batch_seconds = batch_seconds
+        self.max_batch_rows = max_batch_rows
+        self.max_lag_seconds = max_lag_seconds
+        self.max_table_rows = max_table_rows
+
+        names = tables or list(DEFAULT_TABLE_ROWS)
+        weight = sum(DEFAULT_TABLE_ROWS[n] for n in names)
+        self.rates = {n: eps * DEFAULT_TABLE_ROWS[n] / weight for n in names}
+
+        self._rng = np.random.default_rng(seed)
+        self._carry = {n: 0.0 for n in names}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._recent: Deque[Tuple[float, int]] = deque()
+        self._emitted = {n: 0 for n in names}
+        self._dropped = {n: 0 for n in names}
+        self._batches = 0
+        self._lag = 0.0
+        self._started_at: Optional[datetime] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._started_at = datetime.now(timezone.utc)
+        self._thread = threading.Thread(target=self._run, name="telemetry-emitter", daemon=True)
+        self._thread.start()
+        logger.info("Telemetry emitter started at %.1f EPS (%s)", self.eps, self.profile)
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        interval = self.batch_seconds
+        next_tick = time.monotonic() + interval
+        last_wall = datetime.now(timezone.utc)
+        while not self._stop.wait(max(0.0, next_tick - time.monotonic())):
+            scheduled = next_tick
+            wall = datetime.now(timezone.utc)
+            behind = time.monotonic() - scheduled
+            try:
+                emitted = self.tick(last_wall, wall, shed=behind > self.max_lag_seconds)
+            except Exception:
+                logger.exception("Telemetry tick failed")
+                emitted = 0
+            last_wall = wall
+
+            done = time.monotonic()
+            with self._lock:
+                self._lag = done - scheduled
+                self._batches += 1
+                self._recent.append((done, emitted))
+                while self._recent and done - self._recent[0][0] > EPS_WINDOW_SECONDS:
+                    self._recent.popleft()
+
+            next_tick = scheduled + interval
+            if behind > self.max_lag_seconds:
+                # The overdue events were shed; restart the schedule from now.
+                next_tick = done + interval
+
+    def tick(self, start: datetime, end: datetime, shed: bool = False) -> int:
+        """Emit the events due for [start, end); returns the number appended."""
+        seconds = (end - start).total_seconds()
+        multiplier = RATE_PROFILES[self.profile](end)
+        appended = 0
+        for name, rate in self.rates.items():
+            due = rate * multiplier * seconds + self._carry[name]
+            count = int(due)
+            self._carry[name] = due - count
+            dropped = count if shed else max(count - self.max_batch_rows, 0)
+            count -= dropped
+            if dropped:
+                TELEMETRY_DROPPED.inc(dropped, table=name)
+                with self._lock:
+                    self._dropped[name] += dropped
+            if count <= 0:
+                continue
+            batch = generate_batch(name, count, self._rng, start, end)
+            self.registry.append(name, batch)
+            if self.max_table_rows and len(self.registry.get(name)) > self.max_table_rows * 1.1:
+                # Trim in steps rather than on every batch: trimming rebuilds statistics.
+                self.registry.retain_last(name, self.max_table_rows)
+            TELEMETRY_EVENTS.inc(count, table=name)
+            with self._lock:
+                self._emitted[name] += count
+            appended += count
+        return appended
+
+    def status(self) -> dict:
+        with self._lock:
+            recent = list(self._recent)
+            emitted = dict(self._emitted)
+            dropped = dict(self._dropped)
+            lag, batches = self._lag, self._batches
+        span = recent[-1][0] - recent[0][0] + self.batch_seconds if recent else 0.0
+        achieved = sum(n for _, n in recent) / span if span > 0 else 0.0
+        multiplier = RATE_PROFILES[self.profile](datetime.now(timezone.utc))
+        return {
+            "running": self.running,
+            "profile": self.profile,
+            "started_at": self._started_at.isoformat() if self._started_at else None,
+            "target_eps": round(self.eps * multiplier, 2),
+            "achieved_eps": round(achieved, 2),
+            "lag_seconds": round(lag, 3),
+            "batches": batches,
+            "tables": {
+                name: {
+                    "target_eps": round(rate * multiplier, 2),
+                    "emitted": emitted[name],
+                    "dropped": dropped[name],
+                }
+                for name, rate in self.rates.items()
+            },
+        }
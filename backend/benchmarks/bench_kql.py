@@ -0,0 +1,267 @@
+"""
+KQL Engine Benchmarks
+---------------------
+Generates synthetic log tables at increasing sizes and runs a fixed query
+corpus against them: every KQL challenge solution plus summarize, join
+and time-filter workloads. For each query and table size it records
+latency percentiles, peak traced memory and rows scanned per second, and
+writes a JSON report that can be compared against an earlier run.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_kql --sizes 10000 100000 --output report.json
+    python -m benchmarks.bench_kql --sizes 10000 --compare report.json
+    python -m benchmarks.bench_kql --sizes 100000 --replay slow-queries.jsonl
+"""
+
+import argparse
+import gc
+import json
+import platform
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.simulators import log_data
+from app.simulators.kql_engine import KQLExecutor, TableRegistry
+from app.simulators.kql_querylog import load_jsonl
+
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+GENERATORS = {
+    "SignInLogs": log_data.generate_signin_logs,
+    "SecurityEvent": log_data.generate_security_event,
+    "DeviceProcessEvents": log_data.generate_device_process_events,
+    "DeviceNetworkEvents": log_data.generate_device_network_events,
+    "DeviceLogonEvents": log_data.generate_device_logon_events,
+    "EmailEvents": log_data.generate_email_events,
+    "OfficeActivity": log_data.generate_office_activity,
+    "SecurityAlert": log_data.generate_security_alert,
+}
+
+WORKLOADS = [
+    {
+        "id": "summarize:count-by-two-keys",
+        "query": "SecurityEvent | summarize Count = count() by Computer, EventID",
+    },
+    {
+        "id": "summarize:dcount-and-avg",
+        "query": "DeviceNetworkEvents | summarize Connections = count(), Ports = dcount(RemotePort), "
+                 "AvgLocalPort = avg(LocalPort) by DeviceName",
+    },
+    {
+        "id": "summarize:filtered-top",
+        "query": "SignInLogs | where Status == \"Failure\" | summarize Failures = count() by UserPrincipalName"
+                 " | top 3 by Failures desc",
+    },
+    {
+        "id": "time:ago-count",
+        "query": "SecurityEvent | where TimeGenerated > ago(6h) | count",
+    },
+    {
+        "id": "time:between-summarize",
+        "query": "SignInLogs | where TimeGenerated between (ago(12h) .. ago(6h)) | summarize Count = count() by Location",
+    },
+    {
+        "id": "time:range-and-predicates",
+        "query": "DeviceNetworkEvents | where TimeGenerated > ago(24h) and RemotePort in (445, 3389)"
+                 " and ActionType == \"ConnectionSuccess\" | project TimeGenerated, DeviceName, RemoteIPAddress",
+    },
+    {
+        "id": "join:inner-on-device",
+        "query": "DeviceProcessEvents | summarize Processes = count() by DeviceName"
+                 " | join kind=inner (DeviceNetworkEvents | summarize Connections = count() by DeviceName) on DeviceName",
+    },
+    {
+        "id": "join:leftouter-on-user",
+        "query": "SignInLogs | where Status == \"Failure\" | summarize Failures = count() by UserPrincipalName"
+                 " | join kind=leftouter (OfficeActivity | summarize Operations = count() by UserId"
+                 " | project UserPrincipalName = UserId, Operations) on UserPrincipalName",
+    },
+]
+
+
+def build_corpus() -> List[Dict[str, str]]:
+    """Every KQL challenge solution plus the fixed workloads."""
+    from app.api.sentinel import KQL_CHALLENGES
+
+    corpus = [
+        {"id": f"challenge:{c['id']}", "query": c["example_solution"].replace("\n", " ")}
+        for c in KQL_CHALLENGES
+    ]
+    return corpus + WORKLOADS
+
+
+def replay_corpus(path: str) -> List[Dict[str, str]]:
+    """One query per fingerprint from a slow-query JSONL log."""
+    corpus, seen = [], set()
+    for entry in load_jsonl(path):
+        if entry["fingerprint"] in seen:
+            continue
+        seen.add(entry["fingerprint"])
+        corpus.append({"id": f"replay:{entry['fingerprint']}", "query": entry["query"]})
+    return corpus
+
+
+def referenced_tables(query: str) -> List[str]:
+    return [name for name in GENERATORS if re.search(rf"\b{name}\b", query)]
+
+
+def _percentile(samples: List[float], pct: float) -> float:
+    return float(np.percentile(samples, pct)) if samples else 0.0
+
+
+# ─── Runner ──────────────────────────────────────────────────────────────────
+
+def run_query(executor: KQLExecutor, query: str, scanned_rows: int, repeat: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        executor.execute(query)
+
+    latencies, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = executor.execute(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if result.error:
+            break
+
+    # Memory is measured on a separate run: tracing slows execution down.
+    gc.collect()
+    tracemalloc.start()
+    executor.execute(query)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50 = _percentile(latencies, 50)
+    return {
+        "error": result.error if result else None,
+        "result_rows": result.row_count if result else 0,
+        "scanned_rows": scanned_rows,
+        "runs": len(latencies),
+        "mean_ms": statistics.fmean(latencies) if latencies else 0.0,
+        "p50_ms": p50,
+        "p95_ms": _percentile(latencies, 95),
+        "p99_ms": _percentile(latencies, 99),
+        "max_ms": max(latencies) if latencies else 0.0,
+        "peak_memory_bytes": peak,
+        "rows_per_sec": scanned_rows / (p50 / 1000) if p50 > 0 else 0.0,
+    }
+
+
+def run_benchmarks(sizes: List[int], corpus: List[Dict[str, str]], repeat: int, warmup: int,
+                   executor_factory=KQLExecutor, seed: Optional[int] = 0, gen_workers: int = 1) -> dict:
+    needed = sorted({t for item in corpus for t in referenced_tables(item["query"])})
+    results = []
+    for size in sizes:
+        registry = TableRegistry()
+        gen_start = time.perf_counter()
+        for name in needed:
+            registry.register(name, GENERATORS[name](size, seed=seed, workers=gen_workers))
+        gen_seconds = time.perf_counter() - gen_start
+        print(f"[{size:>10,} rows] generated {len(needed)} tables in {gen_seconds:.1f}s", file=sys.stderr)
+
+        executor = executor_factory(registry)
+        for item in corpus:
+            scanned = size * len(referenced_tables(item["query"]))
+            stats = run_query(executor, item["query"], scanned, repeat, warmup)
+            results.append({"query_id": item["id"], "size": size, **stats})
+            status = f"ERROR {stats['error']}" if stats["error"] else f"p50 {stats['p50_ms']:.1f} ms"
+            print(f"[{size:>10,} rows] {item['id']:<32} {status}", file=sys.stderr)
+
+        close = getattr(executor, "close", None)
+        if close:
+            close()
+        del registry, executor
+        gc.collect()
+
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "repeat": repeat,
+            "warmup": warmup,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+# ─── Comparison ──────────────────────────────────────────────────────────────
+
+def compare_reports(baseline: dict, current: dict, threshold: float) -> List[dict]:
+    """
+    Return the (query, size) pairs whose p50 latency or peak memory grew by
+    more than `threshold` (0.2 = 20%) relative to the baseline report.
+    """
+    previous = {(r["query_id"], r["size"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for row in current["results"]:
+        old = previous.get((row["query_id"], row["size"]))
+        if old is None or old.get("error") or row.get("error"):
+            continue
+        for metric in ("p50_ms", "peak_memory_bytes"):
+            if old[metric] > 0 and row[metric] > old[metric] * (1 + threshold):
+                regressions.append({
+                    "query_id": row["query_id"],
+                    "size": row["size"],
+                    "metric": metric,
+                    "baseline": old[metric],
+                    "current": row[metric],
+                    "change": row[metric] / old[metric] - 1,
+                })
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the KQL engine at several table sizes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per query")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs per query")
+    parser.add_argument("--only", help="regex selecting query ids to run")
+    parser.add_argument("--output", default="bench-report.json", help="where to write the JSON report")
+    parser.add_argument("--compare", help="earlier report to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before flagging (0.2 = 20%%)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the generated tables")
+    parser.add_argument("--gen-workers", type=int, default=1, help="processes used to generate tables")
+    parser.add_argument("--replay", help="slow-query JSONL log to benchmark instead of the built-in corpus")
+    args = parser.parse_args(argv)
+
+    corpus = replay_corpus(args.replay) if args.replay else build_corpus()
+    if args.only:
+        corpus = [item for item in corpus if re.search(args.only, item["id"])]
+
+    report = run_benchmarks(args.sizes, corpus, args.repeat, args.warmup,
+                            seed=args.seed, gen_workers=args.gen_workers)
+    with open(args.output, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"Report written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as fh:
+            baseline = json.load(fh)
+        regressions = compare_reports(baseline, report, args.threshold)
+        for r in regressions:
+            print(
+                f"REGRESSION {r['query_id']} @ {r['size']:,} rows: {r['metric']} "
+                f"{r['baseline']:.1f} -> {r['current']:.1f} ({r['change']:+.0%})",
+                file=sys.stderr,
+            )
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
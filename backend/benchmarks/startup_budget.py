@@ -0,0 +1,87 @@
+"""
+Startup Budget Check
+--------------------
+Measures cold-start cost in a fresh interpreter: importing the application,
+running its lifespan startup until it serves /health, and answering the
+first KQL query (which materializes a lazy table). Exits non-zero when a
+measurement exceeds its budget; tests/test_startup.py runs the same probe
+under pytest with looser budgets.
+
+Run from the backend directory:
+
+    python -m benchmarks.startup_budget
+    python -m benchmarks.startup_budget --import-budget 1.5 --startup-budget 0.5
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+
+_PROBE = r"""
+import json, time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+
+from fastapi.testclient import TestClient
+from app.simulators.tables import registry
+
+with TestClient(app.main.app) as client:
+    client.get("/health")
+    started = time.perf_counter()
+    loaded_at_start = sum(registry.is_loaded(n) for n in registry.list_tables())
+    client.post("/api/v1/sentinel/query/kql", json={"query": "SignInLogs | take 1"})
+    first_query = time.perf_counter()
+
+print(json.dumps({
+    "import_seconds": imported - start,
+    "startup_seconds": started - imported,
+    "first_query_seconds": first_query - started,
+    "tables_loaded_at_startup": loaded_at_start,
+}))
+"""
+
+
+def measure(env: Optional[Dict[str, str]] = None) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE], capture_output=True, text=True, check=True, env=env
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def check(timings: dict, budgets: Dict[str, float]) -> List[str]:
+    return [
+        f"{key} {timings[key]:.3f}s exceeds budget {budget:.3f}s"
+        for key, budget in budgets.items()
+        if timings[key] > budget
+    ]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check application cold-start time against budgets.")
+    parser.add_argument("--import-budget", type=float, default=3.0, help="seconds to import app.main")
+    parser.add_argument("--startup-budget", type=float, default=1.0, help="seconds for lifespan startup")
+    parser.add_argument("--first-query-budget", type=float, default=2.0, help="seconds for the first KQL query")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters to start; the best run counts")
+    args = parser.parse_args(argv)
+
+    runs = [measure() for _ in range(args.runs)]
+    best = {key: min(run[key] for run in runs) for key in runs[0]}
+    for key, value in best.items():
+        print(f"{key:<28} {value:.3f}" if isinstance(value, float) else f"{key:<28} {value}")
+
+    failures = check(best, {
+        "import_seconds": args.import_budget,
+        "startup_seconds": args.startup_budget,
+        "first_query_seconds": args.first_query_budget,
+    })
+    for failure in failures:
+        print(f"OVER BUDGET {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""Alert correlation into incidents and the incident store's indexes."""
+
+from app.services.persistence import WriteBehindJournal
+from app.services.record_store import RecordStore
+from app.simulators.alert_correlation import AlertCorrelator
+from app.simulators.kql_engine import TableRegistry
+from app.simulators.lab_sessions import STORE_INDEXES, LabEnvironment
+
+
+def _alert(alert_id: str, severity: str, entities, minute: int = 0) -> dict:
+    return {
+        "id": alert_id, "title": f"Alert {alert_id}", "severity": severity, "status": "New",
+        "entities": entities, "createdTime": f"2024-01-01T10:{minute:02d}:00+00:00",
+    }
+
+
+def _correlator():
+    incidents = RecordStore(indexed_fields=STORE_INDEXES)
+    return incidents, AlertCorrelator(incidents, window_seconds=3600)
+
+
+def test_alerts_sharing_an_entity_join_one_incident():
+    incidents, correlator = _correlator()
+    correlator.ingest_many([_alert("a1", "Low", ["alice@contoso.com"]), _alert("a2", "Low", ["alice@contoso.com", "ws-01"])])
+    correlator.ingest(_alert("a3", "Low", ["bob@contoso.com"]))
+    assert len(incidents) == 2
+    alice = next(i for i in incidents.values() if "a1" in i["alertIds"])
+    assert alice["alertIds"] == ["a1", "a2"]
+    assert alice["alertCount"] == 2
+
+
+def test_severity_escalation_moves_the_incident_between_index_buckets():
+    incidents, correlator = _correlator()
+    correlator.ingest(_alert("a1", "Low", ["alice@contoso.com"]))
+    correlator.ingest(_alert("a2", "High", ["alice@contoso.com"], minute=5))
+
+    records, _, total = incidents.page({"severity": "High"})
+    assert total == 1 and records[0]["alertIds"] == ["a1", "a2"]
+    assert incidents.page({"severity": "Low"})[2] == 0
+
+
+def test_linking_alert_merges_incidents_and_keeps_the_highest_severity():
+    incidents, correlator = _correlator()
+    correlator.ingest(_alert("a1", "Medium", ["alice@contoso.com"]))
+    correlator.ingest(_alert("a2", "High", ["ws-01"]))
+    correlator.ingest(_alert("a3", "Low", ["alice@contoso.com", "ws-01"], minute=5))
+
+    assert len(incidents) == 1
+    (incident,) = incidents.values()
+    assert sorted(incident["alertIds"]) == ["a1", "a2", "a3"]
+    assert incidents.page({"severity": "High"})[2] == 1
+    assert incidents.page({"severity": "Medium"})[2] == 0
+
+
+def test_entity_outside_the_window_opens_a_new_incident():
+    incidents, correlator = _correlator()
+    correlator.ingest(_alert("a1", "Low", ["alice@contoso.com"]))
+    late = _alert("a2", "Low", ["alice@contoso.com"])
+    late["createdTime"] = "2024-01-01T12:30:00+00:00"
+    correlator.ingest(late)
+    assert len(incidents) == 2
+
+
+def test_a_merge_deletes_the_absorbed_incident_everywhere():
+    journal = WriteBehindJournal(flush_seconds=3600)
+    env = LabEnvironment("s1", TableRegistry(), correlation_window=3600, journal=journal)
+    changes = []
+    env.incidents.listeners.append(lambda op, records: changes.append((op, [r["id"] for r in records])))
+    (alice,) = env.correlator.ingest_many([_alert("a1", "Medium", ["alice@contoso.com"])])
+    (host,) = env.correlator.ingest_many([_alert("a2", "High", ["ws-01"])])
+    changes.clear()
+
+    merged = env.correlator.ingest(_alert("a3", "Low", ["alice@contoso.com", "ws-01"], minute=5))
+    (survivor,) = env.incidents.values()
+    assert merged["id"] == survivor["id"]
+    absorbed = alice["id"] if survivor["id"] == host["id"] else host["id"]
+    assert env.incidents.get(absorbed) is None
+    for key in ("alice@contoso.com", "ws-01"):
+        assert env.entities.ids("incident", key) == [survivor["id"]]
+    assert env.entities.entities("incident", absorbed) == ()
+
+    # Listeners see the absorbed incident deleted and the survivor updated, not re-inserted.
+    assert ("delete", [absorbed]) in changes
+    assert ("update", [survivor["id"]]) in changes
+    assert all(op != "insert" for op, _ in changes)
+    assert journal._records[("incidents", "s1", absorbed)] is None
+    assert journal._records[("incidents", "s1", survivor["id"])]["alertCount"] == 3
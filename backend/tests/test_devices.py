@@ -0,0 +1,131 @@
+"""Device inventory paging and per-entity alert counts."""
+
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.simulators import tables
+from app.simulators.devices import DEVICE_INVENTORY, build_device_store, generate_devices
+from app.simulators.entity_index import EntityAlertCounter
+
+ANCHOR = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+def _alert(alert_id: str, entity: str, severity: str = "High", status: str = "New", description: str = "") -> dict:
+    return {"id": alert_id, "entity": entity, "severity": severity, "status": status, "description": description}
+
+
+# ─── Alert Counts ────────────────────────────────────────────────────────────
+
+def test_counts_follow_inserts_updates_and_deletes():
+    counter = EntityAlertCounter()
+    counter.record("insert", [
+        _alert("a1", "DESKTOP-FIN-001"),
+        _alert("a2", "alice@contoso.com", "Low", description="Seen on DESKTOP-FIN-001"),
+        _alert("a3", "DESKTOP-FIN-001", "Medium", "Resolved"),
+    ])
+    assert counter.counts("desktop-fin-001") == {
+        "total": 3, "active": 2,
+        "bySeverity": {"High": 1, "Low": 1, "Medium": 1},
+        "byStatus": {"New": 2, "Resolved": 1},
+    }
+    assert counter.counts("alice@contoso.com")["total"] == 1
+
+    counter.record("update", [_alert("a1", "SRV-DC-01", status="Closed")])
+    counts = counter.counts("desktop-fin-001")
+    # An update moves the alert between buckets but keeps its original entities.
+    assert (counts["total"], counts["active"], counts["byStatus"]) == (3, 1, {"Closed": 1, "New": 1, "Resolved": 1})
+    assert counter.counts("srv-dc-01")["total"] == 0
+
+    counter.record("delete", [_alert("a2", "alice@contoso.com")])
+    assert counter.counts("alice@contoso.com") == {"total": 0, "active": 0, "bySeverity": {}, "byStatus": {}}
+    assert counter.counts("desktop-fin-001")["total"] == 2
+
+    counter.record("clear", [])
+    assert counter.counts("desktop-fin-001")["total"] == 0
+
+
+def test_reinserting_an_alert_does_not_count_it_twice():
+    counter = EntityAlertCounter()
+    counter.record("insert", [_alert("a1", "DESKTOP-FIN-001")])
+    counter.record("insert", [_alert("a1", "DESKTOP-FIN-001", "Low")])
+    assert counter.counts("desktop-fin-001")["bySeverity"] == {"Low": 1}
+
+
+# ─── Inventory ───────────────────────────────────────────────────────────────
+
+def test_generated_devices_are_seeded():
+    devices = generate_devices(200, seed=3, anchor=ANCHOR)
+    assert devices == generate_devices(200, seed=3, anchor=ANCHOR)
+    assert devices != generate_devices(200, seed=4, anchor=ANCHOR)
+    assert len({d["id"] for d in devices} | {d["id"] for d in DEVICE_INVENTORY}) == 200 + len(DEVICE_INVENTORY)
+    assert all("2026-02-22T00:00:00Z" <= d["lastSeen"] <= "2026-03-01T00:00:00Z" for d in devices)
+
+
+def _walk(store, filters: dict, limit: int) -> list:
+    pages, cursor = [], None
+    while True:
+        page, cursor, total = store.page(filters, limit, cursor)
+        pages.append(page)
+        if cursor is None:
+            return [d for page in pages for d in page], total, len(pages)
+
+
+@pytest.mark.parametrize("filters", [
+    {}, {"riskLevel": "Critical"}, {"tags": "High Value"}, {"tags": "Finance", "riskLevel": "High"},
+])
+def test_filtered_pages_walk_every_matching_device_newest_first(filters):
+    store = build_device_store(500, seed=1)
+    devices, total, pages = _walk(store, filters, limit=37)
+    expected = [
+        d for d in store.values()
+        if all(value in (d[field] if field == "tags" else [d[field]]) for field, value in filters.items())
+    ]
+    assert total == len(devices) == len(expected) > 0
+    assert {d["id"] for d in devices} == {d["id"] for d in expected}
+    assert [d["lastSeen"] for d in devices] == sorted((d["lastSeen"] for d in devices), reverse=True)
+    assert pages == max(1, -(-total // 37))
+
+
+# ─── /devices ────────────────────────────────────────────────────────────────
+
+SESSION = "device-counts"
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+    tables.sessions.drop(SESSION)
+
+
+def test_device_pages_carry_the_session_alert_counts(client):
+    env = tables.sessions.get(SESSION)
+    env.alerts.insert_many([
+        {**_alert("a1", "DESKTOP-FIN-001"), "createdTime": "2026-02-25T14:00:00Z"},
+        {**_alert("a2", "DESKTOP-FIN-001", "Low", "Resolved"), "createdTime": "2026-02-25T14:01:00Z"},
+    ])
+    headers = {"X-Lab-Session": SESSION}
+
+    body = client.get("/api/v1/defender/devices", params={"tag": "Finance", "limit": 500}, headers=headers).json()
+    finance = next(d for d in body["devices"] if d["name"] == "DESKTOP-FIN-001")
+    assert finance["alertCounts"]["total"] == 2 and finance["activeAlerts"] == 1
+    assert all("Finance" in d["tags"] for d in body["devices"])
+
+    shared = client.get("/api/v1/defender/devices", params={"tag": "Finance", "limit": 500}).json()
+    assert next(d for d in shared["devices"] if d["name"] == "DESKTOP-FIN-001")["activeAlerts"] == 0
+
+
+def test_device_pages_follow_the_cursor(client):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        body = client.get("/api/v1/defender/devices", params=params).json()
+        seen += [d["id"] for d in body["devices"]]
+        cursor = body["nextCursor"]
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == body["total"] == len(tables.devices)
+    assert client.get("/api/v1/defender/devices", params={"cursor": "not-a-cursor"}).status_code == 400
@@ -0,0 +1,197 @@
+"""Entity index: row and record lookups, graph expansion and /graph pivots."""
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.simulators import entity_index, tables
+from app.simulators.entity_index import (
+    EntityRecordIndex, EntityRowIndex, alert_entities, entity_key, entity_kind, expand_entity_graph,
+)
+from app.simulators.kql_engine import TableRegistry
+from app.simulators.lab_sessions import LabEnvironment
+from app.simulators.scenario_runner import create_alerts, create_incidents
+
+
+def _signins(*rows) -> pd.DataFrame:
+    users, ips = zip(*rows)
+    return pd.DataFrame({"UserPrincipalName": list(users), "IPAddress": list(ips), "ResultType": [0] * len(rows)})
+
+
+# ─── Keys ────────────────────────────────────────────────────────────────────
+
+def test_keys_are_normalized_and_classified():
+    assert entity_key("  Alice@Contoso.com. ") == "alice@contoso.com"
+    assert entity_key({"hostname": "DESKTOP-FIN-001"}) == "desktop-fin-001"
+    assert entity_key(None) == ""
+    assert entity_kind("10.1.2.3") == "ip"
+    assert entity_kind("alice@contoso.com") == "account"
+    assert entity_kind("desktop-fin-001") == "device"
+    assert entity_kind("svc_backup") == "account"
+
+
+def test_alert_entities_include_names_in_the_description():
+    alert = {
+        "entity": "Alice@Contoso.com",
+        "entities": ["ws-01", "-"],
+        "description": "alice@contoso.com signed in to DESKTOP-FIN-001 from 91.214.44.22.",
+    }
+    assert alert_entities(alert) == {
+        "alice@contoso.com": "Alice@Contoso.com",
+        "ws-01": "ws-01",
+        "desktop-fin-001": "DESKTOP-FIN-001",
+        "91.214.44.22": "91.214.44.22",
+    }
+
+
+# ─── Log Rows ────────────────────────────────────────────────────────────────
+
+def test_rows_are_found_across_columns_and_case():
+    index = EntityRowIndex()
+    index.index_table("SigninLogs", _signins(
+        ("Alice@contoso.com", "10.0.0.1"), ("bob@contoso.com", "10.0.0.1"), ("alice@contoso.com ", "-"),
+    ))
+    assert index.rows("SigninLogs", "alice@contoso.com").tolist() == [0, 2]
+    assert index.rows("SigninLogs", "10.0.0.1").tolist() == [0, 1]
+    assert index.rows("SigninLogs", "-").tolist() == []  # placeholders are not indexed
+    assert index.rows("Other", "alice@contoso.com").tolist() == []
+    assert index.name("alice@contoso.com") == "Alice@contoso.com"
+    assert index.sizes() == {"SigninLogs": (3, 5)}
+
+
+def test_appended_batches_merge_into_a_few_chunks():
+    index = EntityRowIndex()
+    index.index_table("SigninLogs", _signins(("alice@contoso.com", "10.0.0.1")))
+    expected = [0]
+    for batch in range(1, 40):
+        user = "alice@contoso.com" if batch % 3 == 0 else "bob@contoso.com"
+        index.append("SigninLogs", _signins((user, "10.0.0.2")), start=batch)
+        if user.startswith("alice"):
+            expected.append(batch)
+        assert len(index._chunks["SigninLogs"]) <= entity_index.MAX_CHUNKS
+    assert index.rows("SigninLogs", "alice@contoso.com").tolist() == expected
+    assert index.rows("SigninLogs", "10.0.0.2").tolist() == list(range(1, 40))
+
+
+def test_registry_keeps_the_index_current():
+    registry = TableRegistry()
+    registry.register("SigninLogs", _signins(("alice@contoso.com", "10.0.0.1")))
+    registry.append("SigninLogs", _signins(("bob@contoso.com", "10.0.0.1"), ("alice@contoso.com", "10.0.0.3")))
+    assert registry.entity_rows("SigninLogs", "alice@contoso.com").tolist() == [0, 2]
+    positions = registry.entity_rows("SigninLogs", "10.0.0.1")
+    assert set(registry.get("SigninLogs")["IPAddress"].iloc[positions]) == {"10.0.0.1"}
+
+
+# ─── Alerts and Incidents ────────────────────────────────────────────────────
+
+def test_record_index_reindexes_and_removes():
+    index = EntityRecordIndex()
+    index.set("alert", "a1", {"alice@contoso.com": "Alice@contoso.com", "ws-01": "WS-01"})
+    index.set("alert", "a2", {"alice@contoso.com": "alice@contoso.com"})
+    assert index.ids("alert", "alice@contoso.com") == ["a1", "a2"]
+    assert index.name("alice@contoso.com") == "Alice@contoso.com"
+
+    index.set("alert", "a1", {"ws-02": "WS-02"})
+    assert index.ids("alert", "alice@contoso.com") == ["a2"]
+    assert index.ids("alert", "ws-01") == []
+    assert index.entities("alert", "a1") == ("ws-02",)
+
+    index.remove("alert", "a2")
+    assert index.ids("alert", "alice@contoso.com") == []
+    assert index.ids("incident", "ws-02") == []
+
+
+# ─── Graph Expansion ─────────────────────────────────────────────────────────
+
+def _env() -> LabEnvironment:
+    registry = TableRegistry()
+    registry.register("SigninLogs", _signins(
+        ("alice@contoso.com", "10.0.0.1"), ("alice@contoso.com", "10.0.0.2"),
+        ("bob@contoso.com", "10.0.0.2"), ("carol@contoso.com", "10.0.0.9"),
+    ))
+    env = LabEnvironment("graph", registry)
+    template = {"severity": "High", "status": "New", "title": "Impossible travel"}
+    create_alerts(env, [{**template, "entity": "alice@contoso.com", "description": "From 91.214.44.22"}])
+    create_incidents(env, [{**template, "entities": ["alice@contoso.com", "ws-01"]}])
+    return env
+
+
+def _ids(graph) -> set:
+    return {node["id"] for node in graph["nodes"]}
+
+
+def test_graph_links_rows_records_and_neighbours():
+    graph = expand_entity_graph(_env(), "Alice@Contoso.com")
+    assert graph["root"] == "entity:alice@contoso.com" and not graph["truncated"]
+    root = next(n for n in graph["nodes"] if n["id"] == graph["root"])
+    assert root["kind"] == "account" and root["depth"] == 0
+    assert (root["alertCount"], root["incidentCount"]) == (1, 1)
+    assert root["tables"] == {"SigninLogs": {"rows": 2}}
+
+    assert {n["type"] for n in graph["nodes"]} == {"entity", "alert", "incident"}
+    neighbours = {e["target"]: e for e in graph["edges"] if e["relation"] == "related_to"}
+    assert set(neighbours) == {"entity:10.0.0.1", "entity:10.0.0.2", "entity:91.214.44.22", "entity:ws-01"}
+    assert neighbours["entity:10.0.0.2"]["via"] == ["SigninLogs"]
+    assert neighbours["entity:ws-01"]["via"] == ["incidents"]
+    # bob only shares an IP with alice, so he is two hops away.
+    assert "entity:bob@contoso.com" not in _ids(graph)
+    assert "entity:bob@contoso.com" in _ids(expand_entity_graph(_env(), "alice@contoso.com", depth=2))
+    assert "entity:carol@contoso.com" not in _ids(expand_entity_graph(_env(), "alice@contoso.com", depth=3))
+
+
+def test_graph_limits():
+    env = _env()
+    assert len(expand_entity_graph(env, "alice@contoso.com", depth=0)["edges"]) == 2  # the alert and incident
+    narrow = expand_entity_graph(env, "alice@contoso.com", fan_out=1)
+    assert len([e for e in narrow["edges"] if e["relation"] == "related_to"]) == 1
+    small = expand_entity_graph(env, "alice@contoso.com", max_nodes=3)
+    assert small["truncated"] and len(small["nodes"]) == 3
+
+
+# ─── /graph ──────────────────────────────────────────────────────────────────
+
+SESSION = "graph-pivot"
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+    tables.sessions.drop(SESSION)
+
+
+def test_graph_endpoint_pivots_within_the_session(client):
+    headers = {"X-Lab-Session": SESSION}
+    started = client.post("/api/v1/labs/scenarios/bec-invoice-fraud-001/start?compression=0", headers=headers)
+    assert started.status_code == 200, started.text
+
+    url = "/api/v1/sentinel/entities/sarah.chen@fabrikam.com/graph"
+    graph = client.get(url, params={"depth": 10}, headers=headers).json()
+    assert graph["depth"] == 3  # clamped
+    root = next(n for n in graph["nodes"] if n["id"] == graph["root"])
+    assert root["alertCount"] == started.json()["alerts_created"] > 0
+    assert root["incidentCount"] == 1
+    incident = f"incident:{started.json()['incident_id']}"
+    assert {"source": graph["root"], "target": incident, "relation": "involved_in"} in graph["edges"]
+
+    # Pivoting from a neighbour leads back to the same incident.
+    neighbour = next(e["target"] for e in graph["edges"] if e["relation"] == "related_to" and "incidents" in e["via"])
+    back = client.get(f"/api/v1/sentinel/entities/{neighbour.removeprefix('entity:')}/graph", headers=headers).json()
+    assert incident in _ids(back)
+
+    other = client.get(url, headers={"X-Lab-Session": "graph-other"}).json()
+    tables.sessions.drop("graph-other")
+    assert not any(n["type"] == "incident" for n in other["nodes"])
+
+
+def test_graph_endpoint_bounds_its_parameters(client):
+    graph = client.get(
+        "/api/v1/sentinel/entities/nobody@example.com/graph",
+        params={"depth": -1, "fan_out": 0, "max_nodes": 0},
+        headers={"X-Lab-Session": SESSION},
+    ).json()
+    assert graph["depth"] == 0
+    assert [n["id"] for n in graph["nodes"]] == ["entity:nobody@example.com"]
+    assert graph["edges"] == []
+    assert not graph["truncated"]
@@ -0,0 +1,44 @@
+"""Value dictionaries behind KQL value completion."""
+
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from app.simulators.kql_completion import ValueDictionary
+
+
+def _check(dictionary: ValueDictionary, counts: Counter, prefix: str, limit: int = 5):
+    got = dictionary.complete(prefix, limit)
+    matching = sorted((c for v, c in counts.items() if v.lower().startswith(prefix.lower())), reverse=True)
+    # Values tied at the cut-off may be picked in any order; their counts may not.
+    assert [c for _, c in got] == matching[:limit]
+    assert all(v.lower().startswith(prefix.lower()) and counts[v] == c for v, c in got)
+
+
+def test_appends_keep_completions_exact():
+    rng = np.random.default_rng(0)
+    values = [f"User{i}@Contoso.com" for i in range(300)] + [f"user{i}@contoso.com" for i in range(20)]
+    dictionary, counts = ValueDictionary(), Counter()
+    for size in [500, 1, 3, 200, 2, 80, 1]:  # mixes in-place inserts and merged batches
+        batch = list(rng.choice(values, size))
+        dictionary.update(pd.Series(batch))
+        counts.update(batch)
+        for prefix in ("user1", "USER2", "user19@contoso", "zzz", ""):
+            _check(dictionary, counts, prefix)
+
+
+def test_truncation_keeps_the_most_frequent_values():
+    dictionary = ValueDictionary(max_values=3)
+    dictionary.update(pd.Series(["a"] * 5 + ["b"] * 4 + ["c"] * 3))
+    dictionary.update(pd.Series(["d", "e"]))
+    assert dictionary.truncated and len(dictionary) == 3
+    assert dictionary.complete("", 10) == [("a", 5), ("b", 4), ("c", 3)]
+    dictionary.update(pd.Series(["d"] * 10))
+    assert dictionary.complete("", 10) == [("d", 10), ("a", 5), ("b", 4)]
+
+
+def test_non_strings_are_ignored():
+    dictionary = ValueDictionary()
+    dictionary.update(pd.Series(["x", None, 3, "x"], dtype=object))
+    assert dictionary.complete("x") == [("x", 2)]
@@ -0,0 +1,161 @@
+"""KQL executor: planning with table statistics, joins and metadata answers."""
+
+import pandas as pd
+import pytest
+
+from app.simulators.kql_engine import KQLExecutor, TableRegistry, estimate_selectivity, order_conjuncts, parse_where
+
+
+def _registry() -> TableRegistry:
+    registry = TableRegistry()
+    registry.register("Logons", pd.DataFrame({
+        "Account": ["alice", "bob", "carol", "alice", "dave", "alice"],
+        "Computer": ["WS1", "WS2", "WS1", "WS3", "WS2", "WS1"],
+        "Failed": [3, 0, 1, 7, 0, 2],
+    }))
+    return registry
+
+
+class _RecordingExecutor(KQLExecutor):
+    """Notes the stats each where stage was planned with."""
+
+    def __init__(self, registry: TableRegistry):
+        super().__init__(registry)
+        self.where_stats = []
+
+    def _op_where(self, df, condition, stats=None):
+        self.where_stats.append((condition.strip(), stats))
+        return super()._op_where(df, condition, stats)
+
+
+# ─── Planning ────────────────────────────────────────────────────────────────
+
+def test_only_leading_where_stages_are_planned_with_table_stats():
+    executor = _RecordingExecutor(_registry())
+    result = executor.execute(
+        "Logons | where Failed > 0 | where Account == 'alice' | extend Account = Computer"
+        " | where Account == 'WS1' | summarize Failed=sum(Failed) by Account | where Failed > 1"
+    )
+    assert result.error is None, result.error
+    assert result.rows == [{"Account": "WS1", "Failed": 5}]
+    planned = {condition: stats is not None for condition, stats in executor.where_stats}
+    assert planned == {
+        "Failed > 0": True, "Account == 'alice'": True, "Account == 'WS1'": False, "Failed > 1": False
+    }
+
+
+def test_conjuncts_run_most_selective_first_by_column_stats():
+    registry = _registry()
+    stats = registry.stats("Logons")
+    common, rare = parse_where("Account == 'alice' and Computer == 'WS3'").children
+    assert estimate_selectivity(common, stats) == pytest.approx(3 / 6)
+    assert estimate_selectivity(rare, stats) == pytest.approx(1 / 6)
+    assert order_conjuncts([common, rare], stats) == [rare, common]
+    assert order_conjuncts([common, rare]) == [common, rare]  # equal defaults keep query order
+
+    absent = parse_where("Computer == 'WS9'")
+    assert estimate_selectivity(absent, stats) == 0.0  # the top-k holds every value
+    below = parse_where("Failed < 2")
+    assert 0.0 < estimate_selectivity(below, stats) < estimate_selectivity(parse_where("Failed < 6"), stats)
+
+
+# ─── Metadata answers ────────────────────────────────────────────────────────
+
+def _operators(result) -> list:
+    return [stage["operator"] for stage in result.profile]
+
+
+@pytest.mark.parametrize("query, rows", [
+    ("Logons | count", [{"Count": 6}]),
+    ("Logons | summarize count()", [{"count()": 6}]),
+    ("Logons | summarize Total=count()", [{"Total": 6}]),
+])
+def test_counts_are_answered_from_stats(query, rows):
+    result = KQLExecutor(_registry()).execute(query)
+    assert result.rows == rows
+    assert _operators(result) == ["metadata"]
+
+
+def test_getschema_and_counts_follow_appends_without_scanning():
+    registry = _registry()
+    registry.append("Logons", pd.DataFrame({"Account": ["erin"], "Computer": ["WS4"], "Failed": [1]}))
+    executor = KQLExecutor(registry)
+    count = executor.execute("Logons | count")
+    assert count.rows == [{"Count": 7}] and _operators(count) == ["metadata"]
+    schema = executor.execute("Logons | getschema")
+    assert _operators(schema) == ["metadata"]
+    assert [(r["ColumnName"], r["ColumnType"], r["DataType"]) for r in schema.rows] == [
+        ("Account", "string", "System.String"), ("Computer", "string", "System.String"), ("Failed", "long", "System.Int64"),
+    ]
+
+
+def test_filtered_counts_still_scan():
+    result = KQLExecutor(_registry()).execute("Logons | where Failed > 0 | count")
+    assert result.rows == [{"Count": 4}]
+    assert _operators(result) == ["source", "where", "count"]
+
+
+# ─── Joins ───────────────────────────────────────────────────────────────────
+
+def _join_registry() -> TableRegistry:
+    registry = _registry()
+    registry.register("Hosts", pd.DataFrame({
+        "Computer": ["WS1", "WS2", "WS9"],
+        "Owner": ["it", "finance", "lab"],
+    }))
+    return registry
+
+
+def _join(kind: str, on: str = "Computer", right: str = "Hosts") -> pd.DataFrame:
+    query = f"Logons | join kind={kind} ({right}) on {on}" if kind else f"Logons | join ({right}) on {on}"
+    result = KQLExecutor(_join_registry()).execute(query)
+    assert result.error is None, result.error
+    return pd.DataFrame(result.rows, columns=result.columns)
+
+
+@pytest.mark.parametrize("kind, rows, computers", [
+    ("inner", 5, {"WS1", "WS2"}),
+    ("innerunique", 2, {"WS1", "WS2"}),  # one left row per key
+    ("", 2, {"WS1", "WS2"}),  # innerunique is the default
+    ("leftouter", 6, {"WS1", "WS2", "WS3"}),
+    ("rightouter", 6, {"WS1", "WS2", "WS9"}),
+    ("fullouter", 7, {"WS1", "WS2", "WS3", "WS9"}),
+    ("leftsemi", 5, {"WS1", "WS2"}),
+    ("leftanti", 1, {"WS3"}),
+    ("rightsemi", 2, {"WS1", "WS2"}),
+    ("rightanti", 1, {"WS9"}),
+])
+def test_join_kinds(kind, rows, computers):
+    df = _join(kind)
+    assert len(df) == rows
+    assert set(df["Computer"].dropna()) | set(df.get("Computer1", pd.Series(dtype=object)).dropna()) == computers
+    if kind in ("leftsemi", "leftanti"):
+        assert list(df.columns) == ["Account", "Computer", "Failed"]
+    if kind in ("rightsemi", "rightanti"):
+        assert list(df.columns) == ["Computer", "Owner"]
+
+
+def test_join_on_differently_named_and_multiple_keys():
+    registry = _join_registry()
+    registry.register("Owners", pd.DataFrame({"Host": ["WS1", "WS3"], "Team": ["it", "hr"]}))
+    registry.register("Pairs", pd.DataFrame({"Account": ["alice", "bob"], "Computer": ["WS1", "WS1"]}))
+    executor = KQLExecutor(registry)
+
+    renamed = executor.execute("Logons | join kind=inner (Owners) on $left.Computer == $right.Host")
+    assert sorted((r["Account"], r["Team"]) for r in renamed.rows) == [
+        ("alice", "hr"), ("alice", "it"), ("alice", "it"), ("carol", "it")
+    ]
+    both = executor.execute("Logons | join kind=leftsemi (Pairs) on Account, Computer")
+    assert sorted((r["Account"], r["Failed"]) for r in both.rows) == [("alice", 2), ("alice", 3)]
+    piped = executor.execute("Logons | join kind=inner (Hosts | where Owner == 'it') on Computer | count")
+    assert piped.rows == [{"Count": 3}]
+
+
+@pytest.mark.parametrize("query, message", [
+    ("Logons | join kind=sideways (Hosts) on Computer", "Unsupported join kind"),
+    ("Logons | join kind=inner (Hosts) on Owner", "not found on the left side"),
+    ("Logons | join kind=inner (Hosts) on Computer > 1", "Unsupported join condition"),
+])
+def test_join_errors(query, message):
+    result = KQLExecutor(_join_registry()).execute(query)
+    assert result.error is not None and message in result.error
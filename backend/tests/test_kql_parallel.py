@@ -0,0 +1,107 @@
+"""Parallel KQL execution over a long-lived, forked worker pool."""
+
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.simulators.kql_engine import KQLExecutor, TableRegistry
+from app.simulators.kql_parallel import ParallelKQLExecutor
+from app.simulators.log_data import generate_batch, generate_table
+
+pytestmark = pytest.mark.skipif(
+    not ParallelKQLExecutor(TableRegistry(), workers=2)._fork_available, reason="needs the fork start method"
+)
+
+ANCHOR = datetime(2024, 1, 1, tzinfo=timezone.utc)
+QUERY = "SecurityEvent | where EventID == 4625 | summarize Failures=count(), Last=max(TimeGenerated) by Computer"
+
+
+def _registries():
+    base = generate_table("SecurityEvent", 4_000, seed=3, anchor=ANCHOR)
+    registry, expected = TableRegistry(), TableRegistry()
+    registry.register("SecurityEvent", base)
+    expected.register("SecurityEvent", base)
+    return registry, expected
+
+
+def _frame(result) -> pd.DataFrame:
+    assert result.error is None, result.error
+    return pd.DataFrame(result.rows, columns=result.columns).sort_values("Computer").reset_index(drop=True)
+
+
+def _assert_same(executor, expected, query=QUERY):
+    pd.testing.assert_frame_equal(_frame(executor.execute(query)), _frame(expected.execute(query)), check_dtype=False)
+
+
+def test_appends_and_trims_reuse_the_pool():
+    registry, expected_registry = _registries()
+    parallel = ParallelKQLExecutor(registry, workers=2, partition_rows=1_000, min_rows=100)
+    expected = KQLExecutor(expected_registry)
+    _assert_same(parallel, expected)
+    pool = parallel._pool
+
+    rng = np.random.default_rng(3)
+    for minute in range(5):
+        start = ANCHOR + timedelta(minutes=minute)
+        batch = generate_batch("SecurityEvent", 150, rng, start, start + timedelta(minutes=1))
+        for target in (registry, expected_registry):
+            target.append("SecurityEvent", batch)
+            target.retain_last("SecurityEvent", 4_200)
+        _assert_same(parallel, expected)
+        assert parallel._pool is pool  # the fresh rows were scanned by the coordinator
+
+    batch = generate_batch("SecurityEvent", 1_500, rng, ANCHOR, ANCHOR + timedelta(hours=1))
+    for target in (registry, expected_registry):
+        target.append("SecurityEvent", batch)
+    _assert_same(parallel, expected)
+    assert parallel._pool is not pool  # too many rows since the fork: forked again
+    parallel.close()
+
+
+def test_replaced_table_forks_again():
+    registry, expected_registry = _registries()
+    parallel = ParallelKQLExecutor(registry, workers=2, partition_rows=1_000, min_rows=100)
+    _assert_same(parallel, KQLExecutor(expected_registry))
+    pool = parallel._pool
+
+    replacement = generate_table("SecurityEvent", 2_000, seed=4, anchor=ANCHOR)
+    registry.register("SecurityEvent", replacement)
+    expected_registry.register("SecurityEvent", replacement)
+    _assert_same(parallel, KQLExecutor(expected_registry))
+    assert parallel._pool is not pool
+    parallel.close()
+
+
+def test_a_query_sees_one_table_version(monkeypatch):
+    registry, expected_registry = _registries()
+    parallel = ParallelKQLExecutor(registry, workers=2, partition_rows=1_000, min_rows=100)
+    expected = KQLExecutor(expected_registry)
+    _assert_same(parallel, expected)
+
+    rng = np.random.default_rng(5)
+    batch = generate_batch("SecurityEvent", 300, rng, ANCHOR, ANCHOR + timedelta(minutes=1))
+    partition_bounds = parallel._partition_bounds
+
+    def append_meanwhile(start, stop):
+        # Rows arriving (and old ones trimmed) once the query has its snapshot.
+        registry.append("SecurityEvent", batch)
+        registry.retain_last("SecurityEvent", 3_900)
+        monkeypatch.setattr(parallel, "_partition_bounds", partition_bounds)
+        return partition_bounds(start, stop)
+
+    monkeypatch.setattr(parallel, "_partition_bounds", append_meanwhile)
+    _assert_same(parallel, expected)  # still the version before the append
+
+    expected_registry.append("SecurityEvent", batch)
+    expected_registry.retain_last("SecurityEvent", 3_900)
+    _assert_same(parallel, expected)
+    parallel.close()
+
+
+def test_small_tables_run_serially():
+    registry, expected_registry = _registries()
+    parallel = ParallelKQLExecutor(registry, workers=2, partition_rows=1_000, min_rows=10_000)
+    _assert_same(parallel, KQLExecutor(expected_registry))
+    assert parallel._pool is None
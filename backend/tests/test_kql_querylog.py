@@ -0,0 +1,91 @@
+"""Query fingerprinting and the slow-query log."""
+
+import pytest
+
+from app.simulators.kql_engine import KQLResult
+from app.simulators.kql_querylog import QueryLog, fingerprint, load_jsonl, normalize_query
+
+
+def _result(ms: float, error: str = None) -> KQLResult:
+    result = KQLResult(columns=[], rows=[], row_count=0, execution_time_ms=ms, error=error)
+    result.profile = [{"operator": "where", "stage": "where x", "ms": ms, "rows": 0}]
+    return result
+
+
+@pytest.mark.parametrize("query, normalized", [
+    ("SecurityEvent | where EventID == 4625", "SecurityEvent | where EventID == ?"),
+    ("T | where Name == 'alice' and Other =~ \"Bob\"", "T | where Name == ? and Other =~ ?"),
+    ("T | where TimeGenerated > ago(1h)", "T | where TimeGenerated > ago ( ? )"),
+    ("T | where TimeGenerated > datetime(2024-01-01 10:00)", "T | where TimeGenerated > datetime(?)"),
+    ("T | where Port in (22, 3389, 445)", "T | where Port in (?+)"),
+    ("T | where Port in (22)", "T | where Port in ( ? )"),
+    ("T   |  take   10", "T | take ?"),
+])
+def test_literals_are_replaced_and_whitespace_collapsed(query, normalized):
+    assert normalize_query(query) == normalized
+
+
+def test_queries_differing_only_in_literals_share_a_fingerprint():
+    assert fingerprint("T | where EventID == 4625") == fingerprint("T  | where EventID == 4624")
+    assert fingerprint("T | where Port in (1, 2)") == fingerprint("T | where Port in (1, 2, 3, 4)")
+    assert fingerprint("T | where EventID == 4625") != fingerprint("T | where EventID != 4625")
+    assert fingerprint("T | where A == 1") != fingerprint("T | where B == 1")
+
+
+def test_aggregates_per_fingerprint_and_ranks_them():
+    log = QueryLog(slow_threshold_ms=1_000)
+    for ms in (10, 20, 30):
+        log.record(f"T | where EventID == {ms}", _result(ms))
+    log.record("T | take 5", _result(100))
+    log.record("T | take 6", _result(1, error="boom"))
+
+    by_total = log.top("total")
+    assert [row["query"] for row in by_total] == ["T | take ?", "T | where EventID == ?"]
+    take, where = by_total
+    assert (take["count"], take["errors"], take["total_ms"], take["max_ms"]) == (2, 1, 101, 100)
+    assert (where["count"], where["mean_ms"]) == (3, 20)
+    assert [row["query"] for row in log.top("count")] == ["T | where EventID == ?", "T | take ?"]
+    with pytest.raises(ValueError):
+        log.top("median")
+    assert log.slow_queries() == []
+
+
+def test_slow_queries_are_kept_newest_first_and_bounded(tmp_path):
+    sink = tmp_path / "slow.jsonl"
+    log = QueryLog(slow_threshold_ms=50, capacity=2, sink_path=str(sink))
+    for i, ms in enumerate((10, 60, 70, 80)):
+        log.record(f"T | where EventID == {i}", _result(ms))
+    slow = log.slow_queries()
+    assert [entry["query"] for entry in slow] == ["T | where EventID == 3", "T | where EventID == 2"]
+    assert slow[0]["profile"][0]["operator"] == "where"
+    assert slow[0]["fingerprint"] == fingerprint("T | where EventID == 3")
+    # The sink keeps every slow query, for replay.
+    assert [entry["execution_time_ms"] for entry in load_jsonl(str(sink))] == [60, 70, 80]
+
+
+def test_the_cheapest_fingerprint_makes_room():
+    log = QueryLog(max_fingerprints=2)
+    log.record("A | take 1", _result(5))
+    log.record("B | take 1", _result(50))
+    log.record("C | take 1", _result(20))
+    assert sorted(row["query"] for row in log.top()) == ["B | take ?", "C | take ?"]
+
+
+def test_endpoints_report_executed_queries(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app.api import sentinel
+    from app.main import app
+
+    monkeypatch.setattr(sentinel, "_query_log", QueryLog(slow_threshold_ms=0))
+    with TestClient(app) as client:
+        for event_id in (4624, 4625):
+            client.post("/api/v1/sentinel/query/kql", json={"query": f"SecurityEvent | where EventID == {event_id}"})
+        slow = client.get("/api/v1/sentinel/query/slow").json()
+        top = client.get("/api/v1/sentinel/query/fingerprints", params={"by": "count"}).json()
+        assert client.get("/api/v1/sentinel/query/fingerprints", params={"by": "nope"}).status_code == 400
+    assert [q["query"] for q in slow["queries"]] == [
+        "SecurityEvent | where EventID == 4625", "SecurityEvent | where EventID == 4624"
+    ]
+    busiest = top["fingerprints"][0]
+    assert (busiest["query"], busiest["count"]) == ("SecurityEvent | where EventID == ?", 2)
@@ -0,0 +1,179 @@
+"""Scatter-gather KQL execution against local shard processes."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import partial
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.simulators import kql_shards
+from app.simulators.kql_engine import KQLExecutor, TableRegistry
+from app.simulators.kql_shards import ShardedKQLExecutor, generated_sources, local_shard_cluster, parquet_sources
+from app.simulators.log_data import generate_batch, generate_table, write_table
+
+SEED = 7
+ANCHOR = datetime(2024, 1, 1, tzinfo=timezone.utc)
+CHUNK_ROWS = 1_000
+# Three chunks, so every shard of the cluster generates one.
+TABLE_ROWS = {"SignInLogs": 2 * CHUNK_ROWS + 500}
+
+QUERIES = [
+    "SignInLogs | where Status == 'Failure' | summarize Failures=count() by UserPrincipalName",
+    "SignInLogs | where Location == 'US' | count",
+    "SignInLogs | summarize Users=dcount(UserPrincipalName), Latest=max(TimeGenerated)",
+    "SignInLogs | where AppDisplayName == 'Azure Portal' | top 5 by TimeGenerated desc",
+    "SignInLogs | distinct Location",
+]
+
+
+@pytest.fixture
+def cluster(monkeypatch):
+    monkeypatch.setattr(kql_shards, "RECONNECT_SECONDS", 3600.0)
+    with local_shard_cluster(3) as cluster:
+        yield cluster
+
+
+def _registry() -> TableRegistry:
+    registry = TableRegistry()
+    for name, rows in TABLE_ROWS.items():
+        registry.register_lazy(name, partial(generate_table, name, rows, seed=SEED, anchor=ANCHOR, chunk_rows=CHUNK_ROWS))
+    return registry
+
+
+def _sources():
+    return generated_sources(TABLE_ROWS, SEED, ANCHOR, chunk_rows=CHUNK_ROWS)
+
+
+def _frame(result) -> pd.DataFrame:
+    assert result.error is None, result.error
+    df = pd.DataFrame(result.rows, columns=result.columns)
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def _assert_same(executor: KQLExecutor, expected: KQLExecutor, query: str):
+    pd.testing.assert_frame_equal(_frame(executor.execute(query)), _frame(expected.execute(query)), check_dtype=False)
+
+
+def _shard_rows(executor: ShardedKQLExecutor, name: str) -> list:
+    return [tables.get(name, 0) for tables in executor._scatter([("tables",)] * len(executor._live()))]
+
+
+def test_shards_generate_their_own_partitions(cluster):
+    registry = _registry()
+    sharded = ShardedKQLExecutor(registry, cluster.addresses, cluster.authkey, sources=_sources())
+    local = KQLExecutor(_registry())
+    for query in QUERIES:
+        _assert_same(sharded, local, query)
+    assert not registry.is_loaded("SignInLogs")  # nothing was generated or shipped by the coordinator
+    assert _shard_rows(sharded, "SignInLogs") == [CHUNK_ROWS, CHUNK_ROWS, 500]
+    sharded.close()
+
+
+def test_nothing_to_push_down_runs_locally(cluster):
+    registry = _registry()
+    registry.warm_up()
+    sharded = ShardedKQLExecutor(registry, cluster.addresses, cluster.authkey, sources=_sources())
+    local = KQLExecutor(_registry())
+    for query in ("SignInLogs | count", "SignInLogs | getschema", "SignInLogs"):
+        _assert_same(sharded, local, query)
+    assert sharded._placements == {}  # answered from statistics or locally, without the shards
+    sharded.close()
+
+
+def test_appends_and_trims_are_sent_as_deltas(cluster):
+    rng = np.random.default_rng(SEED)
+    registry, expected = TableRegistry(), TableRegistry()
+    base = generate_table("SecurityEvent", 3_000, seed=SEED, anchor=ANCHOR)
+    registry.register("SecurityEvent", base)
+    expected.register("SecurityEvent", base)
+    sharded, local = ShardedKQLExecutor(registry, cluster.addresses, cluster.authkey), KQLExecutor(expected)
+    query = "SecurityEvent | summarize Events=count(), First=min(TimeGenerated) by Computer"
+    _assert_same(sharded, local, query)
+    assert _shard_rows(sharded, "SecurityEvent") == [1_000, 1_000, 1_000]
+
+    for minute in range(4):
+        start = ANCHOR + timedelta(minutes=minute)
+        batch = generate_batch("SecurityEvent", 400, rng, start, start + timedelta(minutes=1))
+        registry.append("SecurityEvent", batch)
+        expected.append("SecurityEvent", batch)
+        _assert_same(sharded, local, query)
+    assert sum(_shard_rows(sharded, "SecurityEvent")) == 4_600
+
+    registry.retain_last("SecurityEvent", 1_500)
+    expected.retain_last("SecurityEvent", 1_500)
+    _assert_same(sharded, local, query)
+    assert sum(_shard_rows(sharded, "SecurityEvent")) == 1_500
+
+    registry.register("SecurityEvent", base.iloc[:10])  # replaced: shipped again
+    expected.register("SecurityEvent", base.iloc[:10])
+    _assert_same(sharded, local, query)
+    assert sum(_shard_rows(sharded, "SecurityEvent")) == 10
+    sharded.close()
+
+
+def test_concurrent_queries_scatter_at_the_same_time(cluster, monkeypatch):
+    sharded = ShardedKQLExecutor(_registry(), cluster.addresses, cluster.authkey, sources=_sources())
+    local = KQLExecutor(_registry())
+    _assert_same(sharded, local, QUERIES[0])  # placed once, up front
+
+    # Every shard call of both queries must be in flight before any is sent.
+    barrier = threading.Barrier(2 * len(cluster.addresses), timeout=10)
+    checkout = sharded._checkout
+
+    def waiting_checkout(address):
+        barrier.wait()
+        return checkout(address)
+
+    monkeypatch.setattr(sharded, "_checkout", waiting_checkout)
+    with ThreadPoolExecutor(2) as pool:
+        for future in [pool.submit(_assert_same, sharded, local, query) for query in QUERIES[:2]]:
+            future.result()
+    sharded.close()
+
+
+def test_dead_shard_is_dropped_and_its_rows_rebuilt(cluster):
+    sharded = ShardedKQLExecutor(_registry(), cluster.addresses, cluster.authkey, sources=_sources())
+    local = KQLExecutor(_registry())
+    _assert_same(sharded, local, QUERIES[0])
+
+    cluster.kill(1)
+    _assert_same(sharded, local, QUERIES[0])
+    assert len(sharded._live()) == 2
+    assert sum(_shard_rows(sharded, "SignInLogs")) == TABLE_ROWS["SignInLogs"]
+
+    cluster.kill(0)
+    cluster.kill(2)
+    _assert_same(sharded, local, QUERIES[0])  # no shard left: the local executor answers
+    sharded.close()
+
+
+def test_shards_require_the_cluster_key(cluster):
+    with pytest.raises(ValueError):
+        ShardedKQLExecutor(_registry(), cluster.addresses, b"")
+    with pytest.raises(ValueError):
+        kql_shards.serve_shard(("127.0.0.1", 0), b"")
+    sharded = ShardedKQLExecutor(_registry(), cluster.addresses, b"not-the-cluster-key", sources=_sources())
+    assert sharded._live() == []  # every handshake is refused
+    _assert_same(sharded, KQLExecutor(_registry()), QUERIES[0])  # answered locally instead
+    sharded.close()
+    sharded = ShardedKQLExecutor(_registry(), cluster.addresses, cluster.authkey, sources=_sources())
+    assert len(sharded._live()) == 3  # the shards kept serving after refusing the wrong key
+    sharded.close()
+
+
+def test_shards_read_their_share_of_parquet_partitions(cluster, tmp_path):
+    pytest.importorskip("pyarrow")
+    write_table("SignInLogs", 3_000, str(tmp_path), seed=SEED, anchor=ANCHOR, days=4.5, chunk_rows=CHUNK_ROWS)
+    expected = TableRegistry()
+    files = sorted((tmp_path / "SignInLogs").glob("date=*/*.parquet"))
+    assert len(files) > 3  # more day files than shards
+    expected.register("SignInLogs", pd.concat([pd.read_parquet(f) for f in files], ignore_index=True))
+
+    sharded = ShardedKQLExecutor(TableRegistry(), cluster.addresses, cluster.authkey, sources=parquet_sources(str(tmp_path)))
+    for query in QUERIES:
+        _assert_same(sharded, KQLExecutor(expected), query)
+    assert sum(_shard_rows(sharded, "SignInLogs")) == 3_000
+    sharded.close()
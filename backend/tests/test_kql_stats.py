@@ -0,0 +1,66 @@
+"""Mergeable table statistics: NDV sketches, top-k summaries and appends."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.simulators.kql_stats import HyperLogLog, column_stats, hash_values, merge_table_stats, table_stats
+
+
+def _sketch(values) -> HyperLogLog:
+    sketch = HyperLogLog()
+    sketch.add_hashes(hash_values(pd.Series(values)))
+    return sketch
+
+
+@pytest.mark.parametrize("distinct", [10, 1_000, 50_000])
+def test_hyperloglog_estimates_within_a_few_percent(distinct):
+    values = np.arange(distinct).repeat(3)
+    assert _sketch(values).estimate() == pytest.approx(distinct, rel=0.05)
+
+
+def test_merged_sketches_estimate_the_union():
+    left, right = _sketch(np.arange(0, 30_000)), _sketch(np.arange(20_000, 50_000))
+    assert left.merge(right).estimate() == pytest.approx(50_000, rel=0.05)
+    assert np.array_equal(left.merge(right).registers, _sketch(np.arange(50_000)).registers)
+
+
+def test_top_k_frequencies_and_error_bound():
+    series = pd.Series(["a"] * 50 + ["b"] * 30 + [f"rare{i}" for i in range(20)] + [None] * 10)
+    stats = column_stats(series, capacity=3)
+    assert (stats.count, stats.null_count) == (100, 10)
+    assert stats.top_k["a"] == 50 and stats.top_k["b"] == 30
+    assert stats.top_k_error == 1
+    assert stats.frequency("a") == pytest.approx(50 / 110)
+    assert stats.frequency("rare19") <= 1 / 110  # bounded by the top-k error
+    assert stats.null_fraction == pytest.approx(10 / 110)
+
+
+def test_range_fraction_interpolates_between_min_and_max():
+    stats = column_stats(pd.Series(np.arange(0, 101, dtype=float)))
+    assert stats.range_fraction("<", 25) == pytest.approx(0.25)
+    assert stats.range_fraction(">=", 25) == pytest.approx(0.75)
+    assert stats.range_fraction(">", 500) == 0.0
+    assert column_stats(pd.Series(["x", "y"])).range_fraction("<", 1) is None
+
+
+def test_appended_stats_match_a_full_rebuild():
+    rng = np.random.default_rng(3)
+    first = pd.DataFrame({"User": rng.choice(list("abcdef"), 500), "Bytes": rng.integers(0, 1_000, 500)})
+    second = pd.DataFrame({
+        "User": rng.choice(list("efgh"), 300),
+        "Bytes": rng.integers(500, 2_000, 300),
+        "Country": rng.choice(["US", "DE"], 300),  # a column the first rows lack
+    })
+    merged = merge_table_stats(table_stats(first), second)
+    rebuilt = table_stats(pd.concat([first, second], ignore_index=True))
+
+    assert merged.row_count == rebuilt.row_count == 800
+    for name, column in rebuilt.columns.items():
+        got = merged.columns[name]
+        assert (got.dtype, got.count, got.null_count, got.min, got.max) == (
+            column.dtype, column.count, column.null_count, column.min, column.max
+        )
+        assert got.ndv == column.ndv
+    assert merged.columns["User"].top_k == rebuilt.columns["User"].top_k
+    assert merged.columns["Country"].null_count == 500
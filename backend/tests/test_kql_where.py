@@ -0,0 +1,71 @@
+"""The where-clause parser and its predicates."""
+
+import pandas as pd
+import pytest
+
+from app.simulators.kql_engine import BoolExpr, KQLExecutor, Predicate, TableRegistry, parse_where
+
+
+@pytest.fixture
+def executor():
+    registry = TableRegistry()
+    registry.register("Events", pd.DataFrame({
+        "TimeGenerated": pd.to_datetime([
+            "2024-01-01T00:00:00Z", "2024-01-01T06:00:00Z", "2024-01-02T00:00:00Z", "2024-01-03T00:00:00Z",
+        ]),
+        "Account": ["alice@contoso.com", "Bob@Contoso.com", "carol@fabrikam.com", None],
+        "Process": ["powershell.exe -enc abc", "cmd.exe /c whoami", "explorer.exe", "PowerShell.exe"],
+        "EventID": [4624, 4625, 4625, 4688],
+    }))
+    return KQLExecutor(registry)
+
+
+def _rows(executor, condition: str) -> list:
+    result = executor.execute(f"Events | where {condition} | project EventID")
+    assert result.error is None, result.error
+    return [row["EventID"] for row in result.rows]
+
+
+def test_precedence_and_parentheses():
+    tree = parse_where("A == 1 or B == 2 and not C == 3")
+    assert tree.kind == "or"
+    assert isinstance(tree.children[0], Predicate)
+    assert tree.children[1] == BoolExpr("and", [Predicate("==", ("col", "B"), ("lit", 2)),
+                                                BoolExpr("not", [Predicate("==", ("col", "C"), ("lit", 3))])])
+    assert parse_where("(A == 1 or B == 2) and C == 3").kind == "and"
+
+
+@pytest.mark.parametrize("condition, expected", [
+    ("EventID == 4625", [4625, 4625]),
+    ("EventID in (4624, 4688)", [4624, 4688]),
+    ("EventID !in (4624, 4688)", [4625, 4625]),
+    ("EventID between (4625 .. 4688)", [4625, 4625, 4688]),
+    ("Account =~ 'BOB@contoso.com'", [4625]),
+    ("Account in~ ('ALICE@contoso.com', 'carol@FABRIKAM.com')", [4624, 4625]),
+    ("Account endswith '@contoso.com'", [4624, 4625]),
+    ("Account endswith_cs '@contoso.com'", [4624]),
+    ("Process contains 'POWERSHELL'", [4624, 4688]),
+    ("Process contains_cs 'PowerShell'", [4688]),
+    ("Process !contains 'exe'", []),
+    ("Process has 'whoami'", [4625]),
+    ("Process has 'who'", []),
+    ("Process startswith 'power'", [4624, 4688]),
+    ("Process has_any ('whoami', 'explorer')", [4625, 4625]),
+    ("Process contains_any ('WHOAMI', 'plorer')", [4625, 4625]),
+    ("Process contains_any ('notepad', 'rundll')", []),
+    ("Account contains_any ('CONTOSO')", [4624, 4625]),
+    ("Process contains_any ('cmd.exe /c', '[abc]')", [4625]),
+    ("Process contains_any ('p.w', 'e (', '*')", []),
+    ("Process matches regex '^[a-z]+\\\\.exe$'", [4625]),
+    ("isempty(Account)", [4688]),
+    ("isnotempty(Account) and EventID == 4625", [4625, 4625]),
+    ("TimeGenerated > datetime(2024-01-01T12:00:00Z)", [4625, 4688]),
+    ("not (EventID == 4625 or EventID == 4624)", [4688]),
+])
+def test_predicates(executor, condition, expected):
+    assert _rows(executor, condition) == expected
+
+
+@pytest.mark.parametrize("condition", ["EventID ==", "EventID like 'x'", "(EventID == 1", "Missing == 1"])
+def test_errors_are_reported(executor, condition):
+    assert executor.execute(f"Events | where {condition}").error
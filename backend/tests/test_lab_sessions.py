@@ -0,0 +1,65 @@
+"""Session overlay tables: base rows shared, injected rows per session."""
+
+import pandas as pd
+
+from app.simulators.entity_index import entity_key
+from app.simulators.kql_engine import KQLExecutor, TableRegistry
+from app.simulators.lab_sessions import OverlayRegistry
+
+
+def _events(*users: str) -> pd.DataFrame:
+    return pd.DataFrame({"UserPrincipalName": list(users), "EventID": list(range(len(users)))})
+
+
+def _overlay():
+    base = TableRegistry()
+    base.register("Events", _events("alice@contoso.com", "bob@contoso.com", "alice@contoso.com"))
+    return base, OverlayRegistry(base)
+
+
+def test_reads_see_base_rows_then_overlay_rows():
+    base, overlay = _overlay()
+    assert overlay.get("Events") is base.get("Events")  # nothing injected yet
+    overlay.append("Events", _events("mallory@contoso.com"))
+    assert overlay.get("Events")["UserPrincipalName"].tolist() == [
+        "alice@contoso.com", "bob@contoso.com", "alice@contoso.com", "mallory@contoso.com"
+    ]
+    assert len(base.get("Events")) == 3  # the base table is untouched
+    assert overlay.stats("Events").row_count == 4
+    result = KQLExecutor(overlay).execute("Events | where UserPrincipalName == 'mallory@contoso.com' | count")
+    assert result.error is None and result.rows == [{"Count": 1}]
+
+
+def test_combined_frame_is_reused_until_either_side_changes():
+    base, overlay = _overlay()
+    overlay.append("Events", _events("mallory@contoso.com"))
+    combined = overlay.get("Events")
+    assert overlay.get("Events") is combined
+
+    overlay.append("Events", _events("trent@contoso.com"))
+    combined = overlay.get("Events")
+    assert len(combined) == 5 and overlay.get("Events") is combined
+
+    base.append("Events", _events("carol@contoso.com"))
+    combined = overlay.get("Events")
+    assert len(combined) == 6 and combined["UserPrincipalName"].iloc[-1] == "trent@contoso.com"
+    assert overlay.get("Events") is combined
+
+
+def test_entity_rows_are_offset_past_the_base_rows():
+    base, overlay = _overlay()
+    overlay.append("Events", _events("bob@contoso.com", "alice@contoso.com"))
+    alice = overlay.entity_rows("Events", entity_key("alice@contoso.com"))
+    assert alice.tolist() == [0, 2, 4]
+    frame = overlay.get("Events")
+    assert set(frame["UserPrincipalName"].iloc[alice]) == {"alice@contoso.com"}
+
+
+def test_clear_drops_only_the_session_rows():
+    base, overlay = _overlay()
+    overlay.append("Events", _events("mallory@contoso.com"))
+    overlay.get("Events")
+    overlay.clear()
+    assert overlay.empty
+    assert overlay.get("Events") is base.get("Events")
+    assert overlay.entity_rows("Events", entity_key("mallory@contoso.com")).tolist() == []
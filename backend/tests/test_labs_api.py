@@ -0,0 +1,41 @@
+"""Lab scenario endpoints."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.simulators import tables
+
+SCENARIO = "bec-invoice-fraud-001"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(tables.sessions, "max_sessions", 2)
+    with TestClient(app) as client:
+        yield client
+    for session_id in ("class-a", "class-b", "class-c"):
+        tables.sessions.drop(session_id)
+
+
+def _bulk_start(client, sessions):
+    return client.post(
+        "/api/v1/labs/scenarios/bulk-start",
+        json={"scenario_ids": [SCENARIO], "sessions": sessions, "compression": 0},
+    )
+
+
+def test_bulk_start_runs_in_every_listed_session(client):
+    response = _bulk_start(client, ["class-a", "class-b", "class-a"])
+    assert response.status_code == 200, response.text
+    assert [run["session"] for run in response.json()["runs"]] == ["class-a", "class-b", "class-a"]
+    for session_id, runs in (("class-a", 2), ("class-b", 1)):
+        listed = client.get("/api/v1/labs/runs", headers={"X-Lab-Session": session_id}).json()
+        assert listed["total"] == runs
+
+
+def test_bulk_start_rejects_more_sessions_than_are_kept(client):
+    response = _bulk_start(client, ["class-a", "class-b", "class-c"])
+    assert response.status_code == 400
+    assert "at most 2" in response.json()["detail"]
+    assert len(tables.sessions) == 0  # nothing was created, so nothing was evicted
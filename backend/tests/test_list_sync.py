@@ -0,0 +1,62 @@
+"""Delta sync and ETag revalidation on the incident and alert lists."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.simulators import tables
+
+SESSION = "sync-test"
+HEADERS = {"X-Lab-Session": SESSION}
+LISTS = [("/api/v1/sentinel/incidents", "incidents"), ("/api/v1/defender/alerts", "alerts")]
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/v1/labs/scenarios/bulk-start",
+            json={"scenario_ids": ["bec-invoice-fraud-001"], "compression": 0},
+            headers=HEADERS,
+        )
+        assert response.status_code == 200, response.text
+        yield client
+    tables.sessions.drop(SESSION)
+
+
+@pytest.mark.parametrize("path, key", LISTS)
+def test_if_none_match_revalidates_until_the_list_changes(client, path, key):
+    first = client.get(path, headers=HEADERS)
+    etag = first.headers["ETag"]
+    assert etag == f'"{first.json()["version"]}"'
+    assert client.get(path, headers={**HEADERS, "If-None-Match": etag}).status_code == 304
+
+    record_id = first.json()[key][0]["id"]
+    assert client.patch(f"{path}/{record_id}", json={"status": "Resolved"}, headers=HEADERS).status_code == 200
+    changed = client.get(path, headers={**HEADERS, "If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+
+
+@pytest.mark.parametrize("path, key", LISTS)
+def test_since_returns_changed_and_removed_records(client, path, key):
+    listed = client.get(path, headers=HEADERS).json()
+    version, record_id = listed["version"], listed[key][0]["id"]
+    assert client.get(path, params={"since": version}, headers=HEADERS).json() == {
+        key: [], "removed": [], "version": version, "more": False
+    }
+
+    client.patch(f"{path}/{record_id}", json={"status": "Resolved"}, headers=HEADERS)
+    delta = client.get(path, params={"since": version}, headers=HEADERS).json()
+    assert [r["id"] for r in delta[key]] == [record_id] and delta[key][0]["status"] == "Resolved"
+    assert delta["version"] > version
+
+    filtered = client.get(path, params={"since": version, "status": "New"}, headers=HEADERS).json()
+    assert filtered[key] == [] and filtered["removed"] == [record_id]  # no longer matches
+
+
+@pytest.mark.parametrize("path, key", LISTS)
+def test_expired_versions_get_410(client, path, key):
+    version = client.get(path, headers=HEADERS).json()["version"]
+    assert client.post("/api/v1/labs/reset", headers=HEADERS).status_code == 200
+    assert client.get(path, params={"since": version}, headers=HEADERS).status_code == 410
+    assert client.get(path, params={"since": 0}, headers=HEADERS).status_code == 410
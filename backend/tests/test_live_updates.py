@@ -0,0 +1,177 @@
+"""Live update hub: coalescing, filtering and slow subscribers."""
+
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from app.main import app
+from app.services.live_updates import CLOSED_FRAME, RESYNC_FRAME, LiveFilter, LiveUpdateHub
+from app.simulators import tables
+from app.simulators.kql_engine import TableRegistry
+from app.simulators.lab_sessions import LabEnvironment
+
+
+def _alert(alert_id: str, severity: str = "High", status: str = "New", **fields) -> dict:
+    return {
+        "id": alert_id, "severity": severity, "status": status,
+        "createdTime": "2024-01-01T10:00:00+00:00", **fields,
+    }
+
+
+def _hub(**kwargs):
+    hub, env = LiveUpdateHub(**kwargs), LabEnvironment("live", TableRegistry())
+    return hub, env
+
+
+def _drain(subscription) -> list:
+    frames = []
+    while subscription.backlog:
+        frames.append(json.loads(asyncio.run(subscription.next_frame())))
+    return frames
+
+
+def _events(subscription) -> list:
+    return [(e["kind"], e["event"], e["record"].get("id") if "record" in e else None)
+            for frame in _drain(subscription) for e in frame["events"]]
+
+
+def test_changes_to_one_record_are_coalesced():
+    hub, env = _hub()
+    subscription = hub.subscribe(env, LiveFilter())
+    env.alerts.insert(_alert("a1"))
+    env.alerts.update("a1", status="InProgress")
+    env.alerts.insert(_alert("a2"))
+    env.alerts.update("a2", status="Resolved")
+    hub.flush()
+    (frame,) = _drain(subscription)
+    assert frame["type"] == "changes"
+    # Still new to the subscriber, so sent once as created, at its latest version.
+    assert [(e["event"], e["record"]["status"]) for e in frame["events"]] == [("created", "InProgress"), ("created", "Resolved")]
+
+    env.alerts.update("a1", status="Resolved")
+    env.alerts.delete("a2")
+    hub.flush()
+    assert _events(subscription) == [("alert", "updated", "a1"), ("alert", "deleted", "a2")]
+    hub.flush()
+    assert subscription.backlog == 0  # nothing changed since
+
+
+def test_a_clear_replaces_the_pending_changes_of_its_store():
+    hub, env = _hub()
+    subscription = hub.subscribe(env, LiveFilter())
+    env.alerts.insert(_alert("a1"))
+    env.incidents.insert(_alert("i1"))
+    env.alerts.clear()
+    hub.flush()
+    assert _events(subscription) == [("incident", "created", "i1"), ("alert", "cleared", None)]
+
+
+def test_subscribers_only_get_matching_changes():
+    hub, env = _hub()
+    everything = hub.subscribe(env, LiveFilter())
+    high = hub.subscribe(env, LiveFilter.parse({"kinds": "alert", "severity": "HIGH, medium"}))
+    scenario = hub.subscribe(env, LiveFilter.parse({"scenarioId": "bec", "status": ["new"]}))
+    env.alerts.insert_many([_alert("a1"), _alert("a2", "Low", scenarioId="bec"), _alert("a3", "Medium", "Resolved")])
+    env.incidents.insert(_alert("i1", scenarioId="bec"))
+    hub.flush()
+    assert {e[2] for e in _events(everything)} == {"a1", "a2", "a3", "i1"}
+    assert [e[2] for e in _events(high)] == ["a1", "a3"]
+    assert {e[2] for e in _events(scenario)} == {"a2", "i1"}
+
+    env.incidents.insert(_alert("i2"))
+    hub.flush()
+    assert high.backlog == 0  # no frame when nothing matches
+
+    with pytest.raises(ValueError, match="Unknown kinds"):
+        LiveFilter.parse({"kinds": "alert,device"})
+
+
+def test_subscribers_with_one_filter_share_a_frame():
+    hub, env = _hub()
+    first = hub.subscribe(env, LiveFilter.parse({"severity": "high"}))
+    second = hub.subscribe(env, LiveFilter.parse({"severity": ["High"]}))
+    env.alerts.insert(_alert("a1"))
+    hub.flush()
+    assert first._frames[0] is second._frames[0]
+
+
+def test_a_slow_subscriber_is_told_to_resync():
+    hub, env = _hub(max_frames=3)
+    slow = hub.subscribe(env, LiveFilter())
+    fast = hub.subscribe(env, LiveFilter())
+    for i in range(5):
+        env.alerts.insert(_alert(f"a{i}"))
+        hub.flush()
+        _drain(fast)
+    # The fourth frame found the queue full: the backlog became one resync frame.
+    assert slow.backlog == 2
+    assert asyncio.run(slow.next_frame()) == RESYNC_FRAME
+    assert [e["record"]["id"] for e in json.loads(asyncio.run(slow.next_frame()))["events"]] == ["a4"]
+
+
+def test_unsubscribing_the_last_client_stops_listening():
+    hub, env = _hub()
+    listeners = len(env.alerts.listeners)
+    first, second = hub.subscribe(env, LiveFilter()), hub.subscribe(env, LiveFilter())
+    assert len(hub) == 2 and len(env.alerts.listeners) == listeners + 1
+    hub.unsubscribe(first)
+    hub.unsubscribe(second)
+    assert len(hub) == 0 and len(env.alerts.listeners) == listeners
+    env.alerts.insert(_alert("a1"))
+    hub.flush()
+    assert second.backlog == 0
+
+
+def test_subscriber_limit():
+    hub, env = _hub(max_subscribers=1)
+    hub.subscribe(env, LiveFilter())
+    with pytest.raises(OverflowError):
+        hub.subscribe(env, LiveFilter())
+
+
+def test_subscribers_of_a_closed_environment_are_closed():
+    hub, env = _hub()
+    subscription = hub.subscribe(env, LiveFilter())
+    env.alerts.insert(_alert("a1"))
+    env.closed = True
+    hub.flush()
+    assert len(hub) == 0
+
+    async def frames():
+        return [await subscription.next_frame() for _ in range(3)]
+
+    changes, closed, end = asyncio.run(frames())
+    assert json.loads(changes)["type"] == "changes"
+    assert (closed, end) == (CLOSED_FRAME, None)
+
+
+SESSION = "live-ws"
+
+
+def test_websocket_streams_filtered_changes():
+    with TestClient(app) as client:
+        try:
+            with client.websocket_connect(f"/api/v1/live/ws?session={SESSION}&kinds=alert&severity=high") as ws:
+                started = client.post(
+                    "/api/v1/labs/scenarios/bec-invoice-fraud-001/start?compression=0",
+                    headers={"X-Lab-Session": SESSION},
+                )
+                assert started.status_code == 200
+                frame = ws.receive_json()
+            assert frame["type"] == "changes" and frame["events"]
+            assert {(e["kind"], e["event"], e["record"]["severity"]) for e in frame["events"]} == {
+                ("alert", "created", "High")
+            }
+        finally:
+            tables.sessions.drop(SESSION)
+
+
+def test_websocket_rejects_unknown_kinds():
+    with TestClient(app) as client:
+        with pytest.raises(WebSocketDisconnect) as closed:
+            with client.websocket_connect("/api/v1/live/ws?kinds=device") as ws:
+                ws.receive_text()
+    assert closed.value.code == 1008
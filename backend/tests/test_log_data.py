@@ -0,0 +1,168 @@
+"""Synthetic log data generation."""
+
+import re
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.simulators import log_data
+from app.simulators.log_data import (
+    DEFAULT_TABLE_ROWS, DEVICES, USERS, generate_batch, generate_table, random_guids, random_hex,
+    random_ips_internal, random_ips_mixed,
+)
+
+ANCHOR = datetime(2024, 3, 1, 12, tzinfo=timezone.utc)
+TABLES = list(DEFAULT_TABLE_ROWS)
+
+
+# ─── Vectorized tables ───────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("name", TABLES)
+def test_same_seed_gives_identical_tables(name):
+    first = generate_table(name, 2_000, seed=11, anchor=ANCHOR)
+    pd.testing.assert_frame_equal(first, generate_table(name, 2_000, seed=11, anchor=ANCHOR))
+    assert not first.equals(generate_table(name, 2_000, seed=12, anchor=ANCHOR))
+
+
+@pytest.mark.parametrize("name", TABLES)
+def test_tables_have_their_schema_and_time_window(name):
+    df = generate_table(name, 1_000, seed=1, anchor=ANCHOR)
+    assert len(df) == 1_000
+    assert list(df.columns) == [column for column, _ in log_data.table_schema(name)]
+    assert str(df["TimeGenerated"].dt.tz) == "UTC"
+    assert df["TimeGenerated"].min() >= ANCHOR - timedelta(hours=48)
+    assert df["TimeGenerated"].max() <= ANCHOR
+    assert not df.isna().any().any()
+
+
+def test_column_values_come_from_their_domains():
+    signins = generate_table("SignInLogs", 5_000, seed=2, anchor=ANCHOR)
+    assert set(signins["UserPrincipalName"]) <= set(USERS)
+    assert set(signins["Status"]) == {"Success", "Failure"}
+    assert 0.75 < (signins["Status"] == "Success").mean() < 0.85
+    processes = generate_table("DeviceProcessEvents", 2_000, seed=2, anchor=ANCHOR)
+    assert set(processes["DeviceName"]) <= set(DEVICES)
+    # The command line always starts with the row's own process.
+    assert (processes.apply(lambda r: r["ProcessCommandLine"].startswith(r["FileName"]), axis=1)).all()
+    assert processes["SHA256"].str.fullmatch(r"[0-9a-f]{64}").all()
+    alerts = generate_table("SecurityAlert", 2_000, seed=2, anchor=ANCHOR)
+    # Name, severity and category are drawn together.
+    assert alerts.groupby("AlertName")[["AlertSeverity", "Category"]].nunique().max().max() == 1
+
+
+def test_identifier_helpers():
+    rng = np.random.default_rng(0)
+    guids = random_guids(rng, 500, prefix="/sites/x/")
+    assert all(re.fullmatch(r"/sites/x/[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}", g) for g in guids)
+    assert len(set(guids)) == 500
+    assert all(len(h) == 16 for h in random_hex(rng, 10, 8))
+    assert all(re.fullmatch(r"10\.1\.\d+\.\d+", ip) for ip in random_ips_internal(rng, 200))
+    mixed = random_ips_mixed(rng, 5_000, external_share=0.3)
+    assert all(re.fullmatch(r"\d+\.\d+\.\d+\.\d+", ip) for ip in mixed)
+    internal = np.isin(mixed, log_data._internal_ips())
+    assert 0.6 < internal.mean() < 0.8
+
+
+def test_live_batches_are_sorted_within_their_window():
+    rng = np.random.default_rng(4)
+    start = ANCHOR
+    batch = generate_batch("SecurityEvent", 300, rng, start, start + timedelta(seconds=10))
+    times = batch["TimeGenerated"]
+    assert times.is_monotonic_increasing
+    assert times.min() >= start and times.max() < start + timedelta(seconds=10)
+
+
+# ─── Seeded, chunked generation ──────────────────────────────────────────────
+
+def test_output_does_not_depend_on_the_worker_count():
+    serial = generate_table("DeviceNetworkEvents", 5_500, seed=9, anchor=ANCHOR, chunk_rows=1_000)
+    parallel = generate_table("DeviceNetworkEvents", 5_500, seed=9, anchor=ANCHOR, workers=3, chunk_rows=1_000)
+    pd.testing.assert_frame_equal(serial, parallel)
+
+
+def test_a_table_does_not_depend_on_the_tables_generated_with_it():
+    tables = log_data.load_all_tables(seed=5, anchor=ANCHOR, workers=2)
+    assert {name: len(df) for name, df in tables.items()} == DEFAULT_TABLE_ROWS
+    pd.testing.assert_frame_equal(tables["EmailEvents"], generate_table("EmailEvents", 80, seed=5, anchor=ANCHOR))
+    assert not tables["SignInLogs"]["CorrelationId"].isin(
+        generate_table("SignInLogs", 100, seed=6, anchor=ANCHOR)["CorrelationId"]
+    ).any()
+
+
+def test_chunks_are_independent_streams():
+    chunked = generate_table("SecurityEvent", 3_000, seed=9, anchor=ANCHOR, chunk_rows=1_000)
+    # Asking for more rows only appends chunks: the first ones are unchanged.
+    longer = generate_table("SecurityEvent", 4_500, seed=9, anchor=ANCHOR, chunk_rows=1_000)
+    pd.testing.assert_frame_equal(chunked, longer.iloc[:3_000])
+
+
+@pytest.mark.parametrize("parts", [1, 2, 3, 7])
+def test_partitions_concatenate_to_the_table(parts):
+    table = generate_table("OfficeActivity", 5_500, seed=8, anchor=ANCHOR, chunk_rows=1_000)
+    pieces = [
+        log_data.generate_partition("OfficeActivity", 5_500, part, parts, seed=8, anchor=ANCHOR, chunk_rows=1_000)
+        for part in range(parts)
+    ]
+    pd.testing.assert_frame_equal(pd.concat(pieces, ignore_index=True), table)
+    assert all(list(piece.columns) == list(table.columns) for piece in pieces)
+
+
+# ─── Streaming to Parquet ────────────────────────────────────────────────────
+
+def test_stream_is_sorted_and_covers_the_window():
+    chunks = list(log_data.stream_table("DeviceProcessEvents", 2_500, seed=3, anchor=ANCHOR, days=1, chunk_rows=1_000))
+    assert [len(chunk) for chunk in chunks] == [1_000, 1_000, 500]
+    times = pd.concat(chunks, ignore_index=True)["TimeGenerated"]
+    assert times.is_monotonic_increasing
+    assert times.min() >= ANCHOR - timedelta(days=1) and times.max() < ANCHOR
+
+
+def test_stream_does_not_depend_on_the_worker_count():
+    serial = pd.concat(log_data.stream_table("SignInLogs", 4_200, seed=3, anchor=ANCHOR, chunk_rows=1_000))
+    parallel = pd.concat(log_data.stream_table("SignInLogs", 4_200, seed=3, anchor=ANCHOR, chunk_rows=1_000, workers=2))
+    pd.testing.assert_frame_equal(serial, parallel)
+
+
+def test_write_table_partitions_by_day(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    summary = log_data.write_table("SecurityEvent", 3_000, str(tmp_path), seed=4, anchor=ANCHOR, days=2, chunk_rows=700)
+
+    files = sorted(tmp_path.glob("SecurityEvent/date=*/part-0.parquet"))
+    # 48 hours before noon touch three calendar days.
+    assert [f.parent.name for f in files] == ["date=2024-02-28", "date=2024-02-29", "date=2024-03-01"]
+    assert summary == {"rows": 3_000, "files": 3, "bytes": sum(f.stat().st_size for f in files)}
+
+    written = pd.concat([pq.read_table(f).to_pandas() for f in files], ignore_index=True)
+    streamed = pd.concat(log_data.stream_table("SecurityEvent", 3_000, seed=4, anchor=ANCHOR, days=2, chunk_rows=700),
+                         ignore_index=True)
+    pd.testing.assert_frame_equal(written, streamed, check_dtype=False)
+    for f in files:
+        day = f.parent.name.removeprefix("date=")
+        frame = pq.read_table(f, columns=["TimeGenerated"]).to_pandas()
+        assert (frame["TimeGenerated"].dt.strftime("%Y-%m-%d") == day).all()
+
+
+@pytest.mark.parametrize("text, size", [
+    ("512", 512), ("10B", 10), ("2KB", 2048), ("1.5 mb", 3 * 512 * 1024), (" 2GB ", 2 * 1024 ** 3),
+])
+def test_parse_size(text, size):
+    assert log_data.parse_size(text) == size
+
+
+@pytest.mark.parametrize("text", ["", "MB", "2 PB", "-1KB", "1,5MB"])
+def test_parse_size_rejects_garbage(text):
+    with pytest.raises(ValueError):
+        log_data.parse_size(text)
+
+
+def test_main_writes_the_requested_tables(tmp_path):
+    pytest.importorskip("pyarrow")
+    code = log_data.main([
+        "--tables", "EmailEvents", "SecurityAlert", "--rows", "300", "--out", str(tmp_path),
+        "--seed", "1", "--days", "0.5", "--chunk-rows", "100",
+    ])
+    assert code == 0
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["EmailEvents", "SecurityAlert"]
+    assert all(list((tmp_path / name).glob("date=*/part-0.parquet")) for name in ("EmailEvents", "SecurityAlert"))
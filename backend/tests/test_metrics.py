@@ -0,0 +1,90 @@
+"""Prometheus-style metrics registry and the /metrics endpoint."""
+
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.core.metrics import MetricsRegistry
+from app.main import app
+
+
+def _samples(text: str) -> dict:
+    return {
+        line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1])
+        for line in text.splitlines() if line and not line.startswith("#")
+    }
+
+
+def test_counter_renders_help_type_and_labelled_samples():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests served.", ["route"])
+    requests.inc(route="/a")
+    requests.inc(2, route="/a")
+    requests.inc(route='/b"c')
+    text = registry.render()
+    assert "# HELP requests_total Requests served.\n# TYPE requests_total counter\n" in text
+    assert _samples(text) == {'requests_total{route="/a"}': 3, 'requests_total{route="/b\\"c"}': 1}
+
+
+def test_registering_a_name_twice_returns_the_same_metric():
+    registry = MetricsRegistry()
+    assert registry.counter("x_total", "X.") is registry.counter("x_total", "X again.")
+
+
+def test_gauges_set_or_collect_at_scrape_time():
+    registry = MetricsRegistry()
+    registry.gauge("queue_depth", "Queued items.").set(4)
+    sizes = {"SignInLogs": 10}
+    registry.gauge("table_rows", "Rows per table.", ["table"], collect=lambda: {(k,): v for k, v in sizes.items()})
+    assert _samples(registry.render())['table_rows{table="SignInLogs"}'] == 10
+    sizes["SignInLogs"] = 25
+    samples = _samples(registry.render())
+    assert samples["queue_depth"] == 4 and samples['table_rows{table="SignInLogs"}'] == 25
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency.", ["op"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, op="q")
+    with latency.time(op="t"):
+        pass
+    samples = _samples(registry.render())
+    assert samples['latency_seconds_bucket{op="q",le="0.1"}'] == 2  # bounds are inclusive
+    assert samples['latency_seconds_bucket{op="q",le="1.0"}'] == 3
+    assert samples['latency_seconds_bucket{op="q",le="+Inf"}'] == 4
+    assert samples['latency_seconds_count{op="q"}'] == 4
+    assert samples['latency_seconds_sum{op="q"}'] == 3.65
+    assert samples['latency_seconds_count{op="t"}'] == 1
+
+
+def test_concurrent_increments_are_not_lost():
+    registry = MetricsRegistry()
+    counter = registry.counter("hits_total", "Hits.")
+
+    def hit():
+        for _ in range(10_000):
+            counter.inc()
+
+    threads = [threading.Thread(target=hit) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert _samples(registry.render())["hits_total"] == 40_000
+
+
+def test_endpoint_reports_route_templates_and_kql_metrics():
+    with TestClient(app) as client:
+        client.get("/api/v1/sentinel/incidents/does-not-exist")
+        client.post("/api/v1/sentinel/query/kql", json={"query": "SecurityAlert | take 1"})
+        response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    samples = _samples(response.text)
+    assert any(
+        key.startswith("http_request_duration_seconds_count{")
+        and 'route="/api/v1/sentinel/incidents/{incident_id}"' in key and 'status="404"' in key
+        for key in samples
+    )
+    assert any(key.startswith("kql_query_duration_seconds_count{") for key in samples)
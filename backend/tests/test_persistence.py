@@ -0,0 +1,105 @@
+"""Write-behind persistence of lab sessions (SQLite, one database per test)."""
+
+import asyncio
+
+from app.core.database import create_engine, metadata
+from app.services.persistence import WriteBehindJournal
+from app.simulators.kql_engine import TableRegistry
+from app.simulators.lab_sessions import SessionManager
+
+
+def _alert(alert_id: str, severity: str = "High") -> dict:
+    return {"id": alert_id, "title": f"Alert {alert_id}", "severity": severity, "status": "New",
+            "createdTime": "2024-01-01T00:00:00Z"}
+
+
+def _run(tmp_path, scenario):
+    async def main():
+        engine = create_engine(f"sqlite:///{tmp_path / 'lab.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(metadata.create_all)
+        try:
+            await scenario(engine)
+        finally:
+            await engine.dispose()
+    asyncio.run(main())
+
+
+async def _start(engine, max_sessions: int = 500):
+    journal = WriteBehindJournal(flush_seconds=3600)
+    sessions = SessionManager(TableRegistry(), max_sessions=max_sessions, journal=journal)
+    await journal.restore(engine, sessions)
+    journal.start(engine, sessions)
+    return journal, sessions
+
+
+def test_changes_survive_a_restart(tmp_path):
+    async def scenario(engine):
+        journal, sessions = await _start(engine)
+        env = sessions.get("a")
+        env.alerts.insert_many([_alert("1"), _alert("2")])
+        env.alerts.update("1", status="Resolved")
+        env.alerts.delete("2")
+        env.add_score("s1", "q1", 10)
+        await journal.stop()
+
+        journal, sessions = await _start(engine)
+        env = await sessions.acquire("a")
+        assert [a["status"] for a in env.alerts.values()] == ["Resolved"]
+        assert env.scores == {"s1": {"q1": 10}}
+        await journal.stop()
+
+    _run(tmp_path, scenario)
+
+
+def test_eviction_keeps_saved_state_and_reloads_it(tmp_path):
+    async def scenario(engine):
+        journal, sessions = await _start(engine, max_sessions=1)
+        (await sessions.acquire("a")).alerts.insert_many([_alert("1")])
+        (await sessions.acquire("b")).alerts.insert_many([_alert("2")])  # evicts a
+        assert len(sessions) == 1
+        await journal.flush()
+
+        env = await sessions.acquire("a")  # loaded back, evicting b
+        assert [a["id"] for a in env.alerts.values()] == ["1"]
+        await journal.stop()
+
+        journal, sessions = await _start(engine, max_sessions=1)
+        assert len(sessions) == 1  # the other saved session stays on disk until used
+        assert [a["id"] for a in (await sessions.acquire("a")).alerts.values()] == ["1"]
+        assert [a["id"] for a in (await sessions.acquire("b")).alerts.values()] == ["2"]
+        await journal.stop()
+
+    _run(tmp_path, scenario)
+
+
+def test_resync_keeps_changes_of_evicted_sessions(tmp_path):
+    async def scenario(engine):
+        journal, sessions = await _start(engine, max_sessions=1)
+        journal.max_pending = 3
+        (await sessions.acquire("a")).alerts.insert_many([_alert("1"), _alert("2")])
+        (await sessions.acquire("b")).alerts.insert_many([_alert(str(i)) for i in range(3, 8)])  # overflows
+        await journal.flush()
+
+        journal, sessions = await _start(engine, max_sessions=1)
+        assert len((await sessions.acquire("a")).alerts) == 2
+        assert len((await sessions.acquire("b")).alerts) == 5
+        await journal.stop()
+
+    _run(tmp_path, scenario)
+
+
+def test_drop_deletes_saved_state(tmp_path):
+    async def scenario(engine):
+        journal, sessions = await _start(engine)
+        (await sessions.acquire("a")).alerts.insert_many([_alert("1")])
+        await journal.flush()
+        assert sessions.drop("a")
+        assert not journal.has_saved("a")
+        await journal.stop()
+
+        journal, sessions = await _start(engine)
+        assert len((await sessions.acquire("a")).alerts) == 0
+        await journal.stop()
+
+    _run(tmp_path, scenario)
@@ -0,0 +1,185 @@
+"""Indexed record store: cursor pages, index filters, match counts and the change log."""
+
+import pytest
+
+from app.services.record_store import RecordStore, VersionExpired
+
+SEVERITIES = ("High", "Medium", "Low")
+STATUSES = ("New", "Active")
+
+
+def _record(i: int, **fields) -> dict:
+    record = {
+        "id": f"r{i:03d}",
+        "createdTime": f"2024-01-01T00:{i // 60:02d}:{i % 60:02d}Z",
+        "severity": SEVERITIES[i % 3],
+        "status": STATUSES[i % 2],
+        "tags": [],
+    }
+    record.update(fields)
+    return record
+
+
+def _store(n: int = 30, batch: bool = True) -> RecordStore:
+    store = RecordStore(indexed_fields=("severity", "status", "tags"), multi_valued=("tags",))
+    records = [_record(i) for i in range(n)]
+    if batch:
+        store.insert_many(records)
+    else:
+        for record in records:
+            store.insert(record)
+    return store
+
+
+def _expected(store: RecordStore, **filters) -> list:
+    """Matching ids, newest first, by a full scan."""
+    return [
+        r["id"] for r in sorted(store.values(), key=lambda r: r["createdTime"], reverse=True)
+        if all(
+            value.lower() in [v.lower() for v in (r[f] if isinstance(r[f], list) else [r[f]])]
+            for f, value in filters.items()
+        )
+    ]
+
+
+def _all_pages(store: RecordStore, limit: int, **filters) -> list:
+    ids, cursor = [], None
+    while True:
+        items, cursor, total = store.page(filters, limit=limit, cursor=cursor)
+        assert total == len(_expected(store, **filters))
+        ids += [r["id"] for r in items]
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("batch", [True, False])
+@pytest.mark.parametrize("filters", [{}, {"severity": "high"}, {"severity": "Low", "status": "New"}])
+def test_pages_walk_every_match_newest_first(batch, filters):
+    store = _store(batch=batch)
+    for limit in (1, 7, 10, 100):
+        assert _all_pages(store, limit, **filters) == _expected(store, **filters)
+
+
+def test_out_of_order_inserts_keep_creation_order():
+    store = _store(10)
+    store.insert_many([_record(i) for i in range(20, 10, -1)])
+    store.insert(_record(5, createdTime="2023-12-31T00:00:00Z"))  # replaces r005
+    assert len(store) == 20
+    assert _all_pages(store, 3) == _expected(store)
+    assert _all_pages(store, 3)[-1] == "r005"
+
+
+def test_a_batch_naming_an_id_twice_keeps_the_last_record():
+    store = _store(0)
+    store.insert_many([_record(1, severity="High"), _record(2), _record(1, createdTime="2024-01-02T00:00:00Z")])
+    assert len(store) == 2
+    assert store.get("r001")["createdTime"] == "2024-01-02T00:00:00Z"
+    assert _all_pages(store, 1) == ["r001", "r002"]
+    assert store.page({"severity": "medium", "status": "active"})[2] == 1
+    store.delete("r001")
+    assert len(store) == 1
+    assert store.page({}) == ([store.get("r002")], None, 1)  # no ghost key left behind
+    assert store.page({"severity": "medium", "status": "active"})[2] == 0
+
+
+def test_update_moves_records_between_index_buckets():
+    store = _store()
+    store.update("r000", severity="Low", status="Active")
+    store.update("r001", tags=["phishing", "Finance"])
+    store.update("r002", createdTime="2025-01-01T00:00:00Z")
+    assert store.page({"severity": "high"})[2] == 9
+    assert _all_pages(store, 4, severity="low", status="active") == _expected(store, severity="low", status="active")
+    assert "r000" in _expected(store, severity="low", status="active")
+    assert store.page({"tags": "finance"})[0][0]["id"] == "r001"
+    assert store.page({"tags": "phishing", "status": "active"})[2] == 1
+    assert store.page({})[0][0]["id"] == "r002"  # re-keyed to the newest position
+
+
+def test_delete_and_clear_update_pages_and_totals():
+    store = _store()
+    store.delete("r003")
+    assert store.delete("missing") is None
+    assert "r003" not in _all_pages(store, 5)
+    assert store.page({"severity": "high", "status": "active"})[2] == len(
+        _expected(store, severity="high", status="active")
+    )
+    store.clear()
+    assert store.page({"severity": "high"}) == ([], None, 0)
+
+
+def test_listeners_see_every_write():
+    store = _store(0)
+    seen = []
+    store.listeners.append(lambda op, records: seen.append((op, [r["id"] for r in records])))
+    store.insert_many([_record(1), _record(2)])
+    store.update("r001", status="Resolved")
+    store.delete("r002")
+    store.clear()
+    assert seen == [("insert", ["r001", "r002"]), ("update", ["r001"]), ("delete", ["r002"]), ("clear", [])]
+
+
+def test_unindexed_filters_and_bad_cursors_are_rejected():
+    store = _store()
+    with pytest.raises(ValueError):
+        store.page({"owner": "alice"})
+    with pytest.raises(ValueError):
+        store.page({}, cursor="not a cursor")
+
+
+# ─── Change log ──────────────────────────────────────────────────────────────
+
+def test_changes_since_returns_the_latest_state_once():
+    store = _store(5)
+    version = store.version
+    store.insert(_record(10))
+    store.update("r001", status="Resolved")
+    store.update("r010", severity="Low")
+    store.delete("r002")
+    records, removed, next_version, more = store.changes_since(version)
+    assert [r["id"] for r in records] == ["r001", "r010"]  # oldest change first, r010 once
+    assert removed == ["r002"]
+    assert (next_version, more) == (store.version, False)
+    assert store.changes_since(next_version) == ([], [], store.version, False)
+
+
+def test_changes_that_leave_the_filter_are_removals():
+    store = _store(6)
+    version = store.version
+    store.update("r000", severity="Low")  # was High
+    store.update("r003", status="Resolved")  # still High
+    records, removed, _, _ = store.changes_since(version, {"severity": "high"})
+    assert [r["id"] for r in records] == ["r003"]
+    assert removed == ["r000"]
+
+
+def test_changes_are_paged_by_limit():
+    store = _store(0)
+    version = store.version
+    store.insert_many([_record(i) for i in range(7)])
+    seen = []
+    while True:
+        records, removed, version, more = store.changes_since(version, limit=3)
+        seen += [r["id"] for r in records]
+        if not more:
+            break
+    assert sorted(seen) == [f"r{i:03d}" for i in range(7)] and len(seen) == 7
+
+
+def test_old_tombstones_and_clears_expire_versions():
+    store = RecordStore(indexed_fields=("severity",), max_tombstones=2)
+    store.insert_many([_record(i) for i in range(4)])
+    version = store.version
+    for record_id in ("r000", "r001"):
+        store.delete(record_id)
+    assert store.changes_since(version)[1] == ["r000", "r001"]
+    store.delete("r002")  # the oldest tombstone is forgotten
+    with pytest.raises(VersionExpired):
+        store.changes_since(version)
+    assert store.changes_since(store.version - 1)[1] == ["r002"]
+
+    version = store.version
+    store.clear()
+    with pytest.raises(VersionExpired):
+        store.changes_since(version)
+    with pytest.raises(VersionExpired):
+        store.changes_since(store.version + 1)  # from another process
@@ -0,0 +1,150 @@
+"""Scenario YAML validation, the compiled cache and hot reload."""
+
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from app.simulators import scenario_loader
+from app.simulators.scenario_loader import ScenarioCatalog, ScenarioValidationError, main, parse_scenario_file
+
+SHIPPED = Path(__file__).resolve().parents[1] / "scenarios" / "shared" / "bec-invoice-fraud-001.yaml"
+
+MINIMAL = """\
+id: {id}
+name: {name}
+difficulty: beginner
+stages:
+  - name: Access
+    delay_minutes: 1
+    events:
+      - type: alert
+        product: Microsoft Entra ID Protection
+        delay_seconds: 30
+        data: {{title: Risky sign-in, severity: high, entity: alice@contoso.com}}
+      - type: log
+        table: SigninLogs
+        repeat: 3
+        data: {{UserPrincipalName: alice@contoso.com}}
+incident: {{title: {name}, severity: medium}}
+"""
+
+
+def _write(path: Path, text: str, mtime_ns: int = None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def root(tmp_path) -> Path:
+    root = tmp_path / "scenarios"
+    (root / "shared").mkdir(parents=True)
+    shutil.copy(SHIPPED, root / "shared" / SHIPPED.name)
+    _write(root / "team" / "minimal.yaml", MINIMAL.format(id="minimal-001", name="Minimal"))
+    return root
+
+
+# ─── Validation ──────────────────────────────────────────────────────────────
+
+def test_minimal_scenario_compiles_to_runtime_shape():
+    scenario_id, compiled = parse_scenario_file("minimal.yaml", MINIMAL.format(id="minimal-001", name="Minimal").encode())
+    assert scenario_id == "minimal-001"
+    assert compiled["difficulty"] == "Beginner"
+    assert compiled["alerts"][0]["severity"] == "High"
+    assert compiled["alerts"][0]["offset_seconds"] == 90.0
+    assert compiled["logs"][0]["repeat"] == 3
+    assert compiled["incident"]["severity"] == "Medium"
+
+
+@pytest.mark.parametrize("text, message", [
+    ("id: [unclosed", "invalid YAML"),
+    ("- just\n- a list\n", "scenario must be a mapping"),
+    (MINIMAL.format(id="Not_Kebab", name="X"), "id must be a kebab-case string"),
+    (MINIMAL.format(id="ok-1", name="X").replace("difficulty: beginner", "difficulty: trivial"), "difficulty must be"),
+    (MINIMAL.format(id="ok-1", name="X").replace("type: log", "type: metric"), "stages[0].events[1].type must be"),
+    (MINIMAL.format(id="ok-1", name="X").replace("table: SigninLogs", "repeat_interval_ms: 5"),
+     "stages[0].events[1].table is required"),
+    (MINIMAL.format(id="ok-1", name="X").replace("severity: high", "severity: urgent"), "data.severity must be"),
+    (MINIMAL.format(id="ok-1", name="X").replace("incident: {title: X, severity: medium}", "incident: nope"),
+     "incident is required"),
+])
+def test_invalid_scenarios_are_rejected_with_a_message(text, message):
+    with pytest.raises(ScenarioValidationError) as exc:
+        parse_scenario_file("bad.yaml", text.encode())
+    assert any(message in error for error in exc.value.errors)
+    assert str(exc.value).startswith("bad.yaml: ")
+
+
+def test_cli_reports_failures(root, capsys):
+    bad = root / "bad.yaml"
+    _write(bad, "id: [unclosed")
+    assert main([str(root / "team" / "minimal.yaml")]) == 0
+    assert main([str(root / "team" / "minimal.yaml"), str(bad)]) == 1
+    assert "FAIL" in capsys.readouterr().out
+
+
+# ─── Catalog ─────────────────────────────────────────────────────────────────
+
+def test_catalog_loads_every_file_and_reports_invalid_ones(root):
+    _write(root / "team" / "broken.yaml", "id: [unclosed")
+    # Files load in path order, so the later file with the same id is the duplicate.
+    _write(root / "team" / "zz-copy.yaml", MINIMAL.format(id="minimal-001", name="Copy"))
+    catalog = ScenarioCatalog(str(root))
+    assert set(catalog.all()) == {"bec-invoice-fraud-001", "minimal-001"}
+    errors = {Path(path).name: messages for path, messages in catalog.errors.items()}
+    assert errors["broken.yaml"][0].startswith("invalid YAML")
+    assert errors["zz-copy.yaml"] == ["duplicate scenario id 'minimal-001'"]
+
+
+def test_warm_cache_load_equals_cold_load(root, tmp_path, monkeypatch):
+    cache = tmp_path / "cache" / "scenarios.json"
+    cold = ScenarioCatalog(str(root), cache_path=str(cache)).all()
+    assert cache.exists()
+
+    def unexpected_parse(path, content):
+        raise AssertionError(f"{path} was parsed again")
+
+    monkeypatch.setattr(scenario_loader, "parse_scenario_file", unexpected_parse)
+    warm = ScenarioCatalog(str(root), cache_path=str(cache)).all()
+    assert warm == cold and set(warm) == {"bec-invoice-fraud-001", "minimal-001"}
+
+    os.utime(root / "team" / "minimal.yaml")  # touched, not edited: still not parsed
+    assert ScenarioCatalog(str(root), cache_path=str(cache)).all() == cold
+
+
+def test_cache_for_another_root_is_ignored(root, tmp_path):
+    cache = tmp_path / "scenarios.json"
+    ScenarioCatalog(str(root), cache_path=str(cache)).all()
+    other = tmp_path / "other"
+    _write(other / "only.yaml", MINIMAL.format(id="only-001", name="Only"))
+    assert set(ScenarioCatalog(str(other), cache_path=str(cache)).all()) == {"only-001"}
+
+
+def test_reload_picks_up_edits_additions_and_deletions(root):
+    catalog = ScenarioCatalog(str(root), reload_interval=0)
+    minimal = root / "team" / "minimal.yaml"
+    mtime = minimal.stat().st_mtime_ns
+    assert catalog.get("minimal-001")["name"] == "Minimal"
+
+    _write(minimal, MINIMAL.format(id="minimal-001", name="Edited"), mtime + 1_000_000_000)
+    assert catalog.get("minimal-001")["name"] == "Edited"
+
+    _write(minimal, "id: [unclosed", mtime + 2_000_000_000)
+    assert catalog.get("minimal-001")["name"] == "Edited"  # the last good version keeps serving
+    assert str(minimal) in catalog.errors
+
+    _write(root / "team" / "added.yaml", MINIMAL.format(id="added-001", name="Added"))
+    (root / "shared" / SHIPPED.name).unlink()
+    assert set(catalog.all()) == {"minimal-001", "added-001"}
+
+
+def test_reload_waits_for_the_interval(root):
+    catalog = ScenarioCatalog(str(root), reload_interval=3600)
+    assert "added-001" not in catalog.all()
+    _write(root / "added.yaml", MINIMAL.format(id="added-001", name="Added"))
+    assert "added-001" not in catalog.all()
+    catalog.refresh(force=True)
+    assert "added-001" in catalog.all()
@@ -0,0 +1,158 @@
+"""Scenario timeline playback: compressed timing and cancellation."""
+
+import asyncio
+
+import pandas as pd
+import pytest
+
+from app.simulators import scenario_scheduler
+from app.simulators.kql_engine import TableRegistry
+from app.simulators.lab_sessions import LabEnvironment
+from app.simulators.scenario_scheduler import TimelineScheduler
+
+
+def _alert(title: str, offset: float) -> dict:
+    return {
+        "title": title, "severity": "Medium", "product": "Defender for Endpoint", "category": "Execution",
+        "description": title, "entity": "alice@contoso.com", "mitre": "T1059", "status": "New",
+        "offset_seconds": offset,
+    }
+
+
+# Offsets in scenario seconds: at compression 600 they fire 0, 100 and 200 ms apart.
+SCENARIO = {
+    "name": "Timeline",
+    "alerts": [_alert("First", 0), _alert("Second", 60), _alert("Third", 120)],
+    "logs": [{
+        "offset_seconds": 30, "table": "SecurityEvent", "data": {"EventID": 4625, "Account": "alice"},
+        "repeat": 3, "repeat_interval_ms": 60_000,
+    }],
+    "incident": {
+        "title": "Timeline incident", "severity": "Medium", "description": "",
+        "entities": ["alice@contoso.com"], "mitre_techniques": ["T1059"],
+    },
+}
+
+
+@pytest.fixture(autouse=True)
+def _scenario(monkeypatch):
+    monkeypatch.setattr(scenario_scheduler, "get_scenario", {"timeline": SCENARIO}.get)
+
+
+def _env(session_id: str = "s1") -> LabEnvironment:
+    registry = TableRegistry()
+    registry.register("SecurityEvent", pd.DataFrame({
+        "TimeGenerated": pd.to_datetime(["2024-01-01T00:00:00Z"]), "EventID": [4624], "Account": ["bob"],
+    }))
+    return LabEnvironment(session_id, registry)
+
+
+def _titles(env: LabEnvironment):
+    return sorted(alert["title"] for alert in env.alerts.values())
+
+
+def test_events_fire_at_their_compressed_offsets():
+    async def scenario():
+        scheduler, env = TimelineScheduler(), _env()
+        run = scheduler.schedule(env, "timeline", compression=600)
+        # The offset-0 alert fires before schedule returns.
+        assert _titles(env) == ["First"] and run.incident["alertIds"] == [env.alerts.values()[0]["id"]]
+        await asyncio.sleep(0.07)
+        assert _titles(env) == ["First"] and len(env.registry.get("SecurityEvent")) == 4
+        await asyncio.sleep(0.1)
+        assert _titles(env) == ["First", "Second"]
+        await asyncio.sleep(0.1)
+        assert _titles(env) == ["First", "Second", "Third"]
+        await scheduler.stop()
+        return run, env
+
+    run, env = asyncio.run(scenario())
+    status = run.status()
+    assert status["state"] == "completed"
+    assert (status["events_fired"], status["events_total"], status["alerts_created"]) == (4, 4, 3)
+    assert status["duration_seconds"] == 0.2
+    assert env.incidents.get(run.incident_id)["alertCount"] == 3
+
+    # Repeated log rows are spaced by their compressed interval (60s / 600).
+    rows = env.registry.get("SecurityEvent").iloc[1:]
+    assert rows["Account"].tolist() == ["alice"] * 3
+    gaps = rows["TimeGenerated"].diff().dropna().dt.total_seconds().tolist()
+    assert gaps == pytest.approx([0.1, 0.1])
+
+
+def test_zero_compression_fires_everything_at_once():
+    async def scenario():
+        scheduler, env = TimelineScheduler(), _env()
+        run = scheduler.schedule(env, "timeline", compression=0)
+        fired = _titles(env)
+        await asyncio.sleep(0.02)  # log rows are appended off the event loop
+        await scheduler.stop()
+        return run, env, fired
+
+    run, env, fired = asyncio.run(scenario())
+    assert fired == ["First", "Second", "Third"]
+    assert run.status()["state"] == "completed"
+    assert len(env.registry.get("SecurityEvent")) == 4
+
+
+def test_cancelled_runs_fire_nothing_more():
+    async def scenario():
+        scheduler = TimelineScheduler()
+        env = _env()
+        cancelled = scheduler.schedule(env, "timeline", compression=600)
+        kept = scheduler.schedule(env, "timeline", compression=600)
+        assert scheduler.cancel(cancelled.id)
+        assert not scheduler.cancel(cancelled.id)
+        assert scheduler.active == 1
+        await asyncio.sleep(0.3)
+        await scheduler.stop()
+        return cancelled, kept, env
+
+    cancelled, kept, env = asyncio.run(scenario())
+    assert cancelled.status()["state"] == "cancelled"
+    assert (cancelled.fired, cancelled.alerts_created) == (1, 1)
+    assert kept.status()["state"] == "completed"
+    assert len(env.alerts) == 1 + 3
+
+
+def test_cancel_all_is_scoped_to_an_environment():
+    async def scenario():
+        scheduler = TimelineScheduler()
+        first, second = _env("s1"), _env("s2")
+        runs = scheduler.schedule_many([(first, "timeline"), (second, "timeline")], compression=600)
+        scheduler.cancel_all(first)
+        await asyncio.sleep(0.3)
+        await scheduler.stop()
+        return runs
+
+    stopped, finished = asyncio.run(scenario())
+    assert stopped.status()["state"] == "cancelled" and stopped.fired == 1
+    assert finished.status()["state"] == "completed"
+
+
+def test_runs_of_a_closed_environment_stop():
+    async def scenario():
+        scheduler, env = TimelineScheduler(), _env()
+        run = scheduler.schedule(env, "timeline", compression=600)
+        env.closed = True
+        await asyncio.sleep(0.3)
+        await scheduler.stop()
+        return run, env
+
+    run, env = asyncio.run(scenario())
+    assert run.status()["state"] == "cancelled"
+    assert _titles(env) == ["First"]
+    assert len(env.registry.get("SecurityEvent")) == 1
+
+
+def test_schedule_rejects_bad_input():
+    async def scenario():
+        scheduler = TimelineScheduler()
+        with pytest.raises(ValueError, match="not found"):
+            scheduler.schedule(_env(), "missing")
+        with pytest.raises(ValueError, match="compression"):
+            scheduler.schedule(_env(), "timeline", compression=-1)
+        await scheduler.stop()
+
+    asyncio.run(scenario())
+
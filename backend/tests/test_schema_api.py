@@ -0,0 +1,39 @@
+"""The /schema endpoint."""
+
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import sentinel
+from app.main import app
+from app.simulators.tables import build_registry
+
+ANCHOR = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = build_registry(seed=7, anchor=ANCHOR)
+    monkeypatch.setattr(sentinel, "_registry", registry)
+    with TestClient(app) as client:
+        yield client, registry
+
+
+def _columns(response) -> dict:
+    return {t["name"]: [(c["name"], c["type"]) for c in t["columns"]] for t in response.json()["tables"]}
+
+
+def test_schema_lists_lazy_tables_without_loading_them(registry):
+    client, tables = registry
+    response = client.get("/api/v1/sentinel/schema")
+    assert response.status_code == 200
+    assert not any(tables.is_loaded(name) for name in tables.list_tables())
+    assert all(t["loaded"] is False and t["row_count"] is None for t in response.json()["tables"])
+
+    tables.warm_up()
+    loaded = client.get("/api/v1/sentinel/schema")
+    assert _columns(loaded) == _columns(response)  # declared schemas match the generated tables
+    signins = next(t for t in loaded.json()["tables"] if t["name"] == "SignInLogs")
+    assert signins["loaded"] is True and signins["row_count"] > 0
+    assert any(c["completable"] for c in signins["columns"])
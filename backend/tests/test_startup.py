@@ -0,0 +1,28 @@
+"""Cold-start budget: importing and starting the app stays cheap and generates no tables."""
+
+import os
+
+from benchmarks.startup_budget import check, measure
+from app.simulators.log_data import DEFAULT_TABLE_ROWS
+from app.simulators.tables import build_registry
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous next to the benchmark's defaults, so a loaded CI machine does not flake.
+BUDGETS = {"import_seconds": 6.0, "startup_seconds": 2.0, "first_query_seconds": 4.0}
+
+
+def test_building_the_registry_generates_nothing():
+    registry = build_registry(seed=1)
+    assert registry.list_tables() == list(DEFAULT_TABLE_ROWS)
+    assert not any(registry.is_loaded(name) for name in registry.list_tables())
+
+    assert len(registry.get("SignInLogs")) == DEFAULT_TABLE_ROWS["SignInLogs"]
+    assert [n for n in registry.list_tables() if registry.is_loaded(n)] == ["SignInLogs"]
+
+
+def test_cold_start_is_within_budget():
+    env = {**os.environ, "KQL_WARMUP_ON_STARTUP": "false", "PYTHONPATH": BACKEND}
+    timings = min((measure(env) for _ in range(2)), key=lambda t: t["import_seconds"] + t["startup_seconds"])
+    assert timings["tables_loaded_at_startup"] == 0
+    assert check(timings, BUDGETS) == []
@@ -0,0 +1,118 @@
+"""Live telemetry: EPS targets, rate profiles and backpressure."""
+
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.simulators.kql_engine import TableRegistry
+from app.simulators.log_data import DEFAULT_TABLE_ROWS, generate_table
+from app.simulators.telemetry import RATE_PROFILES, TelemetryEmitter
+
+NOON = datetime(2024, 3, 1, 12, tzinfo=timezone.utc)
+
+
+def _emitter(eps: float, tables=("SecurityEvent",), **kwargs) -> TelemetryEmitter:
+    registry = TableRegistry()
+    for name in tables:
+        registry.register(name, generate_table(name, 10, seed=0, anchor=NOON))
+    return TelemetryEmitter(registry, eps, tables=list(tables), seed=0, **kwargs)
+
+
+def test_eps_is_split_in_proportion_to_table_sizes():
+    emitter = TelemetryEmitter(TableRegistry(), 1_000)
+    assert set(emitter.rates) == set(DEFAULT_TABLE_ROWS)
+    assert sum(emitter.rates.values()) == pytest.approx(1_000)
+    ratio = DEFAULT_TABLE_ROWS["DeviceProcessEvents"] / DEFAULT_TABLE_ROWS["SecurityAlert"]
+    assert emitter.rates["DeviceProcessEvents"] / emitter.rates["SecurityAlert"] == pytest.approx(ratio)
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError, match="Unknown rate profile"):
+        TelemetryEmitter(TableRegistry(), 10, profile="sawtooth")
+
+
+def test_profiles():
+    assert RATE_PROFILES["constant"](NOON) == 1.0
+    assert RATE_PROFILES["diurnal"](NOON.replace(hour=14)) == pytest.approx(1.0)
+    assert RATE_PROFILES["diurnal"](NOON.replace(hour=2)) == pytest.approx(0.3)
+    assert RATE_PROFILES["bursty"](NOON.replace(second=5)) == 5.0
+    assert RATE_PROFILES["bursty"](NOON.replace(second=30)) == 0.6
+
+
+def test_ticks_append_the_due_events_and_carry_fractions():
+    emitter = _emitter(2.5)
+    appended = [emitter.tick(NOON + timedelta(seconds=i), NOON + timedelta(seconds=i + 1)) for i in range(4)]
+    # 2.5 events per second: the half event is carried to the next tick.
+    assert appended == [2, 3, 2, 3]
+    events = emitter.registry.get("SecurityEvent")
+    assert len(events) == 10 + 10
+    fresh = events["TimeGenerated"].iloc[10:]
+    assert fresh.min() >= NOON and fresh.max() < NOON + timedelta(seconds=4)
+
+
+def test_a_late_tick_emits_one_larger_batch():
+    emitter = _emitter(100)
+    assert emitter.tick(NOON, NOON + timedelta(seconds=3)) == 300
+    assert emitter.status()["tables"]["SecurityEvent"]["emitted"] == 300
+
+
+def test_batches_are_capped_and_the_excess_is_dropped():
+    emitter = _emitter(1_000, max_batch_rows=250)
+    assert emitter.tick(NOON, NOON + timedelta(seconds=1)) == 250
+    table = emitter.status()["tables"]["SecurityEvent"]
+    assert (table["emitted"], table["dropped"]) == (250, 750)
+
+
+def test_shedding_drops_the_whole_tick():
+    emitter = _emitter(100)
+    assert emitter.tick(NOON, NOON + timedelta(seconds=2), shed=True) == 0
+    assert len(emitter.registry.get("SecurityEvent")) == 10
+    assert emitter.status()["tables"]["SecurityEvent"]["dropped"] == 200
+
+
+def test_tables_are_trimmed_to_the_newest_rows():
+    emitter = _emitter(100, max_table_rows=50)
+    for i in range(3):
+        emitter.tick(NOON + timedelta(seconds=i), NOON + timedelta(seconds=i + 1))
+    events = emitter.registry.get("SecurityEvent")
+    assert len(events) == 50
+    assert events["TimeGenerated"].min() >= NOON + timedelta(seconds=2)
+
+
+def test_running_emitter_meets_its_target():
+    emitter = _emitter(400, batch_seconds=0.05)
+    emitter.start()
+    try:
+        time.sleep(0.6)
+    finally:
+        emitter.stop()
+    status = emitter.status()
+    assert not status["running"] and status["batches"] >= 5
+    assert status["target_eps"] == 400
+    assert 200 < status["achieved_eps"] < 600
+    assert status["tables"]["SecurityEvent"]["dropped"] == 0
+
+
+def test_a_stalled_emitter_sheds_and_resynchronises(monkeypatch):
+    emitter = _emitter(400, batch_seconds=0.05, max_lag_seconds=0.2)
+    calls = []
+    tick = emitter.tick
+
+    def slow_first_tick(start, end, shed=False):
+        calls.append(shed)
+        if len(calls) == 1:
+            time.sleep(0.5)
+        return tick(start, end, shed)
+
+    monkeypatch.setattr(emitter, "tick", slow_first_tick)
+    emitter.start()
+    try:
+        time.sleep(0.9)
+    finally:
+        emitter.stop()
+    # The tick after the stall is shed, then the schedule restarts on time.
+    assert calls[:2] == [False, True]
+    assert not any(calls[2:])
+    table = emitter.status()["tables"]["SecurityEvent"]
+    assert table["dropped"] > 0 and table["emitted"] > 0